@@ -0,0 +1,53 @@
+"""Add document sequences
+
+Revision ID: 2026_10_19_doc_sequences
+Revises: 2026_10_19_matricules
+Create Date: 2026-10-19
+
+Adds the document_sequences counter table (per site, year and document
+type) and seeds it from existing purchase order numbers. Purchase order
+numbers restart at 1 for each site, so bons_commande.numero becomes unique
+per site instead of globally.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_doc_sequences'
+down_revision = '2026_10_19_matricules'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'document_sequences',
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('document_type', sa.String(30), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('site_id', 'year', 'document_type')
+    )
+
+    op.execute(r"""
+        INSERT INTO document_sequences (site_id, year, document_type, last_value)
+        SELECT
+            site_id,
+            split_part(numero, '-', 2)::int,
+            'bon_commande',
+            max(split_part(numero, '-', 3)::int)
+        FROM bons_commande
+        WHERE numero ~ '^BC-\d{4}-\d+$'
+        GROUP BY site_id, split_part(numero, '-', 2)
+    """)
+
+    op.drop_constraint('bons_commande_numero_key', 'bons_commande', type_='unique')
+    op.create_index('idx_bc_site_numero', 'bons_commande', ['site_id', 'numero'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_bc_site_numero', 'bons_commande')
+    op.create_unique_constraint('bons_commande_numero_key', 'bons_commande', ['numero'])
+    op.drop_table('document_sequences')
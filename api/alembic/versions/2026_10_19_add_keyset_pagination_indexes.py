@@ -0,0 +1,35 @@
+"""Add (site, sort key, id) indexes for keyset pagination
+
+Revision ID: 2026_10_19_keyset_indexes
+Revises: 2026_10_19_site_partial_indexes
+Create Date: 2026-10-19
+
+Stock movements and purchase orders are now paginated by
+(date, id) within a site; these indexes serve the row comparison used by the
+cursor. Built CONCURRENTLY like the site partial indexes.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_keyset_indexes'
+down_revision = '2026_10_19_site_partial_indexes'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('idx_movements_site_date', 'stock_movements', 'site_id, date_mouvement, id'),
+    ('idx_bc_site_date', 'bons_commande', 'site_id, date_commande, id'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,36 @@
+"""Add partial FEFO index on lots_medicament
+
+Revision ID: 2026_10_19_lot_fefo_index
+Revises: 2026_10_19_stock_site_unique
+Create Date: 2026-10-19
+
+Dispensing allocates quantities across a site's lots in expiry order
+(first-expired-first-out) and locks them in one query:
+
+    WHERE site_id = :site AND medicament_id IN (...) AND quantite_restante > 0
+    ORDER BY medicament_id, date_peremption, id FOR UPDATE
+
+The partial index only holds lots that still have stock, so emptied lots
+drop out of it and the scan stays short.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_lot_fefo_index'
+down_revision = '2026_10_19_stock_site_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_lots_fefo "
+            "ON lots_medicament (site_id, medicament_id, date_peremption, id) "
+            "WHERE quantite_restante > 0"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_lots_fefo")
@@ -0,0 +1,34 @@
+"""Add medicament catalogue version
+
+Revision ID: 2026_10_19_catalogue_version
+Revises: 2026_10_19_keyset_indexes
+Create Date: 2026-10-19
+
+Each write to the medicament catalogue stamps the row with the next value of
+medicament_catalogue_version_seq. The highest stamp is the catalogue version
+used for the cached snapshot, its ETag and "changed since version N" deltas.
+Existing rows start at version 0.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_catalogue_version'
+down_revision = '2026_10_19_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS medicament_catalogue_version_seq")
+    op.add_column(
+        'medicaments',
+        sa.Column('catalogue_version', sa.BigInteger(), nullable=False, server_default='0')
+    )
+    op.create_index('idx_medicaments_catalogue_version', 'medicaments', ['catalogue_version'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_medicaments_catalogue_version', 'medicaments')
+    op.drop_column('medicaments', 'catalogue_version')
+    op.execute("DROP SEQUENCE IF EXISTS medicament_catalogue_version_seq")
@@ -0,0 +1,35 @@
+"""Add updated_at index on medicaments for the sync change feed
+
+Revision ID: 2026_10_19_medicament_updated
+Revises: 2026_10_19_transfer_movements
+Create Date: 2026-10-19
+
+The /sync/changes feed now includes the medicament catalogue and the site's
+stock rows (both are part of the bootstrap snapshot). Each pull reads:
+
+    SELECT ... FROM medicaments
+    WHERE updated_at >= :ts AND (updated_at, id) > (:ts, :id)
+    ORDER BY updated_at, id LIMIT :n
+
+Stock rows are served by idx_stock_sites_site_updated.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_medicament_updated'
+down_revision = '2026_10_19_transfer_movements'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_medicaments_updated "
+            "ON medicaments (updated_at, id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_medicaments_updated")
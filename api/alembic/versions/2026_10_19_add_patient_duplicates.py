@@ -0,0 +1,51 @@
+"""Add patient phonetic keys and duplicate pairs
+
+Revision ID: 2026_10_19_patient_duplicates
+Revises: 2026_10_19_patient_search
+Create Date: 2026-10-19
+
+Adds patients.phonetic_key (indexed with site_id) and the patient_duplicates
+table filled by the nightly score_patient_duplicates task. Keys of existing
+patients are computed by that task on its first run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_patient_duplicates'
+down_revision = '2026_10_19_patient_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('patients', sa.Column('phonetic_key', sa.String(100), nullable=True))
+    op.create_index('idx_patients_site_phonetic', 'patients', ['site_id', 'phonetic_key'])
+
+    op.create_table(
+        'patient_duplicates',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('patient_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('duplicate_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('score', sa.Numeric(4, 3), nullable=False),
+        sa.Column('raisons', postgresql.JSON()),
+        sa.Column('statut', sa.String(20), nullable=False, server_default='en_attente'),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id']),
+        sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['duplicate_id'], ['patients.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_patient_duplicates_pair', 'patient_duplicates', ['patient_id', 'duplicate_id'], unique=True)
+    op.create_index('idx_patient_duplicates_site_statut', 'patient_duplicates', ['site_id', 'statut'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_patient_duplicates_site_statut', 'patient_duplicates')
+    op.drop_index('idx_patient_duplicates_pair', 'patient_duplicates')
+    op.drop_table('patient_duplicates')
+    op.drop_index('idx_patients_site_phonetic', 'patients')
+    op.drop_column('patients', 'phonetic_key')
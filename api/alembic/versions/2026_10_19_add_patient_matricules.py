@@ -0,0 +1,77 @@
+"""Add patient matricules and matricule counters
+
+Revision ID: 2026_10_19_matricules
+Revises: 2026_10_19_sync_sessions
+Create Date: 2026-10-19
+
+Adds patients.matricule (unique) and the matricule_counters table used to
+allocate numbers atomically per (village code, year). Existing patients are
+numbered in creation order and the counters are seeded accordingly.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_matricules'
+down_revision = '2026_10_19_sync_sessions'
+branch_labels = None
+depends_on = None
+
+
+# Même règle que generate_village_code(): 4 premières lettres, complétées par 'X'
+VILLAGE_CODE_SQL = """
+    CASE
+        WHEN village IS NULL OR village = '' THEN 'UNKN'
+        ELSE rpad(upper(left(regexp_replace(village, '[^[:alpha:]]', '', 'g'), 4)), 4, 'X')
+    END
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'matricule_counters',
+        sa.Column('village_code', sa.String(4), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('village_code', 'year')
+    )
+
+    op.add_column('patients', sa.Column('matricule', sa.String(30), nullable=True))
+
+    # Numéroter les patients existants
+    op.execute(f"""
+        WITH numbered AS (
+            SELECT
+                id,
+                {VILLAGE_CODE_SQL} AS village_code,
+                extract(year FROM created_at)::int AS year,
+                row_number() OVER (
+                    PARTITION BY {VILLAGE_CODE_SQL}, extract(year FROM created_at)
+                    ORDER BY created_at, id
+                ) AS number
+            FROM patients
+        )
+        UPDATE patients p
+        SET matricule = n.village_code || '-' || n.year || '-' || lpad(n.number::text, 4, '0')
+        FROM numbered n
+        WHERE p.id = n.id
+    """)
+
+    op.execute("""
+        INSERT INTO matricule_counters (village_code, year, last_value)
+        SELECT
+            split_part(matricule, '-', 1),
+            split_part(matricule, '-', 2)::int,
+            max(split_part(matricule, '-', 3)::int)
+        FROM patients
+        WHERE matricule IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+    op.create_index('idx_patients_matricule', 'patients', ['matricule'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_patients_matricule', 'patients')
+    op.drop_column('patients', 'matricule')
+    op.drop_table('matricule_counters')
@@ -0,0 +1,48 @@
+"""Add trigram patient search index
+
+Revision ID: 2026_10_19_patient_search
+Revises: 2026_10_19_doc_sequences
+Create Date: 2026-10-19
+
+Enables pg_trgm and unaccent, adds the generated column patients.search_text
+(lower-cased, accent-free nom + prenom + telephone) and a GIN trigram index
+on it for substring and similarity search.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_patient_search'
+down_revision = '2026_10_19_doc_sequences'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+
+    # unaccent() n'est que STABLE (dictionnaire modifiable): un wrapper IMMUTABLE
+    # avec dictionnaire explicite est requis pour une colonne générée
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+
+    op.execute("""
+        ALTER TABLE patients ADD COLUMN search_text text
+        GENERATED ALWAYS AS (
+            lower(f_unaccent(coalesce(nom, '') || ' ' || coalesce(prenom, '') || ' ' || coalesce(telephone, '')))
+        ) STORED
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_patients_search_trgm ON patients
+        USING gin (search_text gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_patients_search_trgm', 'patients')
+    op.drop_column('patients', 'search_text')
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
@@ -0,0 +1,42 @@
+"""Add partial composite indexes for site-scoped lists
+
+Revision ID: 2026_10_19_site_partial_indexes
+Revises: 2026_10_19_patient_duplicates
+Create Date: 2026-10-19
+
+Patient and encounter queries filter on site_id and deleted_at IS NULL and
+order by created_at / date. These partial indexes cover those access paths
+(and the (sort key, id) keyset order). They are built CONCURRENTLY so that
+production tables are not locked while the index is built.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_site_partial_indexes'
+down_revision = '2026_10_19_patient_duplicates'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('idx_patients_site_created', 'patients', 'site_id, created_at, id'),
+    ('idx_encounters_site_date', 'encounters', 'site_id, date, id'),
+    ('idx_encounters_patient_date', 'encounters', 'patient_id, date'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON {table} ({columns}) WHERE deleted_at IS NULL"
+            )
+    op.execute("ANALYZE patients")
+    op.execute("ANALYZE encounters")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
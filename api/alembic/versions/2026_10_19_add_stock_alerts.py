@@ -0,0 +1,76 @@
+"""Add stock_alerts table
+
+Revision ID: 2026_10_19_stock_alerts
+Revises: 2026_10_19_lot_fefo_index
+Create Date: 2026-10-19
+
+Precomputed stock alerts: one row per stock at or below its alert threshold
+(lot_id NULL) and one per lot nearing or past its expiry date. The stock
+ledger maintains the stock rows when a movement crosses a threshold; the
+nightly refresh_stock_alerts task realigns everything and computes the
+expiry rows. The table is backfilled here so listings are right at once.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_stock_alerts'
+down_revision = '2026_10_19_lot_fefo_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stock_alerts',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('medicament_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('lot_id', postgresql.UUID(as_uuid=True)),
+        sa.Column('type_alerte', sa.String(20), nullable=False),
+        sa.Column('quantite', sa.Integer(), nullable=False),
+        sa.Column('seuil', sa.Integer()),
+        sa.Column('date_peremption', sa.Date()),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id']),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['medicament_id'], ['medicaments.id']),
+        sa.ForeignKeyConstraint(['lot_id'], ['lots_medicament.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('idx_stock_alerts_site_type', 'stock_alerts', ['site_id', 'type_alerte'])
+    op.create_index(
+        'uq_stock_alerts_stock', 'stock_alerts', ['site_id', 'medicament_id'],
+        unique=True, postgresql_where=sa.text('lot_id IS NULL'),
+    )
+    op.create_index(
+        'uq_stock_alerts_lot', 'stock_alerts', ['lot_id'],
+        unique=True, postgresql_where=sa.text('lot_id IS NOT NULL'),
+    )
+
+    op.execute("""
+        INSERT INTO stock_alerts (id, site_id, tenant_id, medicament_id, type_alerte, quantite, seuil)
+        SELECT gen_random_uuid(), s.site_id, s.tenant_id, s.medicament_id,
+               CASE WHEN s.quantite_actuelle <= 0 THEN 'rupture' ELSE 'stock_bas' END,
+               s.quantite_actuelle, coalesce(s.seuil_alerte, m.seuil_alerte_defaut, 0)
+        FROM stock_sites s JOIN medicaments m ON m.id = s.medicament_id
+        WHERE m.is_active AND s.quantite_actuelle <= coalesce(s.seuil_alerte, m.seuil_alerte_defaut, 0)
+    """)
+    op.execute("""
+        INSERT INTO stock_alerts (id, site_id, tenant_id, medicament_id, lot_id, type_alerte, quantite, date_peremption)
+        SELECT gen_random_uuid(), l.site_id, l.tenant_id, l.medicament_id, l.id,
+               CASE WHEN l.date_peremption < current_date THEN 'perime' ELSE 'peremption_proche' END,
+               l.quantite_restante, l.date_peremption
+        FROM lots_medicament l
+        WHERE l.quantite_restante > 0 AND l.date_peremption <= current_date + 90
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_stock_alerts_lot', 'stock_alerts')
+    op.drop_index('uq_stock_alerts_stock', 'stock_alerts')
+    op.drop_index('idx_stock_alerts_site_type', 'stock_alerts')
+    op.drop_table('stock_alerts')
@@ -0,0 +1,35 @@
+"""Add consumption forecast columns to stock_sites
+
+Revision ID: 2026_10_19_stock_forecast
+Revises: 2026_10_19_stock_snapshots
+Create Date: 2026-10-19
+
+Filled nightly by the forecast_stock_consumption task: average daily
+consumption and its standard deviation over the last 90 days, the reorder
+point (used as alert threshold when seuil_alerte is not set) and the
+order-up-to level used to pre-fill draft purchase orders.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_stock_forecast'
+down_revision = '2026_10_19_stock_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('stock_sites', sa.Column('consommation_journaliere', sa.Numeric(10, 3)))
+    op.add_column('stock_sites', sa.Column('consommation_ecart_type', sa.Numeric(10, 3)))
+    op.add_column('stock_sites', sa.Column('point_commande', sa.Integer()))
+    op.add_column('stock_sites', sa.Column('niveau_cible', sa.Integer()))
+    op.add_column('stock_sites', sa.Column('prevision_calculee_at', sa.DateTime(timezone=True)))
+
+
+def downgrade() -> None:
+    op.drop_column('stock_sites', 'prevision_calculee_at')
+    op.drop_column('stock_sites', 'niveau_cible')
+    op.drop_column('stock_sites', 'point_commande')
+    op.drop_column('stock_sites', 'consommation_ecart_type')
+    op.drop_column('stock_sites', 'consommation_journaliere')
@@ -0,0 +1,50 @@
+"""Make (site_id, medicament_id) unique on stock_sites
+
+Revision ID: 2026_10_19_stock_site_unique
+Revises: 2026_10_19_catalogue_version
+Create Date: 2026-10-19
+
+The stock ledger creates missing stock rows with INSERT ... ON CONFLICT,
+which needs a unique index on (site_id, medicament_id). Duplicate rows left
+by the old read-modify-write path are merged first: quantities are summed
+into the oldest row and the others are deleted (nothing references
+stock_sites.id).
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_stock_site_unique'
+down_revision = '2026_10_19_catalogue_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        WITH ranked AS (
+            SELECT id, site_id, medicament_id, quantite_actuelle,
+                   row_number() OVER (PARTITION BY site_id, medicament_id ORDER BY created_at, id) AS rang
+            FROM stock_sites
+        ),
+        merged AS (
+            UPDATE stock_sites s
+            SET quantite_actuelle = totals.quantite
+            FROM (
+                SELECT site_id, medicament_id, sum(quantite_actuelle) AS quantite
+                FROM ranked GROUP BY site_id, medicament_id HAVING count(*) > 1
+            ) totals, ranked r
+            WHERE r.id = s.id AND r.rang = 1
+              AND r.site_id = totals.site_id AND r.medicament_id = totals.medicament_id
+        )
+        DELETE FROM stock_sites WHERE id IN (SELECT id FROM ranked WHERE rang > 1)
+    """)
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_stock_sites_site_medicament "
+            "ON stock_sites (site_id, medicament_id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_stock_sites_site_medicament")
@@ -0,0 +1,33 @@
+"""Add (site_id, updated_at) index on stock_sites
+
+Revision ID: 2026_10_19_stock_site_updated
+Revises: 2026_10_19_stock_forecast
+Create Date: 2026-10-19
+
+The per-site stock dashboard is cached and keyed by the last change to the
+site's stock rows (every ledger movement bumps updated_at):
+
+    SELECT max(updated_at) FROM stock_sites WHERE site_id = :site
+
+With this index the version check is a single index probe.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_stock_site_updated'
+down_revision = '2026_10_19_stock_forecast'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stock_sites_site_updated "
+            "ON stock_sites (site_id, updated_at)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_stock_sites_site_updated")
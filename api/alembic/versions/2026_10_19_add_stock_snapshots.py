@@ -0,0 +1,56 @@
+"""Add stock_snapshots table and ledger tail index
+
+Revision ID: 2026_10_19_stock_snapshots
+Revises: 2026_10_19_stock_alerts
+Create Date: 2026-10-19
+
+Monthly closing balances per stock (site, medicament). A balance at any date
+is the latest snapshot plus the movements recorded after it, so the nightly
+reconciliation and "stock on date X" queries never replay the full
+movement history. The covering index on stock_movements serves that tail
+as an index-only scan.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_stock_snapshots'
+down_revision = '2026_10_19_stock_alerts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stock_snapshots',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('medicament_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('arrete_au', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('quantite', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id']),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['medicament_id'], ['medicaments.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'uq_stock_snapshots_stock_date', 'stock_snapshots', ['site_id', 'medicament_id', 'arrete_au'], unique=True
+    )
+    op.create_index('idx_stock_snapshots_date', 'stock_snapshots', ['arrete_au'])
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_movements_stock_date "
+            "ON stock_movements (site_id, medicament_id, date_mouvement) INCLUDE (type_mouvement, quantite)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_movements_stock_date")
+    op.drop_index('idx_stock_snapshots_date', 'stock_snapshots')
+    op.drop_index('uq_stock_snapshots_stock_date', 'stock_snapshots')
+    op.drop_table('stock_snapshots')
@@ -0,0 +1,46 @@
+"""Add sync sessions table
+
+Revision ID: 2026_10_19_sync_sessions
+Revises: 2025_11_23_blocking, 2026_01_03_pharmacy
+Create Date: 2026-10-19
+
+Stores per-device offline sync state (bootstrap snapshot cursor and last
+incremental cursor). Also merges the two existing heads.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_sync_sessions'
+down_revision = ('2025_11_23_blocking', '2026_01_03_pharmacy')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_sessions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('device_id', sa.String(100), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('snapshot_cursor', sa.String(50)),
+        sa.Column('last_cursor', sa.String(50)),
+        sa.Column('snapshot_downloaded_at', sa.DateTime(timezone=True)),
+        sa.Column('last_pull_at', sa.DateTime(timezone=True)),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('device_id')
+    )
+    op.create_index('idx_sync_sessions_site', 'sync_sessions', ['site_id'])
+    op.create_index('idx_sync_sessions_user', 'sync_sessions', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_sync_sessions_user', 'sync_sessions')
+    op.drop_index('idx_sync_sessions_site', 'sync_sessions')
+    op.drop_table('sync_sessions')
@@ -0,0 +1,30 @@
+"""Add inter-site transfer movement types
+
+Revision ID: 2026_10_19_transfer_movements
+Revises: 2026_10_19_stock_site_updated
+Create Date: 2026-10-19
+
+A transfer between two sites of a tenant is written by a single ledger
+operation as one transfert_sortie movement on the source site and one
+transfert_entree movement on the destination site per lot, in the same
+transaction.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_transfer_movements'
+down_revision = '2026_10_19_stock_site_updated'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE: nouvelle valeur utilisable seulement après commit
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE type_mouvement ADD VALUE IF NOT EXISTS 'transfert_sortie'")
+        op.execute("ALTER TYPE type_mouvement ADD VALUE IF NOT EXISTS 'transfert_entree'")
+
+
+def downgrade() -> None:
+    # PostgreSQL ne sait pas retirer une valeur d'un type enum
+    pass
@@ -0,0 +1,37 @@
+"""Clear stock thresholds copied from the medicament default
+
+Revision ID: 2026_10_19_stock_seuil_null
+Revises: 2026_10_19_medicament_updated
+Create Date: 2026-10-19
+
+Stock rows created by the ledger copied medicaments.seuil_alerte_defaut into
+stock_sites.seuil_alerte. Since the effective threshold is
+
+    COALESCE(seuil_alerte, point_commande, seuil_alerte_defaut, 0)
+
+the copy hid the computed reorder point (point_commande) forever. New rows
+leave seuil_alerte NULL; existing rows whose threshold equals the default
+are reset so the reorder point applies. Thresholds set by a pharmacist to
+the same value as the default are indistinguishable and are reset too;
+they still resolve to the default until a reorder point is computed.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_19_stock_seuil_null'
+down_revision = '2026_10_19_medicament_updated'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE stock_sites s SET seuil_alerte = NULL "
+        "FROM medicaments m "
+        "WHERE s.medicament_id = m.id AND s.seuil_alerte = m.seuil_alerte_defaut"
+    )
+
+
+def downgrade() -> None:
+    # Les seuils copiés ne se distinguent pas des lignes sans seuil: rien à restaurer
+    pass
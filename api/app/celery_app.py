@@ -2,6 +2,7 @@
 Configuration Celery pour tâches asynchrones
 """
 from celery import Celery
+from celery.schedules import crontab
 from app.config import settings
 
 # Initialiser Celery
@@ -38,18 +39,31 @@ celery_app.conf.beat_schedule = {
     # Export DHIS2 mensuel (le 1er de chaque mois à 2h du matin)
     "monthly-dhis2-export": {
         "task": "app.tasks.export_dhis2_monthly",
-        "schedule": {
-            "hour": 2,
-            "minute": 0,
-            "day_of_month": 1,
-        },
+        "schedule": crontab(hour=2, minute=0, day_of_month=1),
+    },
+    # Détection des doublons patients (tous les jours à 4h)
+    "score-patient-duplicates": {
+        "task": "app.tasks.score_patient_duplicates",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    # Rapprochement des stocks et arrêté mensuel (tous les jours à 0h30)
+    "reconcile-stock": {
+        "task": "app.tasks.reconcile_stock",
+        "schedule": crontab(hour=0, minute=30),
+    },
+    # Prévisions de consommation et points de commande (tous les jours à 0h45)
+    "forecast-stock-consumption": {
+        "task": "app.tasks.forecast_stock_consumption",
+        "schedule": crontab(hour=0, minute=45),
+    },
+    # Alertes de stock et de péremption (tous les jours à 1h)
+    "refresh-stock-alerts": {
+        "task": "app.tasks.refresh_stock_alerts",
+        "schedule": crontab(hour=1, minute=0),
     },
     # Nettoyage des anciennes opérations de sync (tous les jours à 3h)
     "cleanup-old-sync-operations": {
         "task": "app.tasks.cleanup_sync_operations",
-        "schedule": {
-            "hour": 3,
-            "minute": 0,
-        },
+        "schedule": crontab(hour=3, minute=0),
     },
 }
@@ -55,10 +55,19 @@ class Settings(BaseSettings):
     # URLs de l'application
     FRONTEND_URL: str = "http://localhost:5173"
 
+    # Configuration Redis (cache, pub/sub)
+    REDIS_URL: str = "redis://:redis_pwd@redis:6379/0"
+
     # Configuration Celery
     CELERY_BROKER_URL: str = "redis://:redis_pwd@redis:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://:redis_pwd@redis:6379/2"
 
+    # Synchronisation offline (snapshots de bootstrap)
+    SYNC_SNAPSHOT_DIR: str = "/tmp/sante_rurale_snapshots"
+    SYNC_SNAPSHOT_ENCOUNTER_DAYS: int = 365  # Consultations récentes incluses dans le snapshot
+    # Écart toléré entre l'horodatage applicatif d'une ligne et le début de sa transaction
+    SYNC_VISIBILITY_MARGIN_SECONDS: float = 2.0
+
     # Configuration SaaS Multi-Tenant (nouveau)
     ENVIRONMENT: str = "development"  # development, staging, production
     STRIPE_ENABLED: bool = False
@@ -1,6 +1,9 @@
 """
 Configuration de la base de données
 """
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -37,3 +40,16 @@ async def get_db() -> AsyncSession:
             raise
         finally:
             await session.close()
+
+
+def constraint_name(error: IntegrityError) -> Optional[str]:
+    """
+    Nom de la contrainte (ou de l'index unique) violée
+
+    asyncpg expose l'erreur PostgreSQL d'origine en cause de l'exception DBAPI.
+    """
+    for candidate in (error.orig, getattr(error.orig, "__cause__", None)):
+        name = getattr(candidate, "constraint_name", None)
+        if name:
+            return name
+    return None
@@ -229,26 +229,18 @@ def require_feature_with_subscription(feature: str):
     return dependency
 
 
-async def check_quota(
+async def get_quota_limit(
     tenant: Tenant,
     quota_type: str,
-    current_value: int,
     db: AsyncSession
-) -> bool:
+) -> Optional[int]:
     """
-    Vérifie si un tenant a atteint son quota
+    Retourne la valeur maximale d'un quota pour un tenant (None = illimité)
 
     Args:
-        tenant: Le tenant à vérifier
+        tenant: Le tenant concerné
         quota_type: Type de quota ("users", "patients_total", "patients_monthly", "sites", "storage_gb")
-        current_value: Valeur actuelle à comparer au quota
         db: Session de base de données
-
-    Returns:
-        True si dans les limites, False sinon
-
-    Raises:
-        HTTPException si quota dépassé
     """
     subscription = await get_tenant_subscription(tenant.id, db)
 
@@ -272,7 +264,31 @@ async def check_quota(
             "storage_gb": plan.max_storage_gb
         }
 
-    max_value = max_values.get(quota_type)
+    return max_values.get(quota_type)
+
+
+async def check_quota(
+    tenant: Tenant,
+    quota_type: str,
+    current_value: int,
+    db: AsyncSession
+) -> bool:
+    """
+    Vérifie si un tenant a atteint son quota
+
+    Args:
+        tenant: Le tenant à vérifier
+        quota_type: Type de quota ("users", "patients_total", "patients_monthly", "sites", "storage_gb")
+        current_value: Valeur actuelle à comparer au quota
+        db: Session de base de données
+
+    Returns:
+        True si dans les limites, False sinon
+
+    Raises:
+        HTTPException si quota dépassé
+    """
+    max_value = await get_quota_limit(tenant, quota_type, db)
 
     # None = illimité
     if max_value is None:
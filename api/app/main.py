@@ -8,9 +8,11 @@ from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.config import settings
+from app.services.change_events import configure_change_notifications
 from app.routers import auth, encounters, reports, tenants, attachments, admin, references, feedback, gdpr, stats
 from app.routers import patients_simple as patients
-from app.routers import medicaments, stock, fournisseurs, bons_commande
+from app.routers import medicaments, stock, fournisseurs, bons_commande, autocomplete
+from app.routers import sync
 
 # Créer l'application FastAPI
 app = FastAPI(
@@ -19,6 +21,9 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Notifications de changements (SSE) publiées après chaque commit
+configure_change_notifications()
+
 # Configuration CORS - DOIT être ajouté AVANT les exception handlers
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +32,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Pagination des endpoints retournant une liste
 )
 
 # Exception handlers pour s'assurer que les CORS headers sont toujours présents
@@ -71,10 +77,13 @@ app.include_router(medicaments.router, prefix=settings.API_V1_STR)
 app.include_router(stock.router, prefix=settings.API_V1_STR)
 app.include_router(fournisseurs.router, prefix=settings.API_V1_STR)
 app.include_router(bons_commande.router, prefix=settings.API_V1_STR)
+app.include_router(autocomplete.router, prefix=settings.API_V1_STR)
 # GDPR/RGPD compliance router
 app.include_router(gdpr.router, prefix=settings.API_V1_STR)
 # Public statistics router
 app.include_router(stats.router, prefix=settings.API_V1_STR)
+# Offline sync router (bootstrap snapshots + incremental changes)
+app.include_router(sync.router, prefix=settings.API_V1_STR)
 
 
 @app.get("/")
@@ -5,3 +5,5 @@ from app.models.base_models import *
 from app.models.tenant import *
 from app.models.mixins import *
 from app.models.inventory import *
+from app.models.sync import *
+from app.models.sequences import *
@@ -6,8 +6,8 @@ from datetime import datetime
 from typing import Optional
 import enum
 
-from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Integer, Numeric, String, Text, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Boolean, Computed, Date, DateTime, ForeignKey, Integer, Numeric, String, Text, Enum as SQLEnum, Index, text
+from sqlalchemy.dialects.postgresql import JSON, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -154,6 +154,23 @@ class Patient(Base, TimestampMixin):
     village: Mapped[str | None] = mapped_column(String(200))
     site_id: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("sites.id"), nullable=False)
 
+    # Identifiant lisible (ex: SIBY-2025-0001), alloué via matricule_counters
+    matricule: Mapped[str | None] = mapped_column(String(30))
+
+    # Texte de recherche normalisé (minuscules, sans accents), généré par PostgreSQL
+    # et indexé en trigrammes (voir app/services/patient_search.py)
+    search_text: Mapped[str | None] = mapped_column(
+        Text,
+        Computed(
+            "lower(f_unaccent(coalesce(nom, '') || ' ' || coalesce(prenom, '') || ' ' || coalesce(telephone, '')))",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+
+    # Clé phonétique nom + prénom (détection des doublons, voir patient_matching)
+    phonetic_key: Mapped[str | None] = mapped_column(String(100))
+
     # Audit fields
     created_by: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     updated_by: Mapped[uuid_module.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"))
@@ -169,6 +186,64 @@ class Patient(Base, TimestampMixin):
     encounters: Mapped[list["Encounter"]] = relationship(back_populates="patient", cascade="all, delete-orphan")
     delivrances: Mapped[list["DelivrancePatient"]] = relationship(back_populates="patient")
 
+    __table_args__ = (
+        Index('idx_patients_matricule', 'matricule', unique=True),
+        Index(
+            'idx_patients_search_trgm',
+            'search_text',
+            postgresql_using='gin',
+            postgresql_ops={'search_text': 'gin_trgm_ops'},
+        ),
+        Index('idx_patients_site_phonetic', 'site_id', 'phonetic_key'),
+        # Listes et comptages par site (patients non supprimés, triés par date de création)
+        Index(
+            'idx_patients_site_created',
+            'site_id', 'created_at', 'id',
+            postgresql_where=text('deleted_at IS NULL'),
+        ),
+    )
+
+
+class PatientDuplicate(Base, TimestampMixin):
+    """
+    Paire de fiches patients probablement en doublon
+
+    Calculée chaque nuit par la tâche score_patient_duplicates. Une paire
+    ignorée par le personnel n'est plus reproposée.
+    """
+    __tablename__ = "patient_duplicates"
+
+    id: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid_module.uuid4)
+    site_id: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("sites.id"), nullable=False)
+    patient_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("patients.id", ondelete="CASCADE"), nullable=False
+    )
+    duplicate_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("patients.id", ondelete="CASCADE"), nullable=False
+    )
+    score: Mapped[float] = mapped_column(Numeric(4, 3), nullable=False)
+    raisons: Mapped[list | None] = mapped_column(JSON)
+    statut: Mapped[str] = mapped_column(String(20), default="en_attente", nullable=False)  # en_attente, ignore
+
+    __table_args__ = (
+        Index('idx_patient_duplicates_pair', 'patient_id', 'duplicate_id', unique=True),
+        Index('idx_patient_duplicates_site_statut', 'site_id', 'statut'),
+    )
+
+
+class MatriculeCounter(Base):
+    """
+    Compteur de matricules par (code village, année)
+
+    Une ligne par couple: l'allocation est un upsert atomique qui renvoie
+    la nouvelle valeur, sans scan de la table patients.
+    """
+    __tablename__ = "matricule_counters"
+
+    village_code: Mapped[str] = mapped_column(String(4), primary_key=True)
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_value: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
 
 class Encounter(Base, TimestampMixin):
     """Modèle pour les consultations/rencontres médicales - Correspond exactement à la structure DB"""
@@ -211,6 +286,21 @@ class Encounter(Base, TimestampMixin):
     procedures: Mapped[list["Procedure"]] = relationship(back_populates="encounter", cascade="all, delete-orphan")
     references: Mapped[list["Reference"]] = relationship(back_populates="encounter", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Listes et rapports par site (consultations non supprimées, triées par date)
+        Index(
+            'idx_encounters_site_date',
+            'site_id', 'date', 'id',
+            postgresql_where=text('deleted_at IS NULL'),
+        ),
+        # Historique d'un patient
+        Index(
+            'idx_encounters_patient_date',
+            'patient_id', 'date',
+            postgresql_where=text('deleted_at IS NULL'),
+        ),
+    )
+
 
 class Condition(Base):
     """Modèle pour les diagnostics"""
@@ -6,7 +6,7 @@ from datetime import datetime, date
 from typing import Optional
 import enum
 
-from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Integer, Numeric, String, Text, Enum as SQLEnum, Index
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, ForeignKey, Integer, Numeric, String, Text, Enum as SQLEnum, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -38,6 +38,16 @@ class TypeMouvementEnum(str, enum.Enum):
     AJUSTEMENT_NEGATIF = "ajustement_negatif"  # Correction inventaire -
     PEREMPTION = "peremption"  # Destruction périmé
     PERTE = "perte"  # Perte/casse
+    TRANSFERT_SORTIE = "transfert_sortie"  # Envoi vers un autre site
+    TRANSFERT_ENTREE = "transfert_entree"  # Réception d'un autre site
+
+
+class TypeAlerteStockEnum(str, enum.Enum):
+    """Types d'alertes de stock"""
+    RUPTURE = "rupture"  # Stock épuisé
+    STOCK_BAS = "stock_bas"  # Sous le seuil d'alerte
+    PEREMPTION_PROCHE = "peremption_proche"  # Lot proche de la péremption
+    PERIME = "perime"  # Lot périmé encore en stock
 
 
 class StatutCommandeEnum(str, enum.Enum):
@@ -90,6 +100,11 @@ class Medicament(Base, TimestampMixin):
     # Métadonnées
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
 
+    # Version du catalogue à la dernière écriture (voir app/services/medicament_catalogue.py)
+    catalogue_version: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+
     # Relations
     stocks_sites: Mapped[list["StockSite"]] = relationship(
         back_populates="medicament",
@@ -108,6 +123,8 @@ class Medicament(Base, TimestampMixin):
         Index('idx_medicaments_code', 'code'),
         Index('idx_medicaments_dci', 'dci'),
         Index('idx_medicaments_forme', 'forme'),
+        Index('idx_medicaments_updated', 'updated_at', 'id'),  # Flux /sync/changes
+        Index('idx_medicaments_catalogue_version', 'catalogue_version'),  # Deltas du catalogue
     )
 
 
@@ -148,6 +165,13 @@ class StockSite(Base, TimestampMixin):
     seuil_alerte: Mapped[int | None] = mapped_column(Integer)  # Personnalisable par site
     valeur_stock: Mapped[float | None] = mapped_column(Numeric(10, 2))  # Calculé automatiquement
 
+    # Prévision de consommation (tâche nocturne forecast_stock_consumption)
+    consommation_journaliere: Mapped[float | None] = mapped_column(Numeric(10, 3))
+    consommation_ecart_type: Mapped[float | None] = mapped_column(Numeric(10, 3))
+    point_commande: Mapped[int | None] = mapped_column(Integer)  # Seuil par défaut si seuil_alerte vide
+    niveau_cible: Mapped[int | None] = mapped_column(Integer)  # Stock visé après commande
+    prevision_calculee_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
     # Dernières opérations (pour référence rapide)
     derniere_entree: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     derniere_sortie: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -165,6 +189,8 @@ class StockSite(Base, TimestampMixin):
         Index('idx_stock_sites_site', 'site_id'),
         Index('idx_stock_sites_tenant', 'tenant_id'),
         Index('idx_stock_sites_site_tenant', 'site_id', 'tenant_id'),
+        Index('uq_stock_sites_site_medicament', 'site_id', 'medicament_id', unique=True),  # Upsert du ledger
+        Index('idx_stock_sites_site_updated', 'site_id', 'updated_at'),  # Flux /sync/changes
     )
 
 
@@ -222,6 +248,80 @@ class LotMedicament(Base, TimestampMixin):
         Index('idx_lots_tenant', 'tenant_id'),
         Index('idx_lots_peremption', 'date_peremption'),
         Index('idx_lots_medicament_site', 'medicament_id', 'site_id'),
+        # Allocation FEFO: lots avec stock d'un site, par date de péremption
+        Index(
+            'idx_lots_fefo', 'site_id', 'medicament_id', 'date_peremption', 'id',
+            postgresql_where=text('quantite_restante > 0'),
+        ),
+    )
+
+
+class StockAlert(Base, TimestampMixin):
+    """
+    Alertes de stock en cours (table précalculée)
+
+    Une alerte par stock sous son seuil (lot_id NULL) et une par lot proche
+    de la péremption ou périmé. Maintenue par le registre des mouvements
+    (franchissement de seuil) et chaque nuit par la tâche refresh_stock_alerts
+    (voir app/services/stock_alerts.py).
+    """
+    __tablename__ = "stock_alerts"
+
+    id: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid_module.uuid4)
+    site_id: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("sites.id"), nullable=False)
+    tenant_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    medicament_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("medicaments.id"), nullable=False
+    )
+    lot_id: Mapped[uuid_module.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("lots_medicament.id", ondelete="CASCADE")
+    )
+    type_alerte: Mapped[str] = mapped_column(String(20), nullable=False)  # TypeAlerteStockEnum
+    quantite: Mapped[int] = mapped_column(Integer, nullable=False)
+    seuil: Mapped[int | None] = mapped_column(Integer)  # Alertes de stock
+    date_peremption: Mapped[date | None] = mapped_column(Date)  # Alertes de lot
+
+    __table_args__ = (
+        Index('idx_stock_alerts_site_type', 'site_id', 'type_alerte'),
+        Index(
+            'uq_stock_alerts_stock', 'site_id', 'medicament_id',
+            unique=True, postgresql_where=text('lot_id IS NULL'),
+        ),
+        Index('uq_stock_alerts_lot', 'lot_id', unique=True, postgresql_where=text('lot_id IS NOT NULL')),
+    )
+
+
+class StockSnapshot(Base):
+    """
+    Solde arrêté d'un stock (clôture mensuelle)
+
+    quantite = somme signée des mouvements antérieurs à arrete_au. Le solde
+    à une date se calcule depuis le dernier arrêté plus les mouvements
+    suivants (voir app/services/stock_reconciliation.py).
+    """
+    __tablename__ = "stock_snapshots"
+
+    id: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid_module.uuid4)
+    site_id: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("sites.id"), nullable=False)
+    tenant_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    medicament_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("medicaments.id"), nullable=False
+    )
+    arrete_au: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    quantite: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.utcnow(),
+        nullable=False
+    )
+
+    __table_args__ = (
+        Index('uq_stock_snapshots_stock_date', 'site_id', 'medicament_id', 'arrete_au', unique=True),
+        Index('idx_stock_snapshots_date', 'arrete_au'),
     )
 
 
@@ -315,6 +415,11 @@ class StockMovement(Base):
         Index('idx_movements_date', 'date_mouvement'),
         Index('idx_movements_medicament_date', 'medicament_id', 'date_mouvement'),
         Index('idx_movements_site_tenant', 'site_id', 'tenant_id'),
+        Index('idx_movements_site_date', 'site_id', 'date_mouvement', 'id'),  # Pagination par site
+        Index(
+            'idx_movements_stock_date', 'site_id', 'medicament_id', 'date_mouvement',
+            postgresql_include=['type_mouvement', 'quantite'],
+        ),  # Soldes: arrêté + mouvements suivants
     )
 
 
@@ -402,7 +507,7 @@ class BonCommande(Base, TimestampMixin):
     )
 
     # Numéro et dates
-    numero: Mapped[str] = mapped_column(String(50), unique=True, nullable=False, index=True)
+    numero: Mapped[str] = mapped_column(String(50), nullable=False, index=True)  # Unique par site
     date_commande: Mapped[date] = mapped_column(Date, nullable=False)
     date_livraison_prevue: Mapped[date | None] = mapped_column(Date)
     date_livraison_effective: Mapped[date | None] = mapped_column(Date)
@@ -437,6 +542,8 @@ class BonCommande(Base, TimestampMixin):
         Index('idx_bc_statut', 'statut'),
         Index('idx_bc_numero', 'numero'),
         Index('idx_bc_site_tenant', 'site_id', 'tenant_id'),
+        Index('idx_bc_site_numero', 'site_id', 'numero', unique=True),
+        Index('idx_bc_site_date', 'site_id', 'date_commande', 'id'),  # Pagination par site
     )
 
 
@@ -0,0 +1,39 @@
+"""
+Modèles pour la numérotation des documents (bons de commande, livraisons, délivrances)
+"""
+import enum
+import uuid as uuid_module
+
+from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base_models import Base
+
+
+class DocumentTypeEnum(str, enum.Enum):
+    """Types de documents numérotés par site et par année"""
+    BON_COMMANDE = "bon_commande"
+    BON_LIVRAISON = "bon_livraison"
+    DELIVRANCE = "delivrance"
+    TRANSFERT = "transfert"
+
+
+class DocumentSequence(Base):
+    """
+    Compteur de numérotation par (site, année, type de document)
+
+    La dernière valeur attribuée est incrémentée par un upsert atomique:
+    aucun scan des tables de documents et aucune collision entre
+    utilisateurs concurrents.
+    """
+    __tablename__ = "document_sequences"
+
+    site_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("sites.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    document_type: Mapped[str] = mapped_column(String(30), primary_key=True)
+    last_value: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -0,0 +1,56 @@
+"""
+Modèles pour la synchronisation offline des appareils
+"""
+import uuid as uuid_module
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, String, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base_models import Base, TimestampMixin
+
+
+class SyncSession(Base, TimestampMixin):
+    """
+    État de synchronisation d'un appareil (tablette, téléphone)
+
+    Un appareil télécharge d'abord un snapshot de bootstrap, puis passe en
+    synchronisation incrémentale via /sync/changes à partir du curseur du snapshot.
+    """
+    __tablename__ = "sync_sessions"
+
+    # Primary Key
+    id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid_module.uuid4
+    )
+
+    # Identifiant fourni par l'appareil (header X-Device-Id)
+    device_id: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+    # Foreign Keys
+    user_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    site_id: Mapped[uuid_module.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("sites.id"),
+        nullable=False
+    )
+
+    # Curseurs de synchronisation (timestamps ISO 8601)
+    snapshot_cursor: Mapped[str | None] = mapped_column(String(50))
+    last_cursor: Mapped[str | None] = mapped_column(String(50))
+
+    # Dernières opérations
+    snapshot_downloaded_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    last_pull_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index('idx_sync_sessions_site', 'site_id'),
+        Index('idx_sync_sessions_user', 'user_id'),
+    )
@@ -0,0 +1,55 @@
+"""
+Router d'autocomplétion (saisie des prescriptions et des diagnostics)
+
+Les suggestions sont servies par des index de préfixes en mémoire
+(voir app/services/autocomplete.py): aucune requête LIKE par frappe.
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import User
+from app.routers.medicaments import catalogue
+from app.security import get_current_user
+from app.services.autocomplete import CIM10_INDEX, medicament_index
+from app.services.serialization import json_response
+
+router = APIRouter(prefix="/autocomplete", tags=["Autocomplete"])
+
+
+# ===========================================================================
+# MÉDICAMENTS
+# ===========================================================================
+
+@router.get("/medicaments", response_model=list)
+async def autocomplete_medicaments(
+    q: str = Query(..., min_length=1, max_length=100, description="Début du nom, du code ou de la DCI"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Suggestions de médicaments actifs (code, nom, DCI)
+
+    Permissions: Tous les utilisateurs authentifiés
+    """
+    snapshot = await catalogue.get(db)
+    return json_response(medicament_index(snapshot).search(q, limit))
+
+
+# ===========================================================================
+# CODES CIM-10
+# ===========================================================================
+
+@router.get("/cim10", response_model=list)
+async def autocomplete_cim10(
+    q: str = Query(..., min_length=1, max_length=100, description="Début du code ou du libellé"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Suggestions de codes CIM-10 ({"code", "libelle"})
+
+    Permissions: Tous les utilisateurs authentifiés
+    """
+    return json_response(CIM10_INDEX.search(q, limit))
@@ -7,15 +7,23 @@ from datetime import datetime, date
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func, and_, or_, desc, String, cast
+from sqlalchemy import select, func, and_, or_, String, cast
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from pydantic import BaseModel, Field, ConfigDict
 
 from app.database import get_db
 from app.models import User
-from app.models.inventory import BonCommande, BonCommandeLigne, Fournisseur, Medicament, StatutCommandeEnum
+from app.models.inventory import BonCommande, BonCommandeLigne, Fournisseur, Medicament, StatutCommandeEnum, StockSite
 from app.schemas import UserRole, BaseSchema
+from app.models.sequences import DocumentTypeEnum
 from app.security import get_current_user
+from app.services.loaders import NB_LIGNES_BON_COMMANDE, load_bons_commande
+from app.services.pagination import Keyset
+from app.services.serialization import RowSerializer, json_response
+from app.services.sequence_service import next_document_numero
+from app.services.stock_alerts import SEUIL
+from app.services.stock_ledger import ReceptionLine, apply_reception
 
 router = APIRouter(prefix="/bons-commande", tags=["Bons de Commande"])
 
@@ -40,6 +48,28 @@ class BonCommandeCreate(BaseModel):
     lignes: List[BonCommandeLigneCreate] = Field(min_length=1)
 
 
+class BonCommandeSuggestionCreate(BaseModel):
+    """Bon de commande brouillon pré-rempli depuis les prévisions"""
+    fournisseur_id: uuid_module.UUID
+    date_livraison_prevue: Optional[date] = None
+    commentaire: Optional[str] = None
+
+
+class ReceptionLigneCreate(BaseModel):
+    """Lot reçu pour une ligne du bon"""
+    ligne_id: uuid_module.UUID
+    quantite: int = Field(ge=1)
+    numero_lot: str = Field(min_length=1, max_length=100)
+    date_peremption: date
+    prix_unitaire: Optional[Decimal] = Field(None, ge=0, description="Par défaut: prix de la ligne")
+
+
+class ReceptionCreate(BaseModel):
+    """Livraison d'un bon de commande (tous les lots en une requête)"""
+    date_reception: Optional[date] = None
+    lignes: List[ReceptionLigneCreate] = Field(min_length=1, max_length=100)
+
+
 class BonCommandeLigneOut(BaseSchema):
     """Ligne de bon de commande"""
     id: uuid_module.UUID
@@ -69,11 +99,22 @@ class BonCommandeOut(BaseSchema):
     updated_at: datetime
 
 
+class BonCommandeListItem(BonCommandeOut):
+    """Bon de commande (liste)"""
+    nb_lignes: int = 0
+
+
 class BonCommandeDetails(BonCommandeOut):
     """Bon de commande avec lignes"""
     lignes: List[BonCommandeLigneOut] = []
 
 
+# Sérialiseurs (voir app/services/serialization.py)
+BON_COMMANDE_ROW = RowSerializer(BonCommandeOut)
+BON_COMMANDE_LIST_ROW = RowSerializer(BonCommandeListItem)
+BON_COMMANDE_LIGNE_ROW = RowSerializer(BonCommandeLigneOut)
+
+
 # ===========================================================================
 # HELPER FUNCTIONS
 # ===========================================================================
@@ -88,20 +129,11 @@ def require_pharmacien_or_admin(current_user: User = Depends(get_current_user))
     return current_user
 
 
-async def generate_numero_bon_commande(db: AsyncSession, site_id: uuid_module.UUID, year: int) -> str:
-    """Génère un numéro de bon de commande unique"""
-    prefix = f"BC-{year}-"
-    
-    stmt = select(func.count(BonCommande.id)).where(
-        and_(
-            BonCommande.site_id == site_id,
-            func.extract('year', BonCommande.date_commande) == year
-        )
-    )
-    result = await db.execute(stmt)
-    count = result.scalar_one() or 0
-    
-    return f"{prefix}{count + 1:04d}"
+def bon_commande_details(bon, lignes):
+    """Réponse détaillée à partir des lignes de load_bons_commande (sans revalidation)"""
+    data = BON_COMMANDE_ROW(bon)
+    data["lignes"] = [BON_COMMANDE_LIGNE_ROW(ligne) for ligne in lignes]
+    return json_response(data)
 
 
 # ===========================================================================
@@ -119,9 +151,8 @@ async def list_bons_commande(
 ):
     """Liste les bons de commande"""
     query = (
-        select(BonCommande, Fournisseur)
+        select(*BON_COMMANDE_LIST_ROW.columns(BonCommande, fournisseur_nom=Fournisseur.nom))
         .join(Fournisseur, BonCommande.fournisseur_id == Fournisseur.id)
-        .order_by(desc(BonCommande.date_commande))
     )
     
     # Filtres
@@ -141,40 +172,19 @@ async def list_bons_commande(
     if conditions:
         query = query.where(and_(*conditions))
     
-    if cursor:
-        query = query.where(BonCommande.id > uuid_module.UUID(cursor))
+    # Plus récents d'abord; le curseur porte (date_commande, id)
+    keyset = Keyset(BonCommande.date_commande, BonCommande.id)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    rows, next_cursor, has_more = keyset.page(result.all(), limit)
     
-    query = query.limit(limit + 1)
-    result = await db.execute(query)
-    rows = result.all()
+    # Nombre de lignes de toute la page en une requête groupée
+    nb_lignes = await NB_LIGNES_BON_COMMANDE.load(db, [row.id for row in rows])
     
-    has_more = len(rows) > limit
-    if has_more:
-        rows = rows[:limit]
-    
-    items = []
-    for bon, fournisseur in rows:
-        items.append(BonCommandeOut(
-            id=bon.id,
-            numero=bon.numero,
-            fournisseur_id=bon.fournisseur_id,
-            fournisseur_nom=fournisseur.nom,
-            site_id=bon.site_id,
-            statut=bon.statut.value,
-            date_commande=bon.date_commande,
-            date_livraison_prevue=bon.date_livraison_prevue,
-            date_livraison_effective=bon.date_livraison_effective,
-            montant_total=bon.montant_total,
-            commentaire=bon.commentaire,
-            created_at=bon.created_at,
-            updated_at=bon.updated_at,
-        ))
-    
-    return {
-        "items": items,
-        "next_cursor": str(rows[-1][0].id) if rows else None,
+    return json_response({
+        "items": [BON_COMMANDE_LIST_ROW({**row._mapping, "nb_lignes": nb_lignes[row.id]}) for row in rows],
+        "next_cursor": next_cursor,
         "has_more": has_more,
-    }
+    })
 
 
 # ===========================================================================
@@ -187,22 +197,15 @@ async def get_bon_commande(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Récupère les détails d'un bon de commande"""
-    stmt = (
-        select(BonCommande, Fournisseur)
-        .join(Fournisseur, BonCommande.fournisseur_id == Fournisseur.id)
-        .where(BonCommande.id == bon_id)
-    )
-    result = await db.execute(stmt)
-    row = result.one_or_none()
-    
-    if not row:
+    """Récupère les détails d'un bon de commande (bon et lignes en deux requêtes)"""
+    bons = await load_bons_commande(db, [bon_id])
+    if bon_id not in bons:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Bon de commande non trouvé"
         )
     
-    bon, fournisseur = row
+    bon, lignes = bons[bon_id]
     
     # Vérifier permissions
     if current_user.role not in [UserRole.ADMIN, UserRole.PHARMACIEN]:
@@ -212,44 +215,7 @@ async def get_bon_commande(
                 detail="Accès refusé"
             )
     
-    # Récupérer les lignes
-    lignes_stmt = (
-        select(BonCommandeLigne, Medicament)
-        .join(Medicament, BonCommandeLigne.medicament_id == Medicament.id)
-        .where(BonCommandeLigne.bon_commande_id == bon_id)
-    )
-    lignes_result = await db.execute(lignes_stmt)
-    lignes_rows = lignes_result.all()
-    
-    lignes = []
-    for ligne, medicament in lignes_rows:
-        lignes.append(BonCommandeLigneOut(
-            id=ligne.id,
-            bon_commande_id=ligne.bon_commande_id,
-            medicament_id=ligne.medicament_id,
-            medicament_nom=medicament.nom,
-            quantite_commandee=ligne.quantite_commandee,
-            quantite_recue=ligne.quantite_recue,
-            prix_unitaire=ligne.prix_unitaire,
-            created_at=ligne.created_at,
-        ))
-    
-    return BonCommandeDetails(
-        id=bon.id,
-        numero=bon.numero,
-        fournisseur_id=bon.fournisseur_id,
-        fournisseur_nom=fournisseur.nom,
-        site_id=bon.site_id,
-        statut=bon.statut.value,
-        date_commande=bon.date_commande,
-        date_livraison_prevue=bon.date_livraison_prevue,
-        date_livraison_effective=bon.date_livraison_effective,
-        montant_total=bon.montant_total,
-        commentaire=bon.commentaire,
-        created_at=bon.created_at,
-        updated_at=bon.updated_at,
-        lignes=lignes,
-    )
+    return bon_commande_details(bon, lignes)
 
 
 # ===========================================================================
@@ -274,9 +240,9 @@ async def create_bon_commande(
             detail="Fournisseur non trouvé"
         )
     
-    # Générer le numéro
+    # Générer le numéro (compteur par site et par année)
     year = bon_data.date_commande.year
-    numero = await generate_numero_bon_commande(db, current_user.site_id, year)
+    numero = await next_document_numero(db, current_user.site_id, DocumentTypeEnum.BON_COMMANDE, year)
     
     # Calculer le montant total
     montant_total = Decimal(0)
@@ -336,6 +302,111 @@ async def create_bon_commande(
     )
 
 
+# ===========================================================================
+# BON DE COMMANDE SUGGÉRÉ (prévisions de consommation)
+# ===========================================================================
+
+@router.post("/suggestion", response_model=BonCommandeDetails, status_code=status.HTTP_201_CREATED)
+async def create_bon_commande_suggere(
+    suggestion: BonCommandeSuggestionCreate,
+    current_user: User = Depends(require_pharmacien_or_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Crée un brouillon avec les médicaments du site à commander
+
+    Un médicament est proposé quand son stock est sous le seuil effectif;
+    la quantité ramène le stock au niveau cible calculé chaque nuit
+    (voir app/services/stock_forecast.py), déduction faite des quantités
+    déjà commandées et non reçues.
+    """
+    fournisseur = await db.get(Fournisseur, suggestion.fournisseur_id)
+    if not fournisseur:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Fournisseur non trouvé"
+        )
+    
+    en_commande = (
+        select(
+            BonCommandeLigne.medicament_id,
+            func.sum(BonCommandeLigne.quantite_commandee - BonCommandeLigne.quantite_recue).label("quantite"),
+        )
+        .join(BonCommande, BonCommandeLigne.bon_commande_id == BonCommande.id)
+        .where(
+            BonCommande.site_id == current_user.site_id,
+            BonCommande.statut.in_([StatutCommandeEnum.VALIDEE, StatutCommandeEnum.EN_COURS]),
+        )
+        .group_by(BonCommandeLigne.medicament_id)
+        .subquery("en_commande")
+    )
+    besoin = StockSite.niveau_cible - StockSite.quantite_actuelle - func.coalesce(en_commande.c.quantite, 0)
+    result = await db.execute(
+        select(
+            StockSite.medicament_id,
+            Medicament.nom,
+            Medicament.prix_unitaire_reference,
+            besoin.label("quantite"),
+        )
+        .join(Medicament, StockSite.medicament_id == Medicament.id)
+        .outerjoin(en_commande, en_commande.c.medicament_id == StockSite.medicament_id)
+        .where(
+            StockSite.site_id == current_user.site_id,
+            Medicament.is_active == True,
+            StockSite.niveau_cible.isnot(None),
+            StockSite.quantite_actuelle <= SEUIL,
+            besoin > 0,
+        )
+        .order_by(Medicament.nom)
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Aucun médicament à commander pour ce site"
+        )
+    
+    today = date.today()
+    numero = await next_document_numero(db, current_user.site_id, DocumentTypeEnum.BON_COMMANDE, today.year)
+    now = datetime.utcnow()
+    bon = BonCommande(
+        id=uuid_module.uuid4(),
+        numero=numero,
+        fournisseur_id=fournisseur.id,
+        site_id=current_user.site_id,
+        tenant_id=current_user.tenant_id,
+        created_by=current_user.id,
+        statut=StatutCommandeEnum.BROUILLON,
+        date_commande=today,
+        date_livraison_prevue=suggestion.date_livraison_prevue,
+        commentaire=suggestion.commentaire,
+        created_at=now,
+        updated_at=now,
+    )
+    lignes = [
+        BonCommandeLigne(
+            id=uuid_module.uuid4(),
+            bon_commande_id=bon.id,
+            medicament_id=row.medicament_id,
+            quantite_commandee=row.quantite,
+            quantite_recue=0,
+            prix_unitaire=row.prix_unitaire_reference,
+            montant_ligne=row.prix_unitaire_reference * row.quantite,
+            created_at=now,
+            updated_at=now,
+        )
+        for row in rows
+    ]
+    bon.montant_total = sum((ligne.montant_ligne for ligne in lignes), Decimal(0))
+    
+    db.add(bon)
+    db.add_all(lignes)
+    await db.commit()
+    
+    bons = await load_bons_commande(db, [bon.id])
+    return bon_commande_details(*bons[bon.id])
+
+
 # ===========================================================================
 # VALIDER UN BON DE COMMANDE
 # ===========================================================================
@@ -388,3 +459,61 @@ async def valider_bon_commande(
         created_at=bon.created_at,
         updated_at=bon.updated_at,
     )
+
+
+# ===========================================================================
+# RÉCEPTION D'UN BON DE COMMANDE
+# ===========================================================================
+
+@router.post("/{bon_id}/reception", response_model=BonCommandeDetails)
+async def receptionner_bon_commande(
+    bon_id: uuid_module.UUID,
+    reception: ReceptionCreate,
+    current_user: User = Depends(require_pharmacien_or_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Enregistre une livraison (totale ou partielle) d'un bon validé
+
+    Crée les lots et les mouvements d'entrée, incrémente les stocks et met
+    à jour les quantités reçues, le statut et la date de livraison, en une
+    transaction.
+    """
+    # Verrou du bon: deux réceptions simultanées sont sérialisées
+    result = await db.execute(
+        select(BonCommande)
+        .options(selectinload(BonCommande.lignes))
+        .where(BonCommande.id == bon_id)
+        .with_for_update(of=BonCommande)
+    )
+    bon = result.scalar_one_or_none()
+    
+    if not bon:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bon de commande non trouvé"
+        )
+    
+    if current_user.role != UserRole.ADMIN and bon.site_id != current_user.site_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Accès refusé"
+        )
+    
+    if bon.statut not in (StatutCommandeEnum.VALIDEE, StatutCommandeEnum.EN_COURS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Seuls les bons validés ou en cours de livraison peuvent être réceptionnés"
+        )
+    
+    await apply_reception(
+        db,
+        bon,
+        [ReceptionLine(**ligne.model_dump()) for ligne in reception.lignes],
+        created_by=current_user.id,
+        date_reception=reception.date_reception or date.today(),
+    )
+    await db.commit()
+    
+    bons = await load_bons_commande(db, [bon.id])
+    return bon_commande_details(*bons[bon.id])
@@ -3,10 +3,10 @@ Routes pour les consultations (encounters)
 """
 import uuid as uuid_module
 from datetime import date, datetime, timezone
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -18,12 +18,21 @@ from app.schemas import (
     EncounterCreate,
     EncounterOut,
     EncounterDetails,
+    ImportResult,
     MedicationRequestCreate,
     MedicationRequestOut,
+    PatientOut,
     ProcedureCreate,
     ProcedureOut,
+    UserRole,
+    UserSimple,
 )
+from app.dependencies.tenant import require_active_subscription
+from app.models.tenant import Tenant
 from app.security import get_current_user
+from app.services.bulk_import import detect_format, import_encounters
+from app.services.pagination import NEXT_CURSOR_HEADER, Keyset
+from app.services.serialization import json_response
 
 router = APIRouter(prefix="/encounters", tags=["Encounters"])
 
@@ -33,22 +42,100 @@ router = APIRouter(prefix="/encounters", tags=["Encounters"])
 # ===========================================================================
 
 
-@router.get("", response_model=List[EncounterDetails])
-async def list_encounters(
-    patient_id: Optional[str] = Query(None),
-    from_date: Optional[date] = Query(None),
-    to_date: Optional[date] = Query(None),
-    limit: int = Query(50, ge=1, le=200),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+# Colonnes disponibles en vue résumée (view=summary ou fields=...)
+ENCOUNTER_SUMMARY_COLUMNS = {
+    "id": Encounter.id,
+    "date": Encounter.date,
+    "motif": Encounter.motif,
+    "patient_id": Encounter.patient_id,
+    "patient_nom": Patient.nom,
+    "patient_prenom": Patient.prenom,
+    "patient_sexe": Patient.sexe,
+    "patient_annee_naissance": Patient.annee_naissance,
+    "user_id": Encounter.user_id,
+    "user_nom": User.nom,
+    "user_prenom": User.prenom,
+    "temperature": Encounter.temperature,
+    "pouls": Encounter.pouls,
+    "pression_systolique": Encounter.pression_systolique,
+    "pression_diastolique": Encounter.pression_diastolique,
+    "poids": Encounter.poids,
+    "taille": Encounter.taille,
+    "notes": Encounter.notes,
+    "diagnostics": (
+        select(func.array_agg(Condition.libelle))
+        .where(Condition.encounter_id == Encounter.id)
+        .correlate(Encounter)
+        .scalar_subquery()
+    ),
+    "created_at": Encounter.created_at,
+    "updated_at": Encounter.updated_at,
+    "version": Encounter.version,
+}
+ENCOUNTER_SUMMARY_DEFAULT = ("id", "date", "motif", "patient_id", "patient_nom", "patient_prenom")
+
+# Colonnes d'une consultation créée, reprises telles quelles dans la réponse
+ENCOUNTER_CREATED_FIELDS = (
+    "id", "patient_id", "site_id", "user_id", "date", "motif", "temperature", "pouls",
+    "pression_systolique", "pression_diastolique", "poids", "taille", "notes",
+    "created_at", "updated_at", "version",
+)
+
+
+def _summary_fields(fields: Optional[str]) -> list[str]:
+    """Champs demandés (id et date toujours inclus: ils portent le curseur)"""
+    requested = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(ENCOUNTER_SUMMARY_DEFAULT)
+    unknown = [f for f in requested if f not in ENCOUNTER_SUMMARY_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Champs inconnus: {', '.join(unknown)}"
+        )
+    return list(dict.fromkeys(["id", "date", *requested]))
+
+
+# Trier par date décroissante (puis id pour les consultations du même jour)
+ENCOUNTER_KEYSET = Keyset(Encounter.date, Encounter.id)
+
+
+def encounter_list_query(
+    site_id: uuid_module.UUID,
+    patient_id: Optional[uuid_module.UUID] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    summary_fields: Optional[list[str]] = None,
 ):
     """
-    Liste les consultations avec filtres optionnels
+    Requête de la liste des consultations d'un site, sans pagination
+
+    summary_fields: colonnes de la vue résumée (voir _summary_fields);
+    None pour les consultations complètes
     """
     # Exclure les consultations supprimées
-    query = (
+    # 🔒 ISOLATION PAR SITE: Tous les utilisateurs ne voient que les consultations de leur site
+    conditions = [Encounter.deleted_at == None, Encounter.site_id == site_id]
+
+    # Filtres
+    if patient_id:
+        conditions.append(Encounter.patient_id == patient_id)
+
+    if from_date:
+        conditions.append(Encounter.date >= from_date)
+
+    if to_date:
+        conditions.append(Encounter.date <= to_date)
+
+    if summary_fields is not None:
+        query = select(*(ENCOUNTER_SUMMARY_COLUMNS[f].label(f) for f in summary_fields)).where(*conditions)
+        if any(f.startswith("patient_") and f != "patient_id" for f in summary_fields):
+            query = query.join(Patient, Encounter.patient_id == Patient.id)
+        if any(f.startswith("user_") and f != "user_id" for f in summary_fields):
+            query = query.join(User, Encounter.user_id == User.id)
+        return query
+
+    return (
         select(Encounter)
-        .where(Encounter.deleted_at == None)
+        .where(*conditions)
         .options(
             selectinload(Encounter.patient),
             selectinload(Encounter.user),
@@ -58,31 +145,55 @@ async def list_encounters(
         )
     )
 
-    # 🔒 ISOLATION PAR SITE: Tous les utilisateurs ne voient que les consultations de leur site
-    query = query.where(Encounter.site_id == current_user.site_id)
 
-    # Filtres
+@router.get("", response_model=List[EncounterDetails])
+async def list_encounters(
+    response: Response,
+    patient_id: Optional[str] = Query(None),
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    view: Literal["summary", "full"] = Query("full", description="summary: colonnes de liste uniquement"),
+    fields: Optional[str] = Query(None, description="Champs de la vue résumée, séparés par des virgules"),
+    cursor: Optional[str] = Query(None, description="Curseur de pagination"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Liste les consultations avec filtres optionnels
+
+    - view=full (défaut): consultations complètes (patient, diagnostics,
+      ordonnances, actes)
+    - view=summary ou fields=...: une seule requête avec jointures, qui ne
+      sélectionne que les colonnes demandées (ex: fields=date,patient_nom)
+
+    La réponse reste une liste; le curseur de la page suivante est retourné
+    dans l'en-tête X-Next-Cursor (absent sur la dernière page).
+    """
+    patient_uuid = None
     if patient_id:
         try:
             patient_uuid = uuid_module.UUID(patient_id)
-            query = query.where(Encounter.patient_id == patient_uuid)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="patient_id invalide"
             )
 
-    if from_date:
-        query = query.where(Encounter.date >= from_date)
+    selected = _summary_fields(fields) if view == "summary" or fields else None
+    query = encounter_list_query(current_user.site_id, patient_uuid, from_date, to_date, selected)
+    result = await db.execute(ENCOUNTER_KEYSET.apply(query, cursor, limit))
 
-    if to_date:
-        query = query.where(Encounter.date <= to_date)
+    if selected is not None:
+        rows, next_cursor, _ = ENCOUNTER_KEYSET.page(result.all(), limit, key=lambda row: (row.date, row.id))
 
-    # Trier par date décroissante
-    query = query.order_by(Encounter.date.desc()).limit(limit)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return json_response([dict(row._mapping) for row in rows], headers=headers)
 
-    result = await db.execute(query)
-    encounters = result.scalars().all()
+    encounters, next_cursor, _ = ENCOUNTER_KEYSET.page(result.scalars().all(), limit)
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     return encounters
 
@@ -126,7 +237,7 @@ async def get_encounter(
     return encounter
 
 
-@router.post("", response_model=EncounterOut, status_code=status.HTTP_201_CREATED)
+@router.post("", response_model=EncounterDetails, status_code=status.HTTP_201_CREATED)
 async def create_encounter(
     encounter_data: EncounterCreate,
     current_user: User = Depends(get_current_user),
@@ -134,6 +245,11 @@ async def create_encounter(
 ):
     """
     Crée une nouvelle consultation
+
+    Les diagnostics, prescriptions et actes peuvent être envoyés dans la même
+    requête (conditions, medication_requests, procedures): tout est inséré
+    dans une seule transaction (un INSERT multi-lignes par table) et la
+    réponse est construite sans relire la consultation.
     """
     # Vérifier que le patient existe ET appartient au même site
     patient_query = select(Patient).where(
@@ -153,6 +269,7 @@ async def create_encounter(
     # Utiliser le site et l'user depuis le token JWT
     site_id = current_user.site_id
     user_id = current_user.id
+    now = datetime.now(timezone.utc)
 
     # Créer l'encounter
     new_encounter = Encounter(
@@ -169,24 +286,65 @@ async def create_encounter(
         poids=encounter_data.poids,
         taille=encounter_data.taille,
         notes=encounter_data.notes,
+        version=1,
+        created_at=now,
+        updated_at=now,
     )
 
+    # Enfants: identifiants générés ici, l'unité de travail regroupe les
+    # INSERT de chaque table (après celui de la consultation)
+    conditions = [
+        Condition(id=uuid_module.uuid4(), encounter_id=new_encounter.id, created_by=user_id, created_at=now, **c.model_dump())
+        for c in encounter_data.conditions
+    ]
+    medication_requests = [
+        MedicationRequest(id=uuid_module.uuid4(), encounter_id=new_encounter.id, created_by=user_id, created_at=now, **m.model_dump())
+        for m in encounter_data.medication_requests
+    ]
+    procedures = [
+        Procedure(id=uuid_module.uuid4(), encounter_id=new_encounter.id, created_by=user_id, created_at=now, **p.model_dump())
+        for p in encounter_data.procedures
+    ]
+
     db.add(new_encounter)
+    db.add_all([*conditions, *medication_requests, *procedures])
     await db.commit()
-    await db.refresh(new_encounter)
 
-    # Charger les relations
-    query = select(Encounter).where(Encounter.id == new_encounter.id).options(
-        selectinload(Encounter.patient),
-        selectinload(Encounter.user),
-        selectinload(Encounter.conditions),
-        selectinload(Encounter.medication_requests),
-        selectinload(Encounter.procedures),
-    )
-    result = await db.execute(query)
-    encounter = result.scalar_one()
+    # Toutes les valeurs sont connues côté Python: rien à relire
+    return EncounterDetails.model_validate({
+        **{column: getattr(new_encounter, column) for column in ENCOUNTER_CREATED_FIELDS},
+        "patient": PatientOut.model_validate(patient),
+        "user": UserSimple.model_validate(current_user),
+        "conditions": [ConditionOut.model_validate(c) for c in conditions],
+        "medication_requests": [MedicationRequestOut.model_validate(m) for m in medication_requests],
+        "procedures": [ProcedureOut.model_validate(p) for p in procedures],
+    })
 
-    return encounter
+
+@router.post("/import", response_model=ImportResult)
+async def import_encounters_file(
+    file: UploadFile = File(..., description="Fichier CSV (séparateur , ou ;) ou NDJSON"),
+    current_user: User = Depends(get_current_user),
+    tenant: Tenant = Depends(require_active_subscription),  # 🔒 Vérifie abonnement actif
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Importe des consultations en masse (reprise des registres papier)
+
+    Colonnes: patient_id, date, motif, temperature, pouls, pression_systolique,
+    pression_diastolique, poids, taille, notes. Les lignes invalides sont
+    rapportées avec leur numéro sans bloquer l'import des autres.
+
+    Permissions: major, médecin, admin
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MEDECIN, UserRole.MAJOR]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Seuls les administrateurs, médecins et majors peuvent importer des consultations"
+        )
+
+    fmt = detect_format(file.filename, file.content_type)
+    return await import_encounters(db, file.file, fmt, current_user)
 
 
 # ===========================================================================
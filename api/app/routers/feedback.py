@@ -1,7 +1,7 @@
 """
 Routes API pour les feedbacks utilisateurs
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
@@ -11,6 +11,7 @@ from app.database import get_db
 from app.models.feedback import Feedback, FeedbackType, FeedbackStatus
 from app.models.base_models import User
 from app.security import get_current_user, get_current_admin_user
+from app.services.pagination import NEXT_CURSOR_HEADER, Keyset
 from pydantic import BaseModel, EmailStr, Field
 import uuid as uuid_module
 
@@ -129,8 +130,9 @@ async def get_my_feedbacks(
 
 @router.get("/admin/all", response_model=List[FeedbackResponse])
 async def get_all_feedbacks(
-    skip: int = 0,
-    limit: int = 50,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Curseur de pagination"),
+    limit: int = Query(50, ge=1, le=200),
     feedback_type: Optional[FeedbackType] = None,
     feedback_status: Optional[FeedbackStatus] = None,
     db: AsyncSession = Depends(get_db),
@@ -140,9 +142,9 @@ async def get_all_feedbacks(
     Récupérer tous les feedbacks (admin seulement)
 
     - Filtrage par type et statut
-    - Pagination
+    - Pagination par curseur (page suivante: en-tête X-Next-Cursor)
     """
-    query = select(Feedback).order_by(Feedback.created_at.desc())
+    query = select(Feedback)
 
     if feedback_type:
         query = query.where(Feedback.type == feedback_type)
@@ -150,10 +152,12 @@ async def get_all_feedbacks(
     if feedback_status:
         query = query.where(Feedback.status == feedback_status)
 
-    query = query.offset(skip).limit(limit)
+    keyset = Keyset(Feedback.created_at, Feedback.id)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    feedbacks, next_cursor, _ = keyset.page(result.scalars().all(), limit)
 
-    result = await db.execute(query)
-    feedbacks = result.scalars().all()
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return feedbacks
 
 
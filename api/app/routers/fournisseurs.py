@@ -6,7 +6,7 @@ from typing import Optional, List
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, or_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 
@@ -15,6 +15,9 @@ from app.models import User
 from app.models.inventory import Fournisseur, BonCommande
 from app.schemas import UserRole, BaseSchema
 from app.security import get_current_user
+from app.services.loaders import NB_BONS_FOURNISSEUR
+from app.services.pagination import Keyset
+from app.services.serialization import RowSerializer, json_response
 
 router = APIRouter(prefix="/fournisseurs", tags=["Fournisseurs"])
 
@@ -77,6 +80,11 @@ class FournisseurDetails(FournisseurOut):
     nb_bons_commande: int = 0
 
 
+# Sérialiseurs des listes (voir app/services/serialization.py)
+FOURNISSEUR_ROW = RowSerializer(FournisseurOut)
+BON_COMMANDE_SIMPLE_ROW = RowSerializer(BonCommandeSimple)
+
+
 # ===========================================================================
 # HELPER FUNCTIONS - PERMISSIONS
 # ===========================================================================
@@ -121,7 +129,7 @@ async def list_fournisseurs(
     Permissions: Tous les utilisateurs authentifiés
     """
     # Query de base
-    query = select(Fournisseur).order_by(Fournisseur.nom)
+    query = select(*FOURNISSEUR_ROW.columns(Fournisseur))
     
     # Filtres
     conditions = []
@@ -147,36 +155,16 @@ async def list_fournisseurs(
     if conditions:
         query = query.where(and_(*conditions))
     
-    # Pagination par curseur
-    if cursor:
-        try:
-            cursor_id = uuid_module.UUID(cursor)
-            query = query.where(Fournisseur.id > cursor_id)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Curseur invalide"
-            )
-    
-    # Limiter les résultats
-    query = query.limit(limit + 1)
+    # Pagination par curseur (ordre alphabétique, id pour les homonymes)
+    keyset = Keyset(Fournisseur.nom, Fournisseur.id, descending=False)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    fournisseurs, next_cursor, has_more = keyset.page(result.all(), limit)
     
-    result = await db.execute(query)
-    fournisseurs = result.scalars().all()
-    
-    # Déterminer le prochain curseur
-    has_more = len(fournisseurs) > limit
-    if has_more:
-        fournisseurs = fournisseurs[:limit]
-        next_cursor = str(fournisseurs[-1].id) if fournisseurs else None
-    else:
-        next_cursor = None
-    
-    return {
-        "items": [FournisseurOut.model_validate(f) for f in fournisseurs],
+    return json_response({
+        "items": [FOURNISSEUR_ROW(f) for f in fournisseurs],
         "next_cursor": next_cursor,
         "has_more": has_more,
-    }
+    })
 
 
 # ===========================================================================
@@ -194,23 +182,21 @@ async def get_fournisseur(
     
     Permissions: Tous les utilisateurs authentifiés
     """
-    # Récupérer le fournisseur
-    stmt = select(Fournisseur).where(Fournisseur.id == fournisseur_id)
+    # Fournisseur et nombre de bons de commande en une requête
+    stmt = select(
+        Fournisseur,
+        NB_BONS_FOURNISSEUR.column(Fournisseur.id, "nb_bons_commande"),
+    ).where(Fournisseur.id == fournisseur_id)
     result = await db.execute(stmt)
-    fournisseur = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not fournisseur:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Fournisseur non trouvé"
         )
     
-    # Compter les bons de commande
-    count_stmt = select(func.count(BonCommande.id)).where(
-        BonCommande.fournisseur_id == fournisseur_id
-    )
-    count_result = await db.execute(count_stmt)
-    nb_bons_commande = count_result.scalar_one()
+    fournisseur, nb_bons_commande = row
     
     # Retourner le fournisseur avec le nombre de bons de commande
     return FournisseurDetails(
@@ -250,45 +236,24 @@ async def get_fournisseur_bons_commande(
     
     # Query de base
     query = (
-        select(BonCommande)
+        select(*BON_COMMANDE_SIMPLE_ROW.columns(BonCommande))
         .where(BonCommande.fournisseur_id == fournisseur_id)
-        .order_by(BonCommande.date_commande.desc())
     )
     
     # Filtrer par statut si demandé
     if statut:
         query = query.where(BonCommande.statut == statut)
     
-    # Pagination par curseur
-    if cursor:
-        try:
-            cursor_id = uuid_module.UUID(cursor)
-            query = query.where(BonCommande.id > cursor_id)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Curseur invalide"
-            )
-    
-    # Limiter les résultats
-    query = query.limit(limit + 1)
-    
-    result = await db.execute(query)
-    bons_commande = result.scalars().all()
-    
-    # Déterminer le prochain curseur
-    has_more = len(bons_commande) > limit
-    if has_more:
-        bons_commande = bons_commande[:limit]
-        next_cursor = str(bons_commande[-1].id) if bons_commande else None
-    else:
-        next_cursor = None
+    # Pagination par curseur (plus récents d'abord, id pour les commandes du même jour)
+    keyset = Keyset(BonCommande.date_commande, BonCommande.id)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    bons_commande, next_cursor, has_more = keyset.page(result.all(), limit)
     
-    return {
-        "items": [BonCommandeSimple.model_validate(bc) for bc in bons_commande],
+    return json_response({
+        "items": [BON_COMMANDE_SIMPLE_ROW(bc) for bc in bons_commande],
         "next_cursor": next_cursor,
         "has_more": has_more,
-    }
+    })
 
 
 # ===========================================================================
@@ -1,11 +1,12 @@
 """
 Router pour la gestion des médicaments (inventaire)
 """
+import hashlib
 import uuid as uuid_module
 from typing import Optional, List
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy import select, func, or_, and_, String, cast
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -13,9 +14,19 @@ from pydantic import BaseModel, Field, ConfigDict
 
 from app.database import get_db
 from app.models import User
-from app.models.inventory import Medicament, StockSite
+from app.models.inventory import Medicament, StockAlert, StockSite
 from app.schemas import UserRole, BaseSchema
 from app.security import get_current_user
+from app.services.medicament_catalogue import (
+    MedicamentCatalogue,
+    current_catalogue_version,
+    etag_matches,
+    next_catalogue_version,
+    not_modified,
+)
+from app.services.pagination import Keyset
+from app.services.serialization import RowSerializer, json_response
+from app.services.stock_alerts import join_live_quantities, live_alert_columns, sync_stock_alerts
 
 router = APIRouter(prefix="/medicaments", tags=["Medicaments"])
 
@@ -94,6 +105,23 @@ class MedicamentLowStock(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Sérialiseur de la liste (voir app/services/serialization.py)
+MEDICAMENT_ROW = RowSerializer(MedicamentOut)
+
+
+async def _load_catalogue(db: AsyncSession) -> list[tuple[int, dict]]:
+    """Catalogue complet sérialisé, par version d'écriture croissante"""
+    result = await db.execute(
+        select(*MEDICAMENT_ROW.columns(Medicament), Medicament.catalogue_version)
+        .order_by(Medicament.catalogue_version, Medicament.id)
+    )
+    return [(row.catalogue_version, MEDICAMENT_ROW(row)) for row in result]
+
+
+# Instantané du catalogue (mémoire + Redis, voir app/services/medicament_catalogue.py)
+catalogue = MedicamentCatalogue(_load_catalogue)
+
+
 # ===========================================================================
 # HELPER FUNCTIONS - PERMISSIONS
 # ===========================================================================
@@ -124,6 +152,7 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
 
 @router.get("", response_model=dict)
 async def list_medicaments(
+    request: Request,
     search: Optional[str] = Query(None, description="Recherche par nom, code ou DCI"),
     forme: Optional[str] = Query(None, description="Filtrer par forme pharmaceutique"),
     actif: Optional[bool] = Query(None, description="Filtrer par statut actif/inactif"),
@@ -134,11 +163,19 @@ async def list_medicaments(
 ):
     """
     Liste tous les médicaments avec pagination et filtres
+
+    La réponse ne dépend que du catalogue et des paramètres: ETag fort
+    (version du catalogue + paramètres), 304 si le client est à jour.
     
     Permissions: Tous les utilisateurs authentifiés
     """
-    # Query de base
-    query = select(Medicament).order_by(Medicament.nom)
+    params = hashlib.sha1(str(request.query_params).encode()).hexdigest()[:16]
+    etag = f'"medicaments-v{await current_catalogue_version(db)}-{params}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # Query de base (colonnes de MedicamentOut, sérialisées sans objets ORM)
+    query = select(*MEDICAMENT_ROW.columns(Medicament))
     
     # Filtres
     conditions = []
@@ -162,36 +199,60 @@ async def list_medicaments(
     if conditions:
         query = query.where(and_(*conditions))
     
-    # Pagination par curseur
-    if cursor:
-        try:
-            cursor_id = uuid_module.UUID(cursor)
-            query = query.where(Medicament.id > cursor_id)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Curseur invalide"
-            )
-    
-    # Limiter les résultats
-    query = query.limit(limit + 1)
+    # Pagination par curseur (ordre alphabétique, id pour les homonymes)
+    keyset = Keyset(Medicament.nom, Medicament.id, descending=False)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    medicaments, next_cursor, has_more = keyset.page(result.all(), limit)
     
-    result = await db.execute(query)
-    medicaments = result.scalars().all()
-    
-    # Déterminer le prochain curseur
-    has_more = len(medicaments) > limit
-    if has_more:
-        medicaments = medicaments[:limit]
-        next_cursor = str(medicaments[-1].id) if medicaments else None
-    else:
-        next_cursor = None
-    
-    return {
-        "items": [MedicamentOut.model_validate(m) for m in medicaments],
+    return json_response({
+        "items": [MEDICAMENT_ROW(m) for m in medicaments],
         "next_cursor": next_cursor,
         "has_more": has_more,
-    }
+    }, headers={"ETag": etag})
+
+
+# ===========================================================================
+# CATALOGUE COMPLET OU DELTA (synchronisation des appareils)
+# ===========================================================================
+
+@router.get("/catalogue", response_model=dict)
+async def get_catalogue(
+    request: Request,
+    since_version: Optional[int] = Query(
+        None, ge=0, description="Version déjà connue du client: ne renvoie que les médicaments modifiés depuis"
+    ),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Catalogue des médicaments servi depuis le cache
+
+    Sans since_version: catalogue complet (inactifs compris).
+    Avec since_version: uniquement les médicaments créés ou modifiés depuis
+    (une désactivation apparaît avec is_active=false). Réponse:
+    {"version": N, "full": bool, "items": [...]}, avec ETag fort.
+    
+    Permissions: Tous les utilisateurs authentifiés
+    """
+    snapshot = await catalogue.get(db)
+
+    # Version inconnue (base restaurée...): le client repart du catalogue complet
+    if since_version is not None and since_version > snapshot.version:
+        since_version = None
+
+    etag = snapshot.etag(since_version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if since_version is None:
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+    return json_response({
+        "version": snapshot.version,
+        "full": False,
+        "items": snapshot.changed_since(since_version),
+    }, headers=headers)
 
 
 # ===========================================================================
@@ -332,45 +393,33 @@ async def get_low_stock_medicaments(
     """
     from app.models.base_models import Site
     
-    # Query avec jointures
-    query = (
+    # Table précalculée des alertes (voir app/services/stock_alerts.py),
+    # avec la quantité et le seuil courants du stock
+    live = live_alert_columns()
+    query = join_live_quantities(
         select(
-            StockSite.medicament_id,
+            StockAlert.medicament_id,
             Medicament.code,
             Medicament.nom,
             Medicament.dci,
             Medicament.forme,
-            StockSite.site_id,
+            StockAlert.site_id,
             Site.nom.label("site_nom"),
-            StockSite.quantite_actuelle,
-            func.coalesce(
-                StockSite.seuil_alerte,
-                Medicament.seuil_alerte_defaut,
-                0
-            ).label("seuil_alerte")
-        )
-        .select_from(StockSite)
-        .join(Medicament, StockSite.medicament_id == Medicament.id)
-        .join(Site, StockSite.site_id == Site.id)
-        .where(
-            and_(
-                Medicament.is_active == True,
-                StockSite.quantite_actuelle <= func.coalesce(
-                    StockSite.seuil_alerte,
-                    Medicament.seuil_alerte_defaut,
-                    0
-                )
-            )
+            live["quantite"].label("quantite_actuelle"),
+            live["seuil"].label("seuil_alerte"),
         )
-    )
+        .select_from(StockAlert)
+        .join(Medicament, StockAlert.medicament_id == Medicament.id)
+        .join(Site, StockAlert.site_id == Site.id)
+    ).where(StockAlert.lot_id.is_(None))
     
     # Filtrer par site si demandé
     if site_id:
-        query = query.where(StockSite.site_id == site_id)
+        query = query.where(StockAlert.site_id == site_id)
     
     # Filtrer par site de l'utilisateur si pas admin
     if current_user.role not in [UserRole.ADMIN, UserRole.PHARMACIEN]:
-        query = query.where(StockSite.site_id == current_user.site_id)
+        query = query.where(StockAlert.site_id == current_user.site_id)
     
     query = query.order_by(Site.nom, Medicament.nom)
     
@@ -424,10 +473,12 @@ async def create_medicament(
         id=uuid_module.uuid4(),
         **medicament_data.model_dump(),
     )
+    medicament.catalogue_version = await next_catalogue_version(db)
     
     db.add(medicament)
     await db.commit()
     await db.refresh(medicament)
+    catalogue.invalidate()
     
     return MedicamentOut.model_validate(medicament)
 
@@ -465,9 +516,16 @@ async def update_medicament(
         setattr(medicament, field, value)
     
     medicament.updated_at = datetime.utcnow()
+    medicament.catalogue_version = await next_catalogue_version(db)
+    
+    # Seuil par défaut ou activation modifiés: réaligner les alertes de stock
+    if {"seuil_alerte_defaut", "is_active"} & update_data.keys():
+        await db.flush()
+        await sync_stock_alerts(db, StockSite.medicament_id == medicament_id)
     
     await db.commit()
     await db.refresh(medicament)
+    catalogue.invalidate()
     
     return MedicamentOut.model_validate(medicament)
 
@@ -501,7 +559,11 @@ async def delete_medicament(
     # Soft delete
     medicament.is_active = False
     medicament.updated_at = datetime.utcnow()
+    medicament.catalogue_version = await next_catalogue_version(db)
+    await db.flush()
+    await sync_stock_alerts(db, StockSite.medicament_id == medicament_id)
     
     await db.commit()
+    catalogue.invalidate()
     
     return None
@@ -2,97 +2,103 @@
 Router pour la gestion des patients - Version production
 """
 import uuid as uuid_module
-from typing import Optional, List
+from typing import Callable, Optional, List
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func, or_
+from fastapi import APIRouter, Depends, File, HTTPException, status, Query, UploadFile
+from pydantic import BaseModel, Field
+from sqlalchemy import Select, select, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
-from app.database import get_db
-from app.models import Patient, User, Site
+from app.database import constraint_name, get_db
+from app.models import Patient, PatientDuplicate, User, Site
+from app.models.base_models import SexeEnum
 from app.models.tenant import Tenant
-from app.schemas import PatientCreate, PatientUpdate, PatientOut, UserRole
+from app.schemas import ImportResult, PatientCreate, PatientUpdate, PatientOut, UserRole
 from app.security import get_current_user
+from app.services.bulk_import import detect_format, import_patients
+from app.services.matricule_service import (
+    MATRICULE_INDEX,
+    MAX_BLOCK_SIZE,
+    allocate_block,
+    allocate_matricule,
+    format_matricule,
+    generate_village_code,
+    unallocated_matricules,
+)
+from app.services.pagination import Keyset
+from app.services.patient_matching import DUPLICATE_THRESHOLD, find_matches, phonetic_key
+from app.services.patient_search import search_clauses
+from app.services.patient_timeline import TIMELINE_TYPES, timeline_query
+from app.services.serialization import RowSerializer, json_response
 from app.dependencies.tenant import check_quota, get_current_tenant, require_active_subscription, require_write_access
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
+# Sérialiseur de la liste (voir app/services/serialization.py)
+PATIENT_ROW = RowSerializer(PatientOut)
+
 
 # ===========================================================================
-# HELPER FUNCTIONS
+# LIST PATIENTS
 # ===========================================================================
 
-def generate_village_code(village_name: str) -> str:
-    """
-    Génère un code de 4 lettres à partir du nom du village
-    Ex: "Konobougou" → "KONO", "Siby" → "SIBY"
+def patient_list_query(
+    site_id: uuid_module.UUID,
+    village: Optional[str] = None,
+    search: Optional[str] = None,
+) -> tuple[Select, Keyset, Optional[Callable]]:
     """
-    if not village_name:
-        return "UNKN"  # Code par défaut si pas de village
+    Requête de la liste des patients d'un site, sans pagination
 
-    # Nettoyer le nom du village
-    name = village_name.strip()
+    Returns:
+        (requête, keyset de pagination, clé de curseur des lignes ou None)
+    """
+    # Base query - exclure les patients supprimés
+    # (colonnes de PatientOut uniquement, sérialisées sans objets ORM)
+    query = select(*PATIENT_ROW.columns(Patient)).where(Patient.deleted_at == None)
 
-    # Prendre les 4 premières lettres
-    code = "".join([c for c in name if c.isalpha()])[:4].upper()
+    # Toujours filtrer par site - même pour les admins/médecins
+    # Cela garantit que chaque utilisateur ne voit que les patients de son établissement
+    query = query.where(Patient.site_id == site_id)
 
-    # Si moins de 4 lettres, compléter avec 'X'
-    while len(code) < 4:
-        code += "X"
+    # Filtre village
+    if village:
+        query = query.where(Patient.village.ilike(f"%{village}%"))
 
-    return code
+    # Recherche textuelle (index trigrammes, insensible aux accents),
+    # résultats les plus proches en premier: le curseur porte alors le score
+    if search and search.strip():
+        search_filter, rank = search_clauses(search)
+        query = query.where(search_filter).add_columns(rank.label("rank"))
+        return query, Keyset(rank, Patient.id), lambda row: (row.rank, row.id)
+    return query, Keyset(Patient.created_at, Patient.id), None
 
 
-async def generate_matricule(db: AsyncSession, village: str | None, year: int) -> str:
+def patient_count_query(site_id: uuid_module.UUID, since: Optional[datetime] = None) -> Select:
     """
-    Génère un matricule unique au format: SIBY-2025-0001
-
-    Args:
-        db: Session de base de données
-        village: Nom du village du patient
-        year: Année en cours
+    Nombre de patients d'un site (quota), créés depuis `since` si fourni
 
-    Returns:
-        Matricule unique (ex: "SIBY-2025-0001", "KATI-2025-0001")
+    Intervalle sur created_at (et non extract mois/année) pour utiliser
+    l'index idx_patients_site_created.
     """
-    # Générer le code du village
-    village_code = generate_village_code(village or "UNKN")
-
-    # Chercher le dernier matricule pour ce village et cette année
-    prefix = f"{village_code}-{year}-%"
-    result = await db.execute(
-        select(func.max(Patient.matricule))
-        .where(Patient.matricule.like(prefix))
+    query = (
+        select(func.count(Patient.id))
+        .where(Patient.site_id == site_id)
+        .where(Patient.deleted_at.is_(None))
     )
-    last_matricule = result.scalar()
-
-    # Déterminer le prochain numéro
-    if last_matricule:
-        # Extraire le numéro (ex: "SIBY-2025-0042" → 42)
-        try:
-            last_number = int(last_matricule.split("-")[-1])
-            next_number = last_number + 1
-        except (ValueError, IndexError):
-            next_number = 1
-    else:
-        next_number = 1
-
-    # Formater le matricule
-    matricule = f"{village_code}-{year}-{next_number:04d}"
-
-    return matricule
+    if since is not None:
+        query = query.where(Patient.created_at >= since)
+    return query
 
 
-# ===========================================================================
-# LIST PATIENTS
-# ===========================================================================
-
 @router.get("", response_model=dict)
 async def list_patients(
     search: Optional[str] = Query(None, description="Recherche par nom/prénom/téléphone"),
     village: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Curseur de pagination"),
     limit: int = Query(50, ge=1, le=200),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
@@ -104,41 +110,138 @@ async def list_patients(
     - Tous les utilisateurs: patients de leur site uniquement
     - Note: L'admin plateforme n'a pas accès aux données patients (confidentialité médicale)
     """
-    # Base query - exclure les patients supprimés
-    query = select(Patient).where(Patient.deleted_at == None)
-
-    # Toujours filtrer par site - même pour les admins/médecins
-    # Cela garantit que chaque utilisateur ne voit que les patients de son établissement
-    query = query.where(Patient.site_id == current_user.site_id)
-
-    # Recherche textuelle
-    if search:
-        search_filter = or_(
-            Patient.nom.ilike(f"%{search}%"),
-            Patient.prenom.ilike(f"%{search}%"),
-            Patient.telephone.ilike(f"%{search}%")
-        )
-        query = query.where(search_filter)
-
-    # Filtre village
-    if village:
-        query = query.where(Patient.village.ilike(f"%{village}%"))
-
-    # Ordre et limite
-    query = query.order_by(Patient.created_at.desc()).limit(limit)
+    query, keyset, key = patient_list_query(current_user.site_id, village, search)
 
     # Exécuter
-    result = await db.execute(query)
-    patients = result.scalars().all()
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    rows, next_cursor, has_more = keyset.page(result.all(), limit, key=key)
 
-    return {
-        "data": [PatientOut.model_validate(p) for p in patients],
+    return json_response({
+        "data": [PATIENT_ROW(row) for row in rows],
         "pagination": {
-            "cursor": None,
-            "next_cursor": None,
-            "has_more": len(patients) >= limit
+            "cursor": cursor,
+            "next_cursor": next_cursor,
+            "has_more": has_more
         }
+    })
+
+
+# ===========================================================================
+# DÉTECTION DES DOUBLONS
+# ===========================================================================
+
+class PatientMatch(BaseModel):
+    patient: PatientOut
+    score: float
+    raisons: List[str]
+
+
+class PatientDuplicateOut(BaseModel):
+    id: uuid_module.UUID
+    patient: PatientOut
+    duplicate: PatientOut
+    score: float
+    raisons: List[str]
+
+
+@router.get("/match", response_model=List[PatientMatch])
+async def match_patients(
+    nom: str = Query(..., min_length=2, max_length=100),
+    prenom: Optional[str] = Query(None, max_length=100),
+    sexe: Optional[SexeEnum] = Query(None),
+    annee_naissance: Optional[int] = Query(None, ge=1900, le=2100),
+    telephone: Optional[str] = Query(None, max_length=20),
+    village: Optional[str] = Query(None, max_length=200),
+    limit: int = Query(5, ge=1, le=20),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Patients existants qui ressemblent à la fiche en cours de saisie
+
+    À appeler avant l'enregistrement: les variantes d'orthographe
+    (Traoré / Trawore) sont retrouvées via la clé phonétique et la
+    similarité des noms. Score de 0 à 1, doublon probable au-delà de 0.6.
+    """
+    probe = {
+        "nom": nom,
+        "prenom": prenom,
+        "sexe": sexe,
+        "annee_naissance": annee_naissance,
+        "telephone": telephone,
+        "village": village,
     }
+    matches = await find_matches(db, current_user.site_id, probe, limit=limit)
+
+    return [
+        PatientMatch(patient=PatientOut.model_validate(patient), score=score, raisons=reasons)
+        for patient, score, reasons in matches
+    ]
+
+
+@router.get("/duplicates", response_model=List[PatientDuplicateOut])
+async def list_duplicates(
+    min_score: float = Query(DUPLICATE_THRESHOLD, ge=0, le=1),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Doublons probables du site détectés par la tâche nocturne, du plus
+    probable au moins probable
+    """
+    duplicate = aliased(Patient)
+    query = (
+        select(PatientDuplicate, Patient, duplicate)
+        .join(Patient, Patient.id == PatientDuplicate.patient_id)
+        .join(duplicate, duplicate.id == PatientDuplicate.duplicate_id)
+        .where(
+            PatientDuplicate.site_id == current_user.site_id,
+            PatientDuplicate.statut == "en_attente",
+            PatientDuplicate.score >= min_score,
+            Patient.deleted_at.is_(None),
+            duplicate.deleted_at.is_(None),
+        )
+        .order_by(PatientDuplicate.score.desc())
+        .limit(limit)
+    )
+    result = await db.execute(query)
+
+    return [
+        PatientDuplicateOut(
+            id=pair.id,
+            patient=PatientOut.model_validate(patient),
+            duplicate=PatientOut.model_validate(other),
+            score=float(pair.score),
+            raisons=pair.raisons or [],
+        )
+        for pair, patient, other in result.all()
+    ]
+
+
+@router.post("/duplicates/{duplicate_id}/ignore", status_code=status.HTTP_204_NO_CONTENT)
+async def ignore_duplicate(
+    duplicate_id: uuid_module.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Marquer une paire comme distincte: elle ne sera plus proposée"""
+    result = await db.execute(
+        select(PatientDuplicate).where(
+            PatientDuplicate.id == duplicate_id,
+            PatientDuplicate.site_id == current_user.site_id,
+        )
+    )
+    pair = result.scalar_one_or_none()
+
+    if not pair:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Doublon non trouvé"
+        )
+
+    pair.statut = "ignore"
+    await db.commit()
 
 
 # ===========================================================================
@@ -179,6 +282,82 @@ async def get_patient(
     return PatientOut.model_validate(patient)
 
 
+# ===========================================================================
+# CHRONOLOGIE DU PATIENT
+# ===========================================================================
+
+class PatientTimelineEvent(BaseModel):
+    type: str
+    id: uuid_module.UUID
+    occurred_at: datetime
+    encounter_id: Optional[uuid_module.UUID] = None
+    titre: Optional[str] = None
+    detail: Optional[str] = None
+    code: Optional[str] = None
+
+
+TIMELINE_ROW = RowSerializer(PatientTimelineEvent)
+
+
+@router.get("/{patient_id}/timeline", response_model=dict)
+async def get_patient_timeline(
+    patient_id: uuid_module.UUID,
+    types: Optional[str] = Query(None, description=f"Types séparés par des virgules ({', '.join(TIMELINE_TYPES)})"),
+    cursor: Optional[str] = Query(None, description="Curseur de pagination"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Dossier chronologique d'un patient (plus récent d'abord)
+
+    Consultations, diagnostics, prescriptions, actes, références,
+    délivrances et pièces jointes entrelacés par date, en une seule requête.
+    La première page (sans curseur) inclut aussi la fiche du patient.
+    """
+    result = await db.execute(
+        select(Patient).where(Patient.id == patient_id, Patient.deleted_at == None)
+    )
+    patient = result.scalar_one_or_none()
+
+    if not patient:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient non trouvé"
+        )
+
+    if patient.site_id != current_user.site_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Accès non autorisé à ce patient"
+        )
+
+    selected = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    unknown = [t for t in selected or [] if t not in TIMELINE_TYPES]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Types inconnus: {', '.join(unknown)}"
+        )
+
+    timeline = timeline_query(patient_id, selected)
+    keyset = Keyset(timeline.c.occurred_at, timeline.c.id)
+    result = await db.execute(keyset.apply(select(timeline), cursor, limit))
+    rows, next_cursor, has_more = keyset.page(result.all(), limit)
+
+    payload = {
+        "data": [TIMELINE_ROW(row) for row in rows],
+        "pagination": {
+            "cursor": cursor,
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+    }
+    if cursor is None:
+        payload["patient"] = PatientOut.model_validate(patient).model_dump(mode="json")
+    return json_response(payload)
+
+
 # ===========================================================================
 # CREATE PATIENT
 # ===========================================================================
@@ -198,6 +377,9 @@ async def create_patient(
     - 2025: année
     - 0001: numéro séquentiel
 
+    Un appareil hors-ligne peut fournir un matricule issu d'un bloc réservé
+    via /patients/matricules/reserve.
+
     🔒 Blocage: Cette action est bloquée si l'abonnement est expiré (mode DEGRADED ou supérieur)
     """
     # Déterminer le type de quota à vérifier selon le plan
@@ -206,31 +388,25 @@ async def create_patient(
     
     # Plan gratuit : vérifier limite TOTALE
     if not subscription or not subscription.plan or subscription.plan.code == 'free':
-        total_patients_result = await db.execute(
-            select(func.count(Patient.id))
-            .where(Patient.site_id == current_user.site_id)
-            .where(Patient.deleted_at.is_(None))
-        )
+        total_patients_result = await db.execute(patient_count_query(current_user.site_id))
         total_patients = total_patients_result.scalar_one()
         await check_quota(current_tenant, "patients_total", total_patients, db)
     
     # Plans payants : vérifier limite MENSUELLE
     else:
-        from datetime import datetime
-        from sqlalchemy import extract
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        monthly_patients_result = await db.execute(
-            select(func.count(Patient.id))
-            .where(Patient.site_id == current_user.site_id)
-            .where(Patient.deleted_at.is_(None))
-            .where(extract('month', Patient.created_at) == current_month)
-            .where(extract('year', Patient.created_at) == current_year)
-        )
+        month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        monthly_patients_result = await db.execute(patient_count_query(current_user.site_id, since=month_start))
         monthly_patients = monthly_patients_result.scalar_one()
         await check_quota(current_tenant, "patients_monthly", monthly_patients, db)
 
+    # Matricule: réservé hors-ligne par l'appareil, sinon alloué maintenant
+    if patient_data.matricule and await unallocated_matricules(db, [patient_data.matricule]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Le matricule {patient_data.matricule} n'a pas été réservé (voir /patients/matricules/reserve)"
+        )
+    matricule = patient_data.matricule or await allocate_matricule(db, patient_data.village)
+
     # Créer le patient
     new_patient = Patient(
         id=uuid_module.uuid4(),
@@ -240,18 +416,108 @@ async def create_patient(
         annee_naissance=patient_data.annee_naissance,
         telephone=patient_data.telephone,
         village=patient_data.village,
+        matricule=matricule,
+        phonetic_key=phonetic_key(patient_data.nom, patient_data.prenom),
         site_id=current_user.site_id,  # Toujours le site de l'utilisateur
         created_by=current_user.id,
         version=1,
     )
 
     db.add(new_patient)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if constraint_name(e) != MATRICULE_INDEX:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Le matricule {matricule} est déjà attribué"
+        )
     await db.refresh(new_patient)
 
     return PatientOut.model_validate(new_patient)
 
 
+# ===========================================================================
+# MATRICULES (réservation hors-ligne)
+# ===========================================================================
+
+class MatriculeReservationRequest(BaseModel):
+    village: Optional[str] = Field(None, max_length=200)
+    count: int = Field(50, ge=1, le=MAX_BLOCK_SIZE)
+
+
+class MatriculeReservationResponse(BaseModel):
+    village_code: str
+    year: int
+    first: str
+    last: str
+    matricules: List[str]
+
+
+@router.post("/matricules/reserve", response_model=MatriculeReservationResponse)
+async def reserve_matricules(
+    reservation: MatriculeReservationRequest,
+    current_user: User = Depends(get_current_user),
+    current_tenant: Tenant = Depends(require_active_subscription),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Réserver un bloc de matricules pour un appareil hors-ligne
+
+    Les numéros réservés ne seront jamais réattribués; l'appareil les utilise
+    dans le champ `matricule` lors de la création des patients. Les numéros
+    non utilisés restent simplement des trous dans la séquence.
+    """
+    year = datetime.now().year
+    village_code = generate_village_code(reservation.village)
+    first = await allocate_block(db, village_code, year, reservation.count)
+    await db.commit()
+
+    matricules = [
+        format_matricule(village_code, year, number)
+        for number in range(first, first + reservation.count)
+    ]
+    return MatriculeReservationResponse(
+        village_code=village_code,
+        year=year,
+        first=matricules[0],
+        last=matricules[-1],
+        matricules=matricules,
+    )
+
+
+# ===========================================================================
+# BULK IMPORT
+# ===========================================================================
+
+@router.post("/import", response_model=ImportResult)
+async def import_patients_file(
+    file: UploadFile = File(..., description="Fichier CSV (séparateur , ou ;) ou NDJSON"),
+    current_user: User = Depends(get_current_user),
+    current_tenant: Tenant = Depends(require_active_subscription),  # 🔒 Vérifie abonnement actif
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Importer des patients en masse (reprise des registres papier)
+
+    Colonnes: nom, prenom, sexe, annee_naissance, telephone, village.
+    Les lignes valides sont importées par lots; les lignes invalides sont
+    rapportées avec leur numéro. Le quota de patients est vérifié par lot.
+
+    Permissions: major, médecin, admin
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MEDECIN, UserRole.MAJOR]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Seuls les administrateurs, médecins et majors peuvent importer des patients"
+        )
+
+    fmt = detect_format(file.filename, file.content_type)
+    return await import_patients(db, file.file, fmt, current_user, current_tenant)
+
+
 # ===========================================================================
 # UPDATE PATIENT
 # ===========================================================================
@@ -297,6 +563,9 @@ async def update_patient(
     for field, value in update_data.items():
         setattr(patient, field, value)
 
+    if "nom" in update_data or "prenom" in update_data:
+        patient.phonetic_key = phonetic_key(patient.nom, patient.prenom)
+
     patient.updated_by = current_user.id
     patient.updated_at = datetime.now()
     patient.version += 1
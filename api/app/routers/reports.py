@@ -1,11 +1,12 @@
 """
 Routes pour les rapports et statistiques
 """
+import uuid as uuid_module
 from datetime import date, datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, select
+from sqlalchemy import Select, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
@@ -22,6 +23,64 @@ router = APIRouter(prefix="/reports", tags=["Reports"])
 # ===========================================================================
 
 
+def overview_queries(from_date: date, to_date: date, site_id: Optional[uuid_module.UUID]) -> dict[str, Select]:
+    """
+    Requêtes de l'aperçu d'une période (nom → requête)
+
+    Toutes excluent les consultations et patients supprimés et, si site_id
+    est fourni, sont limitées au site (ISOLATION MULTI-TENANT).
+    """
+    periode = [Encounter.date >= from_date, Encounter.date <= to_date, Encounter.deleted_at == None]
+    if site_id:
+        periode.append(Encounter.site_id == site_id)
+
+    # Nouveaux patients: créés pendant la période
+    nouveaux = [
+        Patient.created_at >= datetime.combine(from_date, datetime.min.time()),
+        Patient.created_at <= datetime.combine(to_date, datetime.max.time()),
+        Patient.deleted_at == None,
+    ]
+    if site_id:
+        nouveaux.append(Patient.site_id == site_id)
+
+    # Moins de 5 ans: calculé via l'année de naissance du patient
+    year_threshold = datetime.now().year - 5
+
+    def references(*conditions):
+        return (
+            select(func.count(Reference.id))
+            .join(Encounter, Reference.encounter_id == Encounter.id)
+            .where(*periode, *conditions)
+        )
+
+    return {
+        "total_consultations": select(func.count(Encounter.id)).where(*periode),
+        "total_patients": select(func.count(func.distinct(Encounter.patient_id))).where(*periode),
+        "nouveaux_patients": select(func.count(Patient.id)).where(*nouveaux),
+        "consultations_moins_5_ans": (
+            select(func.count(Encounter.id))
+            .join(Patient, Encounter.patient_id == Patient.id)
+            .where(*periode, Patient.annee_naissance >= year_threshold)
+        ),
+        "top_diagnostics": (
+            select(
+                Condition.code_icd10,
+                Condition.libelle,
+                func.count(Condition.id).label("count")
+            )
+            .join(Encounter, Condition.encounter_id == Encounter.id)
+            .where(*periode)
+            .group_by(Condition.code_icd10, Condition.libelle)
+            .order_by(func.count(Condition.id).desc())
+            .limit(10)
+        ),
+        "total_references": references(),
+        "references_confirmees": references(Reference.statut == ReferenceStatutEnum.confirme),
+        "references_completees": references(Reference.statut == ReferenceStatutEnum.complete),
+        "references_en_attente": references(Reference.statut == ReferenceStatutEnum.en_attente),
+    }
+
+
 @router.get("/overview", response_model=ReportOverview)
 async def get_overview(
     from_date: date = Query(alias="from"),
@@ -34,99 +93,9 @@ async def get_overview(
     Génère un rapport d'aperçu pour une période donnée (filtré par tenant)
     """
     # Utiliser le site_id de l'utilisateur connecté pour l'isolation
-    user_site_id = current_user.site_id
-    
-    # Construire les requêtes de base avec filtres de dates
-    encounters_query = select(Encounter).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-    )
-
-    # Filtre par site si fourni
-    if user_site_id:
-        encounters_query = encounters_query.where(Encounter.site_id == user_site_id)
-
-    # 1. Total consultations
-    total_consultations_query = select(func.count(Encounter.id)).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-        Encounter.deleted_at == None,  # Exclure les consultations supprimées
-    )
-    # ISOLATION MULTI-TENANT
-    if user_site_id:
-        total_consultations_query = total_consultations_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(total_consultations_query)
-    total_consultations = result.scalar() or 0
-
-    # 2. Total patients uniques
-    total_patients_query = select(func.count(func.distinct(Encounter.patient_id))).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-        Encounter.deleted_at == None,  # Exclure les consultations supprimées
-    )
-    # ISOLATION MULTI-TENANT
-    if user_site_id:
-        total_patients_query = total_patients_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(total_patients_query)
-    total_patients = result.scalar() or 0
-
-    # 3. Nouveaux patients (patients créés pendant la période)
-    nouveaux_patients_query = select(func.count(Patient.id)).where(
-        Patient.created_at >= datetime.combine(from_date, datetime.min.time()),
-        Patient.created_at <= datetime.combine(to_date, datetime.max.time()),
-    )
-    # ISOLATION MULTI-TENANT
-    if user_site_id:
-        nouveaux_patients_query = nouveaux_patients_query.where(Patient.site_id == user_site_id)
-
-    result = await db.execute(nouveaux_patients_query)
-    nouveaux_patients = result.scalar() or 0
-
-    # 4. Consultations moins de 5 ans (calculé via l'année de naissance du patient)
-    # On récupère les encounters avec les patients
-    current_year = datetime.now().year
-    year_threshold = current_year - 5
-
-    consultations_moins_5_query = select(func.count(Encounter.id)).join(
-        Patient, Encounter.patient_id == Patient.id
-    ).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-        Encounter.deleted_at == None,  # Exclure les consultations supprimées
-        Patient.annee_naissance >= year_threshold,
-    )
-    # ISOLATION MULTI-TENANT
-    if user_site_id:
-        consultations_moins_5_query = consultations_moins_5_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(consultations_moins_5_query)
-    consultations_moins_5_ans = result.scalar() or 0
-
-    # 5. Top 10 diagnostics
-    top_diagnostics_query = (
-        select(
-            Condition.code_icd10,
-            Condition.libelle,
-            func.count(Condition.id).label("count")
-        )
-        .join(Encounter, Condition.encounter_id == Encounter.id)
-        .where(
-            Encounter.date >= from_date,
-            Encounter.date <= to_date,
-            Encounter.deleted_at == None,  # Exclure les consultations supprimées
-        )
-        .group_by(Condition.code_icd10, Condition.libelle)
-        .order_by(func.count(Condition.id).desc())
-        .limit(10)
-    )
-    # ISOLATION MULTI-TENANT
-    if user_site_id:
-        top_diagnostics_query = top_diagnostics_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(top_diagnostics_query)
-    top_diagnostics_raw = result.all()
+    queries = overview_queries(from_date, to_date, current_user.site_id)
+    top_diagnostics_query = queries.pop("top_diagnostics")
+    counts = {name: (await db.execute(query)).scalar() or 0 for name, query in queries.items()}
 
     top_diagnostics = [
         TopDiagnostic(
@@ -134,82 +103,22 @@ async def get_overview(
             libelle=row[1],
             count=row[2]
         )
-        for row in top_diagnostics_raw
+        for row in (await db.execute(top_diagnostics_query)).all()
     ]
 
-    # 6. Statistiques de références
-    # Total des références
-    total_references_query = select(func.count(Reference.id)).join(
-        Encounter, Reference.encounter_id == Encounter.id
-    ).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-        Encounter.deleted_at == None,
-    )
-    if user_site_id:
-        total_references_query = total_references_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(total_references_query)
-    total_references = result.scalar() or 0
-
-    # Références confirmées
-    confirmes_query = select(func.count(Reference.id)).join(
-        Encounter, Reference.encounter_id == Encounter.id
-    ).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-        Encounter.deleted_at == None,
-        Reference.statut == ReferenceStatutEnum.confirme,
-    )
-    if user_site_id:
-        confirmes_query = confirmes_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(confirmes_query)
-    confirmes = result.scalar() or 0
-
-    # Références complétées
-    completes_query = select(func.count(Reference.id)).join(
-        Encounter, Reference.encounter_id == Encounter.id
-    ).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-        Encounter.deleted_at == None,
-        Reference.statut == ReferenceStatutEnum.complete,
-    )
-    if user_site_id:
-        completes_query = completes_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(completes_query)
-    completes = result.scalar() or 0
-
-    # Références en attente
-    en_attente_query = select(func.count(Reference.id)).join(
-        Encounter, Reference.encounter_id == Encounter.id
-    ).where(
-        Encounter.date >= from_date,
-        Encounter.date <= to_date,
-        Encounter.deleted_at == None,
-        Reference.statut == ReferenceStatutEnum.en_attente,
-    )
-    if user_site_id:
-        en_attente_query = en_attente_query.where(Encounter.site_id == user_site_id)
-
-    result = await db.execute(en_attente_query)
-    en_attente = result.scalar() or 0
-
     references = ReferenceStats(
-        total=total_references,
-        confirmes=confirmes,
-        completes=completes,
-        en_attente=en_attente,
+        total=counts["total_references"],
+        confirmes=counts["references_confirmees"],
+        completes=counts["references_completees"],
+        en_attente=counts["references_en_attente"],
     )
 
     return ReportOverview(
         period=ReportPeriod(from_date=from_date, to_date=to_date),
-        total_consultations=total_consultations,
-        total_patients=total_patients,
-        nouveaux_patients=nouveaux_patients,
-        consultations_moins_5_ans=consultations_moins_5_ans,
+        total_consultations=counts["total_consultations"],
+        total_patients=counts["total_patients"],
+        nouveaux_patients=counts["nouveaux_patients"],
+        consultations_moins_5_ans=counts["consultations_moins_5_ans"],
         top_diagnostics=top_diagnostics,
         references=references,
     )
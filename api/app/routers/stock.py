@@ -3,25 +3,44 @@ Router pour la gestion des stocks de médicaments
 """
 import uuid as uuid_module
 from typing import Optional, List
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta, timezone
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from pydantic import BaseModel, Field, ConfigDict
 
 from app.database import get_db
-from app.models import User, Site
+from app.models import Patient, User, Site
 from app.models.inventory import (
     StockSite,
     Medicament,
     LotMedicament,
     StockMovement,
-    TypeMouvementEnum
+    TypeMouvementEnum,
+    TypeAlerteStockEnum,
+    DelivrancePatient,
+    StockAlert,
 )
+from app.models.sequences import DocumentTypeEnum
 from app.schemas import UserRole, BaseSchema
 from app.security import get_current_user
+from app.services.pagination import Keyset
+from app.services.serialization import RowSerializer, json_response
+from app.services.stock_alerts import SEUIL, join_live_quantities, live_alert_columns
+from app.services.stock_dashboard import StockDashboardCache
+from app.services.sequence_service import next_document_numero
+from app.services.stock_ledger import (
+    TRANSFER_TYPES,
+    DispensingLine,
+    TransferLine,
+    apply_dispensing,
+    apply_movement,
+    apply_transfer,
+)
+from app.services.stock_reconciliation import balances_query
 
 router = APIRouter(prefix="/stock", tags=["Stock"])
 
@@ -74,6 +93,102 @@ class StockMovementOut(BaseSchema):
     created_at: datetime
 
 
+class DelivranceLigneCreate(BaseModel):
+    """Ligne d'une délivrance"""
+    medicament_id: uuid_module.UUID
+    quantite: int = Field(ge=1)
+    lot_id: Optional[uuid_module.UUID] = None
+    instructions: Optional[str] = None
+
+
+class DelivranceCreate(BaseModel):
+    """Délivrance d'une ordonnance (toutes les lignes en une requête)"""
+    patient_id: uuid_module.UUID
+    encounter_id: Optional[uuid_module.UUID] = None
+    medication_request_id: Optional[uuid_module.UUID] = None
+    commentaire: Optional[str] = None
+    lignes: List[DelivranceLigneCreate] = Field(min_length=1, max_length=50)
+
+
+class DelivranceLigneOut(BaseSchema):
+    """Ligne délivrée, avec le stock restant du médicament"""
+    id: uuid_module.UUID
+    medicament_id: uuid_module.UUID
+    lot_id: Optional[uuid_module.UUID]
+    quantite: int
+    instructions: Optional[str]
+    stock_restant: int
+
+
+class DelivranceOut(BaseSchema):
+    """Délivrance enregistrée"""
+    id: uuid_module.UUID
+    patient_id: uuid_module.UUID
+    encounter_id: Optional[uuid_module.UUID]
+    medication_request_id: Optional[uuid_module.UUID]
+    site_id: uuid_module.UUID
+    delivered_by: uuid_module.UUID
+    date_delivrance: datetime
+    commentaire: Optional[str]
+    lignes: List[DelivranceLigneOut]
+
+
+class TransfertLigneCreate(BaseModel):
+    """Ligne d'un transfert"""
+    medicament_id: uuid_module.UUID
+    quantite: int = Field(ge=1)
+    lot_id: Optional[uuid_module.UUID] = None
+
+
+class TransfertCreate(BaseModel):
+    """Transfert de stock vers un autre site (toutes les lignes en une requête)"""
+    site_destination_id: uuid_module.UUID
+    commentaire: Optional[str] = None
+    lignes: List[TransfertLigneCreate] = Field(min_length=1, max_length=100)
+
+
+class TransfertLigneOut(BaseSchema):
+    """Part transférée (une par lot entamé), avec les stocks restants des deux sites"""
+    medicament_id: uuid_module.UUID
+    quantite: int
+    lot_source_id: Optional[uuid_module.UUID]
+    lot_destination_id: Optional[uuid_module.UUID]
+    stock_source: int
+    stock_destination: int
+
+
+class TransfertOut(BaseSchema):
+    """Transfert enregistré"""
+    numero: str
+    site_source_id: uuid_module.UUID
+    site_destination_id: uuid_module.UUID
+    date_transfert: datetime
+    commentaire: Optional[str]
+    lignes: List[TransfertLigneOut]
+
+
+# Sérialiseurs des listes (voir app/services/serialization.py)
+class StockAlertOut(BaseSchema):
+    """Alerte de stock (rupture, stock bas, péremption)"""
+    id: uuid_module.UUID
+    site_id: uuid_module.UUID
+    medicament_id: uuid_module.UUID
+    medicament_nom: str
+    medicament_code: str
+    lot_id: Optional[uuid_module.UUID]
+    numero_lot: Optional[str]
+    type_alerte: str
+    quantite: int
+    seuil: Optional[int]
+    date_peremption: Optional[date]
+    updated_at: datetime
+
+
+STOCK_SITE_ROW = RowSerializer(StockSiteDetails)
+STOCK_MOVEMENT_ROW = RowSerializer(StockMovementOut)
+STOCK_ALERT_ROW = RowSerializer(StockAlertOut)
+
+
 # ===========================================================================
 # HELPER FUNCTIONS
 # ===========================================================================
@@ -111,14 +226,21 @@ async def list_stock_site(
                 detail="Vous ne pouvez consulter que les stocks de votre site"
             )
     
-    # Query avec jointures
+    # Query avec jointures: colonnes de StockSiteDetails uniquement
+    # Seuil effectif partagé avec la table des alertes (point de commande compris)
     query = (
-        select(StockSite, Medicament, Site)
+        select(*STOCK_SITE_ROW.columns(
+            StockSite,
+            medicament_nom=Medicament.nom,
+            medicament_code=Medicament.code,
+            medicament_dci=Medicament.dci,
+            site_nom=Site.nom,
+            en_alerte=StockSite.quantite_actuelle <= SEUIL,
+        ))
         .join(Medicament, StockSite.medicament_id == Medicament.id)
         .join(Site, StockSite.site_id == Site.id)
         .where(StockSite.site_id == site_id)
         .where(Medicament.is_active == True)
-        .order_by(Medicament.nom)
     )
     
     # Filtres
@@ -134,50 +256,20 @@ async def list_stock_site(
     
     if en_alerte is not None:
         if en_alerte:
-            query = query.where(
-                StockSite.quantite_actuelle <= func.coalesce(
-                    StockSite.seuil_alerte,
-                    Medicament.seuil_alerte_defaut,
-                    0
-                )
-            )
-    
-    if cursor:
-        query = query.where(StockSite.id > uuid_module.UUID(cursor))
-    
-    query = query.limit(limit + 1)
-    result = await db.execute(query)
-    rows = result.all()
-    
-    has_more = len(rows) > limit
-    if has_more:
-        rows = rows[:limit]
+            query = query.where(StockSite.quantite_actuelle <= SEUIL)
     
-    items = []
-    for stock, medicament, site_obj in rows:
-        seuil = stock.seuil_alerte if stock.seuil_alerte is not None else medicament.seuil_alerte_defaut
-        en_alerte = seuil is not None and stock.quantite_actuelle <= seuil
-        
-        items.append(StockSiteDetails(
-            id=stock.id,
-            medicament_id=stock.medicament_id,
-            site_id=stock.site_id,
-            quantite_actuelle=stock.quantite_actuelle,
-            seuil_alerte=stock.seuil_alerte,
-            created_at=stock.created_at,
-            updated_at=stock.updated_at,
-            medicament_nom=medicament.nom,
-            medicament_code=medicament.code,
-            medicament_dci=medicament.dci,
-            site_nom=site_obj.nom,
-            en_alerte=en_alerte,
-        ))
+    # Ordre alphabétique des médicaments, id du stock pour les homonymes
+    keyset = Keyset(Medicament.nom, StockSite.id, descending=False)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    rows, next_cursor, has_more = keyset.page(
+        result.all(), limit, key=lambda row: (row.medicament_nom, row.id)
+    )
     
-    return {
-        "items": items,
-        "next_cursor": str(rows[-1][0].id) if rows else None,
+    return json_response({
+        "items": [STOCK_SITE_ROW(row) for row in rows],
+        "next_cursor": next_cursor,
         "has_more": has_more,
-    }
+    })
 
 
 # ===========================================================================
@@ -190,71 +282,181 @@ async def create_stock_movement(
     current_user: User = Depends(require_pharmacien_or_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    """Enregistre un mouvement de stock"""
-    site_id = current_user.site_id
-    
-    # Récupérer ou créer le stock
-    stock_stmt = select(StockSite).where(
-        and_(
-            StockSite.site_id == site_id,
-            StockSite.medicament_id == movement_data.medicament_id
+    """
+    Enregistre un mouvement de stock
+
+    Appliqué par le ledger (app/services/stock_ledger.py): mise à jour
+    atomique et conditionnelle du stock + insertion du mouvement, en une
+    instruction. Pas de mise à jour perdue entre deux délivrances simultanées.
+    """
+    try:
+        type_mouvement = TypeMouvementEnum(movement_data.type_mouvement)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Type de mouvement inconnu: {movement_data.type_mouvement}"
         )
-    )
-    stock_result = await db.execute(stock_stmt)
-    stock = stock_result.scalar_one_or_none()
-    
-    if not stock:
-        # Créer le stock automatiquement
-        med_stmt = select(Medicament).where(Medicament.id == movement_data.medicament_id)
-        med = (await db.execute(med_stmt)).scalar_one_or_none()
-
-        stock = StockSite(
-            id=uuid_module.uuid4(),
-            site_id=site_id,
-            tenant_id=current_user.tenant_id,
-            medicament_id=movement_data.medicament_id,
-            quantite_actuelle=0,
-            seuil_alerte=med.seuil_alerte_defaut if med else None,
+    if type_mouvement in TRANSFER_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Les transferts entre sites passent par POST /stock/transferts"
         )
-        db.add(stock)
-        await db.flush()
 
-    stock_actuel = stock.quantite_actuelle
-
-    # Calculer le nouveau stock
-    if movement_data.type_mouvement in ["entree", "ajustement_positif"]:
-        nouveau_stock = stock_actuel + movement_data.quantite
-    else:
-        nouveau_stock = stock_actuel - movement_data.quantite
-        if nouveau_stock < 0 and movement_data.type_mouvement != "ajustement_negatif":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Stock insuffisant. Actuel: {stock_actuel}, demandé: {movement_data.quantite}"
-            )
-
-    # Créer le mouvement
-    movement = StockMovement(
-        id=uuid_module.uuid4(),
-        type_mouvement=TypeMouvementEnum(movement_data.type_mouvement),
-        medicament_id=movement_data.medicament_id,
-        site_id=site_id,
+    entry = await apply_movement(
+        db,
+        site_id=current_user.site_id,
         tenant_id=current_user.tenant_id,
-        created_by=current_user.id,
+        medicament_id=movement_data.medicament_id,
+        type_mouvement=type_mouvement,
         quantite=movement_data.quantite,
+        created_by=current_user.id,
         lot_id=movement_data.lot_id,
         reference_externe=movement_data.reference_externe,
         commentaire=movement_data.commentaire,
-        date_mouvement=datetime.utcnow(),
     )
+    await db.commit()
 
-    stock.quantite_actuelle = nouveau_stock
-    stock.updated_at = datetime.utcnow()
-    
-    db.add(movement)
+    return StockMovementOut.model_validate(entry.movement)
+
+
+# ===========================================================================
+# DÉLIVRANCE D'UNE ORDONNANCE (plusieurs lignes)
+# ===========================================================================
+
+@router.post("/delivrances", response_model=DelivranceOut, status_code=status.HTTP_201_CREATED)
+async def create_delivrance(
+    delivrance_data: DelivranceCreate,
+    current_user: User = Depends(require_pharmacien_or_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Délivre tous les médicaments d'une ordonnance en une transaction
+
+    Les stocks concernés sont verrouillés dans un ordre fixe, décrémentés
+    en une instruction, et la délivrance, ses lignes et les mouvements de
+    sortie sont insérés en INSERT multi-lignes. Une rupture sur une seule
+    ligne refuse toute la délivrance (400).
+    """
+    patient = await db.scalar(
+        select(Patient.id).where(
+            Patient.id == delivrance_data.patient_id,
+            Patient.site_id == current_user.site_id,
+            Patient.deleted_at == None,
+        )
+    )
+    if patient is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient non trouvé ou n'appartient pas à votre organisation"
+        )
+
+    now = datetime.now(timezone.utc)
+    delivrance = DelivrancePatient(
+        id=uuid_module.uuid4(),
+        patient_id=delivrance_data.patient_id,
+        encounter_id=delivrance_data.encounter_id,
+        medication_request_id=delivrance_data.medication_request_id,
+        site_id=current_user.site_id,
+        tenant_id=current_user.tenant_id,
+        delivered_by=current_user.id,
+        date_delivrance=now,
+        commentaire=delivrance_data.commentaire,
+        created_at=now,
+        updated_at=now,
+    )
+    lines = [DispensingLine(**ligne.model_dump()) for ligne in delivrance_data.lignes]
+
+    result = await apply_dispensing(db, delivrance, lines)
     await db.commit()
-    await db.refresh(movement)
-    
-    return StockMovementOut.model_validate(movement)
+
+    return DelivranceOut(
+        **{field: getattr(delivrance, field) for field in DelivranceOut.model_fields if field != "lignes"},
+        lignes=[
+            DelivranceLigneOut(**ligne, stock_restant=result.stock_restant[ligne["medicament_id"]])
+            for ligne in result.lignes
+        ],
+    )
+
+
+# ===========================================================================
+# TRANSFERT ENTRE SITES
+# ===========================================================================
+
+@router.post("/transferts", response_model=TransfertOut, status_code=status.HTTP_201_CREATED)
+async def create_transfert(
+    transfert_data: TransfertCreate,
+    current_user: User = Depends(require_pharmacien_or_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Transfère des médicaments du site de l'utilisateur vers un autre site
+    du même district, en une transaction
+
+    Le site source est débité (lots FEFO ou lot imposé) et le site
+    destination crédité des mêmes lots; une rupture sur une seule ligne
+    refuse tout le transfert (400).
+    """
+    source_site_id = current_user.site_id
+    destination_site_id = transfert_data.site_destination_id
+    if destination_site_id == source_site_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Le site de destination doit être différent du site source"
+        )
+
+    # Site destination: actif, rattaché à l'organisation, même district
+    source = aliased(Site)
+    destination = (await db.execute(
+        select(
+            Site.actif,
+            (Site.district_id == select(source.district_id).where(source.id == source_site_id).scalar_subquery())
+            .label("meme_district"),
+        )
+        .where(
+            Site.id == destination_site_id,
+            select(User.id).where(User.site_id == Site.id, User.tenant_id == current_user.tenant_id).exists(),
+        )
+    )).one_or_none()
+    if destination is None or not destination.actif:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Site de destination non trouvé ou n'appartient pas à votre organisation"
+        )
+    if not destination.meme_district:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Les transferts sont limités aux sites d'un même district"
+        )
+
+    now = datetime.now(timezone.utc)
+    numero = await next_document_numero(db, source_site_id, DocumentTypeEnum.TRANSFERT, now.year)
+    result = await apply_transfer(
+        db,
+        source_site_id=source_site_id,
+        destination_site_id=destination_site_id,
+        tenant_id=current_user.tenant_id,
+        lines=[TransferLine(**ligne.model_dump()) for ligne in transfert_data.lignes],
+        created_by=current_user.id,
+        numero=numero,
+        commentaire=transfert_data.commentaire,
+    )
+    await db.commit()
+
+    return TransfertOut(
+        numero=numero,
+        site_source_id=source_site_id,
+        site_destination_id=destination_site_id,
+        date_transfert=now,
+        commentaire=transfert_data.commentaire,
+        lignes=[
+            TransfertLigneOut(
+                **ligne,
+                stock_source=result.stock_source[ligne["medicament_id"]],
+                stock_destination=result.stock_destination[ligne["medicament_id"]],
+            )
+            for ligne in result.lignes
+        ],
+    )
 
 
 # ===========================================================================
@@ -271,10 +473,7 @@ async def list_stock_movements(
     db: AsyncSession = Depends(get_db),
 ):
     """Liste l'historique des mouvements de stock"""
-    query = (
-        select(StockMovement)
-        .order_by(desc(StockMovement.date_mouvement))
-    )
+    query = select(*STOCK_MOVEMENT_ROW.columns(StockMovement))
     
     # Filtres
     conditions = []
@@ -290,19 +489,145 @@ async def list_stock_movements(
     if conditions:
         query = query.where(and_(*conditions))
     
-    if cursor:
-        query = query.where(StockMovement.id > uuid_module.UUID(cursor))
+    # Plus récents d'abord; le curseur porte (date_mouvement, id)
+    keyset = Keyset(StockMovement.date_mouvement, StockMovement.id)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    movements, next_cursor, has_more = keyset.page(result.all(), limit)
     
-    query = query.limit(limit + 1)
-    result = await db.execute(query)
-    movements = result.scalars().all()
+    return json_response({
+        "items": [STOCK_MOVEMENT_ROW(m) for m in movements],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    })
+
+
+# ===========================================================================
+# ALERTES DE STOCK (table précalculée, voir app/services/stock_alerts.py)
+# ===========================================================================
+
+def _check_site_access(current_user: User, site_id: uuid_module.UUID) -> None:
+    if current_user.role not in [UserRole.ADMIN, UserRole.PHARMACIEN]:
+        if current_user.site_id != site_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Vous ne pouvez consulter que les stocks de votre site"
+            )
+
+
+@router.get("/sites/{site_id}/alertes", response_model=dict)
+async def list_stock_alerts(
+    site_id: uuid_module.UUID,
+    type_alerte: Optional[TypeAlerteStockEnum] = Query(None, description="rupture, stock_bas, peremption_proche, perime"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Liste les alertes en cours d'un site"""
+    _check_site_access(current_user, site_id)
     
-    has_more = len(movements) > limit
-    if has_more:
-        movements = movements[:limit]
+    # Quantité et seuil courants (la ligne d'alerte date du dernier franchissement)
+    query = join_live_quantities(
+        select(*STOCK_ALERT_ROW.columns(
+            StockAlert,
+            medicament_nom=Medicament.nom,
+            medicament_code=Medicament.code,
+            numero_lot=LotMedicament.numero_lot,
+            **live_alert_columns(),
+        ))
+        .select_from(StockAlert)
+        .join(Medicament, StockAlert.medicament_id == Medicament.id)
+    ).where(StockAlert.site_id == site_id)
+    if type_alerte is not None:
+        query = query.where(StockAlert.type_alerte == type_alerte.value)
     
-    return {
-        "items": [StockMovementOut.model_validate(m) for m in movements],
-        "next_cursor": str(movements[-1].id) if movements else None,
+    # Plus récentes d'abord; le curseur porte (updated_at, id)
+    keyset = Keyset(StockAlert.updated_at, StockAlert.id)
+    result = await db.execute(keyset.apply(query, cursor, limit))
+    rows, next_cursor, has_more = keyset.page(result.all(), limit)
+    
+    return json_response({
+        "items": [STOCK_ALERT_ROW(row) for row in rows],
+        "next_cursor": next_cursor,
         "has_more": has_more,
-    }
+    })
+
+
+@router.get("/sites/{site_id}/alertes/compteurs", response_model=dict)
+async def count_stock_alerts(
+    site_id: uuid_module.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Nombre d'alertes par type (badges du tableau de bord)"""
+    _check_site_access(current_user, site_id)
+    
+    result = await db.execute(
+        select(StockAlert.type_alerte, func.count())
+        .where(StockAlert.site_id == site_id)
+        .group_by(StockAlert.type_alerte)
+    )
+    counts = {type_alerte.value: 0 for type_alerte in TypeAlerteStockEnum}
+    counts.update(result.all())
+    
+    return {"site_id": str(site_id), **counts, "total": sum(counts.values())}
+
+
+# ===========================================================================
+# TABLEAU DE BORD DU SITE (voir app/services/stock_dashboard.py)
+# ===========================================================================
+
+# Résumés par site, recalculés après chaque mouvement de stock du site
+dashboards = StockDashboardCache()
+
+
+@router.get("/sites/{site_id}/tableau-de-bord", response_model=dict)
+async def get_stock_dashboard(
+    site_id: uuid_module.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Résumé du stock d'un site pour l'écran d'accueil de la pharmacie
+
+    Références, alertes, valeur du stock, lots à péremption dans 30/60/90
+    jours et consommation du mois précédent, en une requête.
+    """
+    _check_site_access(current_user, site_id)
+    
+    return json_response(await dashboards.get(db, site_id))
+
+
+# ===========================================================================
+# STOCK À UNE DATE (arrêté mensuel + mouvements suivants)
+# ===========================================================================
+
+@router.get("/sites/{site_id}/historique", response_model=dict)
+async def get_stock_at_date(
+    site_id: uuid_module.UUID,
+    date_stock: date = Query(..., alias="date", description="Stock en fin de journée (UTC)"),
+    medicament_id: Optional[uuid_module.UUID] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stock d'un site à une date passée, reconstitué depuis le registre"""
+    _check_site_access(current_user, site_id)
+    
+    at = datetime.combine(date_stock + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    balances = balances_query(at=at, site_id=site_id, medicament_id=medicament_id).subquery("soldes")
+    result = await db.execute(
+        select(
+            balances.c.medicament_id,
+            Medicament.nom.label("medicament_nom"),
+            Medicament.code.label("medicament_code"),
+            balances.c.quantite,
+        )
+        .join(Medicament, balances.c.medicament_id == Medicament.id)
+        .order_by(Medicament.nom)
+    )
+    
+    return json_response({
+        "site_id": site_id,
+        "date": date_stock,
+        "items": [dict(row._mapping) for row in result],
+    })
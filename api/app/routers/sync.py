@@ -0,0 +1,203 @@
+"""
+Router pour la synchronisation offline des appareils
+
+Flux recommandé pour un nouvel appareil:
+1. GET /sync/bootstrap → attendre status="ready"
+2. GET /sync/bootstrap/snapshot → télécharger le snapshot (curseur dans X-Sync-Cursor)
+3. GET /sync/changes?since=<curseur> → synchronisation incrémentale
+
+En ligne, le client écoute GET /sync/events (Server-Sent Events) et ne fait
+un pull que lorsqu'une notification arrive, au lieu de sonder périodiquement.
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import User
+from app.schemas import SyncChangesResponse
+from app.security import get_current_user
+from app.services.change_events import broker
+from app.services.sync_service import (
+    build_site_snapshot,
+    format_cursor,
+    get_changes_since,
+    get_site_watermark,
+    is_snapshot_building,
+    latest_snapshot,
+    parse_change_cursor,
+    record_device_cursor,
+    snapshot_path,
+)
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+# Intervalle des commentaires keep-alive (proxies, nginx proxy_read_timeout)
+SSE_HEARTBEAT_SECONDS = 25
+
+
+# ===========================================================================
+# CHANGEMENTS INCRÉMENTAUX
+# ===========================================================================
+
+@router.get("/changes", response_model=SyncChangesResponse)
+async def get_changes(
+    since: Optional[str] = Query(None, description="Curseur de version (next_cursor, ou timestamp ISO 8601 d'un snapshot)"),
+    limit: int = Query(100, ge=1, le=500),
+    x_device_id: Optional[str] = Header(None, max_length=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Récupère les modifications du site depuis un curseur donné
+
+    Le client conserve `next_cursor` et le renvoie dans `since` au prochain appel.
+    """
+    try:
+        since_position = parse_change_cursor(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur invalide"
+        )
+
+    changes, next_cursor, has_more = await get_changes_since(
+        db, current_user.site_id, since_position, limit
+    )
+
+    if x_device_id:
+        await record_device_cursor(
+            db, x_device_id, current_user.id, current_user.site_id, next_cursor
+        )
+
+    return SyncChangesResponse(
+        changes=changes,
+        next_cursor=next_cursor,
+        has_more=has_more,
+    )
+
+
+# ===========================================================================
+# SNAPSHOT DE BOOTSTRAP
+# ===========================================================================
+
+@router.get("/bootstrap")
+async def get_bootstrap_status(
+    response: Response,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Statut du snapshot de bootstrap du site
+
+    Le snapshot est mis en cache jusqu'au prochain watermark du flux de changements.
+    S'il est périmé ou absent, sa construction est lancée en arrière-plan (202).
+    """
+    site_id = current_user.site_id
+    watermark = await get_site_watermark(db, site_id)
+    cursor = format_cursor(watermark)
+    path = snapshot_path(site_id, watermark)
+
+    if path.exists():
+        return {
+            "status": "ready",
+            "cursor": cursor,
+            "size_bytes": path.stat().st_size,
+        }
+
+    if not is_snapshot_building(site_id):
+        background_tasks.add_task(build_site_snapshot, site_id)
+
+    response.status_code = status.HTTP_202_ACCEPTED
+    response.headers["Retry-After"] = "10"
+    return {
+        "status": "building",
+        "cursor": cursor,
+        "size_bytes": None,
+    }
+
+
+@router.get("/bootstrap/snapshot")
+async def download_bootstrap_snapshot(
+    x_device_id: Optional[str] = Header(None, max_length=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Télécharge le snapshot le plus récent du site (JSON compressé gzip)
+
+    Un snapshot légèrement périmé reste valide: le client rattrape l'écart
+    via /sync/changes à partir du curseur renvoyé dans X-Sync-Cursor.
+    """
+    snapshot = latest_snapshot(current_user.site_id)
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Aucun snapshot disponible. Appelez d'abord /sync/bootstrap"
+        )
+
+    path, cursor = snapshot
+
+    if x_device_id:
+        await record_device_cursor(
+            db, x_device_id, current_user.id, current_user.site_id, cursor, snapshot=True
+        )
+
+    return FileResponse(
+        path,
+        media_type="application/json",
+        headers={
+            "Content-Encoding": "gzip",
+            "X-Sync-Cursor": cursor,
+            "Cache-Control": "private, max-age=0",
+        },
+    )
+
+
+# ===========================================================================
+# NOTIFICATIONS TEMPS RÉEL (SSE)
+# ===========================================================================
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Flux Server-Sent Events des changements du site de l'utilisateur
+
+    Chaque événement `change` contient {entity, id, operation, cursor}.
+    Aucune donnée métier n'est envoyée: le client appelle /sync/changes
+    depuis son dernier curseur lorsqu'il est notifié.
+
+    L'authentification passe par le cookie HttpOnly (EventSource n'envoie
+    pas de header Authorization). Aucune session de base de données n'est
+    conservée pendant la durée du flux.
+    """
+    site_id = current_user.site_id
+
+    async def event_stream():
+        async with broker.subscribe(site_id) as queue:
+            yield "retry: 10000\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: change\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Désactiver le buffering nginx
+        },
+    )
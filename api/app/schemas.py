@@ -43,6 +43,8 @@ class EntityType(str, enum.Enum):
     MEDICATION_REQUEST = "medication_request"
     PROCEDURE = "procedure"
     REFERENCE = "reference"
+    MEDICAMENT = "medicament"
+    STOCK = "stock"
 
 
 class SyncOperationType(str, enum.Enum):
@@ -192,7 +194,8 @@ class PatientBase(BaseSchema):
 
 
 class PatientCreate(PatientBase):
-    pass
+    # Matricule pré-réservé par un appareil hors-ligne (sinon alloué par le serveur)
+    matricule: Optional[str] = Field(None, pattern=r"^\S{4}-\d{4}-\d{4,}$")
 
 
 class PatientUpdate(BaseModel):
@@ -247,8 +250,41 @@ class EncounterBase(BaseSchema):
         return v
 
 
+class EncounterConditionCreate(BaseSchema):
+    """Diagnostic saisi avec la consultation (encounter_id implicite)"""
+    code_icd10: Optional[str] = Field(None, max_length=10)
+    libelle: str = Field(min_length=2, max_length=500)
+    notes: Optional[str] = None
+
+
+class EncounterMedicationRequestCreate(BaseSchema):
+    """Prescription saisie avec la consultation"""
+    medicament: str = Field(min_length=2, max_length=500)
+    posologie: str = Field(min_length=2, max_length=500)
+    duree_jours: Optional[int] = Field(None, gt=0)
+    quantite: Optional[Decimal] = Field(None, gt=0)
+    unite: Optional[str] = Field(None, max_length=50)
+    notes: Optional[str] = None
+
+
+class EncounterProcedureCreate(BaseSchema):
+    """Acte saisi avec la consultation"""
+    type: str = Field(min_length=2, max_length=200)
+    description: Optional[str] = None
+    resultat: Optional[str] = None
+
+
 class EncounterCreate(EncounterBase):
-    pass
+    # Éléments enregistrés dans la même transaction que la consultation
+    conditions: List[EncounterConditionCreate] = Field(default_factory=list, max_length=50)
+    medication_requests: List[EncounterMedicationRequestCreate] = Field(default_factory=list, max_length=50)
+    procedures: List[EncounterProcedureCreate] = Field(default_factory=list, max_length=50)
+
+
+class EncounterImportRow(EncounterBase):
+    """Ligne d'import en masse: consultation seule, colonnes inconnues refusées"""
+    # Diagnostics, ordonnances ou actes imbriqués signalés en erreur plutôt qu'ignorés
+    model_config = ConfigDict(populate_by_name=True, from_attributes=True, use_enum_values=True, extra="forbid")
 
 
 class EncounterUpdate(BaseModel):
@@ -463,6 +499,24 @@ class SyncBatchResponse(BaseModel):
     errors: List[dict]
 
 
+# ===========================================================================
+# BULK IMPORT SCHEMAS
+# ===========================================================================
+
+class ImportRowError(BaseModel):
+    """Erreur de validation d'une ligne du fichier importé"""
+    row: int
+    errors: List[str]
+
+
+class ImportResult(BaseModel):
+    total_rows: int
+    imported: int
+    error_count: int
+    errors: List[ImportRowError]  # Limité aux 1000 premières erreurs
+    quota_exceeded: bool = False
+
+
 # ===========================================================================
 # REPORT SCHEMAS
 # ===========================================================================
@@ -0,0 +1,134 @@
+"""
+Autocomplétion des médicaments et des codes CIM-10
+
+Chaque frappe du clinicien est servie par un index de préfixes en mémoire:
+des tableaux triés de (mot ou libellé normalisé, entrée) interrogés par
+bisect. Tous les mots d'un libellé sont indexés ("amox" trouve
+"Amoxicilline", "clav" trouve "Amoxicilline + Acide clavulanique"); une
+recherche de plusieurs mots garde les entrées dont chaque mot est préfixe
+d'un mot indexé.
+
+L'index des médicaments est reconstruit quand la version du catalogue change
+(voir app/services/medicament_catalogue.py); l'index CIM-10 est construit
+une fois au chargement du module.
+"""
+import bisect
+import heapq
+import re
+import unicodedata
+from typing import Any, Iterable, Optional, Sequence
+
+from app.services.cim10 import CIM10_CODES
+from app.services.medicament_catalogue import CatalogueSnapshot
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(value: str) -> str:
+    """Minuscules sans accents, séparateurs réduits à un espace"""
+    value = value.casefold().replace("œ", "oe").replace("æ", "ae")
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", value).strip()
+
+
+class PrefixIndex:
+    """
+    Index de préfixes sur une liste d'entrées (dicts)
+
+    Trois niveaux de pertinence, puis l'ordre des entrées: code exact, libellé
+    commençant par la requête, puis mot commençant par chaque mot de la
+    requête. Chaque niveau a sa propre table (dictionnaire des codes, tableaux
+    triés des libellés et des mots): une frappe ne classe jamais tous les
+    candidats, seuls les `limit` premiers de chaque niveau sont extraits.
+
+    Args:
+        entries: entrées, dans l'ordre d'affichage à pertinence égale
+        fields: champs indexés; le premier est le code (correspondance exacte favorisée)
+    """
+
+    def __init__(self, entries: Sequence[dict[str, Any]], fields: Sequence[str]):
+        self.entries = list(entries)
+        self._codes: dict[str, list[int]] = {}
+        words, texts = [], []
+        for position, entry in enumerate(self.entries):
+            self._codes.setdefault(normalize(entry.get(fields[0]) or ""), []).append(position)
+            entry_texts = {normalize(entry[f]) for f in fields if entry.get(f)}
+            texts.extend((text, position) for text in entry_texts)
+            words.extend((word, position) for word in {w for text in entry_texts for w in text.split()})
+        self._words, self._word_positions = self._sorted_postings(words)
+        self._texts, self._text_positions = self._sorted_postings(texts)
+
+    @staticmethod
+    def _sorted_postings(pairs: list[tuple[str, int]]) -> tuple[list[str], list[int]]:
+        pairs.sort()
+        return [key for key, _ in pairs], [position for _, position in pairs]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _prefixed(keys: list[str], positions: list[int], prefix: str) -> set[int]:
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + "\uffff", lo=start)
+        return set(positions[start:end])
+
+    def search(self, query: str, limit: int = 10) -> list[dict[str, Any]]:
+        query = normalize(query)
+        words = query.split()
+        if not words:
+            return []
+
+        # Le mot le plus long est le plus sélectif; les autres filtrent
+        words.sort(key=len, reverse=True)
+        candidates = self._prefixed(self._words, self._word_positions, words[0])
+        for word in words[1:]:
+            if not candidates:
+                return []
+            candidates &= self._prefixed(self._words, self._word_positions, word)
+
+        exact = {p for p in self._codes.get(query, ()) if p in candidates}
+        ranked = sorted(exact)
+        # Un libellé qui commence par la requête contient chacun de ses mots
+        prefixed = self._prefixed(self._texts, self._text_positions, query) - exact
+        ranked += heapq.nsmallest(limit - len(ranked), prefixed)
+        if len(ranked) < limit:
+            ranked += heapq.nsmallest(limit - len(ranked), candidates - exact - prefixed)
+        return [self.entries[p] for p in ranked[:limit]]
+
+
+# ===========================================================================
+# INDEX DES MÉDICAMENTS (reconstruit à chaque version du catalogue)
+# ===========================================================================
+
+MEDICAMENT_FIELDS = ("code", "nom", "dci")
+_MEDICAMENT_SUGGESTION_FIELDS = ("id", "code", "nom", "dci", "forme", "dosage")
+
+_medicament_index: Optional[tuple[int, PrefixIndex]] = None
+
+
+def medicament_index(snapshot: CatalogueSnapshot) -> PrefixIndex:
+    """Index des médicaments actifs pour un instantané du catalogue"""
+    global _medicament_index
+    if _medicament_index is None or _medicament_index[0] != snapshot.version:
+        entries = sorted(
+            (
+                {f: item.get(f) for f in _MEDICAMENT_SUGGESTION_FIELDS}
+                for item in snapshot.items
+                if item.get("is_active")
+            ),
+            key=lambda entry: normalize(entry["nom"]),
+        )
+        _medicament_index = (snapshot.version, PrefixIndex(entries, MEDICAMENT_FIELDS))
+    return _medicament_index[1]
+
+
+# ===========================================================================
+# INDEX CIM-10
+# ===========================================================================
+
+def _cim10_entries(codes: Iterable[tuple[str, str]]) -> list[dict[str, str]]:
+    return [{"code": code, "libelle": libelle} for code, libelle in sorted(codes)]
+
+
+CIM10_INDEX = PrefixIndex(_cim10_entries(CIM10_CODES), ("code", "libelle"))
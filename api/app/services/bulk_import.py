@@ -0,0 +1,428 @@
+"""
+Import en masse de patients et de consultations (CSV ou NDJSON)
+
+Utilisé pour l'ouverture d'un nouveau centre de santé: reprise des registres
+papier. Les lignes sont validées par lots, les quotas vérifiés une seule fois
+par lot, et l'écriture passe par COPY (asyncpg copy_records_to_table) au lieu
+d'un INSERT + commit par ligne.
+
+Chaque lot est commité séparément: une ligne invalide n'empêche pas l'import
+des autres, elle est simplement rapportée avec son numéro.
+"""
+import codecs
+import csv
+import itertools
+import json
+import uuid as uuid_module
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Iterator, Optional
+
+import structlog
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies.tenant import get_quota_limit, get_tenant_subscription
+from app.models import Encounter, Patient, User
+from app.models.tenant import Tenant
+from app.schemas import EncounterImportRow, PatientCreate
+from app.services.change_events import build_notification, schedule_publish
+from app.services.matricule_service import allocate_matricules, unallocated_matricules
+from app.services.patient_matching import phonetic_key
+from app.services.sync_service import format_cursor
+
+logger = structlog.get_logger()
+
+BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000  # Au-delà, seules les erreurs sont comptées
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+
+PATIENT_COLUMNS = [
+    "id", "nom", "prenom", "sexe", "annee_naissance", "telephone", "village",
+    "matricule", "phonetic_key", "site_id", "created_by", "version", "created_at", "updated_at",
+]
+
+ENCOUNTER_COLUMNS = [
+    "id", "patient_id", "site_id", "user_id", "date", "motif",
+    "temperature", "pouls", "pression_systolique", "pression_diastolique",
+    "poids", "taille", "notes", "version", "created_at", "updated_at",
+]
+
+
+# ===========================================================================
+# LECTURE DES FICHIERS
+# ===========================================================================
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Détermine le format du fichier (NDJSON si extension/type JSON, sinon CSV)"""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in ctype or "jsonl" in ctype:
+        return FORMAT_NDJSON
+    return FORMAT_CSV
+
+
+def _clean(row: dict[str, Any]) -> dict[str, Any]:
+    """Normalise les en-têtes et convertit les cellules vides en None"""
+    cleaned = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip() or None
+        cleaned[key.strip().lower()] = value
+    return cleaned
+
+
+def iter_rows(stream: BinaryIO, fmt: str) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Parcourt le fichier ligne à ligne sans le charger en mémoire
+
+    Yields:
+        (numéro de ligne, données ou None, erreur de lecture ou None)
+        Pour un CSV, la ligne 1 est l'en-tête: les données commencent à 2.
+    """
+    text = codecs.getreader("utf-8-sig")(stream)
+
+    if fmt == FORMAT_NDJSON:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"JSON invalide: {e.msg}"
+                continue
+            if not isinstance(data, dict):
+                yield line_no, None, "Chaque ligne doit être un objet JSON"
+                continue
+            yield line_no, _clean(data), None
+        return
+
+    header = text.readline()
+    if not header.strip():
+        return
+    # Les exports Excel francophones utilisent souvent ';' comme séparateur
+    delimiter = max((";", ",", "\t"), key=header.count)
+    reader = csv.DictReader(itertools.chain([header], text), delimiter=delimiter)
+    for row in reader:
+        if not any(v for v in row.values() if isinstance(v, str) and v.strip()):
+            continue
+        yield reader.line_num, _clean(row), None
+
+
+def _batches(rows: Iterator, size: int) -> Iterator[list]:
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _format_errors(error: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in e['loc']) or 'ligne'}: {e['msg']}"
+        for e in error.errors()
+    ]
+
+
+def _value(v: Any) -> Any:
+    return getattr(v, "value", v)
+
+
+class ImportReport:
+    """Résultat d'un import: compteurs et erreurs par ligne"""
+
+    def __init__(self):
+        self.total_rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors: list[dict[str, Any]] = []
+        self.quota_exceeded = False
+
+    def add_error(self, row: int, messages: list[str]) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": messages})
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "total_rows": self.total_rows,
+            "imported": self.imported,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "quota_exceeded": self.quota_exceeded,
+        }
+
+
+# ===========================================================================
+# ÉCRITURE
+# ===========================================================================
+
+async def _write_records(db: AsyncSession, model, columns: list[str], records: list[tuple]) -> None:
+    """
+    Écrit un lot via COPY (asyncpg), ou via un INSERT multi-lignes
+    pour les autres drivers
+    """
+    conn = await db.connection()
+    if conn.dialect.driver == "asyncpg":
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            model.__tablename__, records=records, columns=columns
+        )
+    else:
+        await db.execute(insert(model), [dict(zip(columns, r)) for r in records])
+
+
+def _notify(site_id: uuid_module.UUID, entity: str, last_id: uuid_module.UUID, now: datetime) -> None:
+    """Une notification par lot suffit: les clients refont un pull depuis leur curseur"""
+    schedule_publish([
+        (str(site_id), build_notification(entity, last_id, "create", format_cursor(now)))
+    ])
+
+
+# ===========================================================================
+# PATIENTS
+# ===========================================================================
+
+async def _reject_taken_matricules(
+    db: AsyncSession,
+    validated: list[tuple[int, PatientCreate]],
+    report: ImportReport,
+) -> list[tuple[int, PatientCreate]]:
+    """
+    Écarte les lignes dont le matricule fourni n'a pas été réservé ou est
+    déjà attribué (en base ou plus haut dans le fichier), en deux requêtes
+    par lot
+    """
+    provided = {patient.matricule for _, patient in validated if patient.matricule}
+    if not provided:
+        return validated
+
+    unallocated = await unallocated_matricules(db, provided)
+    result = await db.execute(select(Patient.matricule).where(Patient.matricule.in_(provided)))
+    taken = set(result.scalars().all())
+
+    kept = []
+    for line_no, patient in validated:
+        if patient.matricule:
+            if patient.matricule in unallocated:
+                report.add_error(line_no, [f"matricule: {patient.matricule} non réservé"])
+                continue
+            if patient.matricule in taken:
+                report.add_error(line_no, [f"matricule: {patient.matricule} déjà attribué"])
+                continue
+            taken.add(patient.matricule)
+        kept.append((line_no, patient))
+    return kept
+
+
+async def _patient_quota(
+    db: AsyncSession,
+    tenant: Tenant,
+    site_id: uuid_module.UUID,
+) -> tuple[int, Optional[int]]:
+    """
+    Retourne (patients déjà comptés, limite) selon le plan du tenant
+
+    Même règle que la création unitaire: quota total pour le plan gratuit,
+    quota mensuel pour les plans payants.
+    """
+    subscription = await get_tenant_subscription(tenant.id, db)
+
+    stmt = (
+        select(func.count(Patient.id))
+        .where(Patient.site_id == site_id)
+        .where(Patient.deleted_at.is_(None))
+    )
+
+    if not subscription or not subscription.plan or subscription.plan.code == 'free':
+        quota_type = "patients_total"
+    else:
+        quota_type = "patients_monthly"
+        # Intervalle sur created_at, comme create_patient (index idx_patients_site_created)
+        month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        stmt = stmt.where(Patient.created_at >= month_start)
+
+    limit = await get_quota_limit(tenant, quota_type, db)
+    if limit is None:
+        return 0, None
+
+    current = (await db.execute(stmt)).scalar_one()
+    return current, limit
+
+
+async def import_patients(
+    db: AsyncSession,
+    stream: BinaryIO,
+    fmt: str,
+    current_user: User,
+    tenant: Tenant,
+) -> dict[str, Any]:
+    """
+    Importe des patients dans le site de l'utilisateur
+
+    Colonnes: nom, prenom, sexe, annee_naissance, telephone, village,
+    matricule (optionnel: alloué par lot s'il est absent)
+    """
+    report = ImportReport()
+    site_id = current_user.site_id
+    used, limit = await _patient_quota(db, tenant, site_id)
+
+    for batch in _batches(iter_rows(stream, fmt), BATCH_SIZE):
+        # Horodatage commun au lot: le flux /sync/changes départage les ex æquo par id
+        now = datetime.now(timezone.utc)
+        validated = []
+
+        for line_no, data, parse_error in batch:
+            report.total_rows += 1
+            if parse_error:
+                report.add_error(line_no, [parse_error])
+                continue
+            try:
+                validated.append((line_no, PatientCreate.model_validate(data)))
+            except ValidationError as e:
+                report.add_error(line_no, _format_errors(e))
+
+        validated = await _reject_taken_matricules(db, validated, report)
+
+        # Quota vérifié une fois pour tout le lot
+        if limit is not None and used + len(validated) > limit:
+            allowed = max(limit - used, 0)
+            for line_no, _ in validated[allowed:]:
+                report.add_error(line_no, [f"Quota patients atteint ({limit})"])
+            validated = validated[:allowed]
+            report.quota_exceeded = True
+
+        # Matricules manquants: un upsert de compteur par village pour tout le lot
+        missing = [patient for _, patient in validated if not patient.matricule]
+        allocated = iter(await allocate_matricules(db, [p.village for p in missing]))
+
+        records = [
+            (
+                uuid_module.uuid4(),
+                patient.nom,
+                patient.prenom,
+                _value(patient.sexe),
+                patient.annee_naissance,
+                patient.telephone,
+                patient.village,
+                patient.matricule or next(allocated),
+                phonetic_key(patient.nom, patient.prenom),
+                site_id,
+                current_user.id,
+                1,
+                now,
+                now,
+            )
+            for _, patient in validated
+        ]
+
+        if records:
+            await _write_records(db, Patient, PATIENT_COLUMNS, records)
+            await db.commit()
+            used += len(records)
+            report.imported += len(records)
+            _notify(site_id, "patient", records[-1][0], now)
+
+        if report.quota_exceeded:
+            break
+
+    logger.info(
+        "Import patients terminé",
+        site_id=str(site_id),
+        user_id=str(current_user.id),
+        imported=report.imported,
+        errors=report.error_count,
+    )
+    return report.to_dict()
+
+
+# ===========================================================================
+# CONSULTATIONS
+# ===========================================================================
+
+async def import_encounters(
+    db: AsyncSession,
+    stream: BinaryIO,
+    fmt: str,
+    current_user: User,
+) -> dict[str, Any]:
+    """
+    Importe des consultations dans le site de l'utilisateur
+
+    Colonnes: patient_id, date, motif, temperature, pouls, pression_systolique,
+    pression_diastolique, poids, taille, notes; toute autre colonne (dont
+    diagnostics, ordonnances et actes imbriqués) rend la ligne invalide. Les
+    patients doivent appartenir au site (vérifié en une requête par lot).
+    """
+    report = ImportReport()
+    site_id = current_user.site_id
+
+    for batch in _batches(iter_rows(stream, fmt), BATCH_SIZE):
+        now = datetime.now(timezone.utc)
+        validated = []
+
+        for line_no, data, parse_error in batch:
+            report.total_rows += 1
+            if parse_error:
+                report.add_error(line_no, [parse_error])
+                continue
+            try:
+                validated.append((line_no, EncounterImportRow.model_validate(data)))
+            except ValidationError as e:
+                report.add_error(line_no, _format_errors(e))
+
+        if not validated:
+            continue
+
+        patient_ids = {encounter.patient_id for _, encounter in validated}
+        result = await db.execute(
+            select(Patient.id).where(
+                Patient.id.in_(patient_ids),
+                Patient.site_id == site_id,
+                Patient.deleted_at.is_(None),
+            )
+        )
+        known_patients = set(result.scalars().all())
+
+        records = []
+        for line_no, encounter in validated:
+            if encounter.patient_id not in known_patients:
+                report.add_error(line_no, ["patient_id: Patient non trouvé dans votre site"])
+                continue
+            records.append((
+                uuid_module.uuid4(),
+                encounter.patient_id,
+                site_id,
+                current_user.id,
+                encounter.encounter_date,
+                encounter.motif,
+                encounter.temperature,
+                encounter.pouls,
+                encounter.pression_systolique,
+                encounter.pression_diastolique,
+                encounter.poids,
+                encounter.taille,
+                encounter.notes,
+                1,
+                now,
+                now,
+            ))
+
+        if records:
+            await _write_records(db, Encounter, ENCOUNTER_COLUMNS, records)
+            await db.commit()
+            report.imported += len(records)
+            _notify(site_id, "encounter", records[-1][0], now)
+
+    logger.info(
+        "Import consultations terminé",
+        site_id=str(site_id),
+        user_id=str(current_user.id),
+        imported=report.imported,
+        errors=report.error_count,
+    )
+    return report.to_dict()
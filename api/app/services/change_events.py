@@ -0,0 +1,306 @@
+"""
+Notifications de changements en temps réel (Server-Sent Events)
+
+Les écritures commitées via SQLAlchemy sont converties en notifications légères
+("entité X modifiée au curseur N") publiées sur Redis pub/sub. Chaque worker
+maintient UNE seule connexion Redis et redistribue les messages aux flux SSE
+locaux via des files asyncio: des milliers de connexions inactives ne coûtent
+ni requête SQL ni connexion Redis supplémentaire.
+
+Sans Redis (développement, tests), les notifications sont distribuées
+localement aux abonnés du worker courant.
+"""
+import asyncio
+import json
+import uuid as uuid_module
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+logger = structlog.get_logger()
+
+CHANNEL_PREFIX = "sync:"
+GLOBAL_SCOPE = "global"  # Catalogues partagés (médicaments, fournisseurs)
+QUEUE_SIZE = 100
+
+
+def _channel(scope: str) -> str:
+    return f"{CHANNEL_PREFIX}{scope}"
+
+
+class ChangeEventBroker:
+    """
+    Distribue les notifications de changement aux flux SSE d'un worker
+
+    Les abonnés d'un site reçoivent les notifications du site et celles
+    des catalogues globaux.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._redis = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._connected = False
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    # -----------------------------------------------------------------------
+    # Abonnements
+    # -----------------------------------------------------------------------
+
+    @asynccontextmanager
+    async def subscribe(self, site_id: uuid_module.UUID) -> AsyncIterator[asyncio.Queue]:
+        """Abonne un flux aux notifications d'un site"""
+        self._ensure_listener()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        scope = str(site_id)
+        self._subscribers[scope].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[scope].discard(queue)
+            if not self._subscribers[scope]:
+                del self._subscribers[scope]
+
+    def _dispatch(self, scope: str, payload: str) -> None:
+        """Distribue une notification aux abonnés locaux concernés"""
+        if scope == GLOBAL_SCOPE:
+            targets = [q for queues in self._subscribers.values() for q in queues]
+        else:
+            targets = list(self._subscribers.get(scope, ()))
+
+        for queue in targets:
+            if queue.full():
+                # Client lent: l'ancienne notification est obsolète, le client
+                # refera de toute façon un pull depuis son dernier curseur
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(payload)
+
+    # -----------------------------------------------------------------------
+    # Publication
+    # -----------------------------------------------------------------------
+
+    async def publish(self, scope: str, notification: dict[str, Any]) -> None:
+        """
+        Publie une notification pour un site (ou GLOBAL_SCOPE)
+
+        Via Redis si disponible (tous les workers la reçoivent, y compris
+        celui-ci), sinon distribution locale uniquement.
+        """
+        payload = json.dumps(notification, separators=(",", ":"))
+
+        if self._redis is not None and self._connected:
+            try:
+                await self._redis.publish(_channel(scope), payload)
+                return
+            except Exception as e:
+                logger.warning("Publication Redis impossible, distribution locale", error=str(e))
+
+        self._dispatch(scope, payload)
+
+    async def publish_many(self, notifications: list[tuple[str, dict[str, Any]]]) -> None:
+        for scope, notification in notifications:
+            await self.publish(scope, notification)
+
+    # -----------------------------------------------------------------------
+    # Écoute Redis
+    # -----------------------------------------------------------------------
+
+    def _ensure_listener(self) -> None:
+        if not self.redis_url or self._listener_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._listener_task = loop.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Boucle d'écoute Redis (une connexion par worker), avec reconnexion"""
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+                pubsub = self._redis.pubsub()
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                self._connected = True
+                logger.info("Écoute des notifications de changement démarrée")
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "pmessage":
+                        continue
+                    scope = message["channel"][len(CHANNEL_PREFIX):]
+                    self._dispatch(scope, message["data"])
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Connexion Redis pub/sub perdue", error=str(e))
+            finally:
+                self._connected = False
+
+            await asyncio.sleep(5)
+
+
+broker = ChangeEventBroker(settings.REDIS_URL)
+
+
+# ===========================================================================
+# CAPTURE DES CHANGEMENTS SQLALCHEMY
+# ===========================================================================
+
+def _entity_name(obj: Any) -> Optional[str]:
+    from app.models import (
+        Condition, Encounter, MedicationRequest, Patient, Procedure, Reference,
+    )
+    from app.models.inventory import (
+        BonCommande, DelivrancePatient, Fournisseur, LotMedicament, Medicament,
+        StockMovement, StockSite,
+    )
+
+    names = {
+        Patient: "patient",
+        Encounter: "encounter",
+        Condition: "condition",
+        MedicationRequest: "medication_request",
+        Procedure: "procedure",
+        Reference: "reference",
+        Medicament: "medicament",
+        Fournisseur: "fournisseur",
+        StockSite: "stock",
+        LotMedicament: "lot",
+        StockMovement: "stock_movement",
+        BonCommande: "bon_commande",
+        DelivrancePatient: "delivrance",
+    }
+    return names.get(type(obj))
+
+
+def _scope_for(session: Session, obj: Any) -> Optional[str]:
+    """Détermine le site concerné par une entité (None si inconnu)"""
+    from app.models import Encounter, Medicament
+    from app.models.inventory import Fournisseur
+
+    if isinstance(obj, (Medicament, Fournisseur)):
+        return GLOBAL_SCOPE
+
+    site_id = getattr(obj, "site_id", None)
+    if site_id is not None:
+        return str(site_id)
+
+    # Enfants d'une consultation: le site est celui de la consultation,
+    # généralement déjà présente dans l'identity map (chargée pour validation)
+    encounter_id = getattr(obj, "encounter_id", None)
+    if encounter_id is not None:
+        encounter = session.identity_map.get(session.identity_key(Encounter, encounter_id))
+        if encounter is not None:
+            return str(encounter.site_id)
+
+    return None
+
+
+def build_notification(entity: str, entity_id: Any, operation: str, cursor: str) -> dict[str, Any]:
+    """Construit une notification de changement (format commun SSE)"""
+    return {
+        "entity": entity,
+        "id": str(entity_id),
+        "operation": operation,
+        "cursor": cursor,
+    }
+
+
+def _collect(session: Session, flush_context) -> None:
+    from app.services.sync_service import format_cursor
+
+    pending: dict = session.info.setdefault("change_events", {})
+
+    candidates = (
+        [(obj, "create") for obj in session.new]
+        + [(obj, "update") for obj in session.dirty if session.is_modified(obj)]
+        + [(obj, "delete") for obj in session.deleted]
+    )
+
+    for obj, operation in candidates:
+        entity = _entity_name(obj)
+        if entity is None:
+            continue
+        scope = _scope_for(session, obj)
+        if scope is None:
+            continue
+        if getattr(obj, "deleted_at", None) is not None:
+            operation = "delete"
+        ts = getattr(obj, "updated_at", None) or getattr(obj, "created_at", None)
+        pending[(entity, obj.id)] = (
+            scope,
+            build_notification(entity, obj.id, operation, format_cursor(ts)),
+        )
+
+
+def record_change(session: Session, scope: str, entity: str, entity_id: Any, operation: str, ts) -> None:
+    """
+    Notifie un changement écrit hors unité de travail (UPDATE/INSERT Core)
+
+    La notification est publiée après le commit, comme celles de _collect.
+    """
+    from app.services.sync_service import format_cursor
+
+    pending: dict = session.info.setdefault("change_events", {})
+    pending[(entity, entity_id)] = (
+        scope,
+        build_notification(entity, entity_id, operation, format_cursor(ts)),
+    )
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+def schedule_publish(notifications: list[tuple[str, dict[str, Any]]]) -> None:
+    """Publie des notifications en tâche de fond (sans bloquer la requête)"""
+    if not notifications:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Contexte synchrone (Celery, scripts): pas de flux SSE à notifier
+    task = loop.create_task(broker.publish_many(notifications))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _publish(session: Session) -> None:
+    pending = session.info.pop("change_events", None)
+    if pending:
+        schedule_publish(list(pending.values()))
+
+
+def _discard(session: Session, *args) -> None:
+    session.info.pop("change_events", None)
+
+
+def configure_change_notifications() -> None:
+    """
+    Configure les event listeners SQLAlchemy qui publient les notifications
+    après chaque commit réussi
+
+    Usage dans main.py:
+        from app.services.change_events import configure_change_notifications
+        configure_change_notifications()
+    """
+    if event.contains(Session, "after_flush", _collect):
+        return
+    event.listen(Session, "after_flush", _collect)
+    event.listen(Session, "after_commit", _publish)
+    event.listen(Session, "after_rollback", _discard)
@@ -0,0 +1,230 @@
+"""
+Table CIM-10 (codes les plus utilisés en soins de santé primaires)
+
+Sous-ensemble de la Classification internationale des maladies (10e révision,
+libellés OMS en français) couvrant les motifs courants des CSCOM: paludisme,
+infections respiratoires et digestives, santé maternelle et infantile,
+malnutrition, maladies chroniques et traumatismes. Sert à l'autocomplétion
+des diagnostics (voir app/services/autocomplete.py); un code absent de la
+table peut toujours être saisi librement dans Condition.code_icd10.
+"""
+
+CIM10_CODES: tuple[tuple[str, str], ...] = (
+    # Maladies infectieuses et parasitaires (A00-B99)
+    ("A00", "Choléra"),
+    ("A01.0", "Fièvre typhoïde"),
+    ("A03", "Shigellose"),
+    ("A06.0", "Dysenterie amibienne aiguë"),
+    ("A07.1", "Giardiase"),
+    ("A09", "Diarrhée et gastro-entérite d'origine présumée infectieuse"),
+    ("A15", "Tuberculose de l'appareil respiratoire, confirmée"),
+    ("A16", "Tuberculose de l'appareil respiratoire, non confirmée"),
+    ("A18", "Tuberculose d'autres organes"),
+    ("A33", "Tétanos néonatal"),
+    ("A35", "Autres formes de tétanos"),
+    ("A37", "Coqueluche"),
+    ("A39.0", "Méningite à méningocoques"),
+    ("A41.9", "Septicémie, sans précision"),
+    ("A46", "Érysipèle"),
+    ("A53.9", "Syphilis, sans précision"),
+    ("A54", "Infection gonococcique"),
+    ("A56", "Autres infections à Chlamydia transmises par voie sexuelle"),
+    ("A59", "Trichomonase"),
+    ("A64", "Infection sexuellement transmissible, sans précision"),
+    ("A82", "Rage"),
+    ("A90", "Dengue"),
+    ("A95", "Fièvre jaune"),
+    ("B01", "Varicelle"),
+    ("B05", "Rougeole"),
+    ("B15", "Hépatite aiguë A"),
+    ("B16", "Hépatite aiguë B"),
+    ("B18.1", "Hépatite virale chronique B"),
+    ("B20", "Maladie due au VIH"),
+    ("B26", "Oreillons"),
+    ("B35", "Dermatophytose"),
+    ("B37", "Candidose"),
+    ("B50", "Paludisme à Plasmodium falciparum"),
+    ("B50.0", "Paludisme à Plasmodium falciparum avec complications cérébrales"),
+    ("B50.8", "Autres formes graves de paludisme à Plasmodium falciparum"),
+    ("B50.9", "Paludisme à Plasmodium falciparum, sans précision"),
+    ("B51", "Paludisme à Plasmodium vivax"),
+    ("B52", "Paludisme à Plasmodium malariae"),
+    ("B53", "Autres formes de paludisme confirmées par examen parasitologique"),
+    ("B54", "Paludisme, sans précision"),
+    ("B55", "Leishmaniose"),
+    ("B65", "Schistosomiase (bilharziose)"),
+    ("B65.0", "Schistosomiase urinaire à Schistosoma haematobium"),
+    ("B65.1", "Schistosomiase intestinale à Schistosoma mansoni"),
+    ("B68", "Téniase"),
+    ("B73", "Onchocercose"),
+    ("B74", "Filariose"),
+    ("B76", "Ankylostomiase"),
+    ("B77", "Ascaridiase"),
+    ("B80", "Oxyurose"),
+    ("B82.9", "Parasitose intestinale, sans précision"),
+    ("B86", "Gale"),
+    # Tumeurs et sang (C00-D89)
+    ("C50", "Tumeur maligne du sein"),
+    ("C53", "Tumeur maligne du col de l'utérus"),
+    ("D50", "Anémie par carence en fer"),
+    ("D52", "Anémie par carence en acide folique"),
+    ("D57", "Affections à hématies falciformes (drépanocytose)"),
+    ("D64.9", "Anémie, sans précision"),
+    # Endocrinologie et nutrition (E00-E90)
+    ("E03.9", "Hypothyroïdie, sans précision"),
+    ("E04", "Goitre simple"),
+    ("E05", "Thyréotoxicose (hyperthyroïdie)"),
+    ("E10", "Diabète sucré de type 1"),
+    ("E11", "Diabète sucré de type 2"),
+    ("E14", "Diabète sucré, sans précision"),
+    ("E40", "Kwashiorkor"),
+    ("E41", "Marasme nutritionnel"),
+    ("E43", "Malnutrition protéino-énergétique grave, sans précision"),
+    ("E44", "Malnutrition protéino-énergétique modérée ou légère"),
+    ("E46", "Malnutrition protéino-énergétique, sans précision"),
+    ("E50", "Avitaminose A"),
+    ("E86", "Déshydratation"),
+    # Troubles mentaux et système nerveux (F00-G99)
+    ("F10", "Troubles mentaux liés à l'utilisation d'alcool"),
+    ("F20", "Schizophrénie"),
+    ("F32", "Épisode dépressif"),
+    ("F41", "Autres troubles anxieux"),
+    ("G03.9", "Méningite, sans précision"),
+    ("G40", "Épilepsie"),
+    ("G43", "Migraine"),
+    ("G44", "Autres syndromes d'algies céphaliques"),
+    # Œil et oreille (H00-H95)
+    ("H10", "Conjonctivite"),
+    ("H26", "Autres cataractes"),
+    ("H40", "Glaucome"),
+    ("H60", "Otite externe"),
+    ("H65", "Otite moyenne non suppurée"),
+    ("H66", "Otite moyenne suppurée"),
+    # Appareil circulatoire (I00-I99)
+    ("I10", "Hypertension essentielle (primitive)"),
+    ("I11", "Cardiopathie hypertensive"),
+    ("I50", "Insuffisance cardiaque"),
+    ("I64", "Accident vasculaire cérébral, non précisé"),
+    ("I83", "Varices des membres inférieurs"),
+    ("I84", "Hémorroïdes"),
+    # Appareil respiratoire (J00-J99)
+    ("J00", "Rhinopharyngite aiguë (rhume banal)"),
+    ("J01", "Sinusite aiguë"),
+    ("J02", "Pharyngite aiguë"),
+    ("J03", "Amygdalite aiguë"),
+    ("J05", "Laryngite obstructive aiguë et épiglottite"),
+    ("J06.9", "Infection aiguë des voies respiratoires supérieures, sans précision"),
+    ("J11", "Grippe, virus non identifié"),
+    ("J15", "Pneumopathie bactérienne"),
+    ("J18", "Pneumopathie, micro-organisme non précisé"),
+    ("J20", "Bronchite aiguë"),
+    ("J21", "Bronchiolite aiguë"),
+    ("J22", "Infection aiguë des voies respiratoires inférieures, sans précision"),
+    ("J30", "Rhinite allergique et vasomotrice"),
+    ("J42", "Bronchite chronique, sans précision"),
+    ("J44", "Bronchopneumopathie chronique obstructive"),
+    ("J45", "Asthme"),
+    # Appareil digestif (K00-K93)
+    ("K02", "Carie dentaire"),
+    ("K04", "Maladies de la pulpe et des tissus périapicaux"),
+    ("K05", "Gingivite et maladies périodontales"),
+    ("K12", "Stomatite et lésions apparentées"),
+    ("K21", "Reflux gastro-œsophagien"),
+    ("K25", "Ulcère de l'estomac"),
+    ("K26", "Ulcère du duodénum"),
+    ("K29", "Gastrite et duodénite"),
+    ("K30", "Dyspepsie"),
+    ("K35", "Appendicite aiguë"),
+    ("K40", "Hernie inguinale"),
+    ("K56", "Iléus paralytique et occlusion intestinale"),
+    ("K59.0", "Constipation"),
+    ("K74", "Fibrose et cirrhose du foie"),
+    ("K80", "Lithiase biliaire"),
+    # Peau (L00-L99)
+    ("L01", "Impétigo"),
+    ("L02", "Abcès cutané, furoncle et anthrax"),
+    ("L03", "Cellulite (phlegmon)"),
+    ("L08.9", "Infection localisée de la peau, sans précision"),
+    ("L20", "Dermite atopique"),
+    ("L23", "Dermite allergique de contact"),
+    ("L30.9", "Dermite, sans précision"),
+    ("L50", "Urticaire"),
+    ("L89", "Ulcère de décubitus"),
+    # Système ostéo-articulaire (M00-M99)
+    ("M10", "Goutte"),
+    ("M13", "Autres arthrites"),
+    ("M19", "Autres arthroses"),
+    ("M54.5", "Lombalgie basse"),
+    ("M79.1", "Myalgie"),
+    ("M86", "Ostéomyélite"),
+    # Appareil génito-urinaire (N00-N99)
+    ("N10", "Néphrite tubulo-interstitielle aiguë (pyélonéphrite)"),
+    ("N18", "Maladie rénale chronique"),
+    ("N20", "Calcul du rein et de l'uretère"),
+    ("N30", "Cystite"),
+    ("N39.0", "Infection des voies urinaires, siège non précisé"),
+    ("N40", "Hyperplasie de la prostate"),
+    ("N70", "Salpingite et ovarite"),
+    ("N73", "Autres affections inflammatoires pelviennes de la femme"),
+    ("N76", "Autres affections inflammatoires du vagin et de la vulve"),
+    ("N91", "Aménorrhée, oligoménorrhée et hypoménorrhée"),
+    ("N94.6", "Dysménorrhée, sans précision"),
+    ("N97", "Stérilité de la femme"),
+    # Grossesse et accouchement (O00-O99)
+    ("O00", "Grossesse extra-utérine"),
+    ("O03", "Avortement spontané"),
+    ("O13", "Hypertension gestationnelle"),
+    ("O14", "Prééclampsie"),
+    ("O15", "Éclampsie"),
+    ("O20", "Hémorragie du début de la grossesse"),
+    ("O21", "Vomissements excessifs au cours de la grossesse"),
+    ("O23", "Infections de l'appareil génito-urinaire au cours de la grossesse"),
+    ("O24", "Diabète sucré au cours de la grossesse"),
+    ("O42", "Rupture prématurée des membranes"),
+    ("O46", "Hémorragie précédant l'accouchement"),
+    ("O60", "Travail prématuré"),
+    ("O63", "Travail prolongé"),
+    ("O72", "Hémorragie du post-partum"),
+    ("O80", "Accouchement unique et spontané"),
+    ("O85", "Infection puerpérale"),
+    ("O99.0", "Anémie compliquant la grossesse, l'accouchement et la puerpéralité"),
+    # Période périnatale et malformations (P00-Q99)
+    ("P05", "Retard de croissance et malnutrition du fœtus"),
+    ("P07", "Prématurité et faible poids de naissance"),
+    ("P21", "Asphyxie obstétricale"),
+    ("P36", "Sepsis bactérien du nouveau-né"),
+    ("P59", "Ictère néonatal"),
+    ("Q65", "Malformations congénitales de la hanche"),
+    # Symptômes et signes (R00-R99)
+    ("R05", "Toux"),
+    ("R06.0", "Dyspnée"),
+    ("R10", "Douleur abdominale et pelvienne"),
+    ("R11", "Nausées et vomissements"),
+    ("R17", "Ictère, sans précision"),
+    ("R50.9", "Fièvre, sans précision"),
+    ("R51", "Céphalée"),
+    ("R52", "Douleur, non classée ailleurs"),
+    ("R56", "Convulsions, non classées ailleurs"),
+    ("R62", "Retard du développement physiologique"),
+    ("R63.4", "Perte de poids anormale"),
+    # Traumatismes et intoxications (S00-T98)
+    ("S01", "Plaie ouverte de la tête"),
+    ("S06", "Lésion traumatique intracrânienne"),
+    ("S42", "Fracture de l'épaule et du bras"),
+    ("S52", "Fracture de l'avant-bras"),
+    ("S61", "Plaie ouverte du poignet et de la main"),
+    ("S72", "Fracture du fémur"),
+    ("S82", "Fracture de la jambe, y compris la cheville"),
+    ("S93", "Luxation et entorse de la cheville et du pied"),
+    ("T14.1", "Plaie ouverte d'une partie du corps non précisée"),
+    ("T30", "Brûlure, partie du corps non précisée"),
+    ("T63.0", "Effet toxique du venin de serpent"),
+    ("T63.2", "Effet toxique du venin de scorpion"),
+    ("T78.4", "Allergie, sans précision"),
+    # Recours aux services de santé (Z00-Z99)
+    ("Z00.1", "Examen de routine de l'enfant"),
+    ("Z23", "Nécessité d'une vaccination"),
+    ("Z30", "Contraception"),
+    ("Z34", "Surveillance d'une grossesse normale"),
+    ("Z39", "Examen et soins du post-partum"),
+)
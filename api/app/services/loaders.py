@@ -0,0 +1,140 @@
+"""
+Chargeurs groupés (batch loaders)
+
+Un chargeur récupère, pour un ensemble de parents, leurs enfants ou un
+agrégat en UNE requête (WHERE parent_id IN (...) / GROUP BY parent_id),
+au lieu d'une requête par parent. Les endpoints de détail et de liste
+partagent ainsi les mêmes requêtes, et leur nombre ne dépend pas du nombre
+d'éléments affichés.
+
+Usage:
+    lignes = await BON_COMMANDE_LIGNES.load(db, bon_ids)       # {bon_id: [ligne, ...]}
+    nb = await NB_LIGNES_BON_COMMANDE.load(db, bon_ids)        # {bon_id: 3}
+    select(Fournisseur, NB_BONS_FOURNISSEUR.column(Fournisseur.id))  # agrégat corrélé
+"""
+from collections import defaultdict
+from typing import Any, Iterable, Optional, Sequence
+import uuid as uuid_module
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import BonCommande, BonCommandeLigne, Fournisseur, Medicament
+
+
+class ChildrenLoader:
+    """
+    Enfants de plusieurs parents en une requête
+
+    Args:
+        query: requête des enfants (colonnes et jointures), sans filtre parent
+        parent: colonne portant l'id du parent
+    """
+
+    def __init__(self, query: Select, parent):
+        self.query = query
+        self.parent = parent
+
+    async def load(self, db: AsyncSession, parent_ids: Iterable[uuid_module.UUID]) -> dict[uuid_module.UUID, list[Any]]:
+        ids = sorted(set(parent_ids))
+        children: dict[uuid_module.UUID, list[Any]] = defaultdict(list)
+        if not ids:
+            return children
+        result = await db.execute(
+            self.query.add_columns(self.parent.label("parent_id")).where(self.parent.in_(ids))
+        )
+        for row in result:
+            children[row.parent_id].append(row)
+        return children
+
+
+class AggregateLoader:
+    """
+    Agrégat par parent (GROUP BY), ou colonne corrélée pour une seule requête
+
+    Args:
+        parent: colonne portant l'id du parent
+        aggregate: expression d'agrégat (ex: func.count(...))
+        default: valeur des parents sans enfant
+    """
+
+    def __init__(self, parent, aggregate, default: Any = 0):
+        self.parent = parent
+        self.aggregate = aggregate
+        self.default = default
+
+    async def load(self, db: AsyncSession, parent_ids: Iterable[uuid_module.UUID]) -> dict[uuid_module.UUID, Any]:
+        ids = sorted(set(parent_ids))
+        values = dict.fromkeys(ids, self.default)
+        if ids:
+            result = await db.execute(
+                select(self.parent, self.aggregate).where(self.parent.in_(ids)).group_by(self.parent)
+            )
+            values.update(result.tuples().all())
+        return values
+
+    def column(self, parent_id, label: Optional[str] = None):
+        """Sous-requête corrélée à ajouter à la requête du parent"""
+        subquery = select(self.aggregate).where(self.parent == parent_id).scalar_subquery()
+        if self.default is not None:
+            subquery = func.coalesce(subquery, self.default)
+        return subquery.label(label) if label else subquery
+
+
+# ===========================================================================
+# BONS DE COMMANDE ET FOURNISSEURS
+# ===========================================================================
+
+BON_COMMANDE_LIGNES = ChildrenLoader(
+    select(
+        BonCommandeLigne.id,
+        BonCommandeLigne.bon_commande_id,
+        BonCommandeLigne.medicament_id,
+        Medicament.nom.label("medicament_nom"),
+        BonCommandeLigne.quantite_commandee,
+        BonCommandeLigne.quantite_recue,
+        BonCommandeLigne.prix_unitaire,
+        BonCommandeLigne.created_at,
+    )
+    .join(Medicament, BonCommandeLigne.medicament_id == Medicament.id)
+    .order_by(Medicament.nom, BonCommandeLigne.id),
+    BonCommandeLigne.bon_commande_id,
+)
+
+NB_LIGNES_BON_COMMANDE = AggregateLoader(BonCommandeLigne.bon_commande_id, func.count(BonCommandeLigne.id))
+
+NB_BONS_FOURNISSEUR = AggregateLoader(BonCommande.fournisseur_id, func.count(BonCommande.id))
+
+
+async def load_bons_commande(
+    db: AsyncSession,
+    bon_ids: Sequence[uuid_module.UUID],
+) -> dict[uuid_module.UUID, tuple[Any, list[Any]]]:
+    """
+    Bons de commande (avec nom du fournisseur) et leurs lignes, en deux requêtes
+
+    Returns:
+        {bon_id: (ligne du bon, [lignes de commande])}; bons absents omis
+    """
+    result = await db.execute(
+        select(
+            BonCommande.id,
+            BonCommande.numero,
+            BonCommande.fournisseur_id,
+            Fournisseur.nom.label("fournisseur_nom"),
+            BonCommande.site_id,
+            BonCommande.statut,
+            BonCommande.date_commande,
+            BonCommande.date_livraison_prevue,
+            BonCommande.date_livraison_effective,
+            BonCommande.montant_total,
+            BonCommande.commentaire,
+            BonCommande.created_at,
+            BonCommande.updated_at,
+        )
+        .join(Fournisseur, BonCommande.fournisseur_id == Fournisseur.id)
+        .where(BonCommande.id.in_(sorted(set(bon_ids))))
+    )
+    bons = {row.id: row for row in result}
+    lignes = await BON_COMMANDE_LIGNES.load(db, bons)
+    return {bon_id: (bon, lignes.get(bon_id, [])) for bon_id, bon in bons.items()}
@@ -0,0 +1,140 @@
+"""
+Allocation des lots par péremption (FEFO: premier périmé, premier sorti)
+
+Les lots d'un site ayant encore du stock sont lus et verrouillés en UNE
+requête (index partiel idx_lots_fefo), triés par médicament puis par date
+de péremption: l'ordre de verrouillage est le même pour toutes les
+transactions. Une quantité demandée est ensuite répartie sur les lots non
+périmés, du plus proche de la péremption au plus lointain.
+
+Le stock d'un site peut contenir une part hors lot (entrées saisies sans
+numéro de lot): quantite_actuelle - somme des lots. Elle n'est utilisée
+qu'après les lots. Les lots périmés ne sont jamais délivrés.
+"""
+import uuid as uuid_module
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional, Sequence
+
+from sqlalchemy import Integer, cast, column, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import LotMedicament
+
+
+@dataclass
+class LotStock:
+    """Lot verrouillé et quantité encore allouable"""
+    id: uuid_module.UUID
+    medicament_id: uuid_module.UUID
+    numero_lot: str
+    date_peremption: date
+    quantite_restante: int
+
+
+@dataclass
+class LotAllocation:
+    """Part d'une demande prise sur un lot (lot_id None: stock hors lot)"""
+    lot_id: Optional[uuid_module.UUID]
+    quantite: int
+
+
+async def lock_lots(
+    db: AsyncSession,
+    site_id: uuid_module.UUID,
+    medicament_ids: Sequence[uuid_module.UUID],
+) -> dict[uuid_module.UUID, list[LotStock]]:
+    """Lots avec stock des médicaments demandés, verrouillés, par ordre FEFO"""
+    result = await db.execute(
+        select(
+            LotMedicament.id,
+            LotMedicament.medicament_id,
+            LotMedicament.numero_lot,
+            LotMedicament.date_peremption,
+            LotMedicament.quantite_restante,
+        )
+        .where(
+            LotMedicament.site_id == site_id,
+            LotMedicament.medicament_id.in_(sorted(set(medicament_ids))),
+            LotMedicament.quantite_restante > 0,
+        )
+        .order_by(LotMedicament.medicament_id, LotMedicament.date_peremption, LotMedicament.id)
+        .with_for_update()
+    )
+    lots: dict[uuid_module.UUID, list[LotStock]] = {}
+    for row in result:
+        lots.setdefault(row.medicament_id, []).append(LotStock(**row._mapping))
+    return lots
+
+
+class FefoAllocator:
+    """
+    Répartit les demandes d'un médicament sur ses lots (état partagé entre
+    les lignes d'une même délivrance)
+
+    Usage:
+        allocator = FefoAllocator(lots, quantite_actuelle, today)
+        allocations, manquant = allocator.allocate(5)
+    """
+
+    def __init__(self, lots: Sequence[LotStock], quantite_actuelle: int, today: date):
+        self.lots = [lot for lot in lots if lot.date_peremption >= today]
+        self.perimes = sum(lot.quantite_restante for lot in lots if lot.date_peremption < today)
+        self.hors_lot = max(0, quantite_actuelle - sum(lot.quantite_restante for lot in lots))
+        self._by_id = {lot.id: lot for lot in self.lots}
+
+    @property
+    def disponible(self) -> int:
+        return sum(lot.quantite_restante for lot in self.lots) + self.hors_lot
+
+    def allocate(self, quantite: int, lot_id: Optional[uuid_module.UUID] = None) -> tuple[list[LotAllocation], int]:
+        """
+        Alloue une quantité (sur un lot imposé, sinon FEFO)
+
+        Returns:
+            (allocations, quantité non allouée)
+        """
+        if lot_id is not None:
+            candidates = [self._by_id[lot_id]] if lot_id in self._by_id else []
+        else:
+            candidates = self.lots
+
+        allocations = []
+        reste = quantite
+        for lot in candidates:
+            if reste == 0:
+                break
+            prise = min(reste, lot.quantite_restante)
+            if prise:
+                lot.quantite_restante -= prise
+                allocations.append(LotAllocation(lot.id, prise))
+                reste -= prise
+
+        if reste and lot_id is None and self.hors_lot:
+            prise = min(reste, self.hors_lot)
+            self.hors_lot -= prise
+            allocations.append(LotAllocation(None, prise))
+            reste -= prise
+
+        return allocations, reste
+
+
+async def consume_lots(db: AsyncSession, allocations: Sequence[LotAllocation]) -> None:
+    """Décrémente les lots alloués (lignes déjà verrouillées) en une instruction"""
+    totals: dict[uuid_module.UUID, int] = {}
+    for allocation in allocations:
+        if allocation.lot_id is not None:
+            totals[allocation.lot_id] = totals.get(allocation.lot_id, 0) + allocation.quantite
+    if not totals:
+        return
+
+    consumed = values(
+        column("lot_id", UUID(as_uuid=True)), column("quantite", Integer), name="consommation"
+    ).data(sorted(totals.items()))
+    await db.execute(
+        update(LotMedicament)
+        .where(LotMedicament.id == consumed.c.lot_id)
+        .values(quantite_restante=LotMedicament.quantite_restante - cast(consumed.c.quantite, Integer))
+        .execution_options(synchronize_session=False)
+    )
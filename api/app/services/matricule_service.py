@@ -0,0 +1,131 @@
+"""
+Allocation des matricules patients (format SIBY-2025-0001)
+
+Les numéros sont tirés d'un compteur par (code village, année) via le même
+INSERT … ON CONFLICT DO UPDATE … RETURNING que les numéros de documents
+(app/services/sequence_service.py): un seul aller-retour, pas de
+scan de la table patients, et deux inscriptions simultanées ne peuvent pas
+obtenir le même numéro.
+
+Les appareils hors-ligne réservent des blocs de numéros à l'avance et les
+attribuent localement aux patients créés sans réseau. Un matricule fourni
+par un client n'est accepté que s'il a déjà été distribué par le compteur
+(numéro <= last_value): un numéro inventé plus loin serait ensuite alloué
+une seconde fois par le serveur.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import MatriculeCounter
+from app.services.sequence_service import reserve_values
+
+MAX_BLOCK_SIZE = 500
+
+# Index unique des matricules (patients.matricule)
+MATRICULE_INDEX = "idx_patients_matricule"
+
+
+def generate_village_code(village_name: str | None) -> str:
+    """
+    Génère un code de 4 lettres à partir du nom du village
+    Ex: "Konobougou" → "KONO", "Siby" → "SIBY"
+    """
+    if not village_name:
+        return "UNKN"  # Code par défaut si pas de village
+
+    # Nettoyer le nom du village
+    name = village_name.strip()
+
+    # Prendre les 4 premières lettres
+    code = "".join([c for c in name if c.isalpha()])[:4].upper()
+
+    # Si moins de 4 lettres, compléter avec 'X'
+    return code.ljust(4, "X")
+
+
+def format_matricule(village_code: str, year: int, number: int) -> str:
+    """Formate un matricule: ("SIBY", 2025, 1) → "SIBY-2025-0001" """
+    return f"{village_code}-{year}-{number:04d}"
+
+
+def parse_matricule(matricule: str) -> Optional[tuple[str, int, int]]:
+    """
+    Décompose un matricule: "SIBY-2025-0001" → ("SIBY", 2025, 1)
+
+    None si mal formé ou non canonique ("SIBY-2025-1", "SIBY-2025-00001"):
+    une variante d'écriture désignerait le même numéro du compteur sans
+    être arrêtée par l'index unique des matricules.
+    """
+    parts = matricule.rsplit("-", 2)
+    if len(parts) != 3 or not parts[1].isdigit() or not parts[2].isdigit():
+        return None
+    parsed = parts[0], int(parts[1]), int(parts[2])
+    if format_matricule(*parsed) != matricule:
+        return None
+    return parsed
+
+
+async def unallocated_matricules(db: AsyncSession, matricules: Iterable[str]) -> set[str]:
+    """
+    Matricules jamais distribués par leur compteur (en une requête)
+
+    Un matricule est distribué si son numéro est inférieur ou égal au
+    last_value du compteur (code village, année).
+    """
+    parsed = {m: parse_matricule(m) for m in set(matricules)}
+    keys = sorted({(p[0], p[1]) for p in parsed.values() if p})
+    last_values = {}
+    if keys:
+        result = await db.execute(
+            select(MatriculeCounter.village_code, MatriculeCounter.year, MatriculeCounter.last_value)
+            .where(tuple_(MatriculeCounter.village_code, MatriculeCounter.year).in_(keys))
+        )
+        last_values = {(row.village_code, row.year): row.last_value for row in result}
+    return {
+        m for m, p in parsed.items()
+        if p is None or p[2] < 1 or p[2] > last_values.get((p[0], p[1]), 0)
+    }
+
+
+async def allocate_block(db: AsyncSession, village_code: str, year: int, count: int = 1) -> int:
+    """
+    Réserve `count` numéros consécutifs et retourne le premier
+
+    Le verrou de ligne pris par l'upsert est libéré au commit de la
+    transaction appelante; en cas de rollback, les numéros sont rendus.
+    """
+    return await reserve_values(db, MatriculeCounter, {"village_code": village_code, "year": year}, count)
+
+
+async def allocate_matricule(db: AsyncSession, village: str | None, year: int | None = None) -> str:
+    """Alloue le prochain matricule pour un village (année courante par défaut)"""
+    year = year or datetime.now().year
+    village_code = generate_village_code(village)
+    number = await allocate_block(db, village_code, year)
+    return format_matricule(village_code, year, number)
+
+
+async def allocate_matricules(db: AsyncSession, villages: list[str | None], year: int | None = None) -> list[str]:
+    """
+    Alloue un matricule pour chaque village de la liste (dans l'ordre)
+
+    Un seul upsert par code village, quel que soit le nombre de patients.
+    Les compteurs sont verrouillés dans l'ordre alphabétique des codes pour
+    éviter les interblocages entre imports concurrents.
+    """
+    year = year or datetime.now().year
+    codes = [generate_village_code(v) for v in villages]
+
+    next_numbers = {}
+    for code, count in sorted(Counter(codes).items()):
+        next_numbers[code] = await allocate_block(db, code, year, count)
+
+    matricules = []
+    for code in codes:
+        matricules.append(format_matricule(code, year, next_numbers[code]))
+        next_numbers[code] += 1
+    return matricules
@@ -0,0 +1,198 @@
+"""
+Cache du catalogue des médicaments
+
+Le catalogue est global (partagé par tous les sites) et change rarement.
+Chaque écriture (création, modification, désactivation) estampille la ligne
+avec la valeur suivante de la séquence medicament_catalogue_version_seq:
+la plus haute estampille est la version du catalogue.
+
+Un instantané du catalogue (lignes déjà sérialisées, corps JSON complet
+pré-encodé) est gardé en mémoire dans chaque worker et partagé via Redis,
+de sorte qu'une nouvelle version n'est relue en base qu'une seule fois.
+La version courante est lue à chaque requête (max sur un index: une seule
+page d'index), ce qui permet:
+
+    - des ETag forts ("medicaments-v42") et des réponses 304;
+    - des deltas ("modifiés depuis la version N") pour la synchro des appareils.
+
+Sans Redis, seul le cache mémoire est utilisé.
+"""
+import asyncio
+import bisect
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+import structlog
+from fastapi import Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.inventory import Medicament
+from app.services.serialization import dumps
+
+logger = structlog.get_logger()
+
+CATALOGUE_SEQUENCE = "medicament_catalogue_version_seq"
+REDIS_SNAPSHOT_KEY = "catalogue:medicaments"
+REDIS_RETRY_SECONDS = 30
+
+# Verrou consultatif: les écritures du catalogue sont sérialisées jusqu'au
+# commit, donc une version N n'est jamais visible avant la version N-1
+_WRITE_LOCK_KEY = 0x4D454443  # "MEDC"
+
+# Chargement: (version, ligne sérialisée) par médicament, tri par version croissante
+CatalogueLoader = Callable[[AsyncSession], Awaitable[list[tuple[int, dict[str, Any]]]]]
+
+
+async def next_catalogue_version(db: AsyncSession) -> int:
+    """
+    Version à attribuer à un médicament créé ou modifié (avant le commit)
+
+    Usage:
+        medicament.catalogue_version = await next_catalogue_version(db)
+        await db.commit()
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(_WRITE_LOCK_KEY)))
+    return await db.scalar(select(func.nextval(CATALOGUE_SEQUENCE)))
+
+
+async def current_catalogue_version(db: AsyncSession) -> int:
+    """Version courante du catalogue (0 si aucune écriture)"""
+    return await db.scalar(select(func.coalesce(func.max(Medicament.catalogue_version), 0)))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Vrai si l'ETag figure dans If-None-Match (la réponse serait identique)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+@dataclass
+class CatalogueSnapshot:
+    """Catalogue complet à une version donnée"""
+    version: int
+    items: list[dict[str, Any]]
+    item_versions: list[int]
+    body: bytes = field(default=b"", repr=False)
+
+    def __post_init__(self):
+        if not self.body:
+            self.body = dumps({"version": self.version, "full": True, "items": self.items})
+
+    def etag(self, since_version: Optional[int] = None) -> str:
+        if since_version is None:
+            return f'"medicaments-v{self.version}"'
+        return f'"medicaments-v{self.version}-depuis-{since_version}"'
+
+    def changed_since(self, version: int) -> list[dict[str, Any]]:
+        """Médicaments écrits après la version donnée (désactivés compris)"""
+        return self.items[bisect.bisect_right(self.item_versions, version):]
+
+
+class MedicamentCatalogue:
+    """
+    Instantané du catalogue, en mémoire et dans Redis
+
+    Usage:
+        catalogue = MedicamentCatalogue(load_rows)
+        snapshot = await catalogue.get(db)
+    """
+
+    def __init__(self, loader: CatalogueLoader, redis_url: Optional[str] = settings.REDIS_URL):
+        self.loader = loader
+        self.redis_url = redis_url
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._redis = None
+        self._redis_retry_at = 0.0
+
+    async def get(self, db: AsyncSession, version: Optional[int] = None) -> CatalogueSnapshot:
+        """Instantané à la version courante (relu en base au plus une fois par version)"""
+        if version is None:
+            version = await current_catalogue_version(db)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        async with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+
+            snapshot = await self._from_redis(version)
+            if snapshot is None:
+                rows = await self.loader(db)
+                snapshot = CatalogueSnapshot(
+                    version=version,
+                    items=[item for _, item in rows],
+                    item_versions=[v for v, _ in rows],
+                )
+                await self._to_redis(snapshot)
+                logger.info("Catalogue des médicaments rechargé", version=version, count=len(rows))
+
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Oublie l'instantané local (les autres workers voient la nouvelle version)"""
+        self._snapshot = None
+
+    # -----------------------------------------------------------------------
+    # Redis
+    # -----------------------------------------------------------------------
+
+    def _client(self):
+        if not self.redis_url or time.monotonic() < self._redis_retry_at:
+            return None
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self.redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning("Cache Redis du catalogue indisponible", error=str(error))
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    async def _from_redis(self, version: int) -> Optional[CatalogueSnapshot]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(REDIS_SNAPSHOT_KEY)
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        if raw is None:
+            return None
+
+        stored = json.loads(raw)
+        if stored["version"] != version:
+            return None
+        return CatalogueSnapshot(
+            version=version,
+            items=stored["items"],
+            item_versions=stored["item_versions"],
+        )
+
+    async def _to_redis(self, snapshot: CatalogueSnapshot) -> None:
+        client = self._client()
+        if client is None:
+            return
+        payload = dumps({
+            "version": snapshot.version,
+            "items": snapshot.items,
+            "item_versions": snapshot.item_versions,
+        })
+        try:
+            await client.set(REDIS_SNAPSHOT_KEY, payload)
+        except Exception as e:
+            self._redis_failed(e)
@@ -0,0 +1,148 @@
+"""
+Pagination par clé (keyset)
+
+Les listes sont triées par (clé de tri, id): l'id départage les lignes de
+même clé (même date de création, même nom...). Le curseur transmis au client
+est opaque (base64 de [clé, id]) et la page suivante est obtenue par une
+comparaison de lignes (clé, id) < (:clé, :id), servie par un index composite
+sur (..., clé, id), au lieu d'un OFFSET qui relit toutes les lignes précédentes.
+
+Usage:
+    keyset = Keyset(Patient.created_at, Patient.id)
+    query = keyset.apply(query, cursor, limit)
+    rows = (await db.execute(query)).scalars().all()
+    rows, next_cursor, has_more = keyset.page(rows, limit)
+"""
+import base64
+import json
+import uuid as uuid_module
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+# En-tête portant le curseur suivant pour les endpoints qui retournent une liste simple
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid_module.UUID)):
+        return str(value)
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return value
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    """Encode (clé de tri, id) en curseur opaque"""
+    payload = json.dumps([_serialize(sort_value), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, str]:
+    """
+    Décode un curseur en (clé de tri brute, id)
+
+    Raises:
+        HTTPException 400: curseur illisible
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return sort_value, str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+
+
+def _python_type(column: ColumnElement) -> Optional[type]:
+    try:
+        return column.type.python_type
+    except NotImplementedError:  # Expressions (ex: score de similarité)
+        return None
+
+
+class Keyset:
+    """
+    Tri et pagination d'une requête par (clé de tri, id)
+
+    Args:
+        sort_column: colonne ou expression de tri (non nulle)
+        id_column: clé primaire, pour départager les ex æquo
+        descending: ordre décroissant (les plus récents d'abord)
+    """
+
+    def __init__(self, sort_column: ColumnElement, id_column: ColumnElement, descending: bool = True):
+        self.sort_column = sort_column
+        self.id_column = id_column
+        self.descending = descending
+
+    def _cursor_values(self, cursor: str) -> tuple[Any, Any]:
+        raw_value, raw_id = decode_cursor(cursor)
+        try:
+            python_type = _python_type(self.sort_column)
+            if raw_value is None or python_type is None:
+                sort_value = raw_value
+            elif python_type in (datetime, date):
+                sort_value = python_type.fromisoformat(raw_value)
+            else:
+                sort_value = python_type(raw_value)
+
+            id_type = _python_type(self.id_column)
+            row_id = uuid_module.UUID(raw_id) if id_type is uuid_module.UUID else (id_type or str)(raw_id)
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Curseur de pagination invalide"
+            )
+        return sort_value, row_id
+
+    def apply(self, query: Select, cursor: Optional[str], limit: int) -> Select:
+        """Ajoute le tri, la condition du curseur et limit + 1 (détection de la page suivante)"""
+        if cursor:
+            sort_value, row_id = self._cursor_values(cursor)
+            position = tuple_(self.sort_column, self.id_column)
+            bound = tuple_(sort_value, row_id)
+            query = query.where(position < bound if self.descending else position > bound)
+
+        if self.descending:
+            query = query.order_by(self.sort_column.desc(), self.id_column.desc())
+        else:
+            query = query.order_by(self.sort_column.asc(), self.id_column.asc())
+        return query.limit(limit + 1)
+
+    def page(
+        self,
+        rows: Sequence[Any],
+        limit: int,
+        key: Optional[Callable[[Any], tuple[Any, Any]]] = None,
+    ) -> tuple[Sequence[Any], Optional[str], bool]:
+        """
+        Découpe le résultat de apply() en page
+
+        Args:
+            rows: lignes retournées (au plus limit + 1)
+            key: extrait (clé de tri, id) d'une ligne; par défaut les attributs
+                de même nom que les colonnes (objets ORM)
+
+        Returns:
+            (lignes de la page, curseur suivant ou None, has_more)
+        """
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not has_more or not rows:
+            return rows, None, has_more
+
+        if key is None:
+            last = rows[-1]
+            sort_value, row_id = getattr(last, self.sort_column.key), getattr(last, self.id_column.key)
+        else:
+            sort_value, row_id = key(rows[-1])
+        return rows, encode_cursor(sort_value, row_id), has_more
@@ -0,0 +1,172 @@
+"""
+Détection des doublons de patients
+
+Les noms sont saisis avec de nombreuses variantes (Traoré / Traore / Trawore,
+Coulibaly / Kulibali, Diarra / Jara). Chaque patient porte une clé phonétique
+précalculée (nom + prénom), indexée avec le site: la recherche de doublons
+combine cette clé et l'index trigrammes de search_text, puis classe les
+candidats avec un score qui tient compte du sexe, de l'année de naissance,
+du téléphone et du village.
+"""
+import re
+import unicodedata
+import uuid as uuid_module
+from typing import Any, Optional
+
+from sqlalchemy import func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Patient
+
+MATCH_CANDIDATES = 50
+DUPLICATE_THRESHOLD = 0.6  # Score à partir duquel deux fiches sont un doublon probable
+
+# Règles de réécriture appliquées dans l'ordre (orthographes française,
+# anglaise et bambara). Les majuscules marquent un son déjà normalisé.
+_PHONETIC_RULES = [
+    (re.compile(r"tch"), "C"),
+    (re.compile(r"dj|dy|di(?=[aeou])"), "J"),  # Diarra = Jara, Djénéba = Dieneba
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"[cs]h"), "S"),
+    (re.compile(r"kh"), "k"),
+    (re.compile(r"gn|ny|ni(?=[aeou])"), "n"),  # Nyamoye = Niamoye
+    (re.compile(r"gu(?=[eiy])"), "g"),
+    (re.compile(r"qu|ck|q"), "k"),
+    (re.compile(r"c(?=[eiy])"), "s"),
+    (re.compile(r"c"), "k"),  # Coulibaly = Kulibali
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"z"), "s"),
+    (re.compile(r"h"), ""),
+    (re.compile(r"ou|w|o"), "u"),  # Traoré = Trawore, Ousmane = Usman
+    (re.compile(r"y|e"), "i"),  # Seydou = Seidou
+]
+_REPEATED = re.compile(r"(.)\1+")
+
+
+def _phonetic_word(word: str) -> str:
+    word = unicodedata.normalize("NFKD", word)
+    word = "".join(c for c in word if c.isascii() and c.isalpha()).lower()
+    for pattern, replacement in _PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    word = _REPEATED.sub(r"\1", word)  # Diarra = Diara
+    if len(word) > 3:
+        word = word.rstrip("aiu") or word  # Voyelles finales muettes ou variables
+    return word.lower()
+
+
+def phonetic_key(nom: Optional[str], prenom: Optional[str] = None) -> str:
+    """
+    Clé phonétique d'un patient: "traur aisat" pour Traoré Aïssata
+
+    Les noms composés sont traités mot par mot.
+    """
+    words = re.split(r"[\s\-']+", f"{nom or ''} {prenom or ''}")
+    return " ".join(w for w in (_phonetic_word(w) for w in words) if w)[:100]
+
+
+def _digits(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def score_candidate(
+    probe: dict[str, Any],
+    candidate: dict[str, Any],
+    name_similarity: float,
+) -> tuple[float, list[str]]:
+    """
+    Score de ressemblance entre une fiche saisie et un patient existant (0 à 1)
+
+    Args:
+        probe: nom, prenom, sexe, annee_naissance, telephone, village saisis
+            (phonetic_key optionnelle si déjà connue)
+        candidate: mêmes champs + phonetic_key du patient existant
+        name_similarity: similarité trigrammes des noms (0 à 1)
+
+    Returns:
+        (score, raisons lisibles)
+    """
+    score = 0.35 * name_similarity
+    reasons = []
+
+    probe_key = probe.get("phonetic_key") or phonetic_key(probe.get("nom"), probe.get("prenom"))
+    if candidate.get("phonetic_key") == probe_key:
+        score += 0.4
+        reasons.append("nom_phonetique")
+    elif name_similarity >= 0.5:
+        reasons.append("nom_similaire")
+
+    year, other_year = probe.get("annee_naissance"), candidate.get("annee_naissance")
+    if year and other_year:
+        gap = abs(year - other_year)
+        if gap <= 1:
+            score += 0.15
+            reasons.append("annee_naissance")
+        elif gap > 5:
+            score -= 0.25
+
+    phone = _digits(probe.get("telephone"))
+    if len(phone) >= 8 and phone[-8:] == _digits(candidate.get("telephone"))[-8:]:
+        score += 0.15
+        reasons.append("telephone")
+
+    village = (probe.get("village") or "").strip().lower()
+    if village and village == (candidate.get("village") or "").strip().lower():
+        score += 0.05
+        reasons.append("village")
+
+    sexe, other_sexe = probe.get("sexe"), candidate.get("sexe")
+    if sexe and other_sexe and getattr(sexe, "value", sexe) != getattr(other_sexe, "value", other_sexe):
+        score *= 0.5
+
+    return round(max(0.0, min(score, 1.0)), 3), reasons
+
+
+async def find_matches(
+    db: AsyncSession,
+    site_id: uuid_module.UUID,
+    probe: dict[str, Any],
+    limit: int = 10,
+    min_score: float = 0.3,
+    exclude_id: Optional[uuid_module.UUID] = None,
+) -> list[tuple[Patient, float, list[str]]]:
+    """
+    Cherche les patients du site qui ressemblent à la fiche saisie
+
+    Une seule requête, servie par idx_patients_site_phonetic (clé exacte) et
+    idx_patients_search_trgm (similarité des noms).
+    """
+    full_name = " ".join(filter(None, [probe.get("nom"), probe.get("prenom")]))
+    normalized = func.f_unaccent(func.lower(literal(full_name)))
+    similarity = func.word_similarity(normalized, Patient.search_text)
+
+    stmt = (
+        select(Patient, similarity.label("similarity"))
+        .where(
+            Patient.site_id == site_id,
+            Patient.deleted_at.is_(None),
+            or_(
+                Patient.phonetic_key == phonetic_key(probe.get("nom"), probe.get("prenom")),
+                normalized.op("<%")(Patient.search_text),
+            ),
+        )
+        .order_by(similarity.desc())
+        .limit(MATCH_CANDIDATES)
+    )
+    if exclude_id:
+        stmt = stmt.where(Patient.id != exclude_id)
+
+    matches = []
+    for patient, name_similarity in (await db.execute(stmt)).all():
+        candidate = {
+            "phonetic_key": patient.phonetic_key,
+            "sexe": patient.sexe,
+            "annee_naissance": patient.annee_naissance,
+            "telephone": patient.telephone,
+            "village": patient.village,
+        }
+        score, reasons = score_candidate(probe, candidate, float(name_similarity or 0))
+        if score >= min_score:
+            matches.append((patient, score, reasons))
+
+    matches.sort(key=lambda m: m[1], reverse=True)
+    return matches[:limit]
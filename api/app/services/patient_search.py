@@ -0,0 +1,58 @@
+"""
+Recherche de patients par similarité (pg_trgm)
+
+La colonne générée patients.search_text contient nom, prénom et téléphone en
+minuscules et sans accents ("Traoré Aïssata" → "traore aissata"). Elle est
+indexée en GIN gin_trgm_ops, ce qui sert à la fois:
+- les recherches par sous-chaîne (LIKE '%terme%'), sans scan complet
+- les recherches approchées (opérateur <% de word_similarity), qui tolèrent
+  les variantes d'orthographe courantes des noms français et bambara
+
+Les résultats sont classés par similarité décroissante.
+"""
+import re
+
+from sqlalchemy import func, literal, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models import Patient
+
+# En dessous de 3 caractères, les trigrammes ne sont pas discriminants:
+# seule la recherche par sous-chaîne est utilisée
+MIN_FUZZY_LENGTH = 3
+
+
+def normalize_search_term(term: str) -> str:
+    """Nettoie un terme saisi (espaces superflus)"""
+    return re.sub(r"\s+", " ", term).strip()
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_clauses(term: str) -> tuple[ColumnElement, ColumnElement]:
+    """
+    Construit le filtre et l'expression de classement pour un terme
+
+    La normalisation (minuscules, unaccent) est faite par PostgreSQL avec la
+    même fonction que la colonne générée, pour des résultats cohérents.
+
+    Returns:
+        (clause WHERE, score de similarité pour ORDER BY)
+    """
+    cleaned = normalize_search_term(term)
+    normalized = func.f_unaccent(func.lower(literal(cleaned)))
+    pattern = func.f_unaccent(func.lower(literal(_escape_like(cleaned))))
+
+    substring = Patient.search_text.like(
+        literal("%").concat(pattern).concat(literal("%")),
+        escape="\\",
+    )
+    rank = func.word_similarity(normalized, Patient.search_text)
+
+    if len(cleaned) < MIN_FUZZY_LENGTH:
+        return substring, rank
+
+    fuzzy = normalized.op("<%")(Patient.search_text)
+    return or_(substring, fuzzy), rank
@@ -0,0 +1,148 @@
+"""
+Chronologie d'un patient
+
+Consultations, diagnostics, prescriptions, actes, références, délivrances de
+médicaments et pièces jointes d'un patient, entrelacés par date, en une
+seule requête UNION ALL. Chaque branche projette les mêmes colonnes:
+
+    type, id, occurred_at, encounter_id, titre, detail, code
+
+Les éléments rattachés à une consultation (diagnostic, prescription, acte,
+référence) portent son encounter_id pour être regroupés côté client.
+La pagination se fait par (occurred_at, id), voir app/services/pagination.py.
+"""
+import uuid as uuid_module
+from typing import Iterable, Optional
+
+from sqlalchemy import DateTime, Select, String, Text, cast, func, literal, null, or_, select, union_all
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models import (
+    Attachment,
+    Condition,
+    DelivranceLigne,
+    DelivrancePatient,
+    Encounter,
+    Medicament,
+    MedicationRequest,
+    Procedure,
+    Reference,
+)
+
+TIMELINE_TYPES = (
+    "consultation",
+    "diagnostic",
+    "prescription",
+    "acte",
+    "reference",
+    "delivrance",
+    "piece_jointe",
+)
+
+
+def _branch(
+    event_type: str,
+    id_column: ColumnElement,
+    occurred_at: ColumnElement,
+    encounter_id: ColumnElement,
+    titre: ColumnElement,
+    detail: Optional[ColumnElement] = None,
+    code: Optional[ColumnElement] = None,
+) -> Select:
+    """SELECT d'une branche, avec les colonnes communes typées à l'identique"""
+    return select(
+        literal(event_type, String(20)).label("type"),
+        id_column.label("id"),
+        cast(occurred_at, DateTime(timezone=True)).label("occurred_at"),
+        encounter_id.label("encounter_id"),
+        cast(titre, Text).label("titre"),
+        cast(detail if detail is not None else null(), Text).label("detail"),
+        cast(code if code is not None else null(), Text).label("code"),
+    )
+
+
+def _encounter_child(event_type: str, model, titre, detail=None, code=None) -> Select:
+    """Élément rattaché à une consultation (daté comme la consultation)"""
+    return (
+        _branch(event_type, model.id, Encounter.date, model.encounter_id, titre, detail, code)
+        .join(Encounter, model.encounter_id == Encounter.id)
+    )
+
+
+def timeline_query(patient_id: uuid_module.UUID, types: Optional[Iterable[str]] = None):
+    """
+    Sous-requête UNION ALL de la chronologie d'un patient
+
+    Args:
+        types: types d'événements à inclure (tous par défaut)
+
+    Returns:
+        Sous-requête "timeline" (colonnes: voir le module)
+    """
+    wanted = set(types or TIMELINE_TYPES)
+    of_patient = [Encounter.patient_id == patient_id, Encounter.deleted_at.is_(None)]
+    branches = []
+
+    if "consultation" in wanted:
+        branches.append(
+            _branch("consultation", Encounter.id, Encounter.date, Encounter.id, Encounter.motif, Encounter.notes)
+            .where(*of_patient)
+        )
+    if "diagnostic" in wanted:
+        branches.append(
+            _encounter_child("diagnostic", Condition, Condition.libelle, Condition.notes, Condition.code_icd10)
+            .where(*of_patient)
+        )
+    if "prescription" in wanted:
+        branches.append(
+            _encounter_child("prescription", MedicationRequest, MedicationRequest.medicament, MedicationRequest.posologie)
+            .where(*of_patient)
+        )
+    if "acte" in wanted:
+        branches.append(
+            _encounter_child("acte", Procedure, Procedure.type, func.coalesce(Procedure.resultat, Procedure.description))
+            .where(*of_patient)
+        )
+    if "reference" in wanted:
+        branches.append(
+            _branch(
+                "reference", Reference.id, Reference.date_reference, Reference.encounter_id,
+                Reference.etablissement_destination, Reference.motif, Reference.statut,
+            )
+            .join(Encounter, Reference.encounter_id == Encounter.id)
+            .where(*of_patient, Reference.deleted_at.is_(None))
+        )
+    if "delivrance" in wanted:
+        # Médicaments délivrés ("Paracétamol x 20, Amoxicilline x 12")
+        lignes = (
+            select(func.string_agg(Medicament.nom + " x " + cast(DelivranceLigne.quantite, String), ", "))
+            .select_from(DelivranceLigne)
+            .join(Medicament, DelivranceLigne.medicament_id == Medicament.id)
+            .where(DelivranceLigne.delivrance_id == DelivrancePatient.id)
+            .correlate(DelivrancePatient)
+            .scalar_subquery()
+        )
+        branches.append(
+            _branch(
+                "delivrance", DelivrancePatient.id, DelivrancePatient.date_delivrance,
+                DelivrancePatient.encounter_id, lignes, DelivrancePatient.commentaire,
+            )
+            .where(DelivrancePatient.patient_id == patient_id)
+        )
+    if "piece_jointe" in wanted:
+        # Pièces jointes du patient ou de l'une de ses consultations
+        branches.append(
+            _branch(
+                "piece_jointe", Attachment.id, Attachment.created_at, Attachment.encounter_id,
+                Attachment.filename, None, Attachment.mime_type,
+            )
+            .where(
+                Attachment.uploaded.is_(True),
+                or_(
+                    Attachment.patient_id == patient_id,
+                    Attachment.encounter_id.in_(select(Encounter.id).where(*of_patient)),
+                ),
+            )
+        )
+
+    return union_all(*branches).subquery("timeline")
@@ -0,0 +1,70 @@
+"""
+Allocation de numéros de documents par site et par année
+
+Service commun aux bons de commande et aux futurs documents (bons de
+livraison, délivrances). Chaque allocation est un unique
+INSERT … ON CONFLICT DO UPDATE … RETURNING sur document_sequences; le même
+upsert (reserve_values) sert aux compteurs de matricules patients
+(app/services/matricule_service.py).
+
+Le verrou de ligne est conservé jusqu'au commit de la transaction appelante:
+si la création du document échoue, le numéro est rendu (pas de trou).
+"""
+from typing import Any
+import uuid as uuid_module
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sequences import DocumentSequence, DocumentTypeEnum
+
+# Préfixe des numéros affichés (ex: BC-2025-0001)
+DOCUMENT_PREFIXES = {
+    DocumentTypeEnum.BON_COMMANDE: "BC",
+    DocumentTypeEnum.BON_LIVRAISON: "BL",
+    DocumentTypeEnum.DELIVRANCE: "DL",
+    DocumentTypeEnum.TRANSFERT: "TR",
+}
+
+
+async def reserve_values(db: AsyncSession, counter: type, key: dict[str, Any], count: int = 1) -> int:
+    """
+    Réserve `count` valeurs consécutives d'un compteur et retourne la première
+
+    `counter` est un modèle de compteur (clé primaire = colonnes de `key`,
+    colonne last_value): DocumentSequence, MatriculeCounter.
+    """
+    stmt = (
+        pg_insert(counter)
+        .values(**key, last_value=count)
+        .on_conflict_do_update(
+            index_elements=[getattr(counter, column) for column in key],
+            set_={"last_value": counter.last_value + count},
+        )
+        .returning(counter.last_value)
+    )
+    last_value = (await db.execute(stmt)).scalar_one()
+    return last_value - count + 1
+
+
+async def allocate_sequence(
+    db: AsyncSession,
+    site_id: uuid_module.UUID,
+    document_type: DocumentTypeEnum,
+    year: int,
+    count: int = 1,
+) -> int:
+    """Réserve `count` valeurs consécutives et retourne la première"""
+    key = {"site_id": site_id, "year": year, "document_type": document_type.value}
+    return await reserve_values(db, DocumentSequence, key, count)
+
+
+async def next_document_numero(
+    db: AsyncSession,
+    site_id: uuid_module.UUID,
+    document_type: DocumentTypeEnum,
+    year: int,
+) -> str:
+    """Alloue le prochain numéro d'un document (ex: "BC-2025-0042")"""
+    value = await allocate_sequence(db, site_id, document_type, year)
+    return f"{DOCUMENT_PREFIXES[document_type]}-{year}-{value:04d}"
@@ -0,0 +1,134 @@
+"""
+Sérialisation rapide des listes
+
+Les listes (patients, médicaments, stocks...) étaient construites avec un
+model_validate Pydantic par ligne, puis revalidées par FastAPI via
+response_model. Ici, un RowSerializer est compilé une fois par schéma de
+sortie: il sait quelles colonnes sélectionner et comment convertir chaque
+valeur en type JSON. Les lignes SQL (Row / RowMapping) sont converties
+directement en dict puis encodées en octets (orjson si installé, sinon json).
+
+Le JSON produit est identique à celui de Pydantic (UUID et Decimal en
+chaîne, dates ISO 8601 avec "Z" pour UTC, enums par valeur).
+"""
+import enum
+import json
+import types
+import typing
+import uuid as uuid_module
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Mapping, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle: json de la bibliothèque standard sinon
+    orjson = None
+
+
+def _datetime(value: Any) -> str:
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    if value.utcoffset() == timedelta(0):
+        return value.replace(tzinfo=None).isoformat() + "Z"
+    return value.isoformat()
+
+
+def _enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+_CONVERTERS: dict[Any, Callable[[Any], Any]] = {
+    uuid_module.UUID: str,
+    datetime: _datetime,
+    date: lambda value: value.isoformat(),
+    Decimal: str,
+    float: float,
+}
+
+
+def _converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """Fonction de conversion d'une valeur SQL vers le type JSON du champ (None: identité)"""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Annotated:
+        return _converter(typing.get_args(annotation)[0])
+    if origin in (typing.Union, types.UnionType):
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) != 1:
+            raise TypeError(f"Type non pris en charge: {annotation}")
+        return _converter(args[0])
+    if origin is not None or (isinstance(annotation, type) and issubclass(annotation, BaseModel)):
+        raise TypeError(f"Champ composé non pris en charge: {annotation}")
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return _enum_value
+    if annotation is str:
+        return _enum_value  # Colonnes Enum exposées en str (ex: forme, statut)
+    return _CONVERTERS.get(annotation)
+
+
+class RowSerializer:
+    """
+    Sérialiseur précompilé pour un schéma de sortie plat
+
+    Usage:
+        PATIENT_ROW = RowSerializer(PatientOut)
+        query = select(*PATIENT_ROW.columns(Patient))
+        data = [PATIENT_ROW(row) for row in result.mappings()]
+    """
+
+    def __init__(self, schema: type[BaseModel]):
+        self.schema = schema
+        self.fields = []
+        for name, field in schema.model_fields.items():
+            default = None if field.is_required() else field.get_default(call_default_factory=True)
+            self.fields.append((name, _converter(field.annotation), default))
+
+    def columns(self, model: Any, **labeled: Any) -> list:
+        """
+        Colonnes à sélectionner: attributs du modèle de même nom que les
+        champs, plus les expressions données explicitement (nom=expression)
+        """
+        columns = []
+        for name, _, _ in self.fields:
+            if name in labeled:
+                columns.append(labeled[name].label(name))
+            elif name in model.__table__.columns:
+                columns.append(getattr(model, name))
+        return columns
+
+    def __call__(self, row: Mapping[str, Any]) -> dict[str, Any]:
+        if not isinstance(row, Mapping):
+            row = row._mapping
+        data = {}
+        for name, convert, default in self.fields:
+            value = row.get(name, default)
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+
+def _default(value: Any) -> Any:
+    """Types non natifs JSON rencontrés hors RowSerializer (lignes libres)"""
+    if isinstance(value, datetime):
+        return _datetime(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (uuid_module.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode en JSON (octets)"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def json_response(payload: Any, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Réponse JSON déjà encodée: FastAPI ne revalide pas le response_model"""
+    return Response(content=dumps(payload), media_type="application/json", headers=headers)
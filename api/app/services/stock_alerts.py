@@ -0,0 +1,198 @@
+"""
+Alertes de stock (table précalculée stock_alerts)
+
+La liste des alertes et les compteurs du tableau de bord lisent la table
+stock_alerts au lieu de recalculer "quantite_actuelle <= seuil" sur toute
+la jointure stocks x médicaments. La table est tenue à jour:
+
+    - par le registre des mouvements (app/services/stock_ledger.py), quand
+      un mouvement fait franchir un seuil (stock bas, rupture): seuls ces
+      mouvements paient l'écriture de l'alerte;
+    - par la tâche nocturne refresh_stock_alerts, qui réaligne toutes les
+      alertes de stock (seuils modifiés) et calcule les alertes de
+      péremption des lots.
+
+Chaque synchronisation est ensembliste: un INSERT ... SELECT ... ON
+CONFLICT DO UPDATE pour les alertes présentes, un DELETE pour les autres.
+
+Seuls les franchissements de seuil réécrivent une alerte: stock_alerts.quantite
+est la quantité au moment de cette écriture. Les listes affichent donc la
+quantité courante, lue par jointure (live_alert_columns) sur le stock ou le
+lot de l'alerte (index uniques, une ligne par alerte).
+"""
+from datetime import date, timedelta
+from typing import Optional, Sequence
+import uuid as uuid_module
+
+from sqlalchemy import and_, case, delete, func, not_, null, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import LotMedicament, Medicament, StockAlert, StockSite, TypeAlerteStockEnum
+
+# Un lot est signalé quand sa péremption tombe dans ce délai
+EXPIRY_HORIZON_DAYS = 90
+
+# Seuil effectif d'un stock (jointure Medicament requise): seuil fixé par le
+# pharmacien, sinon point de commande calculé (app/services/stock_forecast.py),
+# sinon seuil par défaut du médicament
+SEUIL = func.coalesce(StockSite.seuil_alerte, StockSite.point_commande, Medicament.seuil_alerte_defaut, 0)
+
+
+
+def join_live_quantities(query):
+    """Ajoute à une requête sur stock_alerts (jointure Medicament requise) le stock et le lot de chaque alerte"""
+    return (
+        query
+        .outerjoin(StockSite, and_(
+            StockSite.site_id == StockAlert.site_id,
+            StockSite.medicament_id == StockAlert.medicament_id,
+        ))
+        .outerjoin(LotMedicament, StockAlert.lot_id == LotMedicament.id)
+    )
+
+
+def live_alert_columns() -> dict:
+    """Quantité et seuil courants d'une alerte (requête passée par join_live_quantities)"""
+    stock_alert = StockAlert.lot_id.is_(None)
+    return {
+        "quantite": func.coalesce(
+            case((stock_alert, StockSite.quantite_actuelle), else_=LotMedicament.quantite_restante),
+            StockAlert.quantite,
+        ),
+        "seuil": case((stock_alert, SEUIL), else_=StockAlert.seuil),
+    }
+
+
+_ALERT_COLUMNS = [
+    "id", "site_id", "tenant_id", "medicament_id", "lot_id", "type_alerte",
+    "quantite", "seuil", "date_peremption", "created_at", "updated_at",
+]
+
+
+def stock_alert_type(quantite: int, seuil: int) -> Optional[TypeAlerteStockEnum]:
+    """Alerte d'un stock pour une quantité et un seuil donnés"""
+    if quantite <= 0:
+        return TypeAlerteStockEnum.RUPTURE
+    if quantite <= seuil:
+        return TypeAlerteStockEnum.STOCK_BAS
+    return None
+
+
+def crosses_threshold(avant: int, apres: int, seuil: int) -> bool:
+    """Vrai si le mouvement change l'alerte du stock"""
+    return stock_alert_type(avant, seuil) != stock_alert_type(apres, seuil)
+
+
+def _upsert(source, index_elements, index_where):
+    statement = pg_insert(StockAlert).from_select(_ALERT_COLUMNS, source)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        index_where=index_where,
+        set_={
+            "type_alerte": statement.excluded.type_alerte,
+            "quantite": statement.excluded.quantite,
+            "seuil": statement.excluded.seuil,
+            "date_peremption": statement.excluded.date_peremption,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+
+
+async def sync_stock_alerts(db: AsyncSession, *conditions) -> None:
+    """
+    Aligne les alertes de stock sur les stocks sélectionnés (sans commit)
+
+    Usage:
+        await sync_stock_alerts(db, StockSite.id.in_(stock_ids))
+        await sync_stock_alerts(db)  # tous les stocks
+    """
+    en_alerte = and_(Medicament.is_active == True, StockSite.quantite_actuelle <= SEUIL)
+    source = (
+        select(
+            func.gen_random_uuid(),
+            StockSite.site_id,
+            StockSite.tenant_id,
+            StockSite.medicament_id,
+            null(),
+            case(
+                (StockSite.quantite_actuelle <= 0, TypeAlerteStockEnum.RUPTURE.value),
+                else_=TypeAlerteStockEnum.STOCK_BAS.value,
+            ),
+            StockSite.quantite_actuelle,
+            SEUIL,
+            null(),
+            func.now(),
+            func.now(),
+        )
+        .join(Medicament, StockSite.medicament_id == Medicament.id)
+        .where(en_alerte, *conditions)
+    )
+    await db.execute(_upsert(
+        source, [StockAlert.site_id, StockAlert.medicament_id], StockAlert.lot_id.is_(None)
+    ))
+
+    sorties = (
+        select(StockSite.site_id, StockSite.medicament_id)
+        .join(Medicament, StockSite.medicament_id == Medicament.id)
+        .where(not_(en_alerte), *conditions)
+    )
+    await db.execute(
+        delete(StockAlert)
+        .where(
+            StockAlert.lot_id.is_(None),
+            tuple_(StockAlert.site_id, StockAlert.medicament_id).in_(sorties),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def refresh_expiry_alerts(
+    db: AsyncSession,
+    today: date,
+    horizon_days: int = EXPIRY_HORIZON_DAYS,
+) -> None:
+    """Alertes de péremption de tous les lots en stock (sans commit)"""
+    limite = today + timedelta(days=horizon_days)
+    source = (
+        select(
+            func.gen_random_uuid(),
+            LotMedicament.site_id,
+            LotMedicament.tenant_id,
+            LotMedicament.medicament_id,
+            LotMedicament.id,
+            case(
+                (LotMedicament.date_peremption < today, TypeAlerteStockEnum.PERIME.value),
+                else_=TypeAlerteStockEnum.PEREMPTION_PROCHE.value,
+            ),
+            LotMedicament.quantite_restante,
+            null(),
+            LotMedicament.date_peremption,
+            func.now(),
+            func.now(),
+        )
+        .where(LotMedicament.quantite_restante > 0, LotMedicament.date_peremption <= limite)
+    )
+    await db.execute(_upsert(source, [StockAlert.lot_id], StockAlert.lot_id.isnot(None)))
+
+    await db.execute(
+        delete(StockAlert)
+        .where(
+            StockAlert.lot_id.in_(
+                select(LotMedicament.id).where(
+                    (LotMedicament.quantite_restante <= 0) | (LotMedicament.date_peremption > limite)
+                )
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def clear_lot_alerts(db: AsyncSession, lot_ids: Sequence[uuid_module.UUID]) -> None:
+    """Supprime les alertes des lots épuisés (sans commit)"""
+    if lot_ids:
+        await db.execute(
+            delete(StockAlert)
+            .where(StockAlert.lot_id.in_(lot_ids))
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,197 @@
+"""
+Tableau de bord du stock d'un site
+
+L'écran d'accueil de la pharmacie affiche en une fois: nombre de références,
+alertes en cours, valeur du stock (lots x prix d'achat), lots qui se
+périment dans 30/60/90 jours et consommation du mois précédent. Le résumé
+est calculé en UNE requête (une CTE agrégée par indicateur, jointes sur
+une ligne), à partir des tables précalculées quand elles existent
+(stock_alerts) et des index partiels sinon (idx_lots_fefo pour les lots
+en stock, idx_movements_site_date pour la consommation).
+
+Le résumé est gardé en mémoire par worker et par site, avec pour version
+la somme des versions des stocks du site (sum(stock_sites.version)): chaque
+mouvement du registre (app/services/stock_ledger.py) incrémente la version
+du stock concerné dans la même transaction, donc invalide le résumé pour
+tous les workers sans notification. Contrairement à max(updated_at), cette
+somme ne peut que croître, même quand deux transactions commitent dans le
+désordre de leurs horodatages. Les changements qui ne passent pas par un mouvement
+(seuils recalculés la nuit, prix d'un lot) sont pris en compte au plus
+tard après CACHE_TTL_SECONDS; le résumé est aussi recalculé chaque jour
+(horizons de péremption, mois précédent).
+"""
+import asyncio
+import time as time_module
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Optional
+import uuid as uuid_module
+
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import (
+    LotMedicament,
+    Medicament,
+    StockAlert,
+    StockMovement,
+    StockSite,
+    TypeAlerteStockEnum,
+    TypeMouvementEnum,
+)
+
+EXPIRY_HORIZONS = (30, 60, 90)
+CACHE_TTL_SECONDS = 300
+
+
+def _previous_month(today: date) -> tuple[datetime, datetime]:
+    """Début du mois précédent et début du mois courant (UTC)"""
+    debut_mois = datetime.combine(today.replace(day=1), time.min, tzinfo=timezone.utc)
+    debut_precedent = (debut_mois - timedelta(days=1)).replace(day=1)
+    return debut_precedent, debut_mois
+
+
+def dashboard_query(site_id: uuid_module.UUID, today: date):
+    """Résumé du stock d'un site (une ligne)"""
+    stocks = (
+        select(
+            func.count().label("nb_references"),
+            func.count().filter(StockSite.quantite_actuelle <= 0).label("nb_ruptures"),
+        )
+        .join(Medicament, StockSite.medicament_id == Medicament.id)
+        .where(StockSite.site_id == site_id, Medicament.is_active == True)
+        .cte("stocks")
+    )
+
+    stock_types = [TypeAlerteStockEnum.RUPTURE.value, TypeAlerteStockEnum.STOCK_BAS.value]
+    alertes = (
+        select(
+            func.count().filter(StockAlert.type_alerte.in_(stock_types)).label("nb_alertes_stock"),
+            func.count().filter(StockAlert.type_alerte.notin_(stock_types)).label("nb_alertes_peremption"),
+        )
+        .where(StockAlert.site_id == site_id)
+        .cte("alertes")
+    )
+
+    en_stock = [LotMedicament.site_id == site_id, LotMedicament.quantite_restante > 0]
+    perimant = {}
+    for jours in EXPIRY_HORIZONS:
+        dans_horizon = (LotMedicament.date_peremption >= today) & (
+            LotMedicament.date_peremption < today + timedelta(days=jours)
+        )
+        perimant[f"lots_{jours}j"] = func.count().filter(dans_horizon)
+        perimant[f"quantite_{jours}j"] = func.coalesce(func.sum(LotMedicament.quantite_restante).filter(dans_horizon), 0)
+    lots = (
+        select(
+            func.coalesce(func.sum(LotMedicament.quantite_restante * LotMedicament.prix_achat_unitaire), 0).label("valeur_stock"),
+            func.count().filter(LotMedicament.date_peremption < today).label("lots_perimes"),
+            *(expression.label(name) for name, expression in perimant.items()),
+        )
+        .where(*en_stock)
+        .cte("lots")
+    )
+
+    debut, fin = _previous_month(today)
+    consommation = (
+        select(
+            func.coalesce(func.sum(StockMovement.quantite), 0).label("consommation_mois_precedent"),
+            func.count(func.distinct(StockMovement.medicament_id)).label("references_consommees"),
+        )
+        .where(
+            StockMovement.site_id == site_id,
+            StockMovement.type_mouvement == TypeMouvementEnum.SORTIE,
+            StockMovement.date_mouvement >= debut,
+            StockMovement.date_mouvement < fin,
+        )
+        .cte("consommation")
+    )
+
+    return (
+        select(stocks, alertes, lots, consommation)
+        .select_from(
+            stocks
+            .join(alertes, true())
+            .join(lots, true())
+            .join(consommation, true())
+        )
+    )
+
+
+async def compute_dashboard(db: AsyncSession, site_id: uuid_module.UUID, today: date) -> dict[str, Any]:
+    """Calcule le résumé (JSON-compatible) en une requête"""
+    row = (await db.execute(dashboard_query(site_id, today))).one()._mapping
+    debut, _ = _previous_month(today)
+    return {
+        "site_id": str(site_id),
+        "date": today.isoformat(),
+        "nb_references": row["nb_references"],
+        "nb_ruptures": row["nb_ruptures"],
+        "nb_alertes_stock": row["nb_alertes_stock"],
+        "nb_alertes_peremption": row["nb_alertes_peremption"],
+        "valeur_stock": str(row["valeur_stock"]),
+        "lots_perimes": row["lots_perimes"],
+        "peremption": {
+            f"{jours}j": {"lots": row[f"lots_{jours}j"], "quantite": row[f"quantite_{jours}j"]}
+            for jours in EXPIRY_HORIZONS
+        },
+        "consommation_mois_precedent": {
+            "mois": debut.strftime("%Y-%m"),
+            "quantite": row["consommation_mois_precedent"],
+            "references": row["references_consommees"],
+        },
+    }
+
+
+async def site_stock_version(db: AsyncSession, site_id: uuid_module.UUID) -> int:
+    """Version du stock du site (croît à chaque mouvement)"""
+    return await db.scalar(
+        select(func.coalesce(func.sum(StockSite.version), 0)).where(StockSite.site_id == site_id)
+    )
+
+
+@dataclass
+class _CachedDashboard:
+    version: int
+    day: date
+    expires_at: float
+    data: dict[str, Any]
+
+
+class StockDashboardCache:
+    """
+    Résumés par site, recalculés quand le stock du site change
+
+    Usage:
+        dashboards = StockDashboardCache()
+        data = await dashboards.get(db, site_id)
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries: dict[uuid_module.UUID, _CachedDashboard] = {}
+        self._locks: dict[uuid_module.UUID, asyncio.Lock] = {}
+
+    def _fresh(self, entry: Optional[_CachedDashboard], version, today: date) -> bool:
+        return (
+            entry is not None
+            and entry.version == version
+            and entry.day == today
+            and entry.expires_at > time_module.monotonic()
+        )
+
+    async def get(self, db: AsyncSession, site_id: uuid_module.UUID, today: Optional[date] = None) -> dict[str, Any]:
+        # Jour UTC, comme les bornes du mois précédent (_previous_month)
+        today = today or datetime.now(timezone.utc).date()
+        version = await site_stock_version(db, site_id)
+        if self._fresh(self._entries.get(site_id), version, today):
+            return self._entries[site_id].data
+
+        # Une seule requête de calcul par site et par version, même sous charge
+        async with self._locks.setdefault(site_id, asyncio.Lock()):
+            entry = self._entries.get(site_id)
+            if self._fresh(entry, version, today):
+                return entry.data
+            data = await compute_dashboard(db, site_id, today)
+            self._entries[site_id] = _CachedDashboard(version, today, time_module.monotonic() + self.ttl, data)
+            return data
+
@@ -0,0 +1,158 @@
+"""
+Prévision de consommation et points de commande
+
+Pour chaque stock (site, médicament) d'un tenant, les sorties des
+HISTORIQUE_JOURS derniers jours sont lues en UNE requête groupée par jour,
+puis rangées dans une matrice (stocks x jours) où les jours sans sortie
+valent 0. Tous les calculs sont vectorisés (NumPy) sur cette matrice:
+
+    moyenne, écart-type  = consommation journalière par stock
+    point de commande    = moyenne x L     + z x écart-type x racine(L)
+    niveau cible         = moyenne x (L+R) + z x écart-type x racine(L+R)
+
+avec L le délai de livraison, R la période entre deux commandes et z le
+facteur de sécurité (taux de service visé). Le point de commande sert de
+seuil d'alerte quand le pharmacien n'en a pas fixé (StockSite.seuil_alerte);
+la quantité suggérée d'une commande est niveau cible - stock - en commande.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+import uuid as uuid_module
+
+import numpy as np
+from sqlalchemy import Date, Integer, Numeric, cast, column, func, literal, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import StockMovement, StockSite, TypeMouvementEnum
+
+HISTORIQUE_JOURS = 90
+DELAI_LIVRAISON_JOURS = 14
+PERIODE_REVUE_JOURS = 30
+FACTEUR_SECURITE = 1.65  # Taux de service visé: 95%
+
+
+@dataclass
+class Forecast:
+    """Prévisions d'un ensemble de stocks (tableaux alignés)"""
+    moyenne: np.ndarray
+    ecart_type: np.ndarray
+    point_commande: np.ndarray
+    niveau_cible: np.ndarray
+
+
+def forecast_series(
+    series: np.ndarray,
+    days: np.ndarray,
+    quantities: np.ndarray,
+    n_series: int,
+    n_days: int = HISTORIQUE_JOURS,
+    delai: int = DELAI_LIVRAISON_JOURS,
+    revue: int = PERIODE_REVUE_JOURS,
+    z: float = FACTEUR_SECURITE,
+) -> Forecast:
+    """
+    Calcule les prévisions à partir des sorties journalières
+
+    Args:
+        series: indice du stock de chaque total journalier
+        days: indice du jour (0 = premier jour de l'historique)
+        quantities: quantité sortie ce jour-là
+    """
+    matrix = np.zeros((n_series, n_days))
+    np.add.at(matrix, (series, days), quantities)
+
+    moyenne = matrix.mean(axis=1)
+    ecart_type = matrix.std(axis=1, ddof=1) if n_days > 1 else np.zeros(n_series)
+    point_commande = np.ceil(moyenne * delai + z * ecart_type * np.sqrt(delai))
+    niveau_cible = np.ceil(moyenne * (delai + revue) + z * ecart_type * np.sqrt(delai + revue))
+    return Forecast(moyenne, ecart_type, point_commande.astype(int), niveau_cible.astype(int))
+
+
+async def refresh_tenant_forecasts(db: AsyncSession, tenant_id: uuid_module.UUID, today: date) -> int:
+    """
+    Recalcule les prévisions de tous les stocks d'un tenant (sans commit)
+
+    Returns:
+        nombre de stocks ayant une consommation sur la période
+    """
+    debut = today - timedelta(days=HISTORIQUE_JOURS)
+    periode = [datetime.combine(d, time.min, tzinfo=timezone.utc) for d in (debut, today)]
+    jour = cast(func.date_trunc("day", StockMovement.date_mouvement, "UTC"), Date)
+    result = await db.execute(
+        select(
+            StockSite.id,
+            (jour - cast(literal(debut), Date)).label("jour"),
+            func.sum(StockMovement.quantite),
+        )
+        .join(StockSite, (StockSite.site_id == StockMovement.site_id) & (StockSite.medicament_id == StockMovement.medicament_id))
+        .where(
+            StockMovement.tenant_id == tenant_id,
+            StockMovement.type_mouvement == TypeMouvementEnum.SORTIE,
+            StockMovement.date_mouvement >= periode[0],
+            StockMovement.date_mouvement < periode[1],
+        )
+        .group_by(StockSite.id, jour)
+    )
+    rows = result.all()
+    now = datetime.now(timezone.utc)
+
+    computed = []
+    if rows:
+        stock_ids, days, quantities = zip(*rows)
+        unique_ids, series = np.unique(np.array(stock_ids, dtype=object), return_inverse=True)
+        forecast = forecast_series(
+            series, np.array(days, dtype=np.int64), np.array(quantities, dtype=np.float64), len(unique_ids)
+        )
+        computed = list(zip(
+            unique_ids.tolist(),
+            np.round(forecast.moyenne, 3).tolist(),
+            np.round(forecast.ecart_type, 3).tolist(),
+            forecast.point_commande.tolist(),
+            forecast.niveau_cible.tolist(),
+        ))
+
+        previsions = values(
+            column("stock_id", UUID(as_uuid=True)),
+            column("moyenne", Numeric),
+            column("ecart_type", Numeric),
+            column("point_commande", Integer),
+            column("niveau_cible", Integer),
+            name="previsions",
+        ).data(computed)
+        # Paramètres d'un VALUES non typés par PostgreSQL (texte): cast explicite.
+        # updated_at conservé: une prévision ne doit pas réémettre le stock
+        # dans le flux de synchronisation des appareils
+        await db.execute(
+            update(StockSite)
+            .where(StockSite.id == previsions.c.stock_id)
+            .values(
+                consommation_journaliere=cast(previsions.c.moyenne, Numeric),
+                consommation_ecart_type=cast(previsions.c.ecart_type, Numeric),
+                point_commande=cast(previsions.c.point_commande, Integer),
+                niveau_cible=cast(previsions.c.niveau_cible, Integer),
+                prevision_calculee_at=now,
+                updated_at=StockSite.updated_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    # Stocks sans sortie sur la période: pas de prévision (seuil du médicament)
+    await db.execute(
+        update(StockSite)
+        .where(
+            StockSite.tenant_id == tenant_id,
+            StockSite.prevision_calculee_at.isnot(None),
+            StockSite.prevision_calculee_at < now,
+        )
+        .values(
+            consommation_journaliere=None,
+            consommation_ecart_type=None,
+            point_commande=None,
+            niveau_cible=None,
+            prevision_calculee_at=None,
+            updated_at=StockSite.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return len(computed)
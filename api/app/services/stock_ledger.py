@@ -0,0 +1,842 @@
+"""
+Registre des mouvements de stock (ledger)
+
+Chaque mouvement est appliqué en UNE instruction SQL:
+
+    WITH stock AS (
+        UPDATE stock_sites SET quantite_actuelle = quantite_actuelle - :q, ...
+        WHERE site_id = :site AND medicament_id = :med AND quantite_actuelle >= :q
+        RETURNING id, quantite_actuelle
+    ), mouvement AS (
+        INSERT INTO stock_movements (...) SELECT ... FROM stock RETURNING id
+    )
+    SELECT stock.id, stock.quantite_actuelle FROM stock, mouvement
+
+La condition "quantite_actuelle >= :q" est évaluée sur la ligne verrouillée
+par l'UPDATE: deux délivrances simultanées sont sérialisées par PostgreSQL,
+sans mise à jour perdue ni stock négatif. Si aucune ligne n'est touchée,
+soit le stock n'existe pas encore (créé par INSERT ... ON CONFLICT pour une
+entrée), soit il est insuffisant (400).
+
+Une délivrance de plusieurs lignes (apply_dispensing) verrouille d'abord
+toutes les lignes de stock concernées, dans l'ordre des medicament_id (ordre
+identique pour toutes les transactions: pas d'interblocage), vérifie les
+quantités, puis écrit le tout en quelques instructions: des UPDATE ... FROM
+(VALUES ...) et des INSERT multi-lignes. La réception d'un bon de commande
+(apply_reception) suit le même schéma en sens inverse, et un transfert entre
+deux sites (apply_transfer) combine les deux: débit et crédit dans la même
+transaction, verrous pris dans l'ordre (site_id, medicament_id). Les
+quantités sont prises sur les lots par ordre de péremption (FEFO, voir
+app/services/lot_allocation.py): une ligne demandée devient une ligne
+délivrée et un mouvement par lot. Une diminution saisie à l'unité
+(apply_movement: sortie, perte, péremption, ajustement négatif) verrouille
+de même le stock puis les lots, et décrémente le lot indiqué ou les lots
+FEFO avant l'UPDATE conditionnel.
+
+L'UPDATE renvoie aussi le seuil d'alerte effectif: un mouvement qui fait
+entrer ou sortir le stock d'une alerte met à jour stock_alerts dans la même
+transaction (voir app/services/stock_alerts.py), les autres n'écrivent rien
+de plus.
+"""
+import uuid as uuid_module
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, case, cast, column, func, insert, literal, literal_column, select, true, update, values
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import (
+    BonCommande,
+    BonCommandeLigne,
+    DelivranceLigne,
+    DelivrancePatient,
+    LotMedicament,
+    Medicament,
+    StockMovement,
+    StockSite,
+    StatutCommandeEnum,
+    TypeMouvementEnum,
+)
+from app.services.change_events import record_change
+from app.services.lot_allocation import FefoAllocator, LotAllocation, consume_lots, lock_lots
+from app.services.stock_alerts import SEUIL, clear_lot_alerts, crosses_threshold, sync_stock_alerts
+
+# Mouvements qui augmentent le stock
+INCREASING = {TypeMouvementEnum.ENTREE, TypeMouvementEnum.AJUSTEMENT_POSITIF, TypeMouvementEnum.TRANSFERT_ENTREE}
+# Mouvements écrits uniquement par apply_transfer (toujours par paire)
+TRANSFER_TYPES = {TypeMouvementEnum.TRANSFERT_SORTIE, TypeMouvementEnum.TRANSFERT_ENTREE}
+# Diminutions autorisées à rendre le stock négatif (correction d'inventaire)
+MAY_GO_NEGATIVE = {TypeMouvementEnum.AJUSTEMENT_NEGATIF}
+
+
+@dataclass
+class LedgerEntry:
+    """Mouvement enregistré et stock résultant"""
+    movement: StockMovement
+    stock_id: uuid_module.UUID
+    quantite_actuelle: int
+
+
+def signed_quantity(type_mouvement: TypeMouvementEnum, quantite: int) -> int:
+    return quantite if type_mouvement in INCREASING else -quantite
+
+
+# Seuil d'alerte effectif, renvoyé par l'UPDATE du stock
+_SEUIL_STOCK = func.coalesce(
+    StockSite.seuil_alerte,
+    StockSite.point_commande,
+    select(Medicament.seuil_alerte_defaut).where(Medicament.id == StockSite.medicament_id).scalar_subquery(),
+    0,
+)
+
+
+def _apply_statement(movement: StockMovement, delta: int, guard: bool):
+    """UPDATE conditionnel du stock + INSERT du mouvement (une instruction)"""
+    now = movement.created_at
+    values = {
+        StockSite.quantite_actuelle: StockSite.quantite_actuelle + delta,
+        StockSite.version: StockSite.version + 1,
+        StockSite.updated_at: now,
+    }
+    if delta > 0:
+        values[StockSite.derniere_entree] = now
+    else:
+        values[StockSite.derniere_sortie] = now
+
+    update_stock = (
+        StockSite.__table__.update()
+        .where(
+            StockSite.site_id == movement.site_id,
+            StockSite.medicament_id == movement.medicament_id,
+        )
+        .values(values)
+        .returning(StockSite.id, StockSite.quantite_actuelle, _SEUIL_STOCK.label("seuil"))
+    )
+    if guard:
+        update_stock = update_stock.where(StockSite.quantite_actuelle >= -delta)
+    stock = update_stock.cte("stock")
+
+    # Paramètres typés explicitement: dans un INSERT ... SELECT, PostgreSQL
+    # ne déduit pas leur type de la colonne cible
+    columns = [c for c in StockMovement.__table__.columns if getattr(movement, c.key) is not None]
+    insert_movement = (
+        StockMovement.__table__.insert()
+        .from_select(
+            [c.name for c in columns],
+            select(*(cast(literal(getattr(movement, c.key), c.type), c.type) for c in columns)).select_from(stock),
+        )
+        .returning(StockMovement.id)
+        .cte("mouvement")
+    )
+
+    return select(stock.c.id, stock.c.quantite_actuelle, stock.c.seuil).join_from(stock, insert_movement, true())
+
+
+async def _ensure_stock_row(db: AsyncSession, movement: StockMovement) -> None:
+    """
+    Crée la ligne de stock (quantité 0) si absente; 404 si le médicament n'existe pas
+
+    seuil_alerte reste NULL: il est réservé au seuil fixé par le pharmacien,
+    pour que le point de commande calculé prime sur le seuil par défaut.
+    """
+    exists = await db.scalar(select(Medicament.id).where(Medicament.id == movement.medicament_id))
+    if exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Médicament non trouvé"
+        )
+    await db.execute(
+        pg_insert(StockSite)
+        .values(
+            id=uuid_module.uuid4(),
+            site_id=movement.site_id,
+            tenant_id=movement.tenant_id,
+            medicament_id=movement.medicament_id,
+            quantite_actuelle=0,
+            version=1,
+            created_at=movement.created_at,
+            updated_at=movement.created_at,
+        )
+        .on_conflict_do_nothing(index_elements=[StockSite.site_id, StockSite.medicament_id])
+    )
+
+
+async def _allocate_decrease(
+    db: AsyncSession,
+    movement: StockMovement,
+) -> tuple[list[LotAllocation], list[uuid_module.UUID]]:
+    """
+    Répartit une diminution de stock sur les lots du site (lot imposé, sinon
+    FEFO puis part hors lot), après avoir verrouillé le stock puis les lots
+
+    Une sortie ne prend jamais sur un lot périmé; une perte, une péremption
+    ou un ajustement peut viser n'importe quel lot.
+
+    Returns:
+        (allocations, lots épuisés par le mouvement)
+
+    Raises:
+        HTTPException 400: lot inconnu, périmé ou insuffisant, ou stock non
+            périmé insuffisant pour une sortie
+    """
+    today = movement.date_mouvement.date()
+    sortie = movement.type_mouvement == TypeMouvementEnum.SORTIE
+    stock = (await lock_stocks(db, movement.site_id, [movement.medicament_id])).get(movement.medicament_id)
+    lots = (await lock_lots(db, movement.site_id, [movement.medicament_id])).get(movement.medicament_id, [])
+    restant = {lot.id: (lot.numero_lot, lot.date_peremption, lot.quantite_restante) for lot in lots}
+
+    allocator = FefoAllocator(lots, stock[1] if stock else 0, today if sortie else date.min)
+    allocations, reste = allocator.allocate(movement.quantite, movement.lot_id)
+    epuises = [lot.id for lot in lots if lot.quantite_restante == 0]
+    if not reste:
+        return allocations, epuises
+
+    if movement.lot_id is not None:
+        if movement.lot_id not in restant:
+            detail = "Lot inconnu ou épuisé pour ce médicament sur ce site"
+        elif sortie and restant[movement.lot_id][1] < today:
+            detail = f"Lot {restant[movement.lot_id][0]} périmé"
+        else:
+            detail = f"Stock du lot {restant[movement.lot_id][0]} insuffisant. Actuel: {restant[movement.lot_id][2]}, demandé: {movement.quantite}"
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    if sortie:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"Stock insuffisant. Disponible: {movement.quantite - reste}, demandé: {movement.quantite}"
+                + (f", périmés: {allocator.perimes}" if allocator.perimes else "")
+            )
+        )
+    # Perte ou péremption: le stock global tranche (garde de l'UPDATE);
+    # ajustement négatif: le reste est pris sur le compteur seul
+    return allocations, epuises
+
+
+async def apply_movement(
+    db: AsyncSession,
+    *,
+    site_id: uuid_module.UUID,
+    tenant_id: uuid_module.UUID,
+    medicament_id: uuid_module.UUID,
+    type_mouvement: TypeMouvementEnum,
+    quantite: int,
+    created_by: uuid_module.UUID,
+    lot_id: Optional[uuid_module.UUID] = None,
+    bon_commande_id: Optional[uuid_module.UUID] = None,
+    delivrance_id: Optional[uuid_module.UUID] = None,
+    reference_externe: Optional[str] = None,
+    commentaire: Optional[str] = None,
+) -> LedgerEntry:
+    """
+    Applique un mouvement de stock (sans commit: l'appelant commite)
+
+    Une diminution (sortie, perte, péremption, ajustement négatif) est aussi
+    prise sur les lots: sur `lot_id` s'il est fourni, sinon par ordre FEFO.
+
+    Raises:
+        HTTPException 400: stock insuffisant, lot inconnu, périmé (sortie) ou insuffisant
+        HTTPException 404: médicament inconnu
+    """
+    now = datetime.now(timezone.utc)
+    movement = StockMovement(
+        id=uuid_module.uuid4(),
+        type_mouvement=type_mouvement,
+        medicament_id=medicament_id,
+        site_id=site_id,
+        tenant_id=tenant_id,
+        created_by=created_by,
+        quantite=quantite,
+        lot_id=lot_id,
+        bon_commande_id=bon_commande_id,
+        delivrance_id=delivrance_id,
+        reference_externe=reference_externe,
+        commentaire=commentaire,
+        date_mouvement=now,
+        created_at=now,
+    )
+    delta = signed_quantity(type_mouvement, quantite)
+    guard = delta < 0 and type_mouvement not in MAY_GO_NEGATIVE
+
+    allocations, lots_epuises = await _allocate_decrease(db, movement) if delta < 0 else ([], [])
+    lots_entames = {part.lot_id for part in allocations}
+    if lot_id is None and len(lots_entames) == 1:
+        movement.lot_id = next(iter(lots_entames))  # None si pris hors lot
+    statement = _apply_statement(movement, delta, guard)
+
+    row = (await db.execute(statement)).first()
+    if row is None and not guard:
+        # Premier mouvement de ce médicament sur le site
+        await _ensure_stock_row(db, movement)
+        row = (await db.execute(statement)).first()
+
+    if row is None:
+        disponible = await db.scalar(
+            select(StockSite.quantite_actuelle).where(
+                StockSite.site_id == site_id,
+                StockSite.medicament_id == medicament_id,
+            )
+        )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Stock insuffisant. Actuel: {disponible or 0}, demandé: {quantite}"
+        )
+
+    await consume_lots(db, allocations)
+    await clear_lot_alerts(db, lots_epuises)
+    if crosses_threshold(row.quantite_actuelle - delta, row.quantite_actuelle, row.seuil):
+        await sync_stock_alerts(db, StockSite.id == row.id)
+
+    sync_session = db.sync_session
+    record_change(sync_session, str(site_id), "stock", row.id, "update", now)
+    record_change(sync_session, str(site_id), "stock_movement", movement.id, "create", now)
+
+    return LedgerEntry(movement=movement, stock_id=row.id, quantite_actuelle=row.quantite_actuelle)
+
+
+# ===========================================================================
+# DÉLIVRANCE MULTI-LIGNES
+# ===========================================================================
+
+@dataclass
+class DispensingLine:
+    """Ligne demandée d'une délivrance"""
+    medicament_id: uuid_module.UUID
+    quantite: int
+    lot_id: Optional[uuid_module.UUID] = None
+    instructions: Optional[str] = None
+
+
+@dataclass
+class DispensingResult:
+    """Lignes insérées (dicts de colonnes) et stock restant par médicament"""
+    lignes: list[dict]
+    stock_restant: dict[uuid_module.UUID, int]
+
+
+async def lock_site_stocks(
+    db: AsyncSession,
+    site_ids: Sequence[uuid_module.UUID],
+    medicament_ids: Sequence[uuid_module.UUID],
+) -> dict[uuid_module.UUID, dict[uuid_module.UUID, tuple]]:
+    """
+    Verrouille (FOR UPDATE) les stocks de un ou plusieurs sites, dans l'ordre
+    (site_id, medicament_id): ordre identique pour toutes les transactions
+
+    Returns:
+        {site_id: {medicament_id: (stock_id, quantite_actuelle, nom du médicament, seuil d'alerte)}}
+    """
+    result = await db.execute(
+        select(
+            StockSite.site_id, StockSite.medicament_id, StockSite.id, StockSite.quantite_actuelle,
+            Medicament.nom, SEUIL.label("seuil"),
+        )
+        .join(Medicament, StockSite.medicament_id == Medicament.id)
+        .where(
+            StockSite.site_id.in_(sorted(set(site_ids))),
+            StockSite.medicament_id.in_(sorted(set(medicament_ids))),
+        )
+        .order_by(StockSite.site_id, StockSite.medicament_id)
+        .with_for_update(of=StockSite)
+    )
+    stocks: dict[uuid_module.UUID, dict[uuid_module.UUID, tuple]] = defaultdict(dict)
+    for row in result:
+        stocks[row.site_id][row.medicament_id] = (row.id, row.quantite_actuelle, row.nom, row.seuil)
+    return stocks
+
+
+async def lock_stocks(
+    db: AsyncSession,
+    site_id: uuid_module.UUID,
+    medicament_ids: Sequence[uuid_module.UUID],
+) -> dict[uuid_module.UUID, tuple]:
+    """
+    Verrouille (FOR UPDATE) les stocks d'un site, dans l'ordre des medicament_id
+
+    Returns:
+        {medicament_id: (stock_id, quantite_actuelle, nom du médicament, seuil d'alerte)}
+    """
+    return (await lock_site_stocks(db, [site_id], medicament_ids)).get(site_id, {})
+
+
+def _allocate_fefo(
+    lines: Sequence,
+    demande: dict[uuid_module.UUID, int],
+    stocks: dict[uuid_module.UUID, tuple],
+    lots: dict,
+    today: date,
+) -> list[list[LotAllocation]]:
+    """
+    Répartit les lignes demandées sur les lots verrouillés (lots imposés
+    d'abord, le reste en FEFO)
+
+    Raises:
+        HTTPException 400: stock insuffisant (lots périmés exclus), avec la
+            liste des ruptures
+    """
+    allocators = {
+        medicament_id: FefoAllocator(lots.get(medicament_id, []), stock[1], today)
+        for medicament_id, stock in stocks.items()
+    }
+    disponible = {medicament_id: allocator.disponible for medicament_id, allocator in allocators.items()}
+
+    allocations: list[list[LotAllocation]] = [[] for _ in lines]
+    manquant: dict[uuid_module.UUID, int] = defaultdict(int)
+    for index in sorted(range(len(lines)), key=lambda i: lines[i].lot_id is None):
+        line = lines[index]
+        allocator = allocators.get(line.medicament_id)
+        if allocator is None:
+            manquant[line.medicament_id] += line.quantite
+            continue
+        allocations[index], reste = allocator.allocate(line.quantite, line.lot_id)
+        if reste:
+            manquant[line.medicament_id] += reste
+
+    ruptures = []
+    for medicament_id, quantite in sorted(demande.items()):
+        stock = stocks.get(medicament_id)
+        if medicament_id not in manquant and stock[1] >= quantite:
+            continue
+        nom = stock[2] if stock else str(medicament_id)
+        rupture = f"{nom} (disponible: {disponible.get(medicament_id, 0)}, demandé: {quantite}"
+        perimes = allocators[medicament_id].perimes if stock else 0
+        ruptures.append(rupture + (f", périmés: {perimes})" if perimes else ")"))
+    if ruptures:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Stock insuffisant: {', '.join(ruptures)}"
+        )
+    return allocations
+
+
+async def apply_dispensing(
+    db: AsyncSession,
+    delivrance: DelivrancePatient,
+    lines: Sequence[DispensingLine],
+) -> DispensingResult:
+    """
+    Enregistre une délivrance et ses lignes et décrémente les stocks (sans commit)
+
+    Toutes les lignes passent ou aucune: si un médicament manque (lots
+    périmés exclus), la délivrance est refusée (400) avec la liste des
+    ruptures. Les colonnes de `delivrance` (objet non ajouté à la session)
+    doivent être remplies, dates comprises.
+    """
+    demande: dict[uuid_module.UUID, int] = defaultdict(int)
+    for line in lines:
+        demande[line.medicament_id] += line.quantite
+
+    # Verrous: stocks puis lots, chacun dans l'ordre des medicament_id
+    stocks = await lock_stocks(db, delivrance.site_id, list(demande))
+    lots = await lock_lots(db, delivrance.site_id, list(demande))
+
+    allocations = _allocate_fefo(lines, demande, stocks, lots, delivrance.date_delivrance.date())
+
+    # Stocks horodatés une fois les verrous obtenus (xid attribué): le flux
+    # /sync/changes ne dépasse pas le début d'une transaction d'écriture en cours
+    stamped_at = datetime.now(timezone.utc)
+    now = delivrance.date_delivrance
+    decrements = values(
+        column("stock_id", UUID(as_uuid=True)), column("quantite", Integer), name="demande"
+    ).data([(stocks[medicament_id][0], quantite) for medicament_id, quantite in sorted(demande.items())])
+    await db.execute(
+        update(StockSite)
+        .where(StockSite.id == decrements.c.stock_id)
+        .values(
+            # Paramètres d'un VALUES non typés par PostgreSQL (texte): cast explicite
+            quantite_actuelle=StockSite.quantite_actuelle - cast(decrements.c.quantite, Integer),
+            derniere_sortie=now,
+            version=StockSite.version + 1,
+            updated_at=stamped_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    await consume_lots(db, [part for parts in allocations for part in parts])
+
+    # Alertes: stocks ayant franchi leur seuil, lots épuisés
+    franchis = [
+        stocks[medicament_id][0]
+        for medicament_id, quantite in demande.items()
+        if crosses_threshold(stocks[medicament_id][1], stocks[medicament_id][1] - quantite, stocks[medicament_id][3])
+    ]
+    if franchis:
+        await sync_stock_alerts(db, StockSite.id.in_(franchis))
+    await clear_lot_alerts(db, [
+        lot.id for lots_medicament in lots.values() for lot in lots_medicament if lot.quantite_restante == 0
+    ])
+
+    await db.execute(insert(DelivrancePatient).values(
+        {c.key: getattr(delivrance, c.key) for c in DelivrancePatient.__table__.columns}
+    ))
+    # Une ligne (et un mouvement) par lot entamé
+    lignes = [
+        {
+            "id": uuid_module.uuid4(), "delivrance_id": delivrance.id, "medicament_id": line.medicament_id,
+            "lot_id": part.lot_id, "quantite": part.quantite, "instructions": line.instructions, "created_at": now,
+        }
+        for line, parts in zip(lines, allocations)
+        for part in parts
+    ]
+    await db.execute(insert(DelivranceLigne).values(lignes))
+    movements = [
+        {
+            "id": uuid_module.uuid4(), "type_mouvement": TypeMouvementEnum.SORTIE,
+            "medicament_id": ligne["medicament_id"], "site_id": delivrance.site_id, "tenant_id": delivrance.tenant_id,
+            "lot_id": ligne["lot_id"], "delivrance_id": delivrance.id, "created_by": delivrance.delivered_by,
+            "quantite": ligne["quantite"], "date_mouvement": now, "created_at": now,
+            "reference_externe": None, "commentaire": None, "bon_commande_id": None,
+        }
+        for ligne in lignes
+    ]
+    await db.execute(insert(StockMovement).values(movements))
+
+    sync_session = db.sync_session
+    scope = str(delivrance.site_id)
+    record_change(sync_session, scope, "delivrance", delivrance.id, "create", now)
+    for medicament_id in demande:
+        record_change(sync_session, scope, "stock", stocks[medicament_id][0], "update", stamped_at)
+    for movement in movements:
+        record_change(sync_session, scope, "stock_movement", movement["id"], "create", now)
+
+    return DispensingResult(
+        lignes=lignes,
+        stock_restant={m: stocks[m][1] - quantite for m, quantite in demande.items()},
+    )
+
+
+# ===========================================================================
+# RÉCEPTION D'UN BON DE COMMANDE
+# ===========================================================================
+
+@dataclass
+class ReceptionLine:
+    """Lot reçu pour une ligne de bon de commande"""
+    ligne_id: uuid_module.UUID
+    quantite: int
+    numero_lot: str
+    date_peremption: date
+    prix_unitaire: Optional[Decimal] = None
+
+
+@dataclass
+class ReceptionResult:
+    """Lots créés (dicts de colonnes) et stock résultant par médicament"""
+    lots: list[dict]
+    stock_restant: dict[uuid_module.UUID, int]
+
+
+async def _ensure_stock_rows(
+    db: AsyncSession,
+    site_id: uuid_module.UUID,
+    tenant_id: uuid_module.UUID,
+    medicament_ids: Sequence[uuid_module.UUID],
+) -> None:
+    """Crée en une instruction les lignes de stock absentes (quantité 0, sans seuil fixé)"""
+    uuid_type = UUID(as_uuid=True)
+    await db.execute(
+        pg_insert(StockSite)
+        .from_select(
+            ["id", "site_id", "tenant_id", "medicament_id", "quantite_actuelle", "version",
+             "created_at", "updated_at"],
+            select(
+                func.gen_random_uuid(),
+                cast(literal(site_id, uuid_type), uuid_type),
+                cast(literal(tenant_id, uuid_type), uuid_type),
+                Medicament.id,
+                literal_column("0"),
+                literal_column("1"),
+                func.now(),
+                func.now(),
+            ).where(Medicament.id.in_(sorted(set(medicament_ids)))),
+        )
+        .on_conflict_do_nothing(index_elements=[StockSite.site_id, StockSite.medicament_id])
+    )
+
+
+async def apply_reception(
+    db: AsyncSession,
+    bon: BonCommande,
+    lines: Sequence[ReceptionLine],
+    created_by: uuid_module.UUID,
+    date_reception: date,
+) -> ReceptionResult:
+    """
+    Enregistre la livraison d'un bon de commande (sans commit)
+
+    `bon` doit être verrouillé par l'appelant (FOR UPDATE) et ses lignes
+    chargées. Pour chaque lot reçu: une ligne lots_medicament et un
+    mouvement d'entrée; les stocks sont incrémentés en une instruction.
+    quantite_recue, le statut (en_cours ou livree) et la date de livraison
+    effective sont mis à jour sur les objets du bon.
+
+    Raises:
+        HTTPException 400: ligne inconnue, quantité supérieure au reste à
+            recevoir, lot périmé
+    """
+    lignes = {ligne.id: ligne for ligne in bon.lignes}
+    recu: dict[uuid_module.UUID, int] = defaultdict(int)
+    erreurs = []
+    for line in lines:
+        if line.ligne_id not in lignes:
+            erreurs.append(f"ligne {line.ligne_id} absente du bon")
+            continue
+        if line.date_peremption < date_reception:
+            erreurs.append(f"lot {line.numero_lot} périmé ({line.date_peremption.isoformat()})")
+        recu[line.ligne_id] += line.quantite
+    for ligne_id, quantite in recu.items():
+        ligne = lignes[ligne_id]
+        reste = ligne.quantite_commandee - ligne.quantite_recue
+        if quantite > reste:
+            erreurs.append(f"ligne {ligne_id} (reste à recevoir: {reste}, reçu: {quantite})")
+    if erreurs:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Réception invalide: {', '.join(erreurs)}"
+        )
+
+    entree: dict[uuid_module.UUID, int] = defaultdict(int)
+    for line in lines:
+        entree[lignes[line.ligne_id].medicament_id] += line.quantite
+
+    await _ensure_stock_rows(db, bon.site_id, bon.tenant_id, list(entree))
+    stocks = await lock_stocks(db, bon.site_id, list(entree))
+
+    now = datetime.now(timezone.utc)
+    increments = values(
+        column("stock_id", UUID(as_uuid=True)), column("quantite", Integer), name="entree"
+    ).data([(stocks[medicament_id][0], quantite) for medicament_id, quantite in sorted(entree.items())])
+    await db.execute(
+        update(StockSite)
+        .where(StockSite.id == increments.c.stock_id)
+        .values(
+            quantite_actuelle=StockSite.quantite_actuelle + cast(increments.c.quantite, Integer),
+            derniere_entree=now,
+            version=StockSite.version + 1,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    lots = [
+        {
+            "id": uuid_module.uuid4(), "medicament_id": lignes[line.ligne_id].medicament_id,
+            "site_id": bon.site_id, "tenant_id": bon.tenant_id, "bon_commande_ligne_id": line.ligne_id,
+            "numero_lot": line.numero_lot, "date_peremption": line.date_peremption,
+            "quantite_restante": line.quantite,
+            "prix_achat_unitaire": line.prix_unitaire if line.prix_unitaire is not None
+            else lignes[line.ligne_id].prix_unitaire,
+            "created_at": now, "updated_at": now,
+        }
+        for line in lines
+    ]
+    await db.execute(insert(LotMedicament).values(lots))
+    movements = [
+        {
+            "id": uuid_module.uuid4(), "type_mouvement": TypeMouvementEnum.ENTREE,
+            "medicament_id": lot["medicament_id"], "site_id": bon.site_id, "tenant_id": bon.tenant_id,
+            "lot_id": lot["id"], "bon_commande_id": bon.id, "created_by": created_by,
+            "quantite": lot["quantite_restante"], "date_mouvement": now, "created_at": now,
+            "reference_externe": bon.numero, "commentaire": None, "delivrance_id": None,
+        }
+        for lot in lots
+    ]
+    await db.execute(insert(StockMovement).values(movements))
+
+    for ligne_id, quantite in recu.items():
+        lignes[ligne_id].quantite_recue += quantite
+        lignes[ligne_id].updated_at = now
+    complete = all(ligne.quantite_recue >= ligne.quantite_commandee for ligne in lignes.values())
+    bon.statut = StatutCommandeEnum.LIVREE if complete else StatutCommandeEnum.EN_COURS
+    if complete:
+        bon.date_livraison_effective = date_reception
+    bon.updated_at = now
+
+    franchis = [
+        stocks[medicament_id][0]
+        for medicament_id, quantite in entree.items()
+        if crosses_threshold(stocks[medicament_id][1], stocks[medicament_id][1] + quantite, stocks[medicament_id][3])
+    ]
+    if franchis:
+        await sync_stock_alerts(db, StockSite.id.in_(franchis))
+
+    sync_session = db.sync_session
+    scope = str(bon.site_id)
+    for medicament_id in entree:
+        record_change(sync_session, scope, "stock", stocks[medicament_id][0], "update", now)
+    for movement in movements:
+        record_change(sync_session, scope, "stock_movement", movement["id"], "create", now)
+
+    return ReceptionResult(
+        lots=lots,
+        stock_restant={m: stocks[m][1] + quantite for m, quantite in entree.items()},
+    )
+
+
+# ===========================================================================
+# TRANSFERT ENTRE SITES
+# ===========================================================================
+
+@dataclass
+class TransferLine:
+    """Ligne demandée d'un transfert"""
+    medicament_id: uuid_module.UUID
+    quantite: int
+    lot_id: Optional[uuid_module.UUID] = None
+
+
+@dataclass
+class TransferResult:
+    """Parts transférées (une par lot entamé) et stocks résultants des deux sites"""
+    lignes: list[dict]
+    stock_source: dict[uuid_module.UUID, int]
+    stock_destination: dict[uuid_module.UUID, int]
+
+
+async def apply_transfer(
+    db: AsyncSession,
+    *,
+    source_site_id: uuid_module.UUID,
+    destination_site_id: uuid_module.UUID,
+    tenant_id: uuid_module.UUID,
+    lines: Sequence[TransferLine],
+    created_by: uuid_module.UUID,
+    numero: str,
+    commentaire: Optional[str] = None,
+) -> TransferResult:
+    """
+    Transfère du stock d'un site à un autre (sans commit)
+
+    Le site source est débité et le site destination crédité dans la même
+    transaction, en une instruction pour tous les stocks. Chaque lot source
+    entamé (FEFO, ou lot imposé) est recopié sur le site destination (même
+    numéro, péremption et prix d'achat); la part hors lot reste hors lot.
+    Un mouvement transfert_sortie et un transfert_entree par lot entamé,
+    avec le numéro du transfert en référence.
+
+    Verrous: les stocks des DEUX sites en une requête, triés par (site_id,
+    medicament_id), puis les lots du site source. Deux transferts de sens
+    opposés entre les mêmes sites verrouillent dans le même ordre.
+
+    Raises:
+        HTTPException 400: stock insuffisant au site source
+    """
+    demande: dict[uuid_module.UUID, int] = defaultdict(int)
+    for line in lines:
+        demande[line.medicament_id] += line.quantite
+
+    await _ensure_stock_rows(db, destination_site_id, tenant_id, list(demande))
+    stocks = await lock_site_stocks(db, [source_site_id, destination_site_id], list(demande))
+    source, destination = stocks[source_site_id], stocks[destination_site_id]
+    lots = await lock_lots(db, source_site_id, list(demande))
+
+    now = datetime.now(timezone.utc)
+    allocations = _allocate_fefo(lines, demande, source, lots, now.date())
+
+    deltas: dict[uuid_module.UUID, int] = {}
+    for medicament_id, quantite in demande.items():
+        deltas[source[medicament_id][0]] = -quantite
+        deltas[destination[medicament_id][0]] = quantite
+    transfert = values(
+        column("stock_id", UUID(as_uuid=True)), column("delta", Integer), name="transfert"
+    ).data(sorted(deltas.items()))
+    delta = cast(transfert.c.delta, Integer)
+    await db.execute(
+        update(StockSite)
+        .where(StockSite.id == transfert.c.stock_id)
+        .values(
+            quantite_actuelle=StockSite.quantite_actuelle + delta,
+            derniere_entree=case((delta > 0, now), else_=StockSite.derniere_entree),
+            derniere_sortie=case((delta < 0, now), else_=StockSite.derniere_sortie),
+            version=StockSite.version + 1,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    await consume_lots(db, [part for parts in allocations for part in parts])
+
+    # Une part par lot entamé; copie du lot source sur le site destination
+    lignes = [
+        {
+            "medicament_id": line.medicament_id, "quantite": part.quantite, "lot_source_id": part.lot_id,
+            "lot_destination_id": uuid_module.uuid4() if part.lot_id is not None else None,
+        }
+        for line, parts in zip(lines, allocations)
+        for part in parts
+    ]
+    copies = [
+        (ligne["lot_source_id"], ligne["lot_destination_id"], ligne["quantite"])
+        for ligne in lignes if ligne["lot_source_id"] is not None
+    ]
+    if copies:
+        uuid_type = UUID(as_uuid=True)
+        copie = values(
+            column("source_id", uuid_type), column("lot_id", uuid_type), column("quantite", Integer), name="copie"
+        ).data(copies)
+        await db.execute(
+            insert(LotMedicament).from_select(
+                ["id", "medicament_id", "site_id", "tenant_id", "bon_commande_ligne_id", "numero_lot",
+                 "date_peremption", "quantite_restante", "prix_achat_unitaire", "created_at", "updated_at"],
+                select(
+                    copie.c.lot_id,
+                    LotMedicament.medicament_id,
+                    cast(literal(destination_site_id, uuid_type), uuid_type),
+                    cast(literal(tenant_id, uuid_type), uuid_type),
+                    LotMedicament.bon_commande_ligne_id,
+                    LotMedicament.numero_lot,
+                    LotMedicament.date_peremption,
+                    cast(copie.c.quantite, Integer),
+                    LotMedicament.prix_achat_unitaire,
+                    func.now(),
+                    func.now(),
+                ).join_from(LotMedicament, copie, LotMedicament.id == copie.c.source_id),
+            )
+        )
+
+    movements = []
+    for ligne in lignes:
+        for type_mouvement, site_id, lot_id in (
+            (TypeMouvementEnum.TRANSFERT_SORTIE, source_site_id, ligne["lot_source_id"]),
+            (TypeMouvementEnum.TRANSFERT_ENTREE, destination_site_id, ligne["lot_destination_id"]),
+        ):
+            movements.append({
+                "id": uuid_module.uuid4(), "type_mouvement": type_mouvement,
+                "medicament_id": ligne["medicament_id"], "site_id": site_id, "tenant_id": tenant_id,
+                "lot_id": lot_id, "created_by": created_by, "quantite": ligne["quantite"],
+                "date_mouvement": now, "created_at": now, "reference_externe": numero,
+                "commentaire": commentaire, "bon_commande_id": None, "delivrance_id": None,
+            })
+    await db.execute(insert(StockMovement).values(movements))
+
+    # Alertes: stocks ayant franchi leur seuil (deux sites), lots source épuisés
+    franchis = []
+    for medicament_id, quantite in demande.items():
+        for stock, apres in (
+            (source[medicament_id], source[medicament_id][1] - quantite),
+            (destination[medicament_id], destination[medicament_id][1] + quantite),
+        ):
+            if crosses_threshold(stock[1], apres, stock[3]):
+                franchis.append(stock[0])
+    if franchis:
+        await sync_stock_alerts(db, StockSite.id.in_(franchis))
+    await clear_lot_alerts(db, [
+        lot.id for lots_medicament in lots.values() for lot in lots_medicament if lot.quantite_restante == 0
+    ])
+
+    sync_session = db.sync_session
+    for site_id, stocks_site in ((source_site_id, source), (destination_site_id, destination)):
+        for medicament_id in demande:
+            record_change(sync_session, str(site_id), "stock", stocks_site[medicament_id][0], "update", now)
+    for movement in movements:
+        record_change(sync_session, str(movement["site_id"]), "stock_movement", movement["id"], "create", now)
+
+    return TransferResult(
+        lignes=lignes,
+        stock_source={m: source[m][1] - quantite for m, quantite in demande.items()},
+        stock_destination={m: destination[m][1] + quantite for m, quantite in demande.items()},
+    )
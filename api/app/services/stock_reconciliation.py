@@ -0,0 +1,177 @@
+"""
+Rapprochement des stocks avec le registre des mouvements
+
+StockSite.quantite_actuelle est un compteur dénormalisé: la source de vérité
+est la somme signée des mouvements (stock_movements). Pour ne pas rejouer
+tout l'historique, des arrêtés mensuels (stock_snapshots) figent le solde
+de chaque stock au 1er du mois; un solde se calcule alors en UNE requête
+groupée:
+
+    solde(stock, t) = dernier arrêté <= t + mouvements de [arrêté, t)
+
+Le même calcul sert au rapprochement nocturne (écarts entre compteur et
+registre, signalés ou corrigés), à l'écriture des arrêtés et aux requêtes
+"stock à la date X".
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+import uuid as uuid_module
+
+from sqlalchemy import DateTime, Integer, and_, case, cast, column, func, literal, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import StockMovement, StockSite, StockSnapshot
+from app.services.stock_alerts import sync_stock_alerts
+from app.services.stock_ledger import INCREASING
+
+SIGNED_QUANTITY = case(
+    (StockMovement.type_mouvement.in_(sorted(INCREASING)), StockMovement.quantite),
+    else_=-StockMovement.quantite,
+)
+
+
+def month_start(moment: datetime) -> datetime:
+    """Début du mois (UTC) contenant `moment`: date des arrêtés mensuels"""
+    moment = moment.astimezone(timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def balances_query(
+    at: Optional[datetime] = None,
+    site_id: Optional[uuid_module.UUID] = None,
+    medicament_id: Optional[uuid_module.UUID] = None,
+):
+    """
+    Solde de chaque stock selon le registre, à la date `at` (None: maintenant)
+
+    Colonnes: stock_id, site_id, tenant_id, medicament_id, quantite_actuelle
+    (compteur), quantite (registre).
+    """
+    snapshots = (
+        select(StockSnapshot.site_id, StockSnapshot.medicament_id, StockSnapshot.arrete_au, StockSnapshot.quantite)
+        .distinct(StockSnapshot.site_id, StockSnapshot.medicament_id)
+        .order_by(StockSnapshot.site_id, StockSnapshot.medicament_id, StockSnapshot.arrete_au.desc())
+    )
+    stocks = []
+    if at is not None:
+        snapshots = snapshots.where(StockSnapshot.arrete_au <= at)
+    if site_id is not None:
+        snapshots = snapshots.where(StockSnapshot.site_id == site_id)
+        stocks.append(StockSite.site_id == site_id)
+    if medicament_id is not None:
+        snapshots = snapshots.where(StockSnapshot.medicament_id == medicament_id)
+        stocks.append(StockSite.medicament_id == medicament_id)
+    arrete = snapshots.subquery("arrete")
+
+    tail = [
+        StockMovement.site_id == StockSite.site_id,
+        StockMovement.medicament_id == StockSite.medicament_id,
+        or_(arrete.c.arrete_au.is_(None), StockMovement.date_mouvement >= arrete.c.arrete_au),
+    ]
+    if at is not None:
+        tail.append(StockMovement.date_mouvement < at)
+
+    return (
+        select(
+            StockSite.id.label("stock_id"),
+            StockSite.site_id,
+            StockSite.tenant_id,
+            StockSite.medicament_id,
+            StockSite.quantite_actuelle,
+            (func.coalesce(arrete.c.quantite, 0) + func.coalesce(func.sum(SIGNED_QUANTITY), 0)).label("quantite"),
+        )
+        .outerjoin(arrete, and_(
+            arrete.c.site_id == StockSite.site_id,
+            arrete.c.medicament_id == StockSite.medicament_id,
+        ))
+        .outerjoin(StockMovement, and_(*tail))
+        .where(*stocks)
+        .group_by(StockSite.id, arrete.c.quantite)
+    )
+
+
+# ===========================================================================
+# RAPPROCHEMENT
+# ===========================================================================
+
+@dataclass
+class StockDrift:
+    """Écart entre le compteur d'un stock et le registre"""
+    stock_id: uuid_module.UUID
+    site_id: uuid_module.UUID
+    medicament_id: uuid_module.UUID
+    compteur: int
+    registre: int
+
+    @property
+    def ecart(self) -> int:
+        return self.registre - self.compteur
+
+
+async def find_drift(db: AsyncSession, site_id: Optional[uuid_module.UUID] = None) -> list[StockDrift]:
+    """Stocks dont le compteur diffère du registre (compteur et registre lus dans la même requête)"""
+    balances = balances_query(site_id=site_id).subquery("soldes")
+    result = await db.execute(
+        select(balances).where(balances.c.quantite_actuelle != balances.c.quantite)
+    )
+    return [
+        StockDrift(row.stock_id, row.site_id, row.medicament_id, row.quantite_actuelle, row.quantite)
+        for row in result
+    ]
+
+
+async def fix_drift(db: AsyncSession, drifts: list[StockDrift]) -> None:
+    """
+    Aligne les compteurs sur le registre (sans commit)
+
+    L'écart est ajouté au compteur plutôt que d'écraser sa valeur: un
+    mouvement enregistré entre la lecture et la correction modifie le
+    compteur et le registre de la même quantité, l'écart reste juste.
+    """
+    if not drifts:
+        return
+    now = datetime.now(timezone.utc)
+    corrections = values(
+        column("stock_id", UUID(as_uuid=True)), column("ecart", Integer), name="corrections"
+    ).data([(drift.stock_id, drift.ecart) for drift in drifts])
+    await db.execute(
+        update(StockSite)
+        .where(StockSite.id == corrections.c.stock_id)
+        .values(
+            quantite_actuelle=StockSite.quantite_actuelle + cast(corrections.c.ecart, Integer),
+            version=StockSite.version + 1,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await sync_stock_alerts(db, StockSite.id.in_([drift.stock_id for drift in drifts]))
+
+
+# ===========================================================================
+# ARRÊTÉS MENSUELS
+# ===========================================================================
+
+async def snapshot_exists(db: AsyncSession, arrete_au: datetime) -> bool:
+    found = await db.scalar(select(StockSnapshot.id).where(StockSnapshot.arrete_au == arrete_au).limit(1))
+    return found is not None
+
+
+async def write_snapshots(db: AsyncSession, arrete_au: datetime) -> int:
+    """Écrit (ou réécrit) l'arrêté de tous les stocks à la date donnée (sans commit)"""
+    balances = balances_query(at=arrete_au).where(StockSite.created_at < arrete_au).subquery("soldes")
+    at = cast(literal(arrete_au, DateTime(timezone=True)), DateTime(timezone=True))
+    statement = pg_insert(StockSnapshot).from_select(
+        ["id", "site_id", "tenant_id", "medicament_id", "arrete_au", "quantite", "created_at"],
+        select(
+            func.gen_random_uuid(), balances.c.site_id, balances.c.tenant_id, balances.c.medicament_id,
+            at, balances.c.quantite, func.now(),
+        ),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[StockSnapshot.site_id, StockSnapshot.medicament_id, StockSnapshot.arrete_au],
+        set_={"quantite": statement.excluded.quantite},
+    )
+    result = await db.execute(statement)
+    return result.rowcount
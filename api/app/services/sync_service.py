@@ -0,0 +1,464 @@
+"""
+Service de synchronisation offline
+
+- Watermark par site: horodatage de la dernière modification visible par le site
+- Flux de changements incrémental (/sync/changes) à partir d'un curseur
+  (horodatage, id), les ex æquo sur l'horodatage étant départagés par l'id
+- Horizon de visibilité: flux et watermark s'arrêtent avant le début de la
+  plus ancienne transaction d'écriture en cours
+- Snapshots de bootstrap compressés (gzip) pour les nouveaux appareils
+"""
+import gzip
+import json
+import os
+import uuid as uuid_module
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import structlog
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import DateTime, column, func, inspect, select, table, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import (
+    Condition,
+    Encounter,
+    MedicationRequest,
+    Patient,
+    Procedure,
+    Reference,
+)
+from app.models.inventory import Medicament, StockSite
+from app.models.sync import SyncSession
+from app.schemas import EntityType, SyncChange, SyncOperationType
+
+logger = structlog.get_logger()
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Id maximal: un curseur sans id couvre toutes les lignes de son horodatage
+LAST_ID = uuid_module.UUID(int=(1 << 128) - 1)
+CURSOR_ID_SEPARATOR = "~"
+
+# Sites dont le snapshot est en cours de construction (par processus)
+_snapshots_in_progress: set[uuid_module.UUID] = set()
+
+# Vue système des connexions (transactions en cours)
+_PG_STAT_ACTIVITY = table(
+    "pg_stat_activity",
+    column("pid"),
+    column("datname"),
+    column("backend_xid"),
+    column("xact_start", DateTime(timezone=True)),
+)
+
+
+# ===========================================================================
+# CURSEURS
+# ===========================================================================
+
+def format_cursor(value: Optional[datetime]) -> str:
+    """Formate un horodatage en curseur ISO 8601 (UTC)"""
+    if value is None:
+        value = EPOCH
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def parse_cursor(cursor: Optional[str]) -> datetime:
+    """
+    Décode un curseur ISO 8601
+
+    Raises:
+        ValueError si le curseur est invalide
+    """
+    if not cursor:
+        return EPOCH
+    value = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def format_change_cursor(value: Optional[datetime], row_id: uuid_module.UUID) -> str:
+    """Formate la position (horodatage, id) d'une ligne du flux de changements"""
+    return f"{format_cursor(value)}{CURSOR_ID_SEPARATOR}{row_id}"
+
+
+def parse_change_cursor(cursor: Optional[str]) -> tuple[datetime, uuid_module.UUID]:
+    """
+    Décode un curseur du flux en (horodatage, id)
+
+    Un curseur réduit à un horodatage (snapshot, notification, ancien client)
+    désigne la fin de cet horodatage: les lignes de même horodatage sont
+    considérées comme déjà reçues.
+
+    Raises:
+        ValueError si le curseur est invalide
+    """
+    value, separator, row_id = (cursor or "").partition(CURSOR_ID_SEPARATOR)
+    return parse_cursor(value), uuid_module.UUID(row_id) if separator else LAST_ID
+
+
+def entity_to_dict(obj: Any) -> dict:
+    """Convertit une entité ORM en dict JSON-compatible (colonnes uniquement, sans relations)"""
+    return jsonable_encoder({
+        attr.key: getattr(obj, attr.key)
+        for attr in inspect(obj).mapper.column_attrs
+        if not attr.deferred  # Colonnes techniques (ex: search_text)
+    })
+
+
+# ===========================================================================
+# HORIZON DE VISIBILITÉ
+# ===========================================================================
+
+async def get_visibility_horizon(db: AsyncSession) -> datetime:
+    """
+    Horodatage en deçà duquel aucune écriture ne peut plus être validée
+
+    Les horodatages du flux (updated_at, created_at) sont posés avant le
+    commit: une transaction encore ouverte peut valider plus tard des lignes
+    antérieures à celles déjà visibles. L'horizon est le début de la plus
+    ancienne transaction d'écriture en cours (xid attribué), ou l'instant
+    présent s'il n'y en a pas, moins SYNC_VISIBILITY_MARGIN_SECONDS pour
+    les horodatages pris juste avant l'attribution de l'xid.
+
+    Le rôle applicatif ne voit que ses propres connexions dans
+    pg_stat_activity (ou toutes avec pg_read_all_stats): les écritures
+    doivent passer par ce rôle.
+    """
+    activity = _PG_STAT_ACTIVITY
+    oldest_write = (
+        select(func.min(activity.c.xact_start))
+        .where(
+            activity.c.backend_xid.is_not(None),
+            activity.c.pid != func.pg_backend_pid(),
+            activity.c.datname == func.current_database(),
+        )
+        .scalar_subquery()
+    )
+    # LEAST ignore les NULL en PostgreSQL
+    horizon = (await db.execute(select(func.least(func.clock_timestamp(), oldest_write)))).scalar_one()
+    return horizon - timedelta(seconds=settings.SYNC_VISIBILITY_MARGIN_SECONDS)
+
+
+# ===========================================================================
+# WATERMARK
+# ===========================================================================
+
+async def get_site_watermark(db: AsyncSession, site_id: uuid_module.UUID) -> datetime:
+    """
+    Calcule le watermark d'un site en une seule requête:
+    le plus récent horodatage parmi les données incluses dans le snapshot,
+    borné par l'horizon de visibilité (les lignes validées ensuite avec un
+    horodatage antérieur restent au-delà du curseur du snapshot).
+    """
+    candidates = [
+        select(func.max(Patient.updated_at)).where(Patient.site_id == site_id),
+        select(func.max(Encounter.updated_at)).where(Encounter.site_id == site_id),
+        select(func.max(Condition.created_at))
+        .join(Encounter, Condition.encounter_id == Encounter.id)
+        .where(Encounter.site_id == site_id),
+        select(func.max(MedicationRequest.created_at))
+        .join(Encounter, MedicationRequest.encounter_id == Encounter.id)
+        .where(Encounter.site_id == site_id),
+        select(func.max(Procedure.created_at))
+        .join(Encounter, Procedure.encounter_id == Encounter.id)
+        .where(Encounter.site_id == site_id),
+        select(func.max(Reference.updated_at)).where(Reference.site_id == site_id),
+        select(func.max(Medicament.updated_at)),
+        select(func.max(StockSite.updated_at)).where(StockSite.site_id == site_id),
+    ]
+
+    # GREATEST ignore les NULL en PostgreSQL
+    stmt = select(func.greatest(*[c.scalar_subquery() for c in candidates]))
+    result = await db.execute(stmt)
+    watermark = result.scalar()
+
+    if watermark is None:
+        return EPOCH
+    if watermark.tzinfo is None:
+        watermark = watermark.replace(tzinfo=timezone.utc)
+    # Curseur horodatage seul: couvre son horodatage, donc strictement sous l'horizon
+    return min(watermark, await get_visibility_horizon(db) - timedelta(microseconds=1))
+
+
+# ===========================================================================
+# FLUX DE CHANGEMENTS
+# ===========================================================================
+
+def _change_sources(site_id: uuid_module.UUID):
+    """
+    Sources du flux de changements: (type d'entité, modèle, colonne horodatage, filtre site)
+    """
+    return [
+        (EntityType.PATIENT, Patient, Patient.updated_at, [Patient.site_id == site_id]),
+        (EntityType.ENCOUNTER, Encounter, Encounter.updated_at, [Encounter.site_id == site_id]),
+        (EntityType.CONDITION, Condition, Condition.created_at, [
+            Condition.encounter_id.in_(select(Encounter.id).where(Encounter.site_id == site_id))
+        ]),
+        (EntityType.MEDICATION_REQUEST, MedicationRequest, MedicationRequest.created_at, [
+            MedicationRequest.encounter_id.in_(select(Encounter.id).where(Encounter.site_id == site_id))
+        ]),
+        (EntityType.PROCEDURE, Procedure, Procedure.created_at, [
+            Procedure.encounter_id.in_(select(Encounter.id).where(Encounter.site_id == site_id))
+        ]),
+        (EntityType.REFERENCE, Reference, Reference.updated_at, [Reference.site_id == site_id]),
+        # Catalogue et niveaux de stock: inclus dans le snapshot, donc dans le flux
+        (EntityType.MEDICAMENT, Medicament, Medicament.updated_at, []),
+        (EntityType.STOCK, StockSite, StockSite.updated_at, [StockSite.site_id == site_id]),
+    ]
+
+
+def _operation_for(obj: Any) -> SyncOperationType:
+    """Déduit le type d'opération (create/update/delete) d'une entité"""
+    if getattr(obj, "deleted_at", None) is not None or getattr(obj, "is_active", True) is False:
+        return SyncOperationType.DELETE
+    updated_at = getattr(obj, "updated_at", None)
+    if updated_at is None or updated_at == obj.created_at:
+        return SyncOperationType.CREATE
+    return SyncOperationType.UPDATE
+
+
+async def get_changes_since(
+    db: AsyncSession,
+    site_id: uuid_module.UUID,
+    since: tuple[datetime, uuid_module.UUID],
+    limit: int,
+) -> tuple[list[SyncChange], str, bool]:
+    """
+    Récupère les changements d'un site postérieurs au curseur (horodatage, id)
+
+    Chaque source est lue dans l'ordre (horodatage, id) à partir du curseur
+    (comparaison de lignes, limit + 1 lignes max), puis les résultats sont
+    fusionnés dans le même ordre. Le curseur suivant est la position de la
+    dernière ligne renvoyée: une page peut s'arrêter au milieu d'un même
+    horodatage sans perdre les lignes suivantes.
+
+    Seules les lignes antérieures à l'horizon de visibilité sont servies: le
+    curseur ne dépasse jamais une ligne qu'une transaction en cours pourrait
+    encore valider; elle sera servie au prochain appel.
+
+    Returns:
+        (changements, prochain curseur, has_more)
+    """
+    since_ts, since_id = since
+    horizon = await get_visibility_horizon(db)
+    rows: list[tuple[datetime, uuid_module.UUID, EntityType, Any]] = []
+
+    for entity, model, ts_column, filters in _change_sources(site_id):
+        stmt = (
+            select(model)
+            .where(
+                ts_column >= since_ts,  # Borne simple pour l'index horodatage
+                tuple_(ts_column, model.id) > tuple_(since_ts, since_id),
+                ts_column < horizon,
+                *filters,
+            )
+            .order_by(ts_column, model.id)
+            .limit(limit + 1)
+        )
+        result = await db.execute(stmt)
+        for obj in result.scalars().all():
+            rows.append((getattr(obj, ts_column.key), obj.id, entity, obj))
+
+    # Même ordre que PostgreSQL (les UUID se comparent octet par octet)
+    rows.sort(key=lambda r: (r[0], r[1]))
+
+    has_more = len(rows) > limit
+    page = rows[:limit]
+
+    changes = [
+        SyncChange(
+            entity=entity,
+            operation=_operation_for(obj),
+            id=row_id,
+            data=entity_to_dict(obj),
+            version=format_cursor(ts),
+        )
+        for ts, row_id, entity, obj in page
+    ]
+
+    next_cursor = format_change_cursor(page[-1][0], page[-1][1]) if page else format_change_cursor(since_ts, since_id)
+    return changes, next_cursor, has_more
+
+
+# ===========================================================================
+# ÉTAT DES APPAREILS
+# ===========================================================================
+
+async def record_device_cursor(
+    db: AsyncSession,
+    device_id: str,
+    user_id: uuid_module.UUID,
+    site_id: uuid_module.UUID,
+    cursor: str,
+    snapshot: bool = False,
+) -> None:
+    """Enregistre (upsert) le dernier curseur connu d'un appareil"""
+    now = datetime.utcnow()
+    values = {
+        "user_id": user_id,
+        "site_id": site_id,
+        "updated_at": now,
+    }
+    if snapshot:
+        values.update(snapshot_cursor=cursor, last_cursor=cursor, snapshot_downloaded_at=now)
+    else:
+        values.update(last_cursor=cursor, last_pull_at=now)
+
+    stmt = pg_insert(SyncSession).values(
+        id=uuid_module.uuid4(),
+        device_id=device_id,
+        created_at=now,
+        **values,
+    ).on_conflict_do_update(
+        index_elements=[SyncSession.device_id],
+        set_=values,
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+# ===========================================================================
+# SNAPSHOTS DE BOOTSTRAP
+# ===========================================================================
+
+def _snapshot_dir() -> Path:
+    path = Path(settings.SYNC_SNAPSHOT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def snapshot_path(site_id: uuid_module.UUID, watermark: datetime) -> Path:
+    """Chemin du snapshot d'un site pour un watermark donné"""
+    stamp = (watermark - EPOCH) // timedelta(microseconds=1)
+    return _snapshot_dir() / f"{site_id}-{stamp}.json.gz"
+
+
+def latest_snapshot(site_id: uuid_module.UUID) -> Optional[tuple[Path, str]]:
+    """
+    Retourne le snapshot le plus récent disponible pour un site
+
+    Returns:
+        (chemin, curseur) ou None si aucun snapshot n'existe
+    """
+    best: Optional[tuple[int, Path]] = None
+    for path in _snapshot_dir().glob(f"{site_id}-*.json.gz"):
+        try:
+            stamp = int(path.name[len(str(site_id)) + 1:-len(".json.gz")])
+        except ValueError:
+            continue
+        if best is None or stamp > best[0]:
+            best = (stamp, path)
+
+    if best is None:
+        return None
+
+    watermark = EPOCH + timedelta(microseconds=best[0])
+    return best[1], format_cursor(watermark)
+
+
+def is_snapshot_building(site_id: uuid_module.UUID) -> bool:
+    return site_id in _snapshots_in_progress
+
+
+async def _write_rows(out, db: AsyncSession, stmt) -> int:
+    """Écrit en flux les lignes d'une requête dans le fichier JSON"""
+    count = 0
+    result = await db.stream(stmt.execution_options(yield_per=1000))
+    async for obj in result.scalars():
+        out.write(("" if count == 0 else ",") + json.dumps(entity_to_dict(obj), separators=(",", ":")))
+        count += 1
+    return count
+
+
+async def build_site_snapshot(site_id: uuid_module.UUID) -> Optional[Path]:
+    """
+    Construit le snapshot compressé d'un site:
+    patients, consultations récentes (avec diagnostics, prescriptions et actes),
+    catalogue des médicaments et niveaux de stock.
+
+    Le fichier est écrit de façon atomique (fichier temporaire + rename) et
+    les snapshots plus anciens du site sont supprimés.
+    """
+    from app.database import AsyncSessionLocal
+
+    if site_id in _snapshots_in_progress:
+        return None
+    _snapshots_in_progress.add(site_id)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            # Le watermark est lu AVANT les données: les écritures concurrentes
+            # seront récupérées par /sync/changes depuis ce curseur
+            watermark = await get_site_watermark(db, site_id)
+            target = snapshot_path(site_id, watermark)
+            if target.exists():
+                return target
+
+            since_date = (datetime.utcnow() - timedelta(days=settings.SYNC_SNAPSHOT_ENCOUNTER_DAYS)).date()
+            recent_encounters = select(Encounter.id).where(
+                Encounter.site_id == site_id,
+                Encounter.deleted_at.is_(None),
+                Encounter.date >= since_date,
+            )
+
+            sections = [
+                ("patients", select(Patient).where(
+                    Patient.site_id == site_id,
+                    Patient.deleted_at.is_(None),
+                )),
+                ("encounters", select(Encounter).where(Encounter.id.in_(recent_encounters))),
+                ("conditions", select(Condition).where(Condition.encounter_id.in_(recent_encounters))),
+                ("medication_requests", select(MedicationRequest).where(
+                    MedicationRequest.encounter_id.in_(recent_encounters)
+                )),
+                ("procedures", select(Procedure).where(Procedure.encounter_id.in_(recent_encounters))),
+                ("medicaments", select(Medicament).where(Medicament.is_active == True)),
+                ("stocks", select(StockSite).where(StockSite.site_id == site_id)),
+            ]
+
+            tmp_path = target.with_suffix(f".{os.getpid()}.tmp")
+            counts = {}
+            try:
+                with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as out:
+                    out.write(json.dumps({
+                        "site_id": str(site_id),
+                        "cursor": format_cursor(watermark),
+                        "generated_at": format_cursor(datetime.now(timezone.utc)),
+                    })[:-1])
+                    for name, stmt in sections:
+                        out.write(f',"{name}":[')
+                        counts[name] = await _write_rows(out, db, stmt)
+                        out.write("]")
+                    out.write("}")
+
+                os.replace(tmp_path, target)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+        # Nettoyer les anciens snapshots du site
+        for old in _snapshot_dir().glob(f"{site_id}-*.json.gz"):
+            if old != target:
+                old.unlink(missing_ok=True)
+
+        logger.info(
+            "Snapshot de bootstrap construit",
+            site_id=str(site_id),
+            cursor=format_cursor(watermark),
+            size_bytes=target.stat().st_size,
+            **counts,
+        )
+        return target
+
+    except Exception as e:
+        logger.error("Erreur lors de la construction du snapshot", site_id=str(site_id), error=str(e))
+        raise
+    finally:
+        _snapshots_in_progress.discard(site_id)
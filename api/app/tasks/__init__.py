@@ -4,6 +4,8 @@ Tâches Celery asynchrones
 from app.tasks.statistics import refresh_site_statistics
 from app.tasks.dhis2 import export_dhis2_monthly
 from app.tasks.maintenance import cleanup_sync_operations
+from app.tasks.patients import score_patient_duplicates
+from app.tasks.stock import forecast_stock_consumption, reconcile_stock, refresh_stock_alerts
 from app.tasks.subscriptions import (
     update_subscription_statuses,
     send_subscription_reminders,
@@ -14,6 +16,10 @@ __all__ = [
     "refresh_site_statistics",
     "export_dhis2_monthly",
     "cleanup_sync_operations",
+    "score_patient_duplicates",
+    "refresh_stock_alerts",
+    "reconcile_stock",
+    "forecast_stock_consumption",
     # Abonnements
     "update_subscription_statuses",
     "send_subscription_reminders",
@@ -0,0 +1,171 @@
+"""
+Tâches de qualité des données patients
+
+Exécutée chaque nuit pour:
+- Calculer les clés phonétiques manquantes (patients antérieurs à la colonne)
+- Détecter les doublons probables par site et les enregistrer dans patient_duplicates
+"""
+import asyncio
+from typing import Optional
+import uuid as uuid_module
+
+import structlog
+from sqlalchemy import and_, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+
+from app.celery_app import celery_app
+from app.database import AsyncSessionLocal
+from app.models import Patient, PatientDuplicate
+from app.services.patient_matching import DUPLICATE_THRESHOLD, phonetic_key, score_candidate
+
+logger = structlog.get_logger()
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+@celery_app.task(name="app.tasks.score_patient_duplicates")
+def score_patient_duplicates(site_id: Optional[str] = None):
+    """
+    Détecte les doublons probables (tous les sites, ou un seul)
+    Exécuté quotidiennement à 4h du matin.
+    """
+    return asyncio.run(_score_patient_duplicates_async(site_id))
+
+
+async def _backfill_phonetic_keys(db) -> int:
+    """Calcule les clés phonétiques manquantes, par lots"""
+    total = 0
+    while True:
+        result = await db.execute(
+            select(Patient.id, Patient.nom, Patient.prenom)
+            .where(Patient.phonetic_key.is_(None))
+            .limit(BACKFILL_BATCH_SIZE)
+        )
+        rows = result.all()
+        if not rows:
+            return total
+
+        # updated_at conservé: une clé technique ne doit pas réémettre le patient
+        # dans le flux de synchronisation des appareils
+        patients = Patient.__table__
+        await db.execute(
+            update(patients)
+            .where(patients.c.id == bindparam("patient_id"))
+            .values(phonetic_key=bindparam("phonetic"), updated_at=patients.c.updated_at),
+            [{"patient_id": row.id, "phonetic": phonetic_key(row.nom, row.prenom)} for row in rows],
+        )
+        await db.commit()
+        total += len(rows)
+
+
+async def _score_site(db, site_id: uuid_module.UUID) -> int:
+    """
+    Compare les patients d'un site ayant la même clé phonétique
+
+    La clé sert de blocage: seules les paires d'un même bloc sont comparées,
+    au lieu de toutes les paires du site.
+    """
+    a = aliased(Patient)
+    b = aliased(Patient)
+    stmt = (
+        select(
+            a.id, a.phonetic_key, a.sexe, a.annee_naissance, a.telephone, a.village,
+            b.id.label("other_id"), b.sexe.label("other_sexe"),
+            b.annee_naissance.label("other_annee"), b.telephone.label("other_telephone"),
+            b.village.label("other_village"),
+            func.similarity(a.search_text, b.search_text).label("similarity"),
+        )
+        .join(b, and_(
+            b.site_id == a.site_id,
+            b.phonetic_key == a.phonetic_key,
+            b.id > a.id,
+        ))
+        .where(
+            a.site_id == site_id,
+            a.deleted_at.is_(None),
+            b.deleted_at.is_(None),
+            a.phonetic_key != "",
+        )
+    )
+    result = await db.stream(stmt.execution_options(yield_per=1000))
+
+    pairs = []
+    async for row in result:
+        probe = {
+            "phonetic_key": row.phonetic_key,
+            "sexe": row.sexe,
+            "annee_naissance": row.annee_naissance,
+            "telephone": row.telephone,
+            "village": row.village,
+        }
+        candidate = {
+            "phonetic_key": row.phonetic_key,
+            "sexe": row.other_sexe,
+            "annee_naissance": row.other_annee,
+            "telephone": row.other_telephone,
+            "village": row.other_village,
+        }
+        score, reasons = score_candidate(probe, candidate, float(row.similarity or 0))
+        if score >= DUPLICATE_THRESHOLD:
+            pairs.append({
+                "id": uuid_module.uuid4(),
+                "site_id": site_id,
+                "patient_id": row.id,
+                "duplicate_id": row.other_id,
+                "score": score,
+                "raisons": reasons,
+                "statut": "en_attente",
+            })
+
+    for start in range(0, len(pairs), 1000):
+        stmt = pg_insert(PatientDuplicate).values(pairs[start:start + 1000])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PatientDuplicate.patient_id, PatientDuplicate.duplicate_id],
+            set_={
+                "score": stmt.excluded.score,
+                "raisons": stmt.excluded.raisons,
+                "updated_at": func.now(),
+            },
+            where=PatientDuplicate.statut == "en_attente",  # Ne pas reproposer une paire ignorée
+        )
+        await db.execute(stmt)
+    await db.commit()
+
+    return len(pairs)
+
+
+async def _score_patient_duplicates_async(site_id: Optional[str] = None):
+    """Version async de la détection des doublons"""
+    async with AsyncSessionLocal() as db:
+        try:
+            backfilled = await _backfill_phonetic_keys(db)
+
+            if site_id:
+                site_ids = [uuid_module.UUID(site_id)]
+            else:
+                result = await db.execute(
+                    select(Patient.site_id).where(Patient.deleted_at.is_(None)).distinct()
+                )
+                site_ids = result.scalars().all()
+
+            results = {"backfilled": backfilled, "sites": 0, "duplicates": 0, "errors": []}
+            for sid in site_ids:
+                try:
+                    results["duplicates"] += await _score_site(db, sid)
+                    results["sites"] += 1
+                except Exception as e:
+                    await db.rollback()
+                    results["errors"].append(f"{sid}: {str(e)}")
+
+            logger.info(
+                "Détection des doublons patients terminée",
+                backfilled=results["backfilled"],
+                sites=results["sites"],
+                duplicates=results["duplicates"],
+            )
+            return results
+
+        except Exception as e:
+            logger.error("Erreur lors de la détection des doublons patients", error=str(e))
+            raise
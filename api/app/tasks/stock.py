@@ -0,0 +1,157 @@
+"""
+Tâches de gestion des stocks
+
+Exécutées chaque nuit pour:
+- Réaligner les alertes de stock (seuils modifiés, médicaments désactivés)
+- Calculer les alertes de péremption des lots
+- Rapprocher les compteurs de stock du registre des mouvements et écrire
+  l'arrêté du mois écoulé
+- Prévoir la consommation et calculer les points de commande
+"""
+import asyncio
+import time
+from datetime import date, datetime, timezone
+from typing import Optional
+import uuid as uuid_module
+
+import structlog
+from sqlalchemy import func, select
+
+from app.celery_app import celery_app
+from app.database import AsyncSessionLocal
+from app.models.inventory import StockAlert, StockSite
+from app.services.stock_alerts import refresh_expiry_alerts, sync_stock_alerts
+from app.services.stock_forecast import refresh_tenant_forecasts
+from app.services.stock_reconciliation import (
+    find_drift,
+    fix_drift,
+    month_start,
+    snapshot_exists,
+    write_snapshots,
+)
+
+logger = structlog.get_logger()
+
+
+@celery_app.task(name="app.tasks.refresh_stock_alerts")
+def refresh_stock_alerts():
+    """
+    Recalcule la table stock_alerts
+    Exécuté quotidiennement à 1h du matin.
+    """
+    return asyncio.run(_refresh_stock_alerts_async())
+
+
+async def _refresh_stock_alerts_async():
+    """Version async du recalcul des alertes"""
+    async with AsyncSessionLocal() as db:
+        try:
+            await sync_stock_alerts(db)
+            await refresh_expiry_alerts(db, date.today())
+            await db.commit()
+
+            result = await db.execute(
+                select(StockAlert.type_alerte, func.count()).group_by(StockAlert.type_alerte)
+            )
+            counts = dict(result.all())
+            logger.info("Alertes de stock recalculées", **counts)
+            return {"status": "success", "alertes": counts}
+
+        except Exception as e:
+            logger.error("Erreur lors du recalcul des alertes de stock", error=str(e))
+            raise
+
+
+@celery_app.task(name="app.tasks.reconcile_stock")
+def reconcile_stock(fix: bool = False):
+    """
+    Rapproche les compteurs de stock du registre des mouvements
+    Exécuté quotidiennement à 0h30 (écarts signalés; corrigés si fix=True).
+    """
+    return asyncio.run(_reconcile_stock_async(fix))
+
+
+async def _reconcile_stock_async(fix: bool = False):
+    """Version async du rapprochement"""
+    async with AsyncSessionLocal() as db:
+        try:
+            # Arrêté du mois écoulé (une fois par mois, depuis l'arrêté précédent)
+            arrete_au = month_start(datetime.now(timezone.utc))
+            snapshots = 0
+            if not await snapshot_exists(db, arrete_au):
+                snapshots = await write_snapshots(db, arrete_au)
+                await db.commit()
+                logger.info("Arrêté mensuel des stocks écrit", arrete_au=arrete_au.isoformat(), stocks=snapshots)
+
+            drifts = await find_drift(db)
+            for drift in drifts:
+                logger.warning(
+                    "Écart entre compteur de stock et registre",
+                    stock_id=str(drift.stock_id),
+                    site_id=str(drift.site_id),
+                    medicament_id=str(drift.medicament_id),
+                    compteur=drift.compteur,
+                    registre=drift.registre,
+                )
+            if fix and drifts:
+                await fix_drift(db, drifts)
+                await db.commit()
+
+            logger.info("Rapprochement des stocks terminé", ecarts=len(drifts), corriges=fix)
+            return {
+                "status": "success",
+                "snapshots": snapshots,
+                "ecarts": len(drifts),
+                "corriges": len(drifts) if fix else 0,
+            }
+
+        except Exception as e:
+            logger.error("Erreur lors du rapprochement des stocks", error=str(e))
+            raise
+
+
+@celery_app.task(name="app.tasks.forecast_stock_consumption")
+def forecast_stock_consumption(tenant_id: Optional[str] = None):
+    """
+    Calcule consommation moyenne, points de commande et niveaux cibles
+    Exécuté quotidiennement à 0h45 (tous les tenants, ou un seul).
+    """
+    return asyncio.run(_forecast_stock_consumption_async(tenant_id))
+
+
+async def _forecast_stock_consumption_async(tenant_id: Optional[str] = None):
+    """Version async des prévisions"""
+    async with AsyncSessionLocal() as db:
+        try:
+            if tenant_id:
+                tenant_ids = [uuid_module.UUID(tenant_id)]
+            else:
+                result = await db.execute(select(StockSite.tenant_id).distinct())
+                tenant_ids = result.scalars().all()
+
+            results = {"tenants": 0, "stocks": 0, "errors": []}
+            for tid in tenant_ids:
+                started = time.perf_counter()
+                try:
+                    stocks = await refresh_tenant_forecasts(db, tid, date.today())
+                    # Points de commande modifiés: seuils effectifs des alertes
+                    await sync_stock_alerts(db, StockSite.tenant_id == tid)
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    results["errors"].append(f"{tid}: {str(e)}")
+                    continue
+                results["tenants"] += 1
+                results["stocks"] += stocks
+                logger.info(
+                    "Prévisions de consommation calculées",
+                    tenant_id=str(tid),
+                    stocks=stocks,
+                    duree_ms=round((time.perf_counter() - started) * 1000),
+                )
+
+            return results
+
+        except Exception as e:
+            logger.error("Erreur lors du calcul des prévisions de consommation", error=str(e))
+            raise
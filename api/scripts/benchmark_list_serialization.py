@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la sérialisation des listes (pages de 200 lignes)
+
+Compare, pour chaque endpoint de liste, l'ancien chemin (model_validate
+Pydantic par objet ORM, puis jsonable_encoder + JSONResponse comme le fait
+FastAPI) et le chemin rapide (RowSerializer sur les lignes SQL + encodage
+direct en octets). Les données sont synthétiques: aucune base n'est requise.
+Vérifie aussi que les deux chemins produisent le même JSON.
+
+Usage:
+    python scripts/benchmark_list_serialization.py
+    python scripts/benchmark_list_serialization.py --rows 200 --runs 200
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models import Patient, SexeEnum
+from app.models.inventory import (
+    FormeMedicamentEnum,
+    Fournisseur,
+    Medicament,
+    StatutCommandeEnum,
+    StockMovement,
+    TypeMouvementEnum,
+)
+from app.routers.bons_commande import BON_COMMANDE_ROW, BonCommandeOut
+from app.routers.fournisseurs import FOURNISSEUR_ROW, FournisseurOut
+from app.routers.medicaments import MEDICAMENT_ROW, MedicamentOut
+from app.routers.patients_simple import PATIENT_ROW
+from app.routers.stock import STOCK_MOVEMENT_ROW, STOCK_SITE_ROW, StockMovementOut, StockSiteDetails
+from app.schemas import PatientOut
+from app.services.serialization import dumps
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def patient_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(), "nom": f"Traoré {i}", "prenom": "Aïssata", "sexe": list(SexeEnum)[i % 2],
+        "annee_naissance": 1990, "telephone": "76 12 34 56", "village": "Siby", "site_id": uuid.uuid4(),
+        "matricule": f"SIBY-2025-{i:04d}", "created_at": _now(), "updated_at": _now(), "version": 1,
+    }
+
+
+def medicament_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(), "code": f"MED{i:05d}", "nom": f"Paracétamol {i}", "dci": "Paracétamol",
+        "forme": list(FormeMedicamentEnum)[0], "dosage": "500mg", "unite_conditionnement": "boîte",
+        "quantite_par_unite": 20, "prix_unitaire_reference": Decimal("125.50"), "seuil_alerte_defaut": 10,
+        "is_active": True, "created_at": _now(), "updated_at": _now(),
+    }
+
+
+def fournisseur_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(), "code": f"F{i:04d}", "nom": f"Fournisseur {i}", "contact_nom": "Moussa Diarra",
+        "telephone": "20 22 33 44", "email": None, "adresse": "Bamako", "ville": "Bamako", "pays": "Mali",
+        "is_active": True, "created_at": _now(), "updated_at": _now(),
+    }
+
+
+def stock_site_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(), "medicament_id": uuid.uuid4(), "site_id": uuid.uuid4(), "quantite_actuelle": i,
+        "seuil_alerte": 10, "created_at": _now(), "updated_at": _now(), "medicament_nom": f"Amoxicilline {i}",
+        "medicament_code": f"AMX{i:04d}", "medicament_dci": "Amoxicilline", "site_nom": "CSCOM Siby",
+        "en_alerte": i <= 10,
+    }
+
+
+def movement_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(), "type_mouvement": list(TypeMouvementEnum)[0], "medicament_id": uuid.uuid4(),
+        "site_id": uuid.uuid4(), "created_by": uuid.uuid4(), "quantite": i, "date_mouvement": _now(),
+        "reference_externe": None, "commentaire": "Réception", "created_at": _now(),
+    }
+
+
+def bon_commande_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(), "numero": f"BC-2025-{i:05d}", "fournisseur_id": uuid.uuid4(),
+        "fournisseur_nom": "Laborex", "site_id": uuid.uuid4(), "statut": list(StatutCommandeEnum)[0],
+        "date_commande": date.today(), "date_livraison_prevue": None, "date_livraison_effective": None,
+        "montant_total": Decimal("15000.00"), "commentaire": None, "created_at": _now(), "updated_at": _now(),
+    }
+
+
+class _Obj:
+    """Objet à attributs (équivalent d'une instance ORM chargée)"""
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+# nom → (fabrique de ligne, classe ORM ou None, schéma, sérialiseur, clé de liste)
+CASES = {
+    "GET /patients": (patient_row, Patient, PatientOut, PATIENT_ROW, "data"),
+    "GET /medicaments": (medicament_row, Medicament, MedicamentOut, MEDICAMENT_ROW, "items"),
+    "GET /fournisseurs": (fournisseur_row, Fournisseur, FournisseurOut, FOURNISSEUR_ROW, "items"),
+    "GET /stock/sites/{id}": (stock_site_row, None, StockSiteDetails, STOCK_SITE_ROW, "items"),
+    "GET /stock/mouvements": (movement_row, StockMovement, StockMovementOut, STOCK_MOVEMENT_ROW, "items"),
+    "GET /bons-commande": (bon_commande_row, None, BonCommandeOut, BON_COMMANDE_ROW, "items"),
+}
+
+
+def _timed(fn, runs: int) -> tuple[float, bytes]:
+    timings = []
+    body = b""
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la sérialisation des listes")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'Endpoint':<24} {'Pydantic (ms)':>14} {'rapide (ms)':>12} {'gain':>6}  JSON identique")
+    print("-" * 74)
+
+    for name, (make_row, model, schema, serializer, list_key) in CASES.items():
+        rows = [make_row(i) for i in range(args.rows)]
+        objects = [model(**row) if model else _Obj(**row) for row in rows]
+
+        def pydantic_path():
+            payload = {list_key: [schema.model_validate(o) for o in objects], "next_cursor": None, "has_more": True}
+            return JSONResponse(content=jsonable_encoder(payload)).body
+
+        def fast_path():
+            return dumps({list_key: [serializer(row) for row in rows], "next_cursor": None, "has_more": True})
+
+        slow_ms, slow_body = _timed(pydantic_path, args.runs)
+        fast_ms, fast_body = _timed(fast_path, args.runs)
+        same = json.loads(slow_body) == json.loads(fast_body)
+        print(f"{name:<24} {slow_ms:>14.2f} {fast_ms:>12.2f} {slow_ms / fast_ms:>5.1f}x  {'oui' if same else 'NON'}")
+
+
+if __name__ == "__main__":
+    main()
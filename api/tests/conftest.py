@@ -3,16 +3,21 @@ Configuration pytest simplifiée pour tests multi-tenant
 """
 import asyncio
 import uuid as uuid_module
-from typing import AsyncGenerator
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, AsyncGenerator, Optional
 
 import pytest
 from httpx import AsyncClient, ASGITransport
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import Table, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 
 from app.main import app
 from app.database import get_db
-from app.models.base_models import Base
-from app.models import User, Site, Patient
+from app.models.base_models import Base, District, Region, SexeEnum, UserRoleEnum
+from app.models import User, Site, Patient, Tenant
+from app.models.tenant import Plan, Subscription, SubscriptionStatus
+from app.models.inventory import FormeMedicamentEnum, Fournisseur, Medicament
 from app.security import create_access_token, hash_password
 
 TEST_DATABASE_URL = "postgresql+asyncpg://sante:sante_pwd@db:5432/sante_rurale"
@@ -45,17 +50,203 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
 
 @pytest.fixture
 async def site(db_session: AsyncSession):
-    """Créer un site de test"""
+    """Créer un site de test (avec sa région et son district)"""
+    suffix = uuid_module.uuid4().hex[:8]
+    region = Region(id=uuid_module.uuid4(), nom="Région de Test", code=f"TEST-R-{suffix}")
+    district = District(id=uuid_module.uuid4(), nom="District de Test", code=f"TEST-D-{suffix}", region_id=region.id)
     site = Site(
         id=uuid_module.uuid4(),
         nom="Site de Test",
-        code="TEST-SITE",
         type="cscom",
-        commune="Test Commune",
-        cercle="Test Cercle",
-        region="Test Region"
+        district_id=district.id,
     )
-    db_session.add(site)
+    db_session.add_all([region, district, site])
     await db_session.commit()
     await db_session.refresh(site)
     return site
+
+
+# =============================================================================
+# DONNÉES PARTAGÉES (tests sur une vraie base, transactions concurrentes)
+# =============================================================================
+
+@pytest.fixture
+async def db_engine() -> AsyncGenerator[AsyncEngine, None]:
+    """Moteur dédié au test, dimensionné pour les tests de concurrence"""
+    engine = create_async_engine(TEST_DATABASE_URL, echo=False, pool_size=20, max_overflow=40)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def sessions(db_engine: AsyncEngine) -> async_sessionmaker:
+    """Fabrique de sessions (une par transaction concurrente)"""
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class SeedData:
+    """
+    Tenant, district, site et pharmacien créés et validés pour un test
+
+    Les données sont visibles des autres connexions (transactions
+    concurrentes, endpoints) et supprimées en fin de test avec tout ce qui
+    en dépend (mouvements, lots, délivrances...), quelles que soient les
+    tables écrites par le test.
+    """
+
+    def __init__(self, sessions: async_sessionmaker):
+        self.sessions = sessions
+        self.suffix = uuid_module.uuid4().hex[:8]
+        self._roots: dict[str, set[uuid_module.UUID]] = defaultdict(set)
+        self._cleanup: list[Any] = []
+
+    async def _add(self, *objects) -> None:
+        async with self.sessions() as db:
+            db.add_all(objects)
+            await db.commit()
+        for obj in objects:
+            self._roots[obj.__table__.name].add(obj.id)
+
+    async def setup(self) -> "SeedData":
+        region = Region(id=uuid_module.uuid4(), nom="Région (test)", code=f"TEST-{self.suffix}")
+        district = District(id=uuid_module.uuid4(), nom="District (test)", code=f"TEST-{self.suffix}", region_id=region.id)
+        tenant = Tenant(
+            id=uuid_module.uuid4(), name="CSCOM (test)", slug=f"test-{self.suffix}",
+            email=f"cscom-{self.suffix}@test.com", is_active=True, is_pilot=True,
+        )
+        await self._add(region, district, tenant)
+        self.tenant_id, self.district_id = tenant.id, district.id
+        self.site_id = await self.add_site()
+        self.user = await self.add_user(UserRoleEnum.pharmacien)
+        return self
+
+    async def add_site(self, nom: str = "Site (test)") -> uuid_module.UUID:
+        site = Site(id=uuid_module.uuid4(), nom=nom, type="cscom", district_id=self.district_id)
+        await self._add(site)
+        return site.id
+
+    async def add_user(self, role: UserRoleEnum, site_id: Optional[uuid_module.UUID] = None) -> User:
+        user_id = uuid_module.uuid4()
+        user = User(
+            id=user_id, nom="Test", prenom=role.value, email=f"{role.value}-{user_id.hex[:8]}@test.com",
+            password_hash="!", role=role, site_id=site_id or self.site_id, tenant_id=self.tenant_id,
+            actif=True, email_verified=True,
+        )
+        await self._add(user)
+        return user
+
+    async def add_medicaments(self, count: int = 1, **values) -> list[uuid_module.UUID]:
+        medicaments = [
+            Medicament(
+                id=uuid_module.uuid4(), code=f"T{self.suffix}-{i}", nom=f"Médicament {i} (test)",
+                forme=FormeMedicamentEnum.COMPRIME, dosage="500mg", **values,
+            )
+            for i in range(count)
+        ]
+        await self._add(*medicaments)
+        return sorted(m.id for m in medicaments)
+
+    async def add_fournisseur(self) -> uuid_module.UUID:
+        fournisseur = Fournisseur(id=uuid_module.uuid4(), code=f"T{self.suffix}", nom="Fournisseur (test)")
+        await self._add(fournisseur)
+        return fournisseur.id
+
+    async def add_patient(self, **values) -> Patient:
+        values = {"site_id": self.site_id, **values}
+        patient = Patient(
+            id=uuid_module.uuid4(), nom="Traoré", prenom="Awa", sexe=SexeEnum.F, annee_naissance=1990,
+            created_by=self.user.id, **values,
+        )
+        await self._add(patient)
+        return patient
+
+    async def add_subscription(self, status: SubscriptionStatus = SubscriptionStatus.ACTIVE, **plan_values) -> Subscription:
+        """Abonne le tenant à un plan payant propre au test (quotas passés en plan_values)"""
+        plan = Plan(id=uuid_module.uuid4(), code=f"test-{self.suffix}", name="Plan (test)", price_monthly=0, **plan_values)
+        subscription = Subscription(
+            id=uuid_module.uuid4(), tenant_id=self.tenant_id, plan_id=plan.id, status=status.value,
+            current_period_end=datetime.utcnow() + timedelta(days=30),
+        )
+        await self._add(plan, subscription)
+        return subscription
+
+    def cleanup(self, statement) -> None:
+        """Instruction de nettoyage supplémentaire (tables globales sans clé vers les données créées)"""
+        self._cleanup.append(statement)
+
+    async def purge(self) -> None:
+        """Supprime les lignes créées et, par clés étrangères, toutes celles qui en dépendent"""
+        tables = Base.metadata.sorted_tables
+        conditions: dict[Table, Any] = {}
+        async with self.sessions() as db:
+            for statement in self._cleanup:
+                await db.execute(statement)
+            for table in tables:
+                clauses = [table.c.id.in_(self._roots[table.name])] if self._roots.get(table.name) else []
+                for fk in table.foreign_keys:
+                    parent = fk.column.table
+                    if parent is not table and self._roots.get(parent.name):
+                        clauses.append(fk.parent.in_(self._roots[parent.name]))
+                if not clauses:
+                    continue
+                conditions[table] = or_(*clauses)
+                if "id" in table.c:
+                    ids = (await db.execute(select(table.c.id).where(conditions[table]))).scalars()
+                    self._roots[table.name].update(ids)
+            for table in reversed(tables):
+                if table in conditions:
+                    await db.execute(delete(table).where(conditions[table]))
+            await db.commit()
+
+
+@pytest.fixture
+async def seed(sessions: async_sessionmaker) -> AsyncGenerator[SeedData, None]:
+    """Tenant, site et pharmacien de test (validés, supprimés en fin de test)"""
+    data = SeedData(sessions)
+    try:
+        yield await data.setup()
+    finally:
+        await data.purge()
+
+
+def bearer_headers(user: User) -> dict:
+    """En-têtes d'authentification d'un utilisateur validé en base"""
+    token = create_access_token({"sub": str(user.id), "email": user.email, "role": user.role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def seed_headers(seed: SeedData) -> dict:
+    """En-têtes d'authentification du pharmacien de test"""
+    return bearer_headers(seed.user)
+
+
+@pytest.fixture
+def auth_headers(seed_headers: dict) -> dict:
+    """En-têtes d'authentification d'un utilisateur non soignant (pharmacien)"""
+    return seed_headers
+
+
+@pytest.fixture
+async def test_site(seed: SeedData, sessions: async_sessionmaker) -> Site:
+    """Site des données de test"""
+    async with sessions() as db:
+        return await db.get(Site, seed.site_id)
+
+
+@pytest.fixture
+async def medecin_user(seed: SeedData) -> User:
+    """Médecin du site de test"""
+    return await seed.add_user(UserRoleEnum.medecin)
+
+
+@pytest.fixture
+def medecin_auth_headers(medecin_user: User) -> dict:
+    """En-têtes d'authentification du médecin de test"""
+    return bearer_headers(medecin_user)
+
+
+@pytest.fixture
+async def test_patient(seed: SeedData) -> Patient:
+    """Patient du site de test"""
+    return await seed.add_patient()
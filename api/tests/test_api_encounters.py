@@ -22,6 +22,25 @@ class TestEncounterEndpoints:
         data = response.json()
         assert isinstance(data, list)
 
+    async def test_list_encounters_summary(self, client: AsyncClient, medecin_auth_headers: dict):
+        """Test de la vue résumée (colonnes demandées uniquement)."""
+        response = await client.get(
+            "/api/encounters",
+            headers=medecin_auth_headers,
+            params={"fields": "patient_nom,diagnostics"},
+        )
+
+        assert response.status_code == 200
+        for row in response.json():
+            assert set(row) == {"id", "date", "patient_nom", "diagnostics"}
+
+        response = await client.get(
+            "/api/encounters",
+            headers=medecin_auth_headers,
+            params={"fields": "mot_de_passe"},
+        )
+        assert response.status_code == 400
+
     async def test_list_encounters_unauthorized(self, client: AsyncClient):
         """Test de listing des consultations sans authentification."""
         response = await client.get("/api/encounters")
@@ -51,6 +70,30 @@ class TestEncounterEndpoints:
         assert data["motif"] == "Consultation de routine"
         assert "id" in data
 
+    async def test_create_encounter_with_children(self, client: AsyncClient, medecin_auth_headers: dict, test_patient: Patient):
+        """Test de création d'une consultation avec diagnostics, prescriptions et actes."""
+        response = await client.post(
+            "/api/encounters",
+            headers=medecin_auth_headers,
+            json={
+                "patient_id": str(test_patient.id),
+                "motif": "Fièvre",
+                "conditions": [{"code_icd10": "B54", "libelle": "Paludisme"}],
+                "medication_requests": [{"medicament": "Artéméther-Luméfantrine", "posologie": "2 cp x 2/j"}],
+                "procedures": [{"type": "TDR paludisme", "resultat": "positif"}],
+            }
+        )
+
+        assert response.status_code == 201
+        data = response.json()
+        assert data["patient"]["id"] == str(test_patient.id)
+        assert [c["code_icd10"] for c in data["conditions"]] == ["B54"]
+        assert data["medication_requests"][0]["encounter_id"] == data["id"]
+        assert data["procedures"][0]["resultat"] == "positif"
+
+        detail = await client.get(f"/api/encounters/{data['id']}", headers=medecin_auth_headers)
+        assert detail.status_code == 200
+
     async def test_get_encounter_by_id(self, client: AsyncClient, medecin_auth_headers: dict, db_session, test_patient: Patient, medecin_user: User, test_site: Site):
         """Test de récupération d'une consultation par ID."""
         # Créer une consultation d'abord
@@ -0,0 +1,87 @@
+"""
+Tests de l'autocomplétion (index de préfixes)
+"""
+import time
+import uuid as uuid_module
+
+import pytest
+
+from app.services.autocomplete import CIM10_INDEX, PrefixIndex, medicament_index, normalize
+from app.services.medicament_catalogue import CatalogueSnapshot
+
+DCI = ["Paracétamol", "Amoxicilline", "Artéméther", "Luméfantrine", "Métronidazole", "Ibuprofène",
+       "Cotrimoxazole", "Fer", "Acide folique", "Quinine", "Ciprofloxacine", "Oméprazole"]
+
+
+def _snapshot(count: int, version: int = 1) -> CatalogueSnapshot:
+    items = [
+        {
+            "id": str(uuid_module.uuid4()), "code": f"MED{i:05d}", "nom": f"{DCI[i % len(DCI)]} {i}",
+            "dci": DCI[i % len(DCI)], "forme": "comprime", "dosage": "500mg", "is_active": i % 50 != 0,
+        }
+        for i in range(count)
+    ]
+    return CatalogueSnapshot(version=version, items=items, item_versions=[0] * count)
+
+
+@pytest.mark.unit
+class TestPrefixIndex:
+    """Recherche par préfixe."""
+
+    def test_normalize(self):
+        assert normalize("  Œdème-Aigu, FŒTUS ") == "oedeme aigu foetus"
+
+    def test_any_word_prefix_and_ranking(self):
+        index = PrefixIndex(
+            [
+                {"code": "AMX500", "nom": "Amoxicilline 500mg", "dci": "Amoxicilline"},
+                {"code": "AUG", "nom": "Augmentin", "dci": "Amoxicilline + Acide clavulanique"},
+                {"code": "PARA", "nom": "Paracétamol", "dci": None},
+            ],
+            ("code", "nom", "dci"),
+        )
+        assert [e["code"] for e in index.search("amox")] == ["AMX500", "AUG"]
+        assert [e["code"] for e in index.search("clav")] == ["AUG"]
+        assert [e["code"] for e in index.search("aug")] == ["AUG"]
+        assert [e["code"] for e in index.search("amox acid")] == ["AUG"]
+        assert index.search("   ") == []
+
+    def test_cim10(self):
+        assert CIM10_INDEX.search("B50.9")[0]["code"] == "B50.9"
+        assert {e["code"] for e in CIM10_INDEX.search("paludisme falciparum")} >= {"B50", "B50.9"}
+
+    def test_medicament_index_rebuilt_on_new_version(self):
+        first = medicament_index(_snapshot(100, version=1))
+        assert medicament_index(_snapshot(100, version=1)) is first
+        assert len(first) == 98  # inactifs exclus
+        assert medicament_index(_snapshot(10, version=2)) is not first
+
+    def test_ranking_matches_full_sort(self):
+        """Les premiers de chaque niveau sont ceux qu'un tri complet donnerait."""
+        index = medicament_index(_snapshot(2000, version=98))
+
+        def rank(entry, query):
+            texts = [normalize(entry[f]) for f in ("code", "nom", "dci") if entry.get(f)]
+            return (0 if texts[0] == query else 1 if any(t.startswith(query) for t in texts) else 2)
+
+        for query in ["par", "paracetamol 1", "med00012", "acide fol", "1"]:
+            matches = [
+                e for e in index.entries
+                if all(any(w.startswith(q) for f in ("code", "nom", "dci") if e.get(f) for w in normalize(e[f]).split())
+                       for q in normalize(query).split())
+            ]
+            expected = sorted(matches, key=lambda e: rank(e, normalize(query)))[:10]
+            assert index.search(query, 10) == expected
+
+    def test_keystroke_latency(self):
+        index = medicament_index(_snapshot(20000, version=99))
+        worst = 0.0
+        for query in ["p", "pa", "par", "amox", "med01", "acide fol", "qui", "z", "1"]:
+            # Meilleur de plusieurs frappes: écarte les pauses du GC et de l'ordonnanceur
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                index.search(query, 10)
+                timings.append((time.perf_counter() - start) * 1000)
+            worst = max(worst, min(timings))
+        assert worst < 5
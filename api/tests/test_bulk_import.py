@@ -0,0 +1,226 @@
+"""
+Tests de l'import en masse (CSV / NDJSON): lecture des fichiers et écriture par lots
+"""
+import io
+import json
+import time
+import uuid as uuid_module
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import delete, func, select
+
+from app.models import MatriculeCounter, Patient, Tenant
+from app.models.base_models import Encounter
+from app.models.tenant import SubscriptionStatus
+from app.schemas import EncounterImportRow
+from app.services import bulk_import
+from app.services.matricule_service import generate_village_code, parse_matricule
+
+THROUGHPUT_ROWS = 100_000
+THROUGHPUT_BUDGET_SECONDS = 20
+
+
+def _rows(content: str, fmt: str):
+    return list(bulk_import.iter_rows(io.BytesIO(content.encode("utf-8")), fmt))
+
+
+def _village(seed) -> str:
+    """Village propre au test: son compteur de matricules est supprimé en fin de test"""
+    village = "Z" + "".join(chr(ord("a") + int(c, 16)) for c in seed.suffix[:5])
+    seed.cleanup(delete(MatriculeCounter).where(MatriculeCounter.village_code == generate_village_code(village)))
+    return village
+
+
+def _patients_csv(count: int, village: str) -> bytes:
+    lines = ["nom;prenom;sexe;annee_naissance;village"]
+    lines += [f"Traoré {i};Awa;{'FM'[i % 2]};1990;{village}" for i in range(count)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _ndjson(rows: list[dict]) -> bytes:
+    return "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+@pytest.mark.unit
+class TestImportParsing:
+    """Tests du parsing ligne à ligne."""
+
+    def test_detect_format(self):
+        assert bulk_import.detect_format("registre.ndjson", None) == bulk_import.FORMAT_NDJSON
+        assert bulk_import.detect_format("upload", "application/x-ndjson") == bulk_import.FORMAT_NDJSON
+        assert bulk_import.detect_format("registre.csv", "text/csv") == bulk_import.FORMAT_CSV
+
+    def test_csv_semicolon_with_bom(self):
+        """Export Excel francophone: BOM, séparateur ';', cellules vides."""
+        content = "\ufeffNom;Prenom;Sexe;Village\nTraoré;;F;Siby\n;;;\nKeita;Moussa;M;Kati\n"
+        rows = _rows(content, bulk_import.FORMAT_CSV)
+
+        assert [line for line, _, _ in rows] == [2, 4]
+        assert rows[0][1] == {"nom": "Traoré", "prenom": None, "sexe": "F", "village": "Siby"}
+
+    def test_ndjson_reports_invalid_lines(self):
+        content = '{"nom": "Diallo", "sexe": "F"}\n\nnot json\n[1, 2]\n'
+        rows = _rows(content, bulk_import.FORMAT_NDJSON)
+
+        assert rows[0] == (1, {"nom": "Diallo", "sexe": "F"}, None)
+        assert rows[1][0] == 3 and rows[1][2].startswith("JSON invalide")
+        assert rows[2][0] == 4 and rows[2][1] is None
+
+    def test_report_caps_errors(self):
+        report = bulk_import.ImportReport()
+        for i in range(bulk_import.MAX_REPORTED_ERRORS + 5):
+            report.add_error(i, ["erreur"])
+
+        result = report.to_dict()
+        assert result["error_count"] == bulk_import.MAX_REPORTED_ERRORS + 5
+        assert len(result["errors"]) == bulk_import.MAX_REPORTED_ERRORS
+
+
+@pytest.mark.unit
+class TestEncounterImportRow:
+    """Une ligne de consultation ne porte pas d'éléments imbriqués."""
+
+    def test_nested_children_rejected(self):
+        row = {"patient_id": str(uuid_module.uuid4()), "date": "2026-10-19", "motif": "Fièvre"}
+        assert EncounterImportRow.model_validate(row).motif == "Fièvre"
+
+        for nested in ("conditions", "medication_requests", "procedures"):
+            with pytest.raises(ValidationError) as exc:
+                EncounterImportRow.model_validate({**row, nested: [{"libelle": "Paludisme"}]})
+            assert exc.value.errors()[0]["loc"] == (nested,)
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestImportWrites:
+    """Écriture par lots (COPY) sur une vraie base PostgreSQL."""
+
+    async def _tenant(self, seed, sessions) -> Tenant:
+        async with sessions() as db:
+            return await db.get(Tenant, seed.tenant_id)
+
+    async def _site_patients(self, sessions, site_id) -> list[Patient]:
+        async with sessions() as db:
+            result = await db.execute(select(Patient).where(Patient.site_id == site_id))
+            return list(result.scalars().all())
+
+    async def test_patients_written_in_copy_batches(self, seed, sessions, monkeypatch):
+        """Lots de BATCH_SIZE lignes valides, matricules alloués, lignes invalides rapportées."""
+        await seed.add_subscription(max_patients_per_month=None)
+        tenant = await self._tenant(seed, sessions)
+        village = _village(seed)
+        monkeypatch.setattr(bulk_import, "BATCH_SIZE", 20)
+
+        batches = []
+        write_records = bulk_import._write_records
+
+        async def recording_write(db, model, columns, records):
+            batches.append(len(records))
+            await write_records(db, model, columns, records)
+
+        monkeypatch.setattr(bulk_import, "_write_records", recording_write)
+
+        # Lignes 4 et 31 du fichier invalides (sexe inconnu, nom trop court)
+        content = _patients_csv(45, village).decode("utf-8").splitlines()
+        content.insert(3, f"Diallo;Fanta;X;1990;{village}")
+        content.insert(30, f"D;Fanta;F;1990;{village}")
+        async with sessions() as db:
+            report = await bulk_import.import_patients(
+                db, io.BytesIO(("\n".join(content) + "\n").encode("utf-8")),
+                bulk_import.FORMAT_CSV, seed.user, tenant,
+            )
+
+        assert report["total_rows"] == 47
+        assert report["imported"] == 45
+        assert [error["row"] for error in report["errors"]] == [4, 31]
+        assert report["errors"][0]["errors"][0].startswith("sexe")
+        assert batches == [19, 19, 7]
+
+        patients = await self._site_patients(sessions, seed.site_id)
+        assert len(patients) == 45
+        numbers = sorted(parse_matricule(p.matricule)[2] for p in patients)
+        assert numbers == list(range(1, 46))
+        assert all(p.phonetic_key and p.created_by == seed.user.id and p.version == 1 for p in patients)
+
+    async def test_quota_cutoff(self, seed, sessions, monkeypatch):
+        """Plan gratuit (50 patients): le lot qui dépasse est tronqué, l'import s'arrête."""
+        tenant = await self._tenant(seed, sessions)
+        village = _village(seed)
+        for _ in range(5):
+            await seed.add_patient()
+        monkeypatch.setattr(bulk_import, "BATCH_SIZE", 20)
+
+        async with sessions() as db:
+            report = await bulk_import.import_patients(
+                db, io.BytesIO(_patients_csv(80, village)), bulk_import.FORMAT_CSV, seed.user, tenant,
+            )
+
+        assert report["quota_exceeded"] is True
+        assert report["imported"] == 45
+        # Le troisième lot est tronqué, le quatrième n'est pas lu
+        assert report["total_rows"] == 60
+        assert report["error_count"] == 15
+        assert {tuple(error["errors"]) for error in report["errors"]} == {("Quota patients atteint (50)",)}
+        assert [error["row"] for error in report["errors"]] == list(range(47, 62))
+        assert len(await self._site_patients(sessions, seed.site_id)) == 50
+
+    async def test_encounters_for_other_site_patients_rejected(self, seed, sessions):
+        patient = await seed.add_patient()
+        other_site = await seed.add_site("Autre site (test)")
+        stranger = await seed.add_patient(site_id=other_site)
+
+        rows = [
+            {"patient_id": str(patient_id), "date": "2026-10-19T09:00:00", "motif": "Fièvre"}
+            for patient_id in (patient.id, stranger.id, uuid_module.uuid4(), patient.id)
+        ]
+        async with sessions() as db:
+            report = await bulk_import.import_encounters(db, io.BytesIO(_ndjson(rows)), bulk_import.FORMAT_NDJSON, seed.user)
+
+        assert report["imported"] == 2
+        assert report["errors"] == [
+            {"row": row, "errors": ["patient_id: Patient non trouvé dans votre site"]} for row in (2, 3)
+        ]
+        async with sessions() as db:
+            result = await db.execute(
+                select(Encounter.patient_id, Encounter.site_id).where(Encounter.site_id.in_([seed.site_id, other_site]))
+            )
+            assert result.all() == [(patient.id, seed.site_id)] * 2
+
+    @pytest.mark.api
+    async def test_endpoints_require_role_and_active_subscription(self, seed, client, seed_headers, medecin_auth_headers):
+        village = _village(seed)
+        patients = {"file": ("registre.csv", _patients_csv(3, village), "text/csv")}
+        encounters = {"file": ("consultations.ndjson", b"", "application/x-ndjson")}
+
+        # Pharmacien: ni patients ni consultations
+        assert (await client.post("/api/patients/import", files=patients, headers=seed_headers)).status_code == 403
+        assert (await client.post("/api/encounters/import", files=encounters, headers=seed_headers)).status_code == 403
+
+        headers = medecin_auth_headers
+        response = await client.post("/api/patients/import", files=patients, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["imported"] == 3
+
+        # Abonnement résilié: plus d'import
+        await seed.add_subscription(SubscriptionStatus.CANCELED)
+        for url, files in (("/api/patients/import", patients), ("/api/encounters/import", encounters)):
+            assert (await client.post(url, files=files, headers=headers)).status_code == 402
+
+    @pytest.mark.slow
+    async def test_throughput(self, seed, sessions):
+        """Objectif de reprise des registres: 100 000 patients en quelques secondes."""
+        await seed.add_subscription(max_patients_per_month=None)
+        tenant = await self._tenant(seed, sessions)
+        content = _patients_csv(THROUGHPUT_ROWS, _village(seed))
+
+        started = time.perf_counter()
+        async with sessions() as db:
+            report = await bulk_import.import_patients(db, io.BytesIO(content), bulk_import.FORMAT_CSV, seed.user, tenant)
+        elapsed = time.perf_counter() - started
+
+        assert report["imported"] == THROUGHPUT_ROWS
+        async with sessions() as db:
+            count = await db.scalar(select(func.count(Patient.id)).where(Patient.site_id == seed.site_id))
+        assert count == THROUGHPUT_ROWS
+        assert elapsed < THROUGHPUT_BUDGET_SECONDS, f"{THROUGHPUT_ROWS} lignes importées en {elapsed:.1f} s"
@@ -0,0 +1,146 @@
+"""
+Tests des notifications de changements temps réel (SSE)
+"""
+import asyncio
+import gc
+import json
+import tracemalloc
+import uuid as uuid_module
+
+import pytest
+
+from app.main import app
+from app.services.change_events import GLOBAL_SCOPE, QUEUE_SIZE, ChangeEventBroker, broker, build_notification
+
+IDLE_CONNECTIONS = 5000
+# Budget d'un flux inactif (requête ASGI, tâches, file d'attente)
+MAX_BYTES_PER_CONNECTION = 64 * 1024
+MAX_TASKS_PER_CONNECTION = 3
+
+
+def _notification(entity="patient"):
+    return build_notification(entity, uuid_module.uuid4(), "update", "2025-01-01T00:00:00.000000Z")
+
+
+@pytest.mark.unit
+class TestChangeEventBroker:
+    """Tests de la distribution des notifications (sans Redis)."""
+
+    async def test_site_isolation(self):
+        """Un site ne reçoit pas les notifications d'un autre site."""
+        broker = ChangeEventBroker()
+        site_a, site_b = uuid_module.uuid4(), uuid_module.uuid4()
+
+        async with broker.subscribe(site_a) as queue_a, broker.subscribe(site_b) as queue_b:
+            await broker.publish(str(site_a), _notification())
+            assert json.loads(queue_a.get_nowait())["entity"] == "patient"
+            assert queue_b.empty()
+
+    async def test_global_scope_reaches_all_sites(self):
+        """Les changements de catalogue sont diffusés à tous les sites."""
+        broker = ChangeEventBroker()
+
+        async with broker.subscribe(uuid_module.uuid4()) as queue_a, \
+                broker.subscribe(uuid_module.uuid4()) as queue_b:
+            await broker.publish(GLOBAL_SCOPE, _notification("medicament"))
+            assert queue_a.qsize() == 1
+            assert queue_b.qsize() == 1
+
+    async def test_slow_client_keeps_latest(self):
+        """Un client lent ne bloque pas la diffusion: les plus anciennes sont écartées."""
+        broker = ChangeEventBroker()
+        site_id = uuid_module.uuid4()
+
+        async with broker.subscribe(site_id) as queue:
+            for i in range(QUEUE_SIZE + 10):
+                await broker.publish(str(site_id), {"seq": i})
+            assert queue.qsize() == QUEUE_SIZE
+            assert json.loads(queue.get_nowait())["seq"] == 10
+
+
+class _EventStream:
+    """
+    Requête GET /api/sync/events en cours sur l'application ASGI
+
+    Le corps est lu au fil de l'eau (httpx.ASGITransport attend la fin de
+    la réponse); close() simule la déconnexion du client.
+    """
+
+    def __init__(self, headers: dict):
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.status = None
+        self._requested = False
+        self._disconnected = asyncio.Event()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/sync/events", "raw_path": b"/api/sync/events",
+            "query_string": b"", "root_path": "", "client": ("test", 0), "server": ("test", 80),
+            "headers": [(b"host", b"test"), *((k.lower().encode(), v.encode()) for k, v in headers.items())],
+        }
+        self.task = asyncio.create_task(app(scope, self._receive, self._send))
+
+    async def _receive(self) -> dict:
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            await self.chunks.put(message["body"].decode())
+
+    async def next_chunk(self) -> str:
+        return await asyncio.wait_for(self.chunks.get(), timeout=5)
+
+    async def close(self) -> None:
+        self._disconnected.set()
+        await asyncio.wait_for(self.task, timeout=5)
+
+
+@pytest.mark.integration
+@pytest.mark.db
+@pytest.mark.slow
+class TestIdleEventStreams:
+    """Des milliers de flux /sync/events ouverts sur un worker."""
+
+    async def test_thousands_of_idle_connections(self, seed, seed_headers):
+        # Premier flux: imports et caches chargés avant la mesure
+        warmup = _EventStream(seed_headers)
+        assert (await warmup.next_chunk()).startswith("retry:")
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            tasks_before = len(asyncio.all_tasks())
+            memory_before = tracemalloc.get_traced_memory()[0]
+            streams = []
+            for _ in range(IDLE_CONNECTIONS):
+                stream = _EventStream(seed_headers)
+                assert (await stream.next_chunk()).startswith("retry:")
+                streams.append(stream)
+            gc.collect()
+            bytes_per_connection = (tracemalloc.get_traced_memory()[0] - memory_before) / IDLE_CONNECTIONS
+            tasks_per_connection = (len(asyncio.all_tasks()) - tasks_before) / IDLE_CONNECTIONS
+        finally:
+            tracemalloc.stop()
+
+        assert all(stream.status == 200 for stream in streams)
+        assert bytes_per_connection < MAX_BYTES_PER_CONNECTION
+        assert tasks_per_connection <= MAX_TASKS_PER_CONNECTION
+
+        # Inactivité: aucun flux ne se termine
+        await asyncio.sleep(0.1)
+        assert not any(stream.task.done() for stream in streams)
+
+        await broker.publish(str(seed.site_id), _notification())
+        received = await asyncio.gather(*(stream.next_chunk() for stream in streams))
+        assert all(json.loads(chunk.split("data: ", 1)[1])["entity"] == "patient" for chunk in received)
+
+        # Déconnexion: abonnements et tâches libérés
+        subscribers = broker.subscriber_count
+        await asyncio.gather(*(stream.close() for stream in [warmup, *streams]))
+        assert broker.subscriber_count == subscribers - IDLE_CONNECTIONS - 1
+        assert len(asyncio.all_tasks()) <= tasks_before
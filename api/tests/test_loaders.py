@@ -0,0 +1,134 @@
+"""
+Tests des chargeurs groupés (app/services/loaders.py)
+"""
+import uuid as uuid_module
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, select
+
+from app.models.inventory import BonCommande, BonCommandeLigne, Fournisseur, StatutCommandeEnum
+from app.services.loaders import (
+    BON_COMMANDE_LIGNES,
+    NB_BONS_FOURNISSEUR,
+    NB_LIGNES_BON_COMMANDE,
+    load_bons_commande,
+)
+
+NB_BONS = 5
+LIGNES_PAR_BON = 3
+
+
+@contextmanager
+def count_queries(engine):
+    """Compte les instructions SQL envoyées par le moteur"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.unit
+class TestLoadersWithoutParents:
+    """Aucun parent: aucune requête."""
+
+    async def test_children_loader_skips_query(self):
+        assert await BON_COMMANDE_LIGNES.load(None, []) == {}
+
+    async def test_aggregate_loader_skips_query(self):
+        assert await NB_LIGNES_BON_COMMANDE.load(None, []) == {}
+
+
+async def _add_bons(seed, sessions) -> tuple[uuid_module.UUID, list[uuid_module.UUID]]:
+    """Fournisseur et NB_BONS bons de LIGNES_PAR_BON lignes, validés"""
+    fournisseur_id = await seed.add_fournisseur()
+    medicament_ids = await seed.add_medicaments(LIGNES_PAR_BON)
+    bon_ids = [uuid_module.uuid4() for _ in range(NB_BONS)]
+
+    async with sessions() as db:
+        now = datetime.now(timezone.utc)
+        db.add_all(
+            BonCommande(
+                id=bon_id, numero=f"LDR-{bon_id.hex[:8]}", fournisseur_id=fournisseur_id,
+                site_id=seed.site_id, tenant_id=seed.tenant_id, created_by=seed.user.id,
+                statut=StatutCommandeEnum.BROUILLON, date_commande=date.today(),
+                created_at=now, updated_at=now,
+            )
+            for bon_id in bon_ids
+        )
+        db.add_all(
+            BonCommandeLigne(
+                id=uuid_module.uuid4(), bon_commande_id=bon_id, medicament_id=medicament_id,
+                quantite_commandee=10, quantite_recue=0, prix_unitaire=Decimal("1.00"),
+                montant_ligne=Decimal("10.00"), created_at=now, updated_at=now,
+            )
+            for bon_id in bon_ids
+            for medicament_id in medicament_ids
+        )
+        await db.commit()
+    return fournisseur_id, bon_ids
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestLoaderQueryCount:
+    """Le nombre de requêtes ne dépend pas du nombre de bons chargés."""
+
+    async def test_bons_commande_in_two_queries(self, seed, sessions, db_engine):
+        fournisseur_id, bon_ids = await _add_bons(seed, sessions)
+
+        async with sessions() as db:
+            with count_queries(db_engine) as statements:
+                bons = await load_bons_commande(db, bon_ids)
+            assert len(statements) == 2
+            assert set(bons) == set(bon_ids)
+            assert all(len(lignes) == LIGNES_PAR_BON for _, lignes in bons.values())
+            assert all(ligne.medicament_nom.endswith("(test)") for _, lignes in bons.values() for ligne in lignes)
+
+            with count_queries(db_engine) as statements:
+                nb_lignes = await NB_LIGNES_BON_COMMANDE.load(db, bon_ids)
+                nb_bons = await db.scalar(
+                    select(NB_BONS_FOURNISSEUR.column(Fournisseur.id)).where(Fournisseur.id == fournisseur_id)
+                )
+            assert len(statements) == 2
+            assert nb_lignes == dict.fromkeys(bon_ids, LIGNES_PAR_BON)
+            assert nb_bons == NB_BONS
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestEndpointQueryCount:
+    """Requêtes envoyées par les endpoints (hors authentification, sur sa propre session)."""
+
+    async def test_bons_commande_endpoints(self, seed, sessions, seed_headers, client, db_session):
+        fournisseur_id, bon_ids = await _add_bons(seed, sessions)
+
+        with count_queries(db_session.bind) as statements:
+            response = await client.get(f"/api/bons-commande/{bon_ids[0]}", headers=seed_headers)
+        assert response.status_code == 200
+        assert len(response.json()["lignes"]) == LIGNES_PAR_BON
+        assert len(statements) == 2
+
+        for limit in (1, NB_BONS):
+            with count_queries(db_session.bind) as statements:
+                response = await client.get(
+                    "/api/bons-commande", params={"fournisseur_id": str(fournisseur_id), "limit": limit},
+                    headers=seed_headers,
+                )
+            assert response.status_code == 200
+            assert [item["nb_lignes"] for item in response.json()["items"]] == [LIGNES_PAR_BON] * limit
+            assert len(statements) == 2
+
+        with count_queries(db_session.bind) as statements:
+            response = await client.get(f"/api/fournisseurs/{fournisseur_id}", headers=seed_headers)
+        assert response.status_code == 200
+        assert response.json()["nb_bons_commande"] == NB_BONS
+        assert len(statements) == 1
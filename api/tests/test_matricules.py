@@ -0,0 +1,95 @@
+"""
+Tests de l'allocation des matricules patients
+"""
+import asyncio
+import random
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+from app.database import constraint_name
+from app.models import MatriculeCounter
+from app.services import matricule_service
+
+
+@pytest.mark.unit
+class TestMatriculeFormat:
+    """Tests du format des matricules."""
+
+    def test_village_code(self):
+        assert matricule_service.generate_village_code("Konobougou") == "KONO"
+        assert matricule_service.generate_village_code("Kati") == "KATI"
+        assert matricule_service.generate_village_code("Bla") == "BLAX"
+        assert matricule_service.generate_village_code(None) == "UNKN"
+
+    def test_format_matricule(self):
+        assert matricule_service.format_matricule("SIBY", 2025, 1) == "SIBY-2025-0001"
+        assert matricule_service.format_matricule("SIBY", 2025, 12345) == "SIBY-2025-12345"
+
+    def test_parse_matricule(self):
+        assert matricule_service.parse_matricule("SIBY-2025-0042") == ("SIBY", 2025, 42)
+        assert matricule_service.parse_matricule("SIBY-2025") is None
+        # Variantes non canoniques du même numéro
+        assert matricule_service.parse_matricule("SIBY-2025-42") is None
+        assert matricule_service.parse_matricule("SIBY-2025-00042") is None
+        assert matricule_service.parse_matricule("SIBY-02025-0042") is None
+        assert matricule_service.parse_matricule("SIBY-2025-12345") == ("SIBY", 2025, 12345)
+
+    def test_constraint_name(self):
+        """Le nom de la contrainte violée est lu sur l'erreur asyncpg d'origine."""
+        class UniqueViolation(Exception):
+            constraint_name = matricule_service.MATRICULE_INDEX
+
+        orig = Exception("duplicate key")
+        orig.__cause__ = UniqueViolation()
+        assert constraint_name(IntegrityError("INSERT", {}, orig)) == matricule_service.MATRICULE_INDEX
+        assert constraint_name(IntegrityError("INSERT", {}, Exception("fk"))) is None
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestMatriculeConcurrency:
+    """Allocation concurrente sur une vraie base PostgreSQL."""
+
+    async def test_concurrent_allocations_are_unique(self, seed, sessions):
+        """Inscriptions et réservations simultanées: aucun numéro en double."""
+        year = random.randint(3000, 9000)  # Compteur isolé pour ce test
+        seed.cleanup(delete(MatriculeCounter).where(MatriculeCounter.year == year))
+
+        async def register():
+            async with sessions() as db:
+                matricule = await matricule_service.allocate_matricule(db, "Siby", year)
+                await db.commit()
+                return [matricule]
+
+        async def reserve_block():
+            async with sessions() as db:
+                first = await matricule_service.allocate_block(db, "SIBY", year, 25)
+                await db.commit()
+                return [
+                    matricule_service.format_matricule("SIBY", year, n)
+                    for n in range(first, first + 25)
+                ]
+
+        tasks = [register() for _ in range(40)] + [reserve_block() for _ in range(10)]
+        results = await asyncio.gather(*tasks)
+        allocated = [m for block in results for m in block]
+
+        assert len(allocated) == 40 + 10 * 25
+        assert len(set(allocated)) == len(allocated)
+        numbers = sorted(int(m.rsplit("-", 1)[1]) for m in allocated)
+        assert numbers == list(range(1, len(allocated) + 1))
+
+    async def test_only_allocated_matricules_are_accepted(self, seed, sessions):
+        """Un matricule client doit avoir été distribué par le compteur."""
+        year = random.randint(3000, 9000)
+        seed.cleanup(delete(MatriculeCounter).where(MatriculeCounter.year == year))
+
+        async with sessions() as db:
+            await matricule_service.allocate_block(db, "SIBY", year, 10)
+            await db.commit()
+            unallocated = await matricule_service.unallocated_matricules(db, [
+                f"SIBY-{year}-0001", f"SIBY-{year}-0010", f"SIBY-{year}-0011", f"KATI-{year}-0001",
+            ])
+        assert unallocated == {f"SIBY-{year}-0011", f"KATI-{year}-0001"}
@@ -0,0 +1,57 @@
+"""
+Tests du cache du catalogue des médicaments
+"""
+import json
+
+import pytest
+from starlette.requests import Request
+
+from app.services.medicament_catalogue import CatalogueSnapshot, MedicamentCatalogue, etag_matches
+
+
+def _request(if_none_match: str) -> Request:
+    return Request({"type": "http", "headers": [(b"if-none-match", if_none_match.encode())]})
+
+
+@pytest.mark.unit
+class TestCatalogueSnapshot:
+    """Deltas et ETags d'un instantané."""
+
+    def test_changed_since(self):
+        snapshot = CatalogueSnapshot(
+            version=7,
+            items=[{"code": "A"}, {"code": "B"}, {"code": "C"}],
+            item_versions=[0, 3, 7],
+        )
+        assert snapshot.changed_since(0) == [{"code": "B"}, {"code": "C"}]
+        assert snapshot.changed_since(3) == [{"code": "C"}]
+        assert snapshot.changed_since(7) == []
+        assert json.loads(snapshot.body) == {"version": 7, "full": True, "items": snapshot.items}
+
+    def test_etags(self):
+        snapshot = CatalogueSnapshot(version=7, items=[], item_versions=[])
+        assert snapshot.etag() == '"medicaments-v7"'
+        assert snapshot.etag(3) != snapshot.etag()
+
+        assert etag_matches(_request('"medicaments-v6", "medicaments-v7"'), snapshot.etag())
+        assert not etag_matches(_request('"medicaments-v6"'), snapshot.etag())
+
+
+@pytest.mark.unit
+class TestMedicamentCatalogue:
+    """Rechargement au plus une fois par version."""
+
+    async def test_loads_once_per_version(self):
+        loads = []
+
+        async def loader(db):
+            loads.append(db)
+            return [(1, {"code": "A"})]
+
+        catalogue = MedicamentCatalogue(loader, redis_url=None)
+        first = await catalogue.get(None, version=1)
+        assert await catalogue.get(None, version=1) is first
+        assert len(loads) == 1
+
+        assert (await catalogue.get(None, version=2)).version == 2
+        assert len(loads) == 2
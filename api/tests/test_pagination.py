@@ -0,0 +1,106 @@
+"""
+Tests de la pagination par clé (keyset)
+"""
+import uuid as uuid_module
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models import Encounter, Patient
+from app.models.feedback import Feedback
+from app.services.pagination import Keyset, decode_cursor, encode_cursor
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.unit
+class TestCursor:
+    """Encodage des curseurs."""
+
+    def test_round_trip(self):
+        row_id = uuid_module.uuid4()
+        created_at = datetime(2025, 3, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+        cursor = encode_cursor(created_at, row_id)
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (created_at.isoformat(), str(row_id))
+
+    def test_typed_values(self):
+        keyset = Keyset(Encounter.date, Encounter.id)
+        row_id = uuid_module.uuid4()
+        assert keyset._cursor_values(encode_cursor(date(2025, 3, 1), row_id)) == (date(2025, 3, 1), row_id)
+
+        keyset = Keyset(Patient.created_at, Patient.id)
+        created_at = datetime(2025, 3, 1, 8, 30, tzinfo=timezone.utc)
+        assert keyset._cursor_values(encode_cursor(created_at, row_id)) == (created_at, row_id)
+
+    @pytest.mark.parametrize("cursor", ["pas-un-curseur", encode_cursor("2025-13-45", "x")])
+    def test_invalid_cursor(self, cursor):
+        with pytest.raises(HTTPException) as exc:
+            Keyset(Patient.created_at, Patient.id)._cursor_values(cursor)
+        assert exc.value.status_code == 400
+
+
+@pytest.mark.unit
+class TestKeyset:
+    """Construction des requêtes et découpage des pages."""
+
+    def test_first_page(self):
+        sql = _sql(Keyset(Patient.created_at, Patient.id).apply(select(Patient), None, 50))
+        assert "ORDER BY patients.created_at DESC, patients.id DESC" in sql
+        assert "(patients.created_at, patients.id) <" not in sql
+
+    def test_next_page_uses_row_comparison(self):
+        cursor = encode_cursor(datetime(2025, 3, 1, tzinfo=timezone.utc), uuid_module.uuid4())
+        sql = _sql(Keyset(Patient.created_at, Patient.id).apply(select(Patient), cursor, 50))
+        assert "(patients.created_at, patients.id) < (" in sql
+
+        sql = _sql(Keyset(Patient.nom, Patient.id, descending=False).apply(select(Patient), encode_cursor("Diarra", uuid_module.uuid4()), 50))
+        assert "(patients.nom, patients.id) > (" in sql
+        assert "ORDER BY patients.nom ASC, patients.id ASC" in sql
+
+    def test_page(self):
+        keyset = Keyset(Patient.created_at, Patient.id)
+        now = datetime.now(timezone.utc)
+        rows = [Patient(id=uuid_module.uuid4(), created_at=now) for _ in range(4)]
+
+        page, next_cursor, has_more = keyset.page(rows, 3)
+        assert len(page) == 3 and has_more
+        assert decode_cursor(next_cursor) == (now.isoformat(), str(rows[2].id))
+
+        page, next_cursor, has_more = keyset.page(rows[:3], 3)
+        assert len(page) == 3 and not has_more and next_cursor is None
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestKeysetTies:
+    """Parcours complet d'une liste dont toutes les lignes ont la même clé de tri."""
+
+    async def test_ties_are_neither_skipped_nor_repeated(self, db_session):
+        marker = f"keyset-{uuid_module.uuid4()}"
+        same_time = datetime(2025, 1, 1, 12, 0)
+
+        feedbacks = [
+            Feedback(subject=marker, message="test", created_at=same_time if i < 17 else datetime(2025, 1, 2))
+            for i in range(23)
+        ]
+        db_session.add_all(feedbacks)
+        await db_session.flush()
+
+        keyset = Keyset(Feedback.created_at, Feedback.id)
+        seen, cursor = [], None
+        while True:
+            query = keyset.apply(select(Feedback).where(Feedback.subject == marker), cursor, 5)
+            page, cursor, _ = keyset.page((await db_session.execute(query)).scalars().all(), 5)
+            seen.extend(f.id for f in page)
+            if cursor is None:
+                break
+
+        expected = [f.id for f in sorted(feedbacks, key=lambda f: (f.created_at, f.id), reverse=True)]
+        assert seen == expected
@@ -0,0 +1,55 @@
+"""
+Tests de la détection des doublons patients (clé phonétique et score)
+"""
+import pytest
+
+from app.services.patient_matching import DUPLICATE_THRESHOLD, phonetic_key, score_candidate
+
+
+@pytest.mark.unit
+class TestPhoneticKey:
+    """Variantes d'orthographe courantes des noms maliens."""
+
+    @pytest.mark.parametrize("variants", [
+        ("Traoré", "Traore", "Trawore"),
+        ("Coulibaly", "Kulibali"),
+        ("Diarra", "Diara", "Jara"),
+        ("Keïta", "Keita"),
+        ("Seydou", "Seidou"),
+        ("Souleymane", "Sulemani"),
+        ("Djénéba", "Dieneba"),
+    ])
+    def test_spelling_variants_share_key(self, variants):
+        assert len({phonetic_key(v) for v in variants}) == 1
+
+    def test_distinct_names(self):
+        assert phonetic_key("Traoré") != phonetic_key("Touré")
+        assert phonetic_key("Cissé") != phonetic_key("Sissoko")
+
+    def test_full_name(self):
+        assert phonetic_key("Traoré", "Aïssata") == phonetic_key("Trawore", "Aissata")
+        assert phonetic_key(None, None) == ""
+
+
+@pytest.mark.unit
+class TestDuplicateScore:
+    """Tests du score de ressemblance."""
+
+    def _probe(self, **overrides):
+        probe = {"nom": "Traoré", "prenom": "Awa", "sexe": "F", "annee_naissance": 1990,
+                 "telephone": "76 12 34 56", "village": "Siby"}
+        probe.update(overrides)
+        return probe
+
+    def test_probable_duplicate(self):
+        candidate = {"phonetic_key": phonetic_key("Trawore", "Awa"), "sexe": "F",
+                     "annee_naissance": 1991, "telephone": "+223 76123456", "village": "siby"}
+        score, reasons = score_candidate(self._probe(), candidate, 0.6)
+        assert score >= DUPLICATE_THRESHOLD
+        assert {"nom_phonetique", "annee_naissance", "telephone", "village"} <= set(reasons)
+
+    def test_different_sex_and_age_is_not_duplicate(self):
+        candidate = {"phonetic_key": phonetic_key("Traoré", "Awa"), "sexe": "M",
+                     "annee_naissance": 1950, "telephone": None, "village": None}
+        score, _ = score_candidate(self._probe(), candidate, 0.6)
+        assert score < DUPLICATE_THRESHOLD
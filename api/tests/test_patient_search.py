@@ -0,0 +1,35 @@
+"""
+Tests de la construction des requêtes de recherche de patients
+"""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.patient_search import normalize_search_term, search_clauses
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.unit
+class TestPatientSearch:
+    """Tests des clauses de recherche trigrammes."""
+
+    def test_normalize_collapses_spaces(self):
+        assert normalize_search_term("  Traoré   Awa ") == "Traoré Awa"
+
+    def test_short_term_uses_substring_only(self):
+        where, _ = search_clauses("di")
+        assert "LIKE" in _sql(where)
+        assert "<%" not in _sql(where)
+
+    def test_fuzzy_match_and_rank(self):
+        where, rank = search_clauses("Trawore")
+        assert "<%" in _sql(where)
+        assert "f_unaccent" in _sql(where)
+        assert "word_similarity" in _sql(rank)
+
+    def test_like_wildcards_are_escaped(self):
+        where, _ = search_clauses("50%_")
+        params = where.compile(dialect=postgresql.dialect()).params
+        assert "50\\%\\_" in params.values()
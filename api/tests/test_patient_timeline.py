@@ -0,0 +1,36 @@
+"""
+Tests de la chronologie patient (requête UNION ALL)
+"""
+import uuid as uuid_module
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.services.patient_timeline import TIMELINE_TYPES, timeline_query
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.unit
+class TestTimelineQuery:
+    """Construction de la requête de chronologie."""
+
+    def test_all_branches_in_one_query(self):
+        sql = _sql(select(timeline_query(uuid_module.uuid4())))
+        assert sql.count("UNION ALL") == len(TIMELINE_TYPES) - 1
+        for table in ("encounters", "conditions", "medication_requests", "procedures",
+                      "referrals", "delivrances_patient", "attachments"):
+            assert f"FROM {table}" in sql
+
+    def test_type_filter(self):
+        sql = _sql(select(timeline_query(uuid_module.uuid4(), ["diagnostic", "delivrance"])))
+        assert sql.count("UNION ALL") == 1
+        assert "FROM conditions" in sql and "FROM delivrances_patient" in sql
+        assert "FROM attachments" not in sql
+
+    def test_common_columns(self):
+        timeline = timeline_query(uuid_module.uuid4())
+        assert list(timeline.c.keys()) == ["type", "id", "occurred_at", "encounter_id", "titre", "detail", "code"]
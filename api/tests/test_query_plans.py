@@ -0,0 +1,129 @@
+"""
+Tests de non-régression des plans d'exécution
+
+Vérifie, sur une base peuplée, que les requêtes fréquentes de patients_simple,
+encounters et reports, construites par les fonctions des routeurs, passent
+par les index partiels (site_id, ... ) WHERE deleted_at IS NULL et non par
+un scan séquentiel.
+"""
+import json
+import random
+import uuid as uuid_module
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Patient, Site
+from app.routers.encounters import ENCOUNTER_KEYSET, encounter_list_query
+from app.routers.patients_simple import patient_count_query, patient_list_query
+from app.routers.reports import overview_queries
+
+SEED_SITES = 8
+PATIENTS_PER_SITE = 1500
+ENCOUNTERS_PER_PATIENT = 3
+
+
+async def _populate(db: AsyncSession, district_id: uuid_module.UUID, user_id: uuid_module.UUID) -> uuid_module.UUID:
+    """Peuple plusieurs sites (dans la transaction du test) et retourne l'un d'eux"""
+    site_ids = [uuid_module.uuid4() for _ in range(SEED_SITES)]
+    for i, site_id in enumerate(site_ids):
+        db.add(Site(id=site_id, nom=f"Plan {i}", type="cscom", district_id=district_id))
+    await db.flush()
+
+    conn = await db.connection()
+    raw = (await conn.get_raw_connection()).driver_connection
+    now = datetime.now(timezone.utc)
+    patients, encounters = [], []
+    for site_id in site_ids:
+        for _ in range(PATIENTS_PER_SITE):
+            patient_id = uuid_module.uuid4()
+            created_at = now - timedelta(days=random.randint(0, 730))
+            deleted_at = now if random.random() < 0.05 else None
+            patients.append((
+                patient_id, "Traoré", "Awa", "F", 1990, site_id, user_id, 1,
+                created_at, created_at, deleted_at,
+            ))
+            for _ in range(ENCOUNTERS_PER_PATIENT):
+                encounters.append((
+                    uuid_module.uuid4(), patient_id, site_id, user_id,
+                    (created_at + timedelta(days=random.randint(0, 60))).date(),
+                    1, created_at, created_at, deleted_at,
+                ))
+
+    await raw.copy_records_to_table("patients", records=patients, columns=[
+        "id", "nom", "prenom", "sexe", "annee_naissance", "site_id", "created_by", "version",
+        "created_at", "updated_at", "deleted_at",
+    ])
+    await raw.copy_records_to_table("encounters", records=encounters, columns=[
+        "id", "patient_id", "site_id", "user_id", "date", "version",
+        "created_at", "updated_at", "deleted_at",
+    ])
+    await db.execute(text("ANALYZE patients"))
+    await db.execute(text("ANALYZE encounters"))
+    return site_ids[0]
+
+
+def _hot_queries(site_id: uuid_module.UUID, patient_id: uuid_module.UUID) -> dict:
+    """Requêtes construites par les routeurs (nom → (requête, index attendu))"""
+    from_date, to_date = date.today() - timedelta(days=30), date.today()
+    month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    patients, patients_keyset, _ = patient_list_query(site_id)
+    reports = overview_queries(from_date, to_date, site_id)
+
+    def encounters(**filters):
+        return ENCOUNTER_KEYSET.apply(encounter_list_query(site_id, **filters), None, 50)
+
+    return {
+        "patients.list_patients": (patients_keyset.apply(patients, None, 50), "idx_patients_site_created"),
+        "patients.create_patient (quota mensuel)": (
+            patient_count_query(site_id, since=month_start), "idx_patients_site_created",
+        ),
+        "encounters.list_encounters": (encounters(), "idx_encounters_site_date"),
+        "encounters.list_encounters (résumé)": (
+            encounters(summary_fields=["id", "date", "patient_nom"]), "idx_encounters_site_date",
+        ),
+        "encounters.list_encounters (période)": (
+            encounters(from_date=from_date, to_date=to_date), "idx_encounters_site_date",
+        ),
+        "encounters.list_encounters (patient)": (encounters(patient_id=patient_id), "idx_encounters_patient_date"),
+        "reports.total_consultations": (reports["total_consultations"], "idx_encounters_site_date"),
+        "reports.total_patients": (reports["total_patients"], "idx_encounters_site_date"),
+        "reports.nouveaux_patients": (reports["nouveaux_patients"], "idx_patients_site_created"),
+    }
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+@pytest.mark.integration
+@pytest.mark.db
+@pytest.mark.slow
+class TestHotQueryPlans:
+    """Les requêtes fréquentes utilisent les index partiels par site."""
+
+    async def test_hot_queries_use_site_indexes(self, seed, db_session):
+        site_id = await _populate(db_session, seed.district_id, seed.user.id)
+        patient_id = (await db_session.execute(
+            select(Patient.id).where(Patient.site_id == site_id).limit(1)
+        )).scalar_one()
+
+        failures = []
+        for name, (stmt, expected_index) in _hot_queries(site_id, patient_id).items():
+            compiled = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            plan = (await db_session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))).scalar_one()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = list(_plan_nodes(plan[0]["Plan"]))
+
+            indexes = {n.get("Index Name") for n in nodes}
+            seq_scans = {n.get("Relation Name") for n in nodes if n["Node Type"] == "Seq Scan"}
+            if expected_index not in indexes or seq_scans & {"patients", "encounters"}:
+                failures.append(f"{name}: index={sorted(filter(None, indexes))} seq_scan={sorted(seq_scans)}")
+
+        assert not failures, "Plans sans index:\n" + "\n".join(failures)
@@ -0,0 +1,90 @@
+"""
+Tests de la numérotation des documents (app/services/sequence_service.py)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.sequences import DocumentTypeEnum
+from app.services import matricule_service
+from app.services.sequence_service import allocate_sequence, next_document_numero
+
+CONCURRENT_DOCUMENTS = 50
+YEAR = 2026
+
+
+class _RecordingSession:
+    """Session factice: garde les instructions, le compteur vaut `last_value`"""
+
+    def __init__(self, last_value: int):
+        self.last_value = last_value
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(scalar_one=lambda: self.last_value)
+
+
+@pytest.mark.unit
+class TestReserveValues:
+    """Documents et matricules partagent le même upsert."""
+
+    async def test_one_upsert_per_block(self):
+        db = _RecordingSession(last_value=30)
+        assert await allocate_sequence(db, None, DocumentTypeEnum.BON_COMMANDE, YEAR, count=10) == 21
+        assert await matricule_service.allocate_block(db, "SIBY", YEAR, 10) == 21
+
+        documents, matricules = db.statements
+        assert documents.startswith("INSERT INTO document_sequences")
+        assert "ON CONFLICT (site_id, year, document_type) DO UPDATE" in documents
+        assert matricules.startswith("INSERT INTO matricule_counters")
+        assert "ON CONFLICT (village_code, year) DO UPDATE" in matricules
+        assert documents.endswith("RETURNING document_sequences.last_value")
+        assert matricules.endswith("RETURNING matricule_counters.last_value")
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestDocumentSequences:
+    """Allocation concurrente sur une vraie base PostgreSQL."""
+
+    async def test_concurrent_numeros_are_unique_and_contiguous(self, seed, sessions):
+        site_id = await seed.add_site("Site séquences (test)")
+
+        async def create_document() -> str:
+            async with sessions() as db:
+                numero = await next_document_numero(db, site_id, DocumentTypeEnum.BON_COMMANDE, YEAR)
+                await db.commit()
+                return numero
+
+        async def reserve_block() -> list[int]:
+            async with sessions() as db:
+                first = await allocate_sequence(db, site_id, DocumentTypeEnum.BON_COMMANDE, YEAR, count=10)
+                await db.commit()
+                return list(range(first, first + 10))
+
+        numeros, blocks = await asyncio.gather(
+            asyncio.gather(*(create_document() for _ in range(CONCURRENT_DOCUMENTS))),
+            asyncio.gather(*(reserve_block() for _ in range(5))),
+        )
+
+        assert all(numero.startswith(f"BC-{YEAR}-") for numero in numeros)
+        values = [int(numero.rsplit("-", 1)[1]) for numero in numeros] + [v for block in blocks for v in block]
+        assert sorted(values) == list(range(1, CONCURRENT_DOCUMENTS + 5 * 10 + 1))
+
+    async def test_rollback_returns_the_numero(self, seed, sessions):
+        """Document non créé: le numéro est rendu, pas de trou."""
+        site_id = await seed.add_site("Site séquences (test)")
+
+        async with sessions() as db:
+            assert await next_document_numero(db, site_id, DocumentTypeEnum.TRANSFERT, YEAR) == f"TR-{YEAR}-0001"
+            await db.rollback()
+
+        async with sessions() as db:
+            assert await next_document_numero(db, site_id, DocumentTypeEnum.TRANSFERT, YEAR) == f"TR-{YEAR}-0001"
+            # Compteurs indépendants par type de document
+            assert await next_document_numero(db, site_id, DocumentTypeEnum.BON_COMMANDE, YEAR) == f"BC-{YEAR}-0001"
+            assert await next_document_numero(db, site_id, DocumentTypeEnum.TRANSFERT, YEAR) == f"TR-{YEAR}-0002"
+            await db.commit()
@@ -0,0 +1,63 @@
+"""
+Tests de la sérialisation rapide des listes
+"""
+import json
+import uuid as uuid_module
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models import Patient, SexeEnum
+from app.models.inventory import FormeMedicamentEnum, Medicament, StatutCommandeEnum
+from app.routers.bons_commande import BON_COMMANDE_ROW, BonCommandeOut
+from app.routers.medicaments import MEDICAMENT_ROW, MedicamentOut
+from app.routers.patients_simple import PATIENT_ROW
+from app.schemas import PatientOut
+from app.services.serialization import RowSerializer, dumps
+
+
+@pytest.mark.unit
+class TestRowSerializer:
+    """Le chemin rapide produit le même JSON que Pydantic."""
+
+    def test_patient_matches_pydantic(self):
+        row = {
+            "id": uuid_module.uuid4(), "nom": "Traoré", "prenom": "Aïssata", "sexe": list(SexeEnum)[0],
+            "annee_naissance": 1990, "telephone": None, "village": "Siby", "site_id": uuid_module.uuid4(),
+            "matricule": "SIBY-2025-0001", "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime(2025, 1, 1, 12, 0), "version": 1,
+        }
+        expected = PatientOut.model_validate(Patient(**row)).model_dump_json()
+        assert json.loads(dumps(PATIENT_ROW(row))) == json.loads(expected)
+
+    def test_medicament_matches_pydantic(self):
+        row = {
+            "id": uuid_module.uuid4(), "code": "PARA500", "nom": "Paracétamol", "dci": None,
+            "forme": list(FormeMedicamentEnum)[0], "dosage": "500mg", "unite_conditionnement": None,
+            "quantite_par_unite": 20, "prix_unitaire_reference": Decimal("12.50"), "seuil_alerte_defaut": None,
+            "is_active": True, "created_at": datetime.now(timezone.utc), "updated_at": datetime.now(timezone.utc),
+        }
+        expected = MedicamentOut.model_validate(Medicament(**row)).model_dump_json()
+        assert json.loads(dumps(MEDICAMENT_ROW(row))) == json.loads(expected)
+
+    def test_bon_commande_matches_pydantic(self):
+        row = {
+            "id": uuid_module.uuid4(), "numero": "BC-2025-00001", "fournisseur_id": uuid_module.uuid4(),
+            "fournisseur_nom": "Laborex", "site_id": uuid_module.uuid4(), "statut": list(StatutCommandeEnum)[0],
+            "date_commande": date(2025, 3, 1), "date_livraison_prevue": None, "date_livraison_effective": None,
+            "montant_total": Decimal("15000.00"), "commentaire": None,
+            "created_at": datetime.now(timezone.utc), "updated_at": datetime.now(timezone.utc),
+        }
+        expected = BonCommandeOut.model_validate(row).model_dump_json()
+        assert json.loads(dumps(BON_COMMANDE_ROW(row))) == json.loads(expected)
+
+    def test_columns_skip_unmapped_fields(self):
+        columns = PATIENT_ROW.columns(Patient)
+        assert "age" not in {c.key for c in columns}
+        assert PATIENT_ROW({"id": uuid_module.uuid4()})["age"] is None
+
+    def test_nested_schema_is_rejected(self):
+        from app.schemas import PatientDetails
+        with pytest.raises(TypeError):
+            RowSerializer(PatientDetails)
@@ -0,0 +1,44 @@
+"""
+Tests des alertes de stock
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.inventory import Medicament, StockAlert, TypeAlerteStockEnum
+from app.services.stock_alerts import crosses_threshold, join_live_quantities, live_alert_columns, stock_alert_type
+
+
+@pytest.mark.unit
+class TestStockAlertThresholds:
+    """Alerte d'un stock et franchissement de seuil."""
+
+    def test_alert_type(self):
+        assert stock_alert_type(0, 10) == TypeAlerteStockEnum.RUPTURE
+        assert stock_alert_type(-2, 0) == TypeAlerteStockEnum.RUPTURE
+        assert stock_alert_type(10, 10) == TypeAlerteStockEnum.STOCK_BAS
+        assert stock_alert_type(11, 10) is None
+
+    def test_only_crossings_write_alerts(self):
+        assert crosses_threshold(12, 10, 10)      # entre en stock bas
+        assert crosses_threshold(3, 0, 10)        # passe en rupture
+        assert crosses_threshold(8, 40, 10)       # sort de l'alerte
+        assert not crosses_threshold(50, 30, 10)  # reste au-dessus
+        assert not crosses_threshold(9, 4, 10)    # reste en stock bas
+
+
+@pytest.mark.unit
+class TestLiveAlertQuantities:
+    """Les listes d'alertes affichent la quantité courante du stock ou du lot."""
+
+    def test_quantity_read_from_stock_and_lot(self):
+        query = join_live_quantities(
+            select(StockAlert.id).add_columns(*(c.label(n) for n, c in live_alert_columns().items()))
+            .select_from(StockAlert)
+            .join(Medicament, StockAlert.medicament_id == Medicament.id)
+        )
+        sql = str(query.compile(dialect=postgresql.dialect()))
+        assert "LEFT OUTER JOIN stock_sites ON stock_sites.site_id = stock_alerts.site_id" in sql
+        assert "LEFT OUTER JOIN lots_medicament ON stock_alerts.lot_id = lots_medicament.id" in sql
+        assert "stock_sites.quantite_actuelle" in sql
+        assert "stock_sites.point_commande" in sql
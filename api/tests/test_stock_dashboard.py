@@ -0,0 +1,134 @@
+"""
+Tests du tableau de bord du stock d'un site
+"""
+import uuid as uuid_module
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models.inventory import LotMedicament, StockMovement, StockSite, TypeMouvementEnum
+from app.services import stock_dashboard
+from app.services.stock_dashboard import StockDashboardCache, _previous_month, compute_dashboard
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.mark.unit
+class TestPreviousMonth:
+    def test_year_boundary(self):
+        assert _previous_month(date(2026, 1, 15)) == (
+            datetime(2025, 12, 1, tzinfo=timezone.utc),
+            datetime(2026, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def test_end_of_month(self):
+        assert _previous_month(date(2026, 3, 31))[0] == datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.unit
+class TestDashboardCache:
+    """Le résumé n'est recalculé que si le stock du site a changé."""
+
+    @pytest.fixture
+    def site(self, monkeypatch):
+        state = {"version": 120, "computed": 0}
+
+        async def version(db, site_id):
+            return state["version"]
+
+        async def compute(db, site_id, today):
+            state["computed"] += 1
+            return {"site_id": str(site_id), "calcul": state["computed"]}
+
+        monkeypatch.setattr(stock_dashboard, "site_stock_version", version)
+        monkeypatch.setattr(stock_dashboard, "compute_dashboard", compute)
+        return state
+
+    async def test_reused_until_stock_changes(self, site):
+        cache, site_id, today = StockDashboardCache(), uuid_module.uuid4(), date(2026, 10, 19)
+        assert (await cache.get(None, site_id, today))["calcul"] == 1
+        assert (await cache.get(None, site_id, today))["calcul"] == 1
+
+        site["version"] = 121  # Mouvement de stock
+        assert (await cache.get(None, site_id, today))["calcul"] == 2
+
+    async def test_recomputed_next_day_and_after_ttl(self, site):
+        site_id = uuid_module.uuid4()
+        cache = StockDashboardCache()
+        await cache.get(None, site_id, date(2026, 10, 19))
+        assert (await cache.get(None, site_id, date(2026, 10, 20)))["calcul"] == 2
+
+        expired = StockDashboardCache(ttl=0)
+        await expired.get(None, site_id, date(2026, 10, 19))
+        assert (await expired.get(None, site_id, date(2026, 10, 19)))["calcul"] == 4
+
+
+def _utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestDashboardQuery:
+    """Indicateurs calculés sur des lots et mouvements en base."""
+
+    async def test_dashboard_figures(self, seed, sessions):
+        medicament_a, medicament_b = await seed.add_medicaments(2)
+        context = dict(site_id=seed.site_id, tenant_id=seed.tenant_id)
+        now = datetime.now(timezone.utc)
+
+        async with sessions() as db:
+            db.add_all(
+                StockSite(
+                    id=uuid_module.uuid4(), medicament_id=medicament_id, quantite_actuelle=quantite,
+                    version=1, created_at=now, updated_at=now, **context,
+                )
+                for medicament_id, quantite in ((medicament_a, 38), (medicament_b, 0))
+            )
+            # (quantité restante, prix d'achat, péremption dans N jours)
+            db.add_all(
+                LotMedicament(
+                    id=uuid_module.uuid4(), medicament_id=medicament_a, numero_lot=f"DASH-{i}",
+                    date_peremption=TODAY + timedelta(days=jours), quantite_restante=quantite,
+                    prix_achat_unitaire=Decimal(prix), created_at=now, updated_at=now, **context,
+                )
+                for i, (quantite, prix, jours) in enumerate([
+                    (10, "2.00", 10),      # 30, 60 et 90 jours
+                    (20, "1.50", 45),      # 60 et 90 jours
+                    (5, "4.00", 200),      # au-delà des horizons
+                    (3, "1.00", -1),       # périmé
+                    (0, "100.00", 5),      # épuisé: ignoré
+                ])
+            )
+            await db.flush()
+            # Seules les sorties de septembre comptent dans la consommation
+            db.add_all(
+                StockMovement(
+                    id=uuid_module.uuid4(), medicament_id=medicament_id, type_mouvement=type_mouvement,
+                    quantite=quantite, date_mouvement=moment, created_at=moment, created_by=seed.user.id, **context,
+                )
+                for medicament_id, type_mouvement, quantite, moment in [
+                    (medicament_a, TypeMouvementEnum.SORTIE, 4, _utc(2026, 9, 1)),
+                    (medicament_b, TypeMouvementEnum.SORTIE, 6, _utc(2026, 9, 30, 23, 59)),
+                    (medicament_a, TypeMouvementEnum.SORTIE, 7, _utc(2026, 8, 31, 23, 59)),
+                    (medicament_a, TypeMouvementEnum.SORTIE, 8, _utc(2026, 10, 1)),
+                    (medicament_a, TypeMouvementEnum.ENTREE, 100, _utc(2026, 9, 10)),
+                    (medicament_a, TypeMouvementEnum.PERTE, 2, _utc(2026, 9, 12)),
+                ]
+            )
+            await db.commit()
+
+        async with sessions() as db:
+            data = await compute_dashboard(db, seed.site_id, TODAY)
+
+        assert (data["nb_references"], data["nb_ruptures"]) == (2, 1)
+        assert (data["nb_alertes_stock"], data["nb_alertes_peremption"]) == (0, 0)
+        assert Decimal(data["valeur_stock"]) == Decimal("73.00")
+        assert data["lots_perimes"] == 1
+        assert data["peremption"] == {
+            "30j": {"lots": 1, "quantite": 10},
+            "60j": {"lots": 2, "quantite": 30},
+            "90j": {"lots": 2, "quantite": 30},
+        }
+        assert data["consommation_mois_precedent"] == {"mois": "2026-09", "quantite": 10, "references": 2}
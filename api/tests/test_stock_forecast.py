@@ -0,0 +1,33 @@
+"""
+Tests des prévisions de consommation
+"""
+import numpy as np
+import pytest
+
+from app.services.stock_forecast import forecast_series
+
+
+@pytest.mark.unit
+class TestForecastSeries:
+    """Moyenne, variabilité et points de commande vectorisés."""
+
+    def test_reorder_points(self):
+        # Stock 0: 10 par jour; stock 1: 30 un jour sur trois; stock 2: aucune sortie
+        days = np.arange(30)
+        series = np.concatenate([np.zeros(30, dtype=int), np.ones(10, dtype=int)])
+        jours = np.concatenate([days, days[::3]])
+        quantities = np.concatenate([np.full(30, 10.0), np.full(10, 30.0)])
+
+        forecast = forecast_series(series, jours, quantities, n_series=3, n_days=30, delai=10, revue=20, z=1.65)
+
+        assert forecast.moyenne.tolist() == [10.0, 10.0, 0.0]
+        assert forecast.ecart_type[0] == 0
+        assert forecast.point_commande[0] == 100
+        assert forecast.niveau_cible[0] == 300
+        # Consommation irrégulière: stock de sécurité plus élevé
+        assert forecast.point_commande[1] > forecast.point_commande[0]
+        assert forecast.point_commande[2] == 0
+
+    def test_duplicate_days_are_summed(self):
+        forecast = forecast_series(np.array([0, 0]), np.array([1, 1]), np.array([2.0, 3.0]), n_series=1, n_days=5)
+        assert forecast.moyenne.tolist() == [1.0]
@@ -0,0 +1,340 @@
+"""
+Tests du registre des mouvements de stock (ledger)
+"""
+import asyncio
+import uuid as uuid_module
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql
+
+from app.models.inventory import (
+    DelivranceLigne,
+    DelivrancePatient,
+    LotMedicament,
+    Medicament,
+    StockMovement,
+    StockSite,
+    TypeMouvementEnum,
+)
+from app.services.lot_allocation import FefoAllocator, LotAllocation, LotStock
+from app.services.stock_ledger import (
+    DispensingLine,
+    ReceptionLine,
+    TransferLine,
+    _apply_statement,
+    apply_dispensing,
+    apply_movement,
+    apply_reception,
+    apply_transfer,
+)
+from app.services.stock_alerts import SEUIL
+
+CONCURRENT_MOVEMENTS = 50
+INITIAL_STOCK = 30
+
+
+@pytest.mark.unit
+class TestLedgerStatement:
+    """Forme de l'instruction SQL."""
+
+    def test_single_conditional_statement(self):
+        movement = StockMovement(
+            id=uuid_module.uuid4(), type_mouvement=TypeMouvementEnum.SORTIE, medicament_id=uuid_module.uuid4(),
+            site_id=uuid_module.uuid4(), tenant_id=uuid_module.uuid4(), created_by=uuid_module.uuid4(), quantite=3,
+        )
+        sql = str(_apply_statement(movement, -3, guard=True).compile(dialect=postgresql.dialect()))
+        assert sql.startswith("WITH stock AS")
+        assert "stock_sites.quantite_actuelle >= " in sql
+        assert "INSERT INTO stock_movements" in sql
+
+        sql = str(_apply_statement(movement, 3, guard=False).compile(dialect=postgresql.dialect()))
+        assert "stock_sites.quantite_actuelle >= " not in sql
+
+
+@pytest.mark.unit
+class TestFefoAllocation:
+    """Répartition d'une demande sur les lots par date de péremption."""
+
+    today = date(2026, 10, 19)
+
+    def lot(self, jours: int, quantite: int) -> LotStock:
+        return LotStock(
+            id=uuid_module.uuid4(), medicament_id=uuid_module.uuid4(), numero_lot=f"L{jours}",
+            date_peremption=self.today + timedelta(days=jours), quantite_restante=quantite,
+        )
+
+    def test_first_expired_first_out(self):
+        perime, proche, lointain = self.lot(-1, 5), self.lot(10, 4), self.lot(90, 20)
+        allocator = FefoAllocator([perime, proche, lointain], quantite_actuelle=29, today=self.today)
+        assert allocator.disponible == 24
+        assert allocator.perimes == 5
+
+        allocations, reste = allocator.allocate(6)
+        assert reste == 0
+        assert allocations == [LotAllocation(proche.id, 4), LotAllocation(lointain.id, 2)]
+
+        # Le lot périmé n'est jamais délivré, même imposé
+        assert allocator.allocate(1, lot_id=perime.id) == ([], 1)
+        assert allocator.allocate(30) == ([LotAllocation(lointain.id, 18)], 12)
+
+    def test_unlotted_stock_used_after_lots(self):
+        lot = self.lot(30, 3)
+        allocator = FefoAllocator([lot], quantite_actuelle=10, today=self.today)
+        allocations, reste = allocator.allocate(5)
+        assert reste == 0
+        assert allocations == [LotAllocation(lot.id, 3), LotAllocation(None, 2)]
+
+
+@pytest.mark.unit
+class TestReceptionValidation:
+    """Réception refusée avant toute écriture."""
+
+    async def test_rejects_over_delivery_and_expired_lots(self):
+        ligne = SimpleNamespace(id=uuid_module.uuid4(), medicament_id=uuid_module.uuid4(),
+                                quantite_commandee=10, quantite_recue=6)
+        bon = SimpleNamespace(lignes=[ligne])
+        today = date(2026, 10, 19)
+
+        with pytest.raises(HTTPException) as exc:
+            await apply_reception(None, bon, [
+                ReceptionLine(ligne.id, 3, "A1", today + timedelta(days=365)),
+                ReceptionLine(ligne.id, 2, "A2", today - timedelta(days=1)),
+                ReceptionLine(uuid_module.uuid4(), 1, "B1", today + timedelta(days=365)),
+            ], created_by=uuid_module.uuid4(), date_reception=today)
+
+        assert exc.value.status_code == 400
+        assert "reste à recevoir: 4, reçu: 5" in exc.value.detail
+        assert "lot A2 périmé" in exc.value.detail
+        assert "absente du bon" in exc.value.detail
+
+
+@pytest.mark.integration
+@pytest.mark.db
+@pytest.mark.slow
+class TestLedgerConcurrency:
+    """Délivrances simultanées sur un même médicament d'un même site."""
+
+    async def test_no_lost_update_under_concurrency(self, seed, sessions):
+        [medicament_id] = await seed.add_medicaments()
+        context = dict(site_id=seed.site_id, tenant_id=seed.tenant_id, medicament_id=medicament_id, created_by=seed.user.id)
+
+        async def move(type_mouvement: TypeMouvementEnum) -> bool:
+            async with sessions() as db:
+                try:
+                    await apply_movement(db, type_mouvement=type_mouvement, quantite=1, **context)
+                    await db.commit()
+                    return True
+                except HTTPException as e:
+                    assert e.status_code == 400
+                    await db.rollback()
+                    return False
+
+        async with sessions() as db:
+            await apply_movement(db, type_mouvement=TypeMouvementEnum.ENTREE, quantite=INITIAL_STOCK, **context)
+            await db.commit()
+
+        results = await asyncio.gather(*(move(TypeMouvementEnum.SORTIE) for _ in range(CONCURRENT_MOVEMENTS)))
+
+        async with sessions() as db:
+            stock = await db.scalar(select(StockSite.quantite_actuelle).where(
+                StockSite.site_id == seed.site_id, StockSite.medicament_id == medicament_id))
+            sorties = await db.scalar(select(func.count()).where(
+                StockMovement.medicament_id == medicament_id,
+                StockMovement.type_mouvement == TypeMouvementEnum.SORTIE))
+
+        assert sum(results) == INITIAL_STOCK
+        assert sorties == INITIAL_STOCK
+        assert stock == 0
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestDispensing:
+    """Délivrance multi-lignes: tout ou rien."""
+
+    async def test_all_lines_or_none(self, seed, sessions):
+        medicament_ids = await seed.add_medicaments(2)
+        patient = await seed.add_patient()
+        user = seed.user
+
+        def delivrance() -> DelivrancePatient:
+            now = datetime.now(timezone.utc)
+            return DelivrancePatient(
+                id=uuid_module.uuid4(), patient_id=patient.id, site_id=seed.site_id, tenant_id=seed.tenant_id,
+                delivered_by=user.id, date_delivrance=now, created_at=now, updated_at=now,
+            )
+
+        async with sessions() as db:
+            for medicament_id in medicament_ids:
+                await apply_movement(
+                    db, site_id=seed.site_id, tenant_id=seed.tenant_id, medicament_id=medicament_id,
+                    type_mouvement=TypeMouvementEnum.ENTREE, quantite=10, created_by=user.id,
+                )
+            await db.commit()
+
+        async with sessions() as db:
+            with pytest.raises(HTTPException) as exc:
+                await apply_dispensing(db, delivrance(), [
+                    DispensingLine(medicament_ids[0], 4), DispensingLine(medicament_ids[1], 11),
+                ])
+            assert exc.value.status_code == 400
+            await db.rollback()
+
+        async with sessions() as db:
+            result = await apply_dispensing(db, delivrance(), [
+                DispensingLine(medicament_ids[0], 4), DispensingLine(medicament_ids[1], 6),
+                DispensingLine(medicament_ids[0], 1),
+            ])
+            await db.commit()
+            assert result.stock_restant == {medicament_ids[0]: 5, medicament_ids[1]: 4}
+
+            stocks = dict((await db.execute(
+                select(StockSite.medicament_id, StockSite.quantite_actuelle)
+                .where(StockSite.medicament_id.in_(medicament_ids))
+            )).all())
+            assert stocks == result.stock_restant
+            lignes = await db.scalar(select(func.count()).where(DelivranceLigne.medicament_id.in_(medicament_ids)))
+            assert lignes == 3
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestTransfer:
+    """Transfert entre deux sites: débit, crédit et lots en une transaction."""
+
+    async def test_transfer_moves_lots_and_stock(self, seed, sessions):
+        [medicament_id] = await seed.add_medicaments()
+        source_id, destination_id = seed.site_id, await seed.add_site("Transfert (test)")
+        transfer = dict(tenant_id=seed.tenant_id, created_by=seed.user.id, numero="TR-TEST")
+
+        async with sessions() as db:
+            await apply_movement(
+                db, site_id=source_id, tenant_id=seed.tenant_id, medicament_id=medicament_id,
+                type_mouvement=TypeMouvementEnum.ENTREE, quantite=10, created_by=seed.user.id,
+            )
+            now = datetime.now(timezone.utc)
+            db.add(LotMedicament(
+                id=uuid_module.uuid4(), medicament_id=medicament_id, site_id=source_id,
+                tenant_id=seed.tenant_id, numero_lot="L-TRF", date_peremption=date.today() + timedelta(days=200),
+                quantite_restante=6, prix_achat_unitaire=2, created_at=now, updated_at=now,
+            ))
+            await db.commit()
+
+        # 6 pris sur le lot, 2 sur la part hors lot
+        async with sessions() as db:
+            result = await apply_transfer(
+                db, source_site_id=source_id, destination_site_id=destination_id,
+                lines=[TransferLine(medicament_id, 8)], **transfer,
+            )
+            await db.commit()
+        assert result.stock_source == {medicament_id: 2}
+        assert result.stock_destination == {medicament_id: 8}
+        assert sorted((ligne["quantite"], ligne["lot_destination_id"] is None) for ligne in result.lignes) == [
+            (2, True), (6, False),
+        ]
+
+        async with sessions() as db:
+            lot = (await db.execute(select(LotMedicament).where(
+                LotMedicament.site_id == destination_id, LotMedicament.medicament_id == medicament_id,
+            ))).scalar_one()
+            assert (lot.numero_lot, lot.quantite_restante) == ("L-TRF", 6)
+
+        # Transferts de sens opposés simultanés: pas d'interblocage
+        async def move(source, destination, quantite):
+            async with sessions() as db:
+                await apply_transfer(
+                    db, source_site_id=source, destination_site_id=destination,
+                    lines=[TransferLine(medicament_id, quantite)], **transfer,
+                )
+                await db.commit()
+
+        await asyncio.wait_for(asyncio.gather(
+            move(source_id, destination_id, 1), move(destination_id, source_id, 3),
+        ), timeout=10)
+
+        async with sessions() as db:
+            stocks = dict((await db.execute(
+                select(StockSite.site_id, StockSite.quantite_actuelle).where(StockSite.medicament_id == medicament_id)
+            )).all())
+        assert stocks == {source_id: 4, destination_id: 6}
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestLotMovements:
+    """Diminutions saisies à l'unité: décrément du lot visé ou des lots FEFO."""
+
+    async def test_decreases_consume_lots(self, seed, sessions):
+        [medicament_id] = await seed.add_medicaments()
+        context = dict(site_id=seed.site_id, tenant_id=seed.tenant_id, medicament_id=medicament_id, created_by=seed.user.id)
+        today = date.today()
+
+        async with sessions() as db:
+            await apply_movement(db, type_mouvement=TypeMouvementEnum.ENTREE, quantite=10, **context)
+            now = datetime.now(timezone.utc)
+            perime, valide = (
+                LotMedicament(
+                    id=uuid_module.uuid4(), medicament_id=medicament_id, site_id=seed.site_id, tenant_id=seed.tenant_id,
+                    numero_lot=numero, date_peremption=today + timedelta(days=jours), quantite_restante=quantite,
+                    prix_achat_unitaire=1, created_at=now, updated_at=now,
+                )
+                for numero, jours, quantite in (("L-PERIME", -1, 3), ("L-VALIDE", 90, 5))
+            )
+            db.add_all([perime, valide])
+            await db.commit()
+
+        async def move(type_mouvement, quantite, lot_id=None):
+            async with sessions() as db:
+                entry = await apply_movement(db, type_mouvement=type_mouvement, quantite=quantite, lot_id=lot_id, **context)
+                await db.commit()
+                return entry
+
+        with pytest.raises(HTTPException) as exc:
+            await move(TypeMouvementEnum.SORTIE, 1, perime.id)
+        assert exc.value.status_code == 400 and "périmé" in exc.value.detail
+
+        # Sortie sans lot: lot valide (FEFO, lot périmé exclu)
+        assert (await move(TypeMouvementEnum.SORTIE, 2)).movement.lot_id == valide.id
+        await move(TypeMouvementEnum.PEREMPTION, 3, perime.id)
+        await move(TypeMouvementEnum.PERTE, 1, valide.id)
+        with pytest.raises(HTTPException):
+            await move(TypeMouvementEnum.PERTE, 3, valide.id)
+
+        async with sessions() as db:
+            lots = dict((await db.execute(
+                select(LotMedicament.numero_lot, LotMedicament.quantite_restante)
+                .where(LotMedicament.medicament_id == medicament_id)
+            )).all())
+            stock = await db.scalar(select(StockSite.quantite_actuelle).where(StockSite.medicament_id == medicament_id))
+        assert lots == {"L-PERIME": 0, "L-VALIDE": 2}
+        assert stock == 4
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestCreatedStockThreshold:
+    """Une ligne de stock créée par un mouvement n'a pas de seuil fixé."""
+
+    async def test_reorder_point_overrides_default(self, seed, sessions):
+        [medicament_id] = await seed.add_medicaments(seuil_alerte_defaut=5)
+        context = dict(site_id=seed.site_id, tenant_id=seed.tenant_id, medicament_id=medicament_id, created_by=seed.user.id)
+        seuil = (
+            select(StockSite.seuil_alerte, SEUIL)
+            .join(Medicament, StockSite.medicament_id == Medicament.id)
+            .where(StockSite.site_id == seed.site_id, StockSite.medicament_id == medicament_id)
+        )
+
+        async with sessions() as db:
+            await apply_movement(db, type_mouvement=TypeMouvementEnum.ENTREE, quantite=10, **context)
+            await db.commit()
+            assert tuple((await db.execute(seuil)).one()) == (None, 5)
+
+            await db.execute(
+                update(StockSite).where(StockSite.medicament_id == medicament_id).values(point_commande=8)
+            )
+            await db.commit()
+            assert tuple((await db.execute(seuil)).one()) == (None, 8)
@@ -0,0 +1,136 @@
+"""
+Tests du rapprochement des stocks (arrêtés + registre)
+"""
+import uuid as uuid_module
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
+
+from app.models.inventory import StockMovement, StockSite, TypeMouvementEnum
+from app.services.stock_ledger import apply_movement, signed_quantity
+from app.services.stock_reconciliation import (
+    StockDrift,
+    balances_query,
+    find_drift,
+    fix_drift,
+    month_start,
+    write_snapshots,
+)
+
+# Historique daté avant toute donnée réelle: les arrêtés (écrits pour tous
+# les stocks créés avant leur date) ne concernent que les stocks du test
+CREATED = datetime(2000, 8, 15, tzinfo=timezone.utc)
+SNAPSHOT = datetime(2000, 10, 1, tzinfo=timezone.utc)
+HISTORY = [
+    (TypeMouvementEnum.ENTREE, 20, datetime(2000, 9, 10, tzinfo=timezone.utc)),
+    (TypeMouvementEnum.SORTIE, 5, datetime(2000, 9, 30, 23, 59, tzinfo=timezone.utc)),
+    (TypeMouvementEnum.ENTREE, 3, SNAPSHOT),  # À l'heure de l'arrêté: après lui
+    (TypeMouvementEnum.PERTE, 4, datetime(2000, 10, 5, tzinfo=timezone.utc)),
+    (TypeMouvementEnum.AJUSTEMENT_POSITIF, 2, datetime(2000, 11, 1, tzinfo=timezone.utc)),
+]
+
+
+@pytest.mark.unit
+class TestStockBalances:
+    """Solde = dernier arrêté + mouvements suivants."""
+
+    def test_month_start(self):
+        moment = datetime(2026, 10, 19, 23, 30, tzinfo=timezone(timedelta(hours=-2)))
+        assert month_start(moment) == datetime(2026, 10, 1, tzinfo=timezone.utc)
+        assert month_start(datetime(2026, 10, 31, 23, 0, tzinfo=timezone(timedelta(hours=-2)))) == \
+            datetime(2026, 11, 1, tzinfo=timezone.utc)
+
+    def test_single_grouped_query_from_snapshot(self):
+        at = datetime(2026, 10, 20, tzinfo=timezone.utc)
+        sql = str(balances_query(at, site_id=uuid_module.uuid4()).compile(dialect=postgresql.dialect()))
+        assert "DISTINCT ON (stock_snapshots.site_id, stock_snapshots.medicament_id)" in sql
+        assert "stock_movements.date_mouvement >= arrete.arrete_au" in sql
+        assert "stock_movements.date_mouvement < " in sql
+        assert "GROUP BY stock_sites.id" in sql
+
+    def test_drift(self):
+        drift = StockDrift(uuid_module.uuid4(), uuid_module.uuid4(), uuid_module.uuid4(), compteur=12, registre=10)
+        assert drift.ecart == -2
+
+
+def _replay(history, at=None) -> int:
+    """Solde par rejeu complet des mouvements antérieurs à `at`"""
+    return sum(signed_quantity(t, quantite) for t, quantite, moment in history if at is None or moment < at)
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestReconciliationWithSnapshots:
+    """Arrêté + mouvements suivants = rejeu complet du registre."""
+
+    @pytest.fixture
+    async def stock(self, seed, sessions):
+        [medicament_id] = await seed.add_medicaments()
+        stock_id = uuid_module.uuid4()
+        async with sessions() as db:
+            db.add(StockSite(
+                id=stock_id, site_id=seed.site_id, tenant_id=seed.tenant_id, medicament_id=medicament_id,
+                quantite_actuelle=_replay(HISTORY), version=1, created_at=CREATED, updated_at=CREATED,
+            ))
+            await db.flush()
+            db.add_all(
+                StockMovement(
+                    id=uuid_module.uuid4(), type_mouvement=type_mouvement, quantite=quantite, date_mouvement=moment,
+                    medicament_id=medicament_id, site_id=seed.site_id, tenant_id=seed.tenant_id,
+                    created_by=seed.user.id, created_at=moment,
+                )
+                for type_mouvement, quantite, moment in HISTORY
+            )
+            await db.flush()
+            await write_snapshots(db, SNAPSHOT)
+            await db.commit()
+        return stock_id, medicament_id
+
+    async def test_balances_match_full_replay(self, seed, sessions, stock):
+        stock_id, medicament_id = stock
+        moments = [SNAPSHOT - timedelta(days=1), SNAPSHOT, SNAPSHOT + timedelta(seconds=1),
+                   datetime(2000, 11, 1, tzinfo=timezone.utc), None]
+        async with sessions() as db:
+            for at in moments:
+                balances = (await db.execute(balances_query(at, site_id=seed.site_id))).all()
+                assert [(row.stock_id, row.quantite) for row in balances] == [(stock_id, _replay(HISTORY, at))]
+
+    async def test_stock_at_month_boundary(self, seed, seed_headers, client, stock):
+        _, medicament_id = stock
+        # Fin du 30 septembre: l'arrêté du 1er octobre, sans le mouvement de minuit
+        for jour, attendu in (("2000-09-30", 15), ("2000-10-01", 18), ("2000-10-31", 14)):
+            response = await client.get(
+                f"/api/stock/sites/{seed.site_id}/historique", params={"date": jour}, headers=seed_headers
+            )
+            assert response.status_code == 200
+            assert [(item["medicament_id"], item["quantite"]) for item in response.json()["items"]] == \
+                [(str(medicament_id), attendu)]
+
+    async def test_fix_drift_with_concurrent_movement(self, seed, sessions, stock):
+        stock_id, medicament_id = stock
+        context = dict(site_id=seed.site_id, tenant_id=seed.tenant_id, medicament_id=medicament_id, created_by=seed.user.id)
+        async with sessions() as db:
+            await db.execute(
+                update(StockSite).where(StockSite.id == stock_id).values(quantite_actuelle=StockSite.quantite_actuelle + 7)
+            )
+            await db.commit()
+
+        async with sessions() as reconciliation:
+            [drift] = await find_drift(reconciliation, site_id=seed.site_id)
+            assert drift.ecart == -7
+            await reconciliation.commit()
+
+            # Délivrance enregistrée entre la lecture de l'écart et sa correction
+            async with sessions() as db:
+                await apply_movement(db, type_mouvement=TypeMouvementEnum.SORTIE, quantite=2, **context)
+                await db.commit()
+
+            await fix_drift(reconciliation, [drift])
+            await reconciliation.commit()
+
+        async with sessions() as db:
+            compteur = await db.scalar(select(StockSite.quantite_actuelle).where(StockSite.id == stock_id))
+            assert compteur == _replay(HISTORY) - 2
+            assert await find_drift(db, site_id=seed.site_id) == []
@@ -0,0 +1,143 @@
+"""
+Tests de la synchronisation offline (curseurs et snapshots de bootstrap)
+"""
+import uuid as uuid_module
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import Patient
+from app.schemas import EntityType
+from app.services import sync_service
+
+
+@pytest.mark.unit
+class TestSyncCursors:
+    """Tests des curseurs du flux de changements."""
+
+    def test_cursor_roundtrip(self):
+        """Un curseur formaté puis décodé redonne le même instant."""
+        value = datetime(2025, 3, 14, 9, 26, 53, 589793, tzinfo=timezone.utc)
+        assert sync_service.parse_cursor(sync_service.format_cursor(value)) == value
+
+    def test_parse_cursor_accepts_z_suffix(self):
+        """Le format envoyé par la PWA (toISOString) est accepté."""
+        parsed = sync_service.parse_cursor("2024-04-20T10:30:00.000Z")
+        assert parsed == datetime(2024, 4, 20, 10, 30, tzinfo=timezone.utc)
+
+    def test_empty_cursor_is_epoch(self):
+        """Sans curseur, la synchronisation part du début."""
+        assert sync_service.parse_cursor(None) == sync_service.EPOCH
+
+    def test_invalid_cursor(self):
+        """Un curseur invalide lève une ValueError."""
+        with pytest.raises(ValueError):
+            sync_service.parse_cursor("pas-un-curseur")
+
+    def test_change_cursor_roundtrip(self):
+        """Le curseur du flux porte l'horodatage et l'id de la dernière ligne reçue."""
+        value, row_id = datetime(2025, 3, 14, 9, 26, tzinfo=timezone.utc), uuid_module.uuid4()
+        cursor = sync_service.format_change_cursor(value, row_id)
+        assert sync_service.parse_change_cursor(cursor) == (value, row_id)
+
+    def test_timestamp_cursor_covers_its_timestamp(self):
+        """Un curseur de snapshot (horodatage seul) exclut toutes les lignes de cet horodatage."""
+        value = datetime(2025, 3, 14, 9, 26, tzinfo=timezone.utc)
+        assert sync_service.parse_change_cursor(sync_service.format_cursor(value)) == (value, sync_service.LAST_ID)
+        assert sync_service.parse_change_cursor(None) == (sync_service.EPOCH, sync_service.LAST_ID)
+        with pytest.raises(ValueError):
+            sync_service.parse_change_cursor(f"{sync_service.format_cursor(value)}~pas-un-id")
+
+    def test_feed_covers_snapshot_entities(self):
+        """Chaque section du snapshot est mise à jour par le flux (table locale `<entité>s`)."""
+        entities = {entity.value for entity, *_ in sync_service._change_sources(uuid_module.uuid4())}
+        assert {f"{entity}s" for entity in entities} >= {
+            "patients", "encounters", "conditions", "medication_requests", "procedures", "medicaments", "stocks",
+        }
+
+
+@pytest.mark.unit
+class TestBootstrapSnapshots:
+    """Tests du cache de snapshots par site."""
+
+    def test_latest_snapshot_returns_newest_cursor(self, tmp_path, monkeypatch):
+        """Le snapshot le plus récent est servi avec son curseur exact."""
+        monkeypatch.setattr(sync_service.settings, "SYNC_SNAPSHOT_DIR", str(tmp_path))
+        site_id = uuid_module.uuid4()
+        old = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        new = datetime(2025, 1, 2, 8, 0, 0, 123456, tzinfo=timezone.utc)
+
+        sync_service.snapshot_path(site_id, old).touch()
+        sync_service.snapshot_path(site_id, new).touch()
+        sync_service.snapshot_path(uuid_module.uuid4(), new).touch()
+
+        path, cursor = sync_service.latest_snapshot(site_id)
+        assert path == sync_service.snapshot_path(site_id, new)
+        assert sync_service.parse_cursor(cursor) == new
+
+    def test_no_snapshot(self, tmp_path, monkeypatch):
+        """Aucun snapshot disponible pour un site inconnu."""
+        monkeypatch.setattr(sync_service.settings, "SYNC_SNAPSHOT_DIR", str(tmp_path))
+        assert sync_service.latest_snapshot(uuid_module.uuid4()) is None
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestChangeFeedTies:
+    """Parcours du flux quand plus de `limit` lignes partagent un horodatage."""
+
+    async def test_tied_rows_are_neither_skipped_nor_repeated(self, seed, db_session):
+        same_time = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+        patients = [
+            Patient(
+                id=uuid_module.uuid4(), nom="Ex aequo", sexe="F", site_id=seed.site_id, created_by=seed.user.id,
+                created_at=same_time, updated_at=same_time if i < 12 else datetime(2025, 1, 2, tzinfo=timezone.utc),
+            )
+            for i in range(15)
+        ]
+        db_session.add_all(patients)
+        await db_session.flush()
+
+        seen, position, has_more = [], (sync_service.EPOCH, sync_service.LAST_ID), True
+        while has_more:
+            changes, cursor, has_more = await sync_service.get_changes_since(db_session, seed.site_id, position, 5)
+            seen.extend(change.id for change in changes)
+            position = sync_service.parse_change_cursor(cursor)
+
+        expected = [p.id for p in sorted(patients, key=lambda p: (p.updated_at, p.id))]
+        assert seen == expected
+
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestChangeFeedVisibility:
+    """Une ligne validée après une lecture du flux, mais horodatée avant, n'est pas perdue."""
+
+    async def test_late_commit_is_delivered(self, seed, sessions, monkeypatch):
+        start = (sync_service.EPOCH, sync_service.LAST_ID)
+
+        async with sessions() as writer:
+            late = Patient(
+                id=uuid_module.uuid4(), nom="Retard", sexe="F", site_id=seed.site_id, created_by=seed.user.id,
+                created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc),
+            )
+            writer.add(late)
+            await writer.flush()
+            # Validée pendant que la transaction de `late` est ouverte, avec un horodatage postérieur
+            now = datetime.now(timezone.utc)
+            early = await seed.add_patient(created_at=now, updated_at=now)
+
+            async with sessions() as db:
+                changes, cursor, has_more = await sync_service.get_changes_since(db, seed.site_id, start, 100)
+                watermark = await sync_service.get_site_watermark(db, seed.site_id)
+            assert changes == [] and not has_more
+            assert sync_service.parse_change_cursor(cursor) == start
+            assert watermark < late.updated_at
+
+            await writer.commit()
+
+        monkeypatch.setattr(sync_service.settings, "SYNC_VISIBILITY_MARGIN_SECONDS", 0)
+        async with sessions() as db:
+            position = sync_service.parse_change_cursor(cursor)
+            changes, _, _ = await sync_service.get_changes_since(db, seed.site_id, position, 100)
+        assert [change.id for change in changes] == [late.id, early.id]